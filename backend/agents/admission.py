@@ -0,0 +1,367 @@
+"""
+Outbound admission control for Gemini calls.
+
+Without it every chat turn, sub-agent hop and dashboard tab hits Gemini the
+moment it is issued, so one team's burst can push the whole deployment into
+429s — and each client's own retries make it worse. `create_google_llm`
+therefore returns `AdmittedChatGoogleGenerativeAI` (unless
+ADMISSION_ENABLED=false), whose async calls first pass through a per-model
+gate:
+
+  - token buckets per model: requests/minute (GEMINI_RPM, or per model via
+    GEMINI_RPM_LIMITS='{"gemini-3.5-flash": 1000}') and, optionally,
+    approximate input tokens/minute (GEMINI_TPM_LIMITS, same format);
+  - two priority lanes (core/request_context.py): interactive chat and
+    background/dashboard work, served by stride scheduling at
+    ADMISSION_INTERACTIVE_WEIGHT : 1 so background work is slowed, not starved;
+  - weighted fair queuing across team_ids within a lane (start-time fair
+    queuing; optional weights via ADMISSION_TEAM_WEIGHTS='{"<team_id>": 2}');
+  - Retry-After-aware backoff: a 429/503 pauses the model's gate for the
+    server-provided delay (or an exponential default) and the call is
+    re-queued, instead of every caller retrying on its own.
+
+Sync `invoke` paths are not gated (all app traffic is async). Queue depth and
+wait-time metrics: `admission_stats()` / GET /agents/admission/stats.
+"""
+
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import os
+import random
+import re
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator
+
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+from core.request_context import INTERACTIVE, LANES, current_lane, current_team_id
+
+logger = logging.getLogger("admission")
+
+_DEFAULT_RPM = float(os.environ.get("GEMINI_RPM", "300"))
+_RPM_LIMITS: dict[str, float] = json.loads(os.environ.get("GEMINI_RPM_LIMITS") or "{}")
+_TPM_LIMITS: dict[str, float] = json.loads(os.environ.get("GEMINI_TPM_LIMITS") or "{}")
+_TEAM_WEIGHTS: dict[str, float] = json.loads(os.environ.get("ADMISSION_TEAM_WEIGHTS") or "{}")
+_BURST_SECONDS = float(os.environ.get("ADMISSION_BURST_SECONDS", "5"))
+_INTERACTIVE_WEIGHT = float(os.environ.get("ADMISSION_INTERACTIVE_WEIGHT", "4"))
+_MAX_QUEUE_WAIT = float(os.environ.get("ADMISSION_MAX_WAIT_SECONDS", "120"))
+_DEFAULT_BACKOFF = 2.0
+_MAX_BACKOFF = 60.0
+
+_RETRY_DELAY_RE = re.compile(r"retry in ([\d.]+)\s*s", re.IGNORECASE)
+
+
+def admission_enabled() -> bool:
+    return os.environ.get("ADMISSION_ENABLED", "true").strip().lower() not in ("0", "false", "no", "off")
+
+
+class AdmissionTimeout(RuntimeError):
+    """A call waited longer than ADMISSION_MAX_WAIT_SECONDS for a Gemini slot."""
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens/second refill, up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, cost: float, now: float) -> float:
+        self._refill(now)
+        cost = min(cost, self.capacity)
+        return 0.0 if self.tokens >= cost else (cost - self.tokens) / self.rate
+
+    def take(self, cost: float, now: float) -> None:
+        self._refill(now)
+        self.tokens -= min(cost, self.capacity)
+
+
+@dataclass
+class _Waiter:
+    future: asyncio.Future
+    team_id: str
+    lane: str
+    cost: float
+    enqueued_at: float
+
+
+@dataclass
+class _LaneQueue:
+    """SFQ across teams: serve the smallest start tag; a team's tags advance by 1/weight per request."""
+
+    heap: list = field(default_factory=list)
+    virtual_time: float = 0.0
+    last_finish: dict[str, float] = field(default_factory=dict)
+    stride_pass: float = 0.0
+    waits: deque = field(default_factory=lambda: deque(maxlen=500))
+
+    def push(self, waiter: _Waiter, seq: int) -> None:
+        start = max(self.virtual_time, self.last_finish.get(waiter.team_id, 0.0))
+        self.last_finish[waiter.team_id] = start + 1.0 / _TEAM_WEIGHTS.get(waiter.team_id, 1.0)
+        heapq.heappush(self.heap, (start, seq, waiter))
+
+    def peek(self) -> _Waiter | None:
+        while self.heap and self.heap[0][2].future.done():  # cancelled / timed out
+            heapq.heappop(self.heap)
+        return self.heap[0][2] if self.heap else None
+
+    def pop(self) -> _Waiter:
+        start, _, waiter = heapq.heappop(self.heap)
+        self.virtual_time = start
+        if len(self.last_finish) > 1000:
+            self.last_finish = {t: f for t, f in self.last_finish.items() if f > start}
+        return waiter
+
+    def depth(self) -> int:
+        return sum(1 for _, _, w in self.heap if not w.future.done())
+
+
+class ModelGate:
+    """Admission gate for one Gemini model."""
+
+    def __init__(self, model: str, rpm: float, tpm: float | None = None, burst_seconds: float = _BURST_SECONDS):
+        self.model = model
+        self.requests = TokenBucket(rpm / 60.0, rpm / 60.0 * burst_seconds)
+        self.tokens = TokenBucket(tpm / 60.0, tpm / 60.0 * burst_seconds) if tpm else None
+        self.cooldown_until = 0.0
+        self.lanes = {lane: _LaneQueue() for lane in LANES}
+        self.lane_weights = {lane: (_INTERACTIVE_WEIGHT if lane == INTERACTIVE else 1.0) for lane in LANES}
+        self.in_flight = 0
+        self.admitted = 0
+        self.rate_limited = 0
+        self._seq = itertools.count()
+        self._dispatcher: asyncio.Task | None = None
+        self._wakeup: asyncio.Event | None = None
+
+    def _delay_for(self, cost: float, now: float) -> float:
+        delay = max(self.cooldown_until - now, self.requests.wait_time(1, now))
+        if self.tokens is not None:
+            delay = max(delay, self.tokens.wait_time(cost, now))
+        return delay
+
+    def _take(self, waiter_cost: float, now: float) -> None:
+        self.requests.take(1, now)
+        if self.tokens is not None:
+            self.tokens.take(waiter_cost, now)
+        self.admitted += 1
+
+    def _next_lane(self) -> str | None:
+        active = [lane for lane, q in self.lanes.items() if q.peek() is not None]
+        return min(active, key=lambda lane: self.lanes[lane].stride_pass) if active else None
+
+    async def acquire(self, team_id: str, lane: str, cost: float = 0.0) -> float:
+        """Wait for a slot; returns seconds spent queued."""
+        now = time.monotonic()
+        if self._next_lane() is None and self._delay_for(cost, now) <= 0:
+            self._take(cost, now)
+            self.lanes[lane].waits.append(0.0)
+            return 0.0
+
+        queue = self.lanes[lane]
+        if queue.peek() is None:
+            # A lane returning from idle must not spend credit banked while idle.
+            busy = [q.stride_pass for q in self.lanes.values() if q.peek() is not None]
+            queue.stride_pass = max(queue.stride_pass, min(busy, default=queue.stride_pass))
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), team_id, lane, cost, now)
+        queue.push(waiter, next(self._seq))
+        self._ensure_dispatcher()
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(waiter.future, timeout=_MAX_QUEUE_WAIT)
+        except asyncio.TimeoutError:
+            raise AdmissionTimeout(
+                f"Waited over {_MAX_QUEUE_WAIT:.0f}s for a {self.model} slot ({lane} lane)"
+            ) from None
+        return time.monotonic() - now
+
+    def _ensure_dispatcher(self) -> None:
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.get_running_loop().create_task(self._dispatch())
+
+    async def _dispatch(self) -> None:
+        while True:
+            lane = self._next_lane()
+            if lane is None:
+                return
+            queue = self.lanes[lane]
+            waiter = queue.peek()
+            now = time.monotonic()
+            delay = self._delay_for(waiter.cost, now)
+            if delay > 0:
+                # Sleep until a slot frees up — or until a new arrival / backoff
+                # changes who should go next.
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            queue.pop()
+            queue.stride_pass += 1.0 / self.lane_weights[lane]
+            self._take(waiter.cost, now)
+            queue.waits.append(now - waiter.enqueued_at)
+            waiter.future.set_result(None)
+
+    def backoff(self, delay: float) -> None:
+        """Pause the whole gate (every team, both lanes) after a 429/503."""
+        self.rate_limited += 1
+        self.cooldown_until = max(self.cooldown_until, time.monotonic() + delay)
+        self.requests.tokens = 0.0
+        if self._wakeup is not None:
+            self._wakeup.set()
+        logger.warning(f"Gemini {self.model} rate limited; pausing admissions for {delay:.1f}s")
+
+    def stats(self) -> dict[str, Any]:
+        def summary(waits: deque) -> dict[str, float]:
+            if not waits:
+                return {"avg_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+            ordered = sorted(waits)
+            return {
+                "avg_ms": 1000 * sum(ordered) / len(ordered),
+                "p95_ms": 1000 * ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))],
+                "max_ms": 1000 * ordered[-1],
+            }
+
+        return {
+            "queue_depth": {lane: q.depth() for lane, q in self.lanes.items()},
+            "in_flight": self.in_flight,
+            "admitted": self.admitted,
+            "rate_limited": self.rate_limited,
+            "cooldown_remaining_s": max(0.0, self.cooldown_until - time.monotonic()),
+            "wait": {lane: summary(q.waits) for lane, q in self.lanes.items()},
+        }
+
+
+_gates: dict[str, ModelGate] = {}
+
+
+def get_gate(model: str) -> ModelGate:
+    gate = _gates.get(model)
+    if gate is None:
+        gate = _gates[model] = ModelGate(model, _RPM_LIMITS.get(model, _DEFAULT_RPM), _TPM_LIMITS.get(model))
+    return gate
+
+
+def admission_stats() -> dict[str, Any]:
+    return {model: gate.stats() for model, gate in _gates.items()}
+
+
+@asynccontextmanager
+async def admit(model: str, cost_tokens: float = 0.0) -> AsyncIterator[ModelGate]:
+    """Hold one admitted slot for `model`, queued under the current team/lane."""
+    gate = get_gate(model)
+    await gate.acquire(current_team_id() or "_anonymous", current_lane(), cost_tokens)
+    gate.in_flight += 1
+    try:
+        yield gate
+    finally:
+        gate.in_flight -= 1
+
+
+def _status_code(exc: BaseException) -> int | None:
+    seen: set[int] = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        code = getattr(exc, "code", None)
+        if isinstance(code, int):
+            return code
+        exc = exc.__cause__ or exc.__context__
+    return None
+
+
+def retry_after_seconds(exc: BaseException) -> float | None:
+    """Server-suggested delay from a Gemini error: Retry-After header, RetryInfo detail, or message text."""
+    seen: set[int] = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        response = getattr(exc, "response", None)
+        header = getattr(getattr(response, "headers", None), "get", lambda _k: None)("retry-after")
+        if header:
+            try:
+                return float(header)
+            except ValueError:
+                pass
+        details = getattr(exc, "details", None)
+        if isinstance(details, dict):
+            for item in (details.get("error") or {}).get("details") or []:
+                delay = str(item.get("retryDelay", "")).rstrip("s")
+                if delay:
+                    try:
+                        return float(delay)
+                    except ValueError:
+                        pass
+        match = _RETRY_DELAY_RE.search(str(exc))
+        if match:
+            return float(match.group(1))
+        exc = exc.__cause__ or exc.__context__
+    return None
+
+
+def _backoff_for(exc: BaseException, attempt: int) -> tuple[float, bool] | None:
+    """(delay, pause_gate) if `exc` is worth retrying, else None."""
+    code = _status_code(exc)
+    if code not in (429, 500, 503, 504):
+        return None
+    hinted = retry_after_seconds(exc)
+    delay = hinted if hinted is not None else min(_MAX_BACKOFF, _DEFAULT_BACKOFF * 2 ** attempt)
+    delay *= random.uniform(1.0, 1.25)  # de-synchronize the retry wave
+    return delay, code in (429, 503)
+
+
+class AdmittedChatGoogleGenerativeAI(ChatGoogleGenerativeAI):
+    """ChatGoogleGenerativeAI whose async calls are queued by the admission controller."""
+
+    # Retries owned by the gate (Retry-After-aware); the SDK's own retry is
+    # turned off by `create_google_llm` so 429s aren't retried twice.
+    admission_retries: int = 2
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        cost = count_tokens_approximately(messages)
+        for attempt in itertools.count():
+            async with admit(self.model, cost) as gate:
+                try:
+                    return await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+                except Exception as exc:
+                    backoff = _backoff_for(exc, attempt)
+                    if backoff is None or attempt >= self.admission_retries:
+                        raise
+                    delay, pause_gate = backoff
+                    if pause_gate:
+                        gate.backoff(delay)
+            if not pause_gate:
+                await asyncio.sleep(delay)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        cost = count_tokens_approximately(messages)
+        for attempt in itertools.count():
+            started = False
+            async with admit(self.model, cost) as gate:
+                try:
+                    async for chunk in super()._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                        started = True
+                        yield chunk
+                    return
+                except Exception as exc:
+                    backoff = _backoff_for(exc, attempt)
+                    if started or backoff is None or attempt >= self.admission_retries:
+                        raise
+                    delay, pause_gate = backoff
+                    if pause_gate:
+                        gate.backoff(delay)
+            if not pause_gate:
+                await asyncio.sleep(delay)
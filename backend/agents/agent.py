@@ -7,7 +7,8 @@ from typing import Any
 
 from langchain_core.tools import BaseTool
 from langgraph.graph.state import CompiledStateGraph
-from agents.langgraph_base import create_google_llm, create_react_agent, create_sub_agent_tool, ai_message_to_text
+from agents.langgraph_base import create_react_agent, create_sub_agent_tool, ai_message_to_text
+from agents.llm_registry import get_llm
 from agents.guardrails_langgraph import create_guardrail_callbacks
 from agents import prompt
 from agents.sub_agents import (
@@ -31,7 +32,7 @@ AGENT_DESCRIPTION = (
 )
 
 # Create LLM for orchestrator
-model = create_google_llm(
+model = get_llm(
     model=config.agents.get_model_for_agent(AGENT_NAME),
     temperature=0.3,
     max_retries=2,
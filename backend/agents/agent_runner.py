@@ -3,13 +3,22 @@ Pitchmate agent runner — migrated to LangGraph from Google ADK.
 Handles agent execution with session management, checkpointing, and memory.
 """
 
+import asyncio
 import logging
 import uuid
-from typing import Any, Optional
+from typing import Any, AsyncIterator, Optional
 
 from core.config import config
 from fastapi import HTTPException
-from agents.langgraph_runner import handle_agent_request, run_agent, get_checkpointer
+from agents.langgraph_runner import (
+    AgentReply,
+    append_turn_to_thread,
+    get_checkpointer,
+    handle_agent_request,
+    run_agent_reply,
+    stream_agent,
+    thread_has_history,
+)
 
 logger = logging.getLogger("pitchmate_runner")
 
@@ -46,29 +55,78 @@ def get_registered_agent(agent_name: str) -> Any | None:
     return _agent_cache.get(agent_name)
 
 
+def get_pitchmate_agent() -> Any:
+    """
+    Resolve the orchestrator graph to run.
+
+    Prefers the checkpointer-backed instance built during app startup
+    (see app.py lifespan); falls back to the memory-only module default for
+    contexts where the lifespan never ran (e.g. scripts, tests).
+    """
+    from agents.langgraph_runner import get_cached_agent
+    from agents.agent import pitchmate_agent as _default_pitchmate_agent
+
+    return get_cached_agent("pitchmate_agent") or _default_pitchmate_agent
+
+
+async def _preroute(query: str, orchestrator: Any, user_id: str, session_id: str) -> tuple[str, Any] | None:
+    """
+    Ask the intent pre-router (agents/intent_router.py) whether this query can
+    skip the orchestrator. Returns (agent_name, compiled_agent) or None.
+
+    Only opening turns are pre-routed: specialists run without the
+    orchestrator's thread, so a follow-up ("make it shorter") sent straight
+    to one would lose the conversation it refers to.
+    """
+    from agents.intent_router import get_intent_router, intent_router_enabled
+
+    if not query or not intent_router_enabled():
+        return None
+    if await thread_has_history(orchestrator, user_id, session_id, "pitchmate_agent"):
+        return None
+    from agents.agent import SUB_AGENT_SPECS
+
+    available = {spec["name"]: spec["get_agent"]() for spec in SUB_AGENT_SPECS}
+    available = {name: agent for name, agent in available.items() if agent is not None}
+    try:
+        # Local MiniLM forward pass — keep it off the event loop.
+        decision = await asyncio.to_thread(get_intent_router().route, query, set(available))
+    except Exception as e:  # noqa: BLE001 — routing is an optimization; fall back
+        logger.warning(f"Intent pre-router failed, using orchestrator: {e}")
+        return None
+    if decision.agent_name is None:
+        logger.info(f"Pre-router abstained (score={decision.score:.2f}, margin={decision.margin:.2f})")
+        return None
+    logger.info(
+        f"Pre-routed to {decision.agent_name} (score={decision.score:.2f}, margin={decision.margin:.2f})"
+    )
+    return decision.agent_name, available[decision.agent_name]
+
+
 async def handle_pitchmate_request(
     user_id: str,
     query: str,
     session_id: Optional[str] = None,
-) -> tuple[str, str]:
+    context: str = "",
+) -> tuple[AgentReply, str]:
     """
     Handle a request to the main Pitchmate orchestrator agent.
+
+    When the intent pre-router is enabled and confident about an opening
+    turn, the query goes straight to that specialist and the exchange is appended to the
+    orchestrator's thread.
     
     Args:
         user_id: User identifier
-        query: User query/message
+        query: User query/message (persisted in the thread as-is)
         session_id: Optional session ID (creates new if not provided)
+        context: Startup profile / session notes for this turn's system
+            prompt only (see `langgraph_runner._thread_config`)
         
     Returns:
-        Tuple of (response_text, session_id)
+        Tuple of (reply, session_id)
     """
-    # Prefer the checkpointer-backed instance built during app startup
-    # (see app.py lifespan); fall back to the memory-only module default for
-    # contexts where the lifespan never ran (e.g. scripts, tests).
-    from agents.langgraph_runner import get_cached_agent
-    from agents.agent import pitchmate_agent as _default_pitchmate_agent
-
-    compiled_agent = get_cached_agent("pitchmate_agent") or _default_pitchmate_agent
+    compiled_agent = get_pitchmate_agent()
 
     if not user_id:
         raise HTTPException(status_code=401, detail="Unauthorized")
@@ -77,18 +135,81 @@ async def handle_pitchmate_request(
         session_id = str(uuid.uuid4())
     
     logger.info(f"Pitchmate request: user={user_id}, session={session_id}")
+
+    routed = await _preroute(query, compiled_agent, user_id, session_id)
+    if routed is not None:
+        specialist_name, specialist = routed
+        reply = await run_agent_reply(
+            compiled_agent=specialist,
+            user_id=user_id,
+            session_id=session_id,
+            query=query,
+            agent_name=specialist_name,
+            context=context,
+        )
+        await append_turn_to_thread(compiled_agent, user_id, session_id, "pitchmate_agent", query, reply.response)
+        logger.info(f"Pitchmate request completed via {specialist_name}: user={user_id}")
+        return reply, session_id
     
     # Execute the agent
-    response = await run_agent(
+    reply = await run_agent_reply(
         compiled_agent=compiled_agent,
         user_id=user_id,
         session_id=session_id,
         query=query,
         agent_name="pitchmate_agent",
+        context=context,
     )
     
     logger.info(f"Pitchmate request completed: user={user_id}")
-    return response, session_id
+    return reply, session_id
+
+
+async def stream_pitchmate_request(
+    user_id: str,
+    query: str,
+    session_id: str,
+    context: str = "",
+) -> AsyncIterator[dict]:
+    """
+    Streaming counterpart of `handle_pitchmate_request` — yields the
+    `langgraph_runner.stream_agent` events for the orchestrator (or for the
+    specialist the intent pre-router picked). The caller owns session-id
+    creation so it can announce it up front.
+    """
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    logger.info(f"Pitchmate stream request: user={user_id}, session={session_id}")
+    compiled_agent = get_pitchmate_agent()
+
+    routed = await _preroute(query, compiled_agent, user_id, session_id)
+    if routed is None:
+        async for event in stream_agent(
+            compiled_agent=compiled_agent,
+            user_id=user_id,
+            session_id=session_id,
+            query=query,
+            agent_name="pitchmate_agent",
+            context=context,
+        ):
+            yield event
+        return
+
+    specialist_name, specialist = routed
+    async for event in stream_agent(
+        compiled_agent=specialist,
+        user_id=user_id,
+        session_id=session_id,
+        query=query,
+        agent_name=specialist_name,
+        context=context,
+    ):
+        if event["event"] == "final":
+            await append_turn_to_thread(
+                compiled_agent, user_id, session_id, "pitchmate_agent", query, event["response"]
+            )
+        yield event
 
 
 async def cleanup():
@@ -2,23 +2,26 @@
 Agents router — Pitchmate AI co-pilot endpoint and artifact download.
 """
 
+import json
 import os
+import uuid
 from typing import Optional, Annotated
 from fastapi import APIRouter, HTTPException, status, Depends
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel
 import logging
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from auth.dependencies import get_current_user
+from auth.dependencies import get_current_user, llm_lane
 from agents.session_context import get_session_context
 from core.config import config
-from db.base import get_db_session
+from core.request_context import INTERACTIVE
+from db.base import get_db_session, get_sessionmaker
 
 logger = logging.getLogger("agents_backend")
 logger.setLevel(logging.INFO)
 
-router = APIRouter(prefix="/agents", tags=["Agents"])
+router = APIRouter(prefix="/agents", tags=["Agents"], dependencies=[Depends(llm_lane(INTERACTIVE))])
 
 
 class PitchmateRequest(BaseModel):
@@ -28,12 +31,16 @@ class PitchmateRequest(BaseModel):
     # root agent (see GET /agents/available for valid values). None/omitted/
     # "pitchmate_agent" all mean "root agent, auto-route".
     agent_name: Optional[str] = None
+    # Skip the semantic response cache for this turn and force a fresh run
+    # (the fresh answer still replaces what's cached — "regenerate").
+    bypass_cache: bool = False
 
 
 class PitchmateResponse(BaseModel):
     status: str
     response: str
     session_id: str
+    cached: bool = False
 
 
 class AgentOption(BaseModel):
@@ -50,31 +57,24 @@ async def list_available_agents(current_user: Annotated[dict, Depends(get_curren
     return _list_agents()
 
 
-def _build_enriched_query(query: str, profile_md: str, session_context: str) -> str:
-    """Prepend persistent profile + optional session context to the user query."""
+def _build_chat_context(profile_md: str, session_context: str) -> str:
+    """Startup profile + optional session notes, as one system-context block."""
     parts: list[str] = []
     if profile_md:
         parts.append(profile_md)
     if session_context:
         parts.append("## Session Notes\n" + session_context)
-    if not parts:
-        return query
-    return "\n\n".join(parts) + "\n\n---\n## User Question\n" + query
+    return "\n\n".join(parts)
 
 
-@router.post("/pitchmate", response_model=PitchmateResponse)
-async def pitchmate(
-    req: PitchmateRequest,
-    current_user: Annotated[dict, Depends(get_current_user)],
-    db: Annotated[AsyncSession, Depends(get_db_session)],
-):
+async def _chat_context_for(req: PitchmateRequest, current_user: dict, db: AsyncSession) -> tuple[str, str]:
     """
-    Main Pitchmate agent endpoint.
-    Auto-prepends the user's startup profile and session context to every query.
+    Load the team's startup profile + session notes as this turn's ephemeral
+    system context (never stored in the checkpointed thread — see
+    `langgraph_runner._thread_config`). Also returns their fingerprint (the
+    response cache key).
     """
     user_id = current_user["id"]
-    logger.info(f"Pitchmate request: user={user_id}, session_id={req.session_id}, query={req.query[:80]}...")
-
     profile_md = ""
     try:
         from startup.router import get_profile_for_user, profile_to_markdown
@@ -84,49 +84,160 @@ async def pitchmate(
     except Exception as exc:  # noqa: BLE001 — chat must not fail if profile lookup fails
         logger.warning("Could not load startup profile for chat: %s", exc)
 
-    session_context = get_session_context(req.session_id)
-    enriched_query = _build_enriched_query(req.query, profile_md, session_context)
+    session_context = get_session_context(current_user["team_id"], req.session_id)
+    chat_context = _build_chat_context(profile_md, session_context)
     if profile_md:
         logger.info("Injected startup profile (%d chars) for user %s", len(profile_md), user_id)
     if session_context:
         logger.info(f"Injected session context ({len(session_context)} chars) for session {req.session_id}")
+    from agents.response_cache import context_fingerprint
+
+    return chat_context, context_fingerprint(profile_md, session_context)
+
+
+def _requested_specialist(req: PitchmateRequest) -> str | None:
+    """The specialist named in the request, or None for the auto-routing root agent."""
+    requested_agent = (req.agent_name or "").strip()
+    if requested_agent and requested_agent != "pitchmate_agent":
+        return requested_agent
+    return None
+
+
+def _resolve_specialist(requested_agent: str):
+    """
+    Compiled graph for one specialist — each sub-agent is itself a compiled
+    LangGraph react agent, so it can be run the exact same way the
+    orchestrator runs it as a tool.
+    """
+    from agents.agent import get_sub_agent_by_name
+
+    compiled_agent = get_sub_agent_by_name(requested_agent)
+    if compiled_agent is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown or unavailable agent: {requested_agent}",
+        )
+    return compiled_agent
+
+
+def _target_agent(req: PitchmateRequest) -> tuple[str, object]:
+    """(agent_name, compiled graph) that will own this turn's thread."""
+    requested_agent = _requested_specialist(req)
+    if requested_agent:
+        return requested_agent, _resolve_specialist(requested_agent)
+    from agents.agent_runner import get_pitchmate_agent
+
+    return "pitchmate_agent", get_pitchmate_agent()
+
+
+async def _cache_lookup(
+    req: PitchmateRequest,
+    current_user: dict,
+    db: AsyncSession,
+    agent_name: str,
+    compiled_agent,
+    session_id: str,
+    context_hash: str,
+):
+    """
+    Probe the semantic response cache (agents/response_cache.py). Returns None
+    when the cache doesn't apply — disabled, or a follow-up turn whose answer
+    depends on thread history — otherwise a CacheProbe (hit or miss).
+    """
+    from agents import response_cache
+    from agents.langgraph_runner import thread_has_history
+
+    if not response_cache.response_cache_enabled():
+        return None
+    if req.session_id and await thread_has_history(compiled_agent, current_user["id"], session_id, agent_name):
+        return None
+    try:
+        return await response_cache.lookup(
+            db, current_user["team_id"], agent_name, context_hash, req.query, bypass=req.bypass_cache
+        )
+    except Exception as exc:  # noqa: BLE001 — the cache must never break chat
+        logger.warning("Response cache lookup failed: %s", exc)
+        await db.rollback()
+        return None
+
+
+async def _cache_store(db: AsyncSession, current_user: dict, agent_name: str, context_hash: str, query: str, probe, response: str):
+    from agents import response_cache
 
     try:
-        requested_agent = (req.agent_name or "").strip()
-        if requested_agent and requested_agent != "pitchmate_agent":
-            # Bypass the orchestrator and talk to one specialist directly —
-            # each sub-agent is itself a compiled LangGraph react agent, so it
-            # can be run the exact same way the orchestrator runs it as a tool.
-            from agents.agent import get_sub_agent_by_name
-            from agents.langgraph_runner import run_agent
-            import uuid as _uuid
-
-            compiled_agent = get_sub_agent_by_name(requested_agent)
-            if compiled_agent is None:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Unknown or unavailable agent: {requested_agent}",
-                )
-            actual_session_id = req.session_id or str(_uuid.uuid4())
-            response = await run_agent(
+        await response_cache.store(
+            db, current_user["team_id"], agent_name, context_hash, query, probe.embedding, response,
+            probe.embedding_version,
+        )
+    except Exception as exc:  # noqa: BLE001
+        logger.warning("Response cache store failed: %s", exc)
+        await db.rollback()
+
+
+async def _record_cached_turn(compiled_agent, user_id: str, session_id: str, agent_name: str, query: str, response: str):
+    """Keep the thread consistent with what the user saw when answering from cache."""
+    from agents.langgraph_runner import append_turn_to_thread
+
+    await append_turn_to_thread(compiled_agent, user_id, session_id, agent_name, query, response)
+
+
+@router.post("/pitchmate", response_model=PitchmateResponse)
+async def pitchmate(
+    req: PitchmateRequest,
+    current_user: Annotated[dict, Depends(get_current_user)],
+    db: Annotated[AsyncSession, Depends(get_db_session)],
+):
+    """
+    Main Pitchmate agent endpoint.
+    Injects the user's startup profile and session context as per-turn system context.
+    """
+    user_id = current_user["id"]
+    logger.info(f"Pitchmate request: user={user_id}, session_id={req.session_id}, query={req.query[:80]}...")
+
+    chat_context, context_hash = await _chat_context_for(req, current_user, db)
+    agent_name, compiled_agent = _target_agent(req)
+    actual_session_id = req.session_id or str(uuid.uuid4())
+
+    probe = await _cache_lookup(req, current_user, db, agent_name, compiled_agent, actual_session_id, context_hash)
+    if probe is not None and probe.response is not None:
+        await _record_cached_turn(compiled_agent, user_id, actual_session_id, agent_name, req.query, probe.response)
+        return PitchmateResponse(
+            status="success",
+            response=probe.response,
+            session_id=actual_session_id,
+            cached=True,
+        )
+
+    try:
+        requested_agent = _requested_specialist(req)
+        if requested_agent:
+            # Bypass the orchestrator and talk to one specialist directly.
+            from agents.langgraph_runner import run_agent_reply
+
+            reply = await run_agent_reply(
                 compiled_agent=compiled_agent,
                 user_id=user_id,
                 session_id=actual_session_id,
-                query=enriched_query,
+                query=req.query,
                 agent_name=requested_agent,
+                context=chat_context,
             )
         else:
             from agents.agent_runner import handle_pitchmate_request
 
-            response, actual_session_id = await handle_pitchmate_request(
+            reply, actual_session_id = await handle_pitchmate_request(
                 user_id=user_id,
-                query=enriched_query,
-                session_id=req.session_id,
+                query=req.query,
+                session_id=actual_session_id,
+                context=chat_context,
             )
 
+        if probe is not None and reply.answered:  # never cache guardrail blocks or empty runs
+            await _cache_store(db, current_user, agent_name, context_hash, req.query, probe, reply.response)
+
         return PitchmateResponse(
             status="success",
-            response=response,
+            response=reply.response,
             session_id=actual_session_id,
         )
 
@@ -140,6 +251,87 @@ async def pitchmate(
         )
 
 
+def _sse_frame(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/pitchmate/stream")
+async def pitchmate_stream(
+    req: PitchmateRequest,
+    current_user: Annotated[dict, Depends(get_current_user)],
+    db: Annotated[AsyncSession, Depends(get_db_session)],
+):
+    """
+    Server-sent-event variant of POST /agents/pitchmate.
+
+    Emits a `session` frame immediately, then `token` / `agent_start` /
+    `agent_token` / `agent_end` frames as the graph runs, and finally one
+    `final` frame carrying the same cleaned response the JSON endpoint returns
+    (or an `error` frame). See `langgraph_runner.stream_agent` for payloads.
+    """
+    user_id = current_user["id"]
+    logger.info(f"Pitchmate stream: user={user_id}, session_id={req.session_id}, query={req.query[:80]}...")
+
+    chat_context, context_hash = await _chat_context_for(req, current_user, db)
+    agent_name, compiled_agent = _target_agent(req)
+    actual_session_id = req.session_id or str(uuid.uuid4())
+
+    probe = await _cache_lookup(req, current_user, db, agent_name, compiled_agent, actual_session_id, context_hash)
+    if probe is not None and probe.response is not None:
+        await _record_cached_turn(compiled_agent, user_id, actual_session_id, agent_name, req.query, probe.response)
+
+        async def cached_frames():
+            yield _sse_frame("session", {"session_id": actual_session_id})
+            yield _sse_frame("final", {"response": probe.response, "session_id": actual_session_id, "cached": True})
+
+        return StreamingResponse(
+            cached_frames(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    requested_agent = _requested_specialist(req)
+    if requested_agent:
+        from agents.langgraph_runner import stream_agent
+
+        events = stream_agent(
+            compiled_agent=compiled_agent,
+            user_id=user_id,
+            session_id=actual_session_id,
+            query=req.query,
+            agent_name=requested_agent,
+            context=chat_context,
+        )
+    else:
+        from agents.agent_runner import stream_pitchmate_request
+
+        events = stream_pitchmate_request(
+            user_id=user_id,
+            query=req.query,
+            session_id=actual_session_id,
+            context=chat_context,
+        )
+
+    async def frames():
+        yield _sse_frame("session", {"session_id": actual_session_id})
+        async for item in events:
+            event = item.pop("event")
+            if event == "final":
+                item["session_id"] = actual_session_id
+                if probe is not None and item.get("answered", True):
+                    # The request-scoped session may already be released while streaming.
+                    async with get_sessionmaker()() as cache_db:
+                        await _cache_store(cache_db, current_user, agent_name, context_hash, req.query, probe, item["response"])
+            yield _sse_frame(event, item)
+
+    return StreamingResponse(
+        frames(),
+        media_type="text/event-stream",
+        # Disable proxy buffering (nginx) so frames reach the browser as they're produced.
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 def _safe_artifact_filename(name: str) -> bool:
     """Allow only simple filenames (no path traversal)."""
     if not name or ".." in name or os.path.sep in name or "/" in name or "\\" in name:
@@ -169,3 +361,34 @@ async def download_artifact(
     else:
         media_type = "text/plain"
     return FileResponse(filepath, filename=filename, media_type=media_type)
+
+
+@router.get("/admission/stats")
+async def gemini_admission_stats(current_user: Annotated[dict, Depends(get_current_user)]):
+    """Gemini admission controller (this worker): queue depth per lane, in-flight calls, waits, 429s."""
+    from agents.admission import admission_stats
+
+    return admission_stats()
+
+
+@router.get("/cache/stats")
+async def response_cache_stats(
+    current_user: Annotated[dict, Depends(get_current_user)],
+    db: Annotated[AsyncSession, Depends(get_db_session)],
+):
+    """Semantic response cache hit rate (this worker) and the team's cached-answer counts."""
+    from agents.response_cache import cache_stats
+
+    return await cache_stats(db, current_user["team_id"])
+
+
+@router.delete("/cache", status_code=status.HTTP_204_NO_CONTENT)
+async def clear_response_cache(
+    current_user: Annotated[dict, Depends(get_current_user)],
+    db: Annotated[AsyncSession, Depends(get_db_session)],
+):
+    """Drop every cached chat answer for the current team."""
+    from agents.response_cache import clear_team
+
+    removed = await clear_team(db, current_user["team_id"])
+    logger.info("Cleared %d cached responses for team %s", removed, current_user["team_id"])
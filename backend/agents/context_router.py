@@ -18,7 +18,7 @@ import logging
 
 from auth.dependencies import get_current_user
 from agents.session_context import set_session_context, get_session_context
-from knowledge_base.router import _extract_text_from_file
+from knowledge_base.extraction_service import aextract_text
 
 logger = logging.getLogger("context_router")
 router = APIRouter(prefix="/agents/context", tags=["Context"])
@@ -43,7 +43,7 @@ async def save_context(
     """Save startup context for this chat session. If no session_id, one is created and returned."""
     user_id = current_user["id"]
     session_id = req.session_id or str(uuid.uuid4())
-    set_session_context(session_id, req.context.strip())
+    set_session_context(current_user["team_id"], session_id, req.context.strip())
     logger.info(f"Saved startup context for session {session_id} (user {user_id})")
     return ContextResponse(
         context=req.context.strip(),
@@ -69,7 +69,7 @@ async def save_context_from_file(
     if not content:
         raise HTTPException(status_code=400, detail="File is empty.")
     try:
-        text = _extract_text_from_file(content, fn)
+        text = await aextract_text(content, fn)
     except Exception as exc:
         logger.warning(f"Extract text from file failed: {exc}")
         raise HTTPException(
@@ -79,7 +79,7 @@ async def save_context_from_file(
     if not (text or "").strip():
         raise HTTPException(status_code=400, detail="No text could be extracted from the file.")
     sid = session_id or str(uuid.uuid4())
-    set_session_context(sid, text.strip())
+    set_session_context(current_user["team_id"], sid, text.strip())
     logger.info(f"Saved startup context from file for session {sid} (user {current_user['id']})")
     return ContextResponse(
         context=text.strip(),
@@ -96,5 +96,5 @@ async def get_context(
     """Retrieve startup context for the given session. Pass session_id to get that chat's context."""
     if not session_id:
         return ContextResponse(context="", message="No session_id provided")
-    context = get_session_context(session_id)
+    context = get_session_context(current_user["team_id"], session_id)
     return ContextResponse(context=context, message="ok" if context else "No context for this session")
@@ -0,0 +1,178 @@
+"""
+Rolling summarization of checkpointed chat threads.
+
+`run_agent` appends every turn to the thread `f"{user_id}:{session_id}"` and
+each model call re-sends the whole `messages` list, so long sessions get
+slower and pricier per turn until they hit the context limit.
+`create_react_agent` therefore runs a "compact" node before the agent on every
+turn: once the thread crosses the policy's message or token threshold, all but
+the turn being answered and the last `keep_last_turns` (at least 1) completed
+turns before it are folded into one pinned summary message (rolled forward on
+later compactions) and removed from state.
+
+Cuts are made only at HumanMessage boundaries — a turn's AIMessage tool calls
+and their ToolMessage results are always kept or summarized together, never
+split, so Gemini never sees an orphaned tool call or result.
+
+Per-agent policy: see `AgentsConfig.get_history_setting` (e.g.
+PITCHMATE_AGENT_HISTORY_MAX_TOKENS, falling back to HISTORY_MAX_TOKENS).
+"""
+
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from typing import Any, Sequence
+
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    RemoveMessage,
+    SystemMessage,
+    ToolMessage,
+)
+from langchain_core.messages.utils import count_tokens_approximately
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+
+from core.config import config
+
+logger = logging.getLogger("history_compaction")
+
+SUMMARY_MESSAGE_ID = "history-summary"
+# Tag on the summarizer call so streaming (langgraph_runner.stream_agent) can
+# keep its tokens out of the user-visible answer.
+COMPACTION_TAG = "history_compaction"
+
+_SUMMARY_PREFIX = "[Summary of the earlier conversation]\n"
+_TOOL_RESULT_CHARS = 1500
+
+SUMMARIZER_INSTRUCTION = (
+    "You maintain the running memory of a conversation between a startup founder and "
+    "Pitchmate, an AI fundraising co-pilot. Write a concise summary of the transcript "
+    "below (which may begin with an earlier summary). Keep every concrete fact the "
+    "founder shared (company, metrics, market, round, investors, decisions), every "
+    "deliverable produced (documents, file names, diagrams), and any open questions or "
+    "commitments. Drop pleasantries and repetition. Use short bullet points."
+)
+
+
+@dataclass(frozen=True)
+class CompactionPolicy:
+    """When and how far to compact one agent's thread."""
+
+    max_messages: int = 40
+    max_tokens: int = 16000
+    keep_last_turns: int = 4
+    enabled: bool = True
+
+    @classmethod
+    def for_agent(cls, agent_name: str) -> "CompactionPolicy":
+        defaults = cls()
+        return cls(
+            max_messages=config.agents.get_history_setting(agent_name, "MAX_MESSAGES", defaults.max_messages),
+            max_tokens=config.agents.get_history_setting(agent_name, "MAX_TOKENS", defaults.max_tokens),
+            keep_last_turns=config.agents.get_history_setting(agent_name, "KEEP_TURNS", defaults.keep_last_turns),
+            enabled=bool(config.agents.get_history_setting(agent_name, "COMPACTION", 1)),
+        )
+
+    def needs_compaction(self, messages: Sequence[BaseMessage]) -> bool:
+        if not self.enabled:
+            return False
+        return len(messages) > self.max_messages or count_tokens_approximately(messages) > self.max_tokens
+
+
+def _is_summary(message: BaseMessage) -> bool:
+    return message.id == SUMMARY_MESSAGE_ID
+
+
+def split_for_compaction(
+    messages: Sequence[BaseMessage], keep_last_turns: int
+) -> tuple[list[BaseMessage], list[BaseMessage]]:
+    """
+    Split a thread into (to_summarize, to_keep), keeping the last
+    `keep_last_turns` completed user turns (at least 1) plus the turn in
+    progress — the newest one, if no final answer follows it yet — which
+    doesn't count toward the limit. A previous summary always lands in
+    `to_summarize` so it gets rolled forward. Returns ([], messages) when
+    there is nothing old enough to fold.
+    """
+    turn_starts = [
+        i for i, m in enumerate(messages) if isinstance(m, HumanMessage) and not _is_summary(m)
+    ]
+    keep = max(1, keep_last_turns)
+    if turn_starts and not any(
+        isinstance(m, AIMessage) and not m.tool_calls for m in messages[turn_starts[-1]:]
+    ):
+        keep += 1  # the turn being answered
+    if len(turn_starts) <= keep:
+        return [], list(messages)
+    cut = turn_starts[-keep]
+    older = list(messages[:cut])
+    if all(_is_summary(m) for m in older):
+        return [], list(messages)
+    return older, list(messages[cut:])
+
+
+def _render_transcript(messages: Sequence[BaseMessage]) -> str:
+    from agents.langgraph_base import message_content_to_text
+
+    lines: list[str] = []
+    for m in messages:
+        text = message_content_to_text(m.content).strip()
+        if _is_summary(m):
+            lines.append(f"Earlier summary:\n{text.removeprefix(_SUMMARY_PREFIX.strip()).strip()}")
+        elif isinstance(m, HumanMessage):
+            lines.append(f"Founder: {text}")
+        elif isinstance(m, ToolMessage):
+            if len(text) > _TOOL_RESULT_CHARS:
+                text = text[:_TOOL_RESULT_CHARS] + " …"
+            lines.append(f"Result of {m.name or 'tool'}: {text}")
+        elif isinstance(m, AIMessage):
+            for call in m.tool_calls or []:
+                lines.append(f"Pitchmate called {call['name']}({call.get('args', {})})")
+            if text:
+                lines.append(f"Pitchmate: {text}")
+    return "\n\n".join(lines)
+
+
+async def summarize_messages(model: Any, messages: Sequence[BaseMessage]) -> str:
+    """Ask `model` (tools unbound) for a rolling summary of `messages`."""
+    from agents.langgraph_base import ai_message_to_text
+
+    response = await model.ainvoke(
+        [SystemMessage(content=SUMMARIZER_INSTRUCTION), HumanMessage(content=_render_transcript(messages))],
+        config={"tags": [COMPACTION_TAG]},
+    )
+    return ai_message_to_text(response).strip()
+
+
+def create_compaction_node(model: Any, policy: CompactionPolicy, agent_name: str = "agent"):
+    """
+    Build the graph node that compacts the thread in place. It rewrites state
+    as [pinned summary, *last K turns] via REMOVE_ALL_MESSAGES, so the summary
+    always sits first regardless of where add_messages would append it.
+    """
+
+    async def compact_history(state: dict) -> dict:
+        messages = state["messages"]
+        if not policy.needs_compaction(messages):
+            return {}
+        older, kept = split_for_compaction(messages, policy.keep_last_turns)
+        if not older:
+            return {}
+        try:
+            summary = await summarize_messages(model, older)
+        except Exception as e:  # noqa: BLE001 — keep answering; retry next turn
+            logger.warning(f"[{agent_name}] History compaction failed, sending full thread: {e}")
+            return {}
+        if not summary:
+            return {}
+        logger.info(
+            f"[{agent_name}] Compacted {len(older)} messages into a summary; kept {len(kept)} "
+            f"(~{count_tokens_approximately(messages)} -> ~{count_tokens_approximately(kept)} tokens)"
+        )
+        pinned = HumanMessage(content=_SUMMARY_PREFIX + summary, id=SUMMARY_MESSAGE_ID)
+        return {"messages": [RemoveMessage(id=REMOVE_ALL_MESSAGES), pinned, *kept]}
+
+    return compact_history
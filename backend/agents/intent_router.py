@@ -0,0 +1,204 @@
+"""
+Embedding-based intent pre-router for the Pitchmate orchestrator.
+
+Every orchestrator turn costs at least two LLM calls before and after the
+specialist runs (pick a sub-agent tool, then re-synthesize its answer). For
+queries whose intent is obvious ("what's my startup worth?") that hop is pure
+latency, so this module classifies the raw user question locally with the
+MiniLM model the knowledge base already loads
+(`pinecone_vector_store._get_model`) and dispatches straight to the specialist
+when it is confident. Ambiguous queries fall back to the orchestrator.
+
+Classifier: nearest-centroid over labelled example queries per
+`agents.agent.SUB_AGENT_SPECS` entry (mean of the normalized example
+embeddings, re-normalized). A query is routed only when its best centroid
+cosine similarity clears `INTENT_ROUTER_MIN_SCORE` *and* beats the runner-up by
+`INTENT_ROUTER_MIN_MARGIN`.
+
+Enable with INTENT_ROUTER_ENABLED=true. Offline accuracy / latency-saved
+evaluation: `python -m agents.intent_router_eval`.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+import numpy as np
+
+logger = logging.getLogger("intent_router")
+
+_MIN_SCORE = float(os.environ.get("INTENT_ROUTER_MIN_SCORE", "0.5"))
+_MIN_MARGIN = float(os.environ.get("INTENT_ROUTER_MIN_MARGIN", "0.07"))
+
+# Labelled example queries per sub-agent (keys must match SUB_AGENT_SPECS names).
+# Phrase these the way founders actually type into the chat box; the eval set
+# in intent_router_eval.py is held out from this list.
+ROUTING_EXAMPLES: dict[str, list[str]] = {
+    "market_validator_agent": [
+        "Is my TAM SAM SOM realistic?",
+        "Validate my market size numbers",
+        "Who are my competitors and how do I differentiate?",
+        "Help me build a go-to-market strategy",
+        "What should my GTM plan look like for the first year?",
+        "Who is my ideal customer profile?",
+        "How should I price my product?",
+        "Is there real demand for my product in this market?",
+        "Which customer segment should I target first?",
+        "Is my serviceable obtainable market too optimistic?",
+    ],
+    "investor_outreacher_agent": [
+        "Who should I pitch to for my seed round?",
+        "Which investors invest in fintech at pre-seed?",
+        "Write a cold email to a VC",
+        "Draft an investor outreach email for an angel",
+        "How do I find investors for my startup?",
+        "What kind of investors fit a Series A climate company?",
+        "Help me write a follow-up email to an investor I met",
+        "Should I approach angels or VCs first?",
+    ],
+    "knowledge_base_agent": [
+        "Review my pitch deck",
+        "Analyse the deck I uploaded",
+        "Give me feedback on my uploaded pitch deck",
+        "What documents are in my knowledge base?",
+        "Search my uploaded docs for churn numbers",
+        "What does my deck say about traction?",
+        "Summarize the document I uploaded",
+        "Find the slide about our business model in my files",
+    ],
+    "figma_mcp_agent": [
+        "Review the design of my Figma deck",
+        "Here's my Figma link, give me design feedback",
+        "Is the visual hierarchy on my slides good in Figma?",
+        "Check brand consistency in my Figma file",
+        "Critique the layout and typography of my Figma slides",
+    ],
+    "web_search_agent": [
+        "What's the latest news about AI startups?",
+        "Search the web for the market size of vertical SaaS",
+        "Find recent news on fintech regulation",
+        "What are the current trends in climate tech?",
+        "Look up the key players in the EV charging market",
+        "Any recent funding news in healthtech?",
+    ],
+    "drawio_agent": [
+        "Draw a flowchart of our onboarding process",
+        "Create an org chart for my team",
+        "Make a diagram of our system architecture",
+        "Draw a Mermaid diagram of the customer journey",
+        "Visualize our GTM funnel as a diagram",
+        "Create a business model canvas drawing",
+        "Draw our use of funds budget allocation",
+    ],
+    "pitch_writer_agent": [
+        "Write my elevator pitch",
+        "Give me a 30 second pitch for my startup",
+        "Create a one-page executive summary PDF",
+        "Write an executive summary for investors",
+        "Help me write my pitch",
+        "Make my one-liner punchier",
+    ],
+    "due_diligence_agent": [
+        "What questions will investors ask me?",
+        "Prepare me for my investor meeting",
+        "What are the red flags in my pitch?",
+        "Do due diligence on my startup",
+        "Create an investor Q&A prep document",
+        "What tough questions should I expect about my deck?",
+        "Help me prep for my VC call tomorrow",
+    ],
+    "deck_creator_agent": [
+        "Create a pitch deck for my startup",
+        "Generate a deck as a PDF",
+        "Make me a product report in DOCX",
+        "Build a pitch deck document with problem, solution and traction",
+        "Create a report document about my company",
+        "Export my pitch as a deck file",
+    ],
+    "valuation_advisor_agent": [
+        "What is my startup worth?",
+        "What valuation should I ask for at seed?",
+        "How much equity should I give up?",
+        "Estimate my pre-money valuation",
+        "Is a 10M cap reasonable for my round?",
+        "How do I negotiate valuation on a term sheet?",
+        "What revenue multiple applies to my SaaS company?",
+    ],
+}
+
+
+@dataclass
+class RoutingDecision:
+    """Outcome of `IntentRouter.route` — `agent_name` is None when the query should go to the orchestrator."""
+
+    agent_name: str | None
+    score: float
+    margin: float
+    scores: dict[str, float] = field(default_factory=dict)
+
+
+def _encode(texts: list[str]) -> np.ndarray:
+    from agents.sub_agents.knowledge_base.pinecone_vector_store import _get_model
+
+    return np.asarray(_get_model().encode(texts, normalize_embeddings=True), dtype=np.float32)
+
+
+class IntentRouter:
+    """Nearest-centroid intent classifier over `ROUTING_EXAMPLES`."""
+
+    def __init__(
+        self,
+        examples: dict[str, list[str]] | None = None,
+        min_score: float = _MIN_SCORE,
+        min_margin: float = _MIN_MARGIN,
+    ):
+        examples = examples or ROUTING_EXAMPLES
+        self.labels = list(examples)
+        self.min_score = min_score
+        self.min_margin = min_margin
+
+        flat = [q for label in self.labels for q in examples[label]]
+        vectors = _encode(flat)
+        centroids = []
+        start = 0
+        for label in self.labels:
+            n = len(examples[label])
+            centroid = vectors[start:start + n].mean(axis=0)
+            centroids.append(centroid / np.linalg.norm(centroid))
+            start += n
+        self._centroids = np.stack(centroids)
+
+    def route(self, query: str, allowed: set[str] | None = None) -> RoutingDecision:
+        """
+        Classify *query*. `allowed` restricts candidates to agents that are
+        actually initialized (MCP-backed ones may be missing).
+        """
+        sims = self._centroids @ _encode([query])[0]
+        ranked = sorted(
+            ((float(s), label) for s, label in zip(sims, self.labels) if allowed is None or label in allowed),
+            reverse=True,
+        )
+        scores = {label: score for score, label in ranked}
+        if not ranked:
+            return RoutingDecision(None, 0.0, 0.0, scores)
+        best_score, best_label = ranked[0]
+        margin = best_score - ranked[1][0] if len(ranked) > 1 else best_score
+        if best_score >= self.min_score and margin >= self.min_margin:
+            return RoutingDecision(best_label, best_score, margin, scores)
+        return RoutingDecision(None, best_score, margin, scores)
+
+
+def intent_router_enabled() -> bool:
+    return os.environ.get("INTENT_ROUTER_ENABLED", "").strip().lower() in ("1", "true", "yes", "on")
+
+
+@lru_cache(maxsize=1)
+def get_intent_router() -> IntentRouter:
+    """Build (once) the process-wide router — embeds every example on first call."""
+    router = IntentRouter()
+    logger.info("Intent router ready (%d agents, min_score=%.2f, min_margin=%.2f)",
+                len(router.labels), router.min_score, router.min_margin)
+    return router
@@ -0,0 +1,137 @@
+"""
+Offline evaluation of the intent pre-router (agents/intent_router.py).
+
+Runs the held-out labelled queries below through `IntentRouter` and reports:
+  - routed accuracy — of the queries the router dispatched directly, how many
+    went to the right specialist (wrong dispatches are the real cost);
+  - coverage — share of specialist-bound queries routed directly;
+  - abstain precision — share of ambiguous queries (label None) that were
+    correctly left to the orchestrator;
+  - latency saved — orchestrator LLM calls skipped × per-call latency, minus
+    the router's own local encode time.
+
+Run with: python -m agents.intent_router_eval [--orchestrator-call-ms 1800]
+"""
+
+import argparse
+import time
+
+from agents.intent_router import IntentRouter
+
+# (query, expected agent). None = ambiguous/multi-intent — should fall back to
+# the orchestrator. None of these appear in ROUTING_EXAMPLES.
+EVAL_QUERIES: list[tuple[str, str | None]] = [
+    ("Does a $40B TAM for pet insurance make sense?", "market_validator_agent"),
+    ("How big is my addressable market really?", "market_validator_agent"),
+    ("What pricing model works for a B2B API product?", "market_validator_agent"),
+    ("How do we stand out against Notion and Coda?", "market_validator_agent"),
+    ("What channels should we use to acquire our first 100 customers?", "market_validator_agent"),
+    ("Who invests in seed-stage fintech?", "investor_outreacher_agent"),
+    ("Write an intro email to a partner at a VC firm", "investor_outreacher_agent"),
+    ("Which angels should I reach out to for my edtech startup?", "investor_outreacher_agent"),
+    ("Draft a cold outreach message to a seed investor", "investor_outreacher_agent"),
+    ("Can you look at my deck and tell me what's weak?", "knowledge_base_agent"),
+    ("What files have I uploaded so far?", "knowledge_base_agent"),
+    ("According to my uploaded memo, what's our burn?", "knowledge_base_agent"),
+    ("Give me design feedback on figma.com/file/abc123", "figma_mcp_agent"),
+    ("Are the fonts and colors consistent across my Figma slides?", "figma_mcp_agent"),
+    ("What's happening in the news with OpenAI this week?", "web_search_agent"),
+    ("Search online for the size of the global pet care market", "web_search_agent"),
+    ("Latest headlines about startup layoffs", "web_search_agent"),
+    ("Draw a sequence diagram of our checkout flow", "drawio_agent"),
+    ("Make a flowchart showing how a user signs up", "drawio_agent"),
+    ("Can you diagram our team structure?", "drawio_agent"),
+    ("Write a 60-second elevator pitch for my company", "pitch_writer_agent"),
+    ("I need an exec summary PDF to send to investors", "pitch_writer_agent"),
+    ("What will VCs grill me on in the partner meeting?", "due_diligence_agent"),
+    ("List the red flags an investor would see in my startup", "due_diligence_agent"),
+    ("Help me prepare answers for investor due diligence", "due_diligence_agent"),
+    ("Generate my pitch deck as a DOCX file", "deck_creator_agent"),
+    ("Create a deck PDF covering problem, solution and market", "deck_creator_agent"),
+    ("How much is my company worth at $500K ARR?", "valuation_advisor_agent"),
+    ("What pre-money should I target for my seed round?", "valuation_advisor_agent"),
+    ("Is giving up 25% equity too much?", "valuation_advisor_agent"),
+    ("Hi", None),
+    ("Thanks, that's helpful!", None),
+    ("Can you make that shorter?", None),
+    ("Tell me about yourself", None),
+    ("Help me with my startup", None),
+    ("Validate my market and then draft an email to investors about it", None),
+]
+
+
+def evaluate(router: IntentRouter, orchestrator_call_ms: float, orchestrator_calls_saved: int = 2) -> dict:
+    routed = correct = abstained_ok = specialist_total = ambiguous_total = 0
+    encode_ms: list[float] = []
+    mistakes: list[str] = []
+
+    for query, expected in EVAL_QUERIES:
+        start = time.perf_counter()
+        decision = router.route(query)
+        encode_ms.append((time.perf_counter() - start) * 1000)
+
+        if expected is None:
+            ambiguous_total += 1
+            if decision.agent_name is None:
+                abstained_ok += 1
+            else:
+                mistakes.append(f"  routed ambiguous {query!r} -> {decision.agent_name} ({decision.score:.2f})")
+            continue
+
+        specialist_total += 1
+        if decision.agent_name is None:
+            continue
+        routed += 1
+        if decision.agent_name == expected:
+            correct += 1
+        else:
+            mistakes.append(f"  {query!r}: expected {expected}, got {decision.agent_name} ({decision.score:.2f})")
+
+    all_routed = routed + (ambiguous_total - abstained_ok)
+    avg_encode_ms = sum(encode_ms) / len(encode_ms)
+    saved_per_routed_ms = orchestrator_calls_saved * orchestrator_call_ms
+    # Expected saving per chat turn across the whole eval mix (router cost is paid on every turn).
+    saved_per_turn_ms = (all_routed / len(EVAL_QUERIES)) * saved_per_routed_ms - avg_encode_ms
+
+    return {
+        "routed_accuracy": correct / routed if routed else 0.0,
+        "coverage": routed / specialist_total if specialist_total else 0.0,
+        "abstain_precision": abstained_ok / ambiguous_total if ambiguous_total else 0.0,
+        "avg_router_ms": avg_encode_ms,
+        "saved_per_routed_turn_ms": saved_per_routed_ms,
+        "expected_saved_per_turn_ms": saved_per_turn_ms,
+        "mistakes": mistakes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orchestrator-call-ms", type=float, default=1800.0,
+                        help="Average latency of one orchestrator LLM call (see MLflow avg_llm_latency_ms).")
+    parser.add_argument("--min-score", type=float, default=None)
+    parser.add_argument("--min-margin", type=float, default=None)
+    args = parser.parse_args()
+
+    kwargs = {}
+    if args.min_score is not None:
+        kwargs["min_score"] = args.min_score
+    if args.min_margin is not None:
+        kwargs["min_margin"] = args.min_margin
+    router = IntentRouter(**kwargs)
+    router.route("warm-up")  # exclude one-off model/thread-pool warm-up from timings
+
+    report = evaluate(router, args.orchestrator_call_ms)
+    print(f"Thresholds: min_score={router.min_score:.2f} min_margin={router.min_margin:.2f}")
+    print(f"Routed accuracy:        {report['routed_accuracy']:.1%}")
+    print(f"Coverage:               {report['coverage']:.1%}")
+    print(f"Abstain precision:      {report['abstain_precision']:.1%}")
+    print(f"Router latency:         {report['avg_router_ms']:.1f} ms/query")
+    print(f"Saved per routed turn:  {report['saved_per_routed_turn_ms']:.0f} ms")
+    print(f"Expected saved / turn:  {report['expected_saved_per_turn_ms']:.0f} ms")
+    if report["mistakes"]:
+        print("Mistakes:")
+        print("\n".join(report["mistakes"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,10 +4,11 @@ Provides state schemas, tool wrappers, and agent creation utilities.
 """
 
 import os
-from typing import Annotated, Any, Literal, Sequence, TypedDict
+from typing import Annotated, Any, Callable, Literal, Sequence, TypedDict
 from langchain_core.callbacks import BaseCallbackHandler
 from langchain_core.messages import BaseMessage, AIMessage, HumanMessage, SystemMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import BaseTool, StructuredTool
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langgraph.graph import StateGraph, END
@@ -16,6 +17,9 @@ from langgraph.graph.message import add_messages
 import functools
 import logging
 
+from agents.admission import AdmittedChatGoogleGenerativeAI, admission_enabled
+from agents.history_compaction import CompactionPolicy, create_compaction_node
+
 logger = logging.getLogger("langgraph_base")
 
 
@@ -107,15 +111,28 @@ def create_google_llm(
     if thinking_level is not None and ("gemini-3" in model or "gemini-3." in model):
         kwargs["thinking_level"] = thinking_level
 
+    llm_cls = ChatGoogleGenerativeAI
+    if admission_enabled():
+        # Async calls queue through the shared Gemini admission gate, which owns
+        # retries (Retry-After aware); the SDK makes a single attempt per call.
+        llm_cls = AdmittedChatGoogleGenerativeAI
+        kwargs["admission_retries"] = max_retries
+        kwargs["max_retries"] = 1
+
     try:
-        return ChatGoogleGenerativeAI(**kwargs)
+        return llm_cls(**kwargs)
     except TypeError:
         # Older SDK builds may not accept thinking_level — retry without it.
         kwargs.pop("thinking_level", None)
-        return ChatGoogleGenerativeAI(**kwargs)
+        return llm_cls(**kwargs)
 
 
-def wrap_tool_function(func: callable, name: str | None = None, description: str | None = None) -> StructuredTool:
+def wrap_tool_function(
+    func: callable,
+    name: str | None = None,
+    description: str | None = None,
+    coroutine: Callable | None = None,
+) -> StructuredTool:
     """
     Wrap a Python function as a LangChain StructuredTool.
     
@@ -123,17 +140,43 @@ def wrap_tool_function(func: callable, name: str | None = None, description: str
         func: The function to wrap (must have type hints)
         name: Tool name (defaults to function name)
         description: Tool description (defaults to function docstring)
+        coroutine: Optional async implementation with the same signature; used
+            when the graph runs async (ainvoke/astream) instead of running
+            `func` on a worker thread.
         
     Returns:
         StructuredTool instance
     """
     return StructuredTool.from_function(
         func=func,
+        coroutine=coroutine,
         name=name or func.__name__,
         description=description or func.__doc__ or f"Tool: {func.__name__}",
     )
 
 
+# Configurable key for the per-invocation context. The "__" prefix keeps it out
+# of checkpoint metadata (and trace metadata), which copy every other
+# string-valued configurable key.
+EPHEMERAL_CONTEXT_KEY = "__ephemeral_context"
+
+
+def with_ephemeral_context(messages: list[BaseMessage], config: RunnableConfig | None) -> list[BaseMessage]:
+    """
+    Append the per-invocation `configurable[EPHEMERAL_CONTEXT_KEY]` (startup
+    profile, session notes — see `langgraph_runner._thread_config`) to the
+    leading system message. Done after template formatting so braces in the
+    profile are never parsed as prompt variables.
+    """
+    context = ((config or {}).get("configurable") or {}).get(EPHEMERAL_CONTEXT_KEY)
+    if not context:
+        return messages
+    if messages and isinstance(messages[0], SystemMessage):
+        system_text = message_content_to_text(messages[0].content)
+        return [SystemMessage(content=f"{system_text}\n\n{context}"), *messages[1:]]
+    return [SystemMessage(content=context), *messages]
+
+
 def create_react_agent(
     model: ChatGoogleGenerativeAI,
     tools: list[BaseTool],
@@ -141,6 +184,7 @@ def create_react_agent(
     agent_name: str = "agent",
     checkpointer: Any | None = None,
     callbacks: list[BaseCallbackHandler] | None = None,
+    compaction: CompactionPolicy | None = None,
 ) -> StateGraph:
     """
     Create a ReAct-style agent using LangGraph.
@@ -167,9 +211,13 @@ def create_react_agent(
             regardless of how the graph is later invoked. Note: the raw `tools` list
             passed to `model.bind_tools()` must stay unwrapped — Gemini's tool-schema
             conversion doesn't understand `RunnableBinding`-wrapped tools.
+        compaction: History-compaction policy for the "compact" node that runs
+            before the agent on each turn (see `agents.history_compaction`).
+            Defaults to `CompactionPolicy.for_agent(agent_name)`.
         
     Returns:
-        Compiled StateGraph
+        Compiled StateGraph. Its nodes are coroutines, so run it with
+        `ainvoke` / `astream_events` (as `langgraph_runner` does).
     """
     # Bind tools to the model (must use the raw, unwrapped tool objects — Gemini's
     # function-declaration conversion can't introspect a RunnableBinding).
@@ -185,16 +233,20 @@ def create_react_agent(
         MessagesPlaceholder(variable_name="messages"),
     ])
     
-    # Define the agent node
-    def call_model(state: AgentState) -> dict:
+    # Define the agent node. Async so the Gemini round-trip awaits on the event
+    # loop instead of blocking it (a sync node would tie up a worker thread per
+    # in-flight LLM call and serialize concurrent chats under load).
+    async def call_model(state: AgentState, config: RunnableConfig) -> dict:
         """Agent reasoning and action selection."""
         messages = state["messages"]
-        formatted = prompt.invoke({"messages": messages})
-        response = model_with_tools.invoke(formatted.messages)
+        formatted = await prompt.ainvoke({"messages": messages})
+        prompt_messages = with_ephemeral_context(formatted.messages, config)
+        response = await model_with_tools.ainvoke(prompt_messages)
         return {"messages": [response]}
     
-    # Define the decision function
-    def should_continue(state: AgentState) -> Literal["tools", "end"]:
+    # Define the decision function (async too, so routing never hops to the
+    # thread pool between the agent and tools nodes).
+    async def should_continue(state: AgentState) -> Literal["tools", "end"]:
         """Determine if agent should continue or end."""
         last_message = state["messages"][-1]
         # If there are tool calls, continue to tools node
@@ -207,7 +259,14 @@ def create_react_agent(
     workflow = StateGraph(AgentState)
     
     # Add nodes
+    # "compact" runs once per turn, before the first model call, so it never
+    # cuts into the tool loop of the turn in progress.
+    policy = compaction or CompactionPolicy.for_agent(agent_name)
+    workflow.add_node("compact", create_compaction_node(model, policy, agent_name))
     workflow.add_node("agent", call_model)
+    # ToolNode runs tool calls concurrently via each tool's `ainvoke` when the
+    # graph is awaited: coroutine tools (sub-agents, MCP) stay on the loop and
+    # sync tools are dispatched to the executor.
     tool_node = ToolNode(tools)
     if callbacks:
         # Bind onto the ToolNode itself (not the individual tools — Gemini's
@@ -217,7 +276,8 @@ def create_react_agent(
     workflow.add_node("tools", tool_node)
     
     # Set entry point
-    workflow.set_entry_point("agent")
+    workflow.set_entry_point("compact")
+    workflow.add_edge("compact", "agent")
     
     # Add edges
     workflow.add_conditional_edges(
@@ -259,7 +319,7 @@ def create_tool_calling_agent(
     
     async def agent_executor(messages: list[BaseMessage]) -> str:
         """Execute the agent with the given messages."""
-        formatted = prompt.invoke({"messages": messages})
+        formatted = await prompt.ainvoke({"messages": messages})
         response = await model_with_tools.ainvoke(formatted.messages)
         
         # If tool calls are made, execute them
@@ -271,7 +331,7 @@ def create_tool_calling_agent(
             })
             # Get final response
             final_messages = [*messages, response, *tool_results["messages"]]
-            final_formatted = prompt.invoke({"messages": final_messages})
+            final_formatted = await prompt.ainvoke({"messages": final_messages})
             final_response = await model_with_tools.ainvoke(final_formatted.messages)
             return ai_message_to_text(final_response)
         
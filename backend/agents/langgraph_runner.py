@@ -7,8 +7,9 @@ import logging
 import os
 import re
 import uuid
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, AsyncIterator, Optional
 
 from fastapi import HTTPException
 from langchain_core.messages import HumanMessage, AIMessage
@@ -18,7 +19,8 @@ from psycopg_pool import AsyncConnectionPool
 from psycopg.rows import dict_row
 
 from agents.guardrails_langgraph import find_blocked_keyword
-from agents.langgraph_base import ai_message_to_text
+from agents.history_compaction import COMPACTION_TAG
+from agents.langgraph_base import EPHEMERAL_CONTEXT_KEY, ai_message_to_text, message_content_to_text
 from core.config import config
 from core.mlflow_tracking import MLflowCallbackHandler, log_metric, log_params, track_run
 
@@ -152,13 +154,143 @@ def _clean_response(text: Any) -> str:
     return text.strip()
 
 
+class _StreamCleaner:
+    """
+    Incremental counterpart of `_clean_response` for token streams.
+
+    `_clean_response`'s reasoning/lead-in patterns are all bounded by a
+    paragraph break, so text is held back until a `\n\n` arrives and then
+    cleaned one paragraph block at a time. An opened `/REASONING/` block can
+    span paragraphs (it ends at `/FINAL_ANSWER/`), so nothing after it is
+    released until the closing marker shows up or the stream ends.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._emitted = False
+
+    def _release(self, block: str) -> str:
+        cleaned = _clean_response(block)
+        if not cleaned:
+            return ""
+        out = ("\n\n" if self._emitted else "") + cleaned
+        self._emitted = True
+        return out
+
+    def feed(self, chunk: str) -> str:
+        """Add streamed text; return whatever cleaned text is now safe to emit."""
+        self._buffer += chunk
+        open_reasoning = self._buffer.rfind("/REASONING/")
+        if open_reasoning != -1 and "/FINAL_ANSWER/" not in self._buffer[open_reasoning:]:
+            ready_upto = self._buffer.rfind("\n\n", 0, open_reasoning)
+        else:
+            ready_upto = self._buffer.rfind("\n\n")
+        if ready_upto == -1:
+            return ""
+        ready, self._buffer = self._buffer[: ready_upto + 2], self._buffer[ready_upto + 2:]
+        return self._release(ready)
+
+    def flush(self) -> str:
+        """Emit the cleaned remainder once the stream has ended."""
+        remainder, self._buffer = self._buffer, ""
+        return self._release(remainder) if remainder.strip() else ""
+
+
+def _blocked_message(blocked_keyword: str) -> str:
+    return (
+        f"I'm sorry, I cannot process this request because it contains the "
+        f"blocked keyword '{blocked_keyword}'."
+    )
+
+
+async def _track_blocked(agent_name: str, user_id: str, session_id: str, query: str, blocked_keyword: str):
+    logger.warning(f"[{agent_name}] Blocked request containing keyword '{blocked_keyword}'")
+    async with track_run(
+        run_name=f"blocked-{agent_name}",
+        run_type="agent_chat",
+        params={
+            "agent_name": agent_name,
+            "user_id": user_id,
+            "session_id": session_id,
+            "query_length": len(query),
+            "blocked_keyword": blocked_keyword,
+        },
+        tags={"agent": agent_name, "blocked": "true"},
+    ):
+        log_metric("blocked", 1)
+
+
+def _thread_config(user_id: str, session_id: str, agent_name: str, callbacks: list, context: str = "") -> dict:
+    """
+    Thread config for checkpointing (+ runtime MLflow callbacks). `context`
+    (startup profile / session notes) rides along in `configurable` under
+    EPHEMERAL_CONTEXT_KEY so the model node can add it to the system prompt
+    for this invocation only — it is never checkpointed, neither in the
+    messages nor in the checkpoint metadata.
+    """
+    return {
+        "configurable": {
+            "thread_id": f"{user_id}:{session_id}",
+            "checkpoint_ns": agent_name,
+            EPHEMERAL_CONTEXT_KEY: context,
+        },
+        "callbacks": callbacks,
+    }
+
+
+def _state_config(user_id: str, session_id: str) -> dict:
+    """
+    Config for reading/writing a thread's state directly. A root graph run
+    checkpoints under the empty namespace regardless of the `checkpoint_ns`
+    label in `_thread_config`, and `aget_state`/`aupdate_state` would treat a
+    non-empty one as a subgraph path — so address the thread by id only.
+    """
+    return {"configurable": {"thread_id": f"{user_id}:{session_id}"}}
+
+
+def _final_text(messages: list) -> str:
+    """Cleaned display text of the last message in a final graph state."""
+    last_message = messages[-1]
+    if isinstance(last_message, AIMessage):
+        response_text = ai_message_to_text(last_message)
+    else:
+        response_text = ai_message_to_text(last_message) if hasattr(last_message, "content") else str(last_message)
+    return _clean_response(response_text)
+
+
+NO_RESPONSE = "Agent did not produce a response."
+NO_FINAL_RESPONSE = "Agent completed without a final response."
+
+
+@dataclass
+class AgentReply:
+    """A turn's response text; `answered` is False for guardrail blocks and runs that produced no model answer."""
+
+    response: str
+    answered: bool = True
+
+
 async def run_agent(
     compiled_agent: Any,
     user_id: str,
     session_id: str,
     query: str,
     agent_name: str = "agent",
+    context: str = "",
 ) -> str:
+    """Execute a LangGraph agent with the given query; returns the response text (see `run_agent_reply`)."""
+    reply = await run_agent_reply(compiled_agent, user_id, session_id, query, agent_name, context)
+    return reply.response
+
+
+async def run_agent_reply(
+    compiled_agent: Any,
+    user_id: str,
+    session_id: str,
+    query: str,
+    agent_name: str = "agent",
+    context: str = "",
+) -> AgentReply:
     """
     Execute a LangGraph agent with the given query.
     
@@ -168,33 +300,21 @@ async def run_agent(
         session_id: Session identifier for checkpointing
         query: User query/message
         agent_name: Name of the agent (for logging)
+        context: Ephemeral per-turn system context (profile, session notes);
+            not persisted in the thread — see `_thread_config`.
         
     Returns:
-        Agent's final response text
+        The agent's final response text, flagged `answered=False` when it is
+        a guardrail block or a placeholder for a run without an answer (so
+        callers don't cache it as one)
     """
     # Hard-block check (mirrors the original Google ADK keyword guardrail, which
     # LangChain callbacks alone cannot replicate since they can only observe/log —
     # see agents.guardrails_langgraph.find_blocked_keyword docstring).
     blocked_keyword = find_blocked_keyword(query)
     if blocked_keyword:
-        logger.warning(f"[{agent_name}] Blocked request containing keyword '{blocked_keyword}'")
-        async with track_run(
-            run_name=f"blocked-{agent_name}",
-            run_type="agent_chat",
-            params={
-                "agent_name": agent_name,
-                "user_id": user_id,
-                "session_id": session_id,
-                "query_length": len(query),
-                "blocked_keyword": blocked_keyword,
-            },
-            tags={"agent": agent_name, "blocked": "true"},
-        ):
-            log_metric("blocked", 1)
-        return (
-            f"I'm sorry, I cannot process this request because it contains the "
-            f"blocked keyword '{blocked_keyword}'."
-        )
+        await _track_blocked(agent_name, user_id, session_id, query, blocked_keyword)
+        return AgentReply(_blocked_message(blocked_keyword), answered=False)
 
     checkpointer = await get_checkpointer()
 
@@ -212,14 +332,7 @@ async def run_agent(
         },
         tags={"agent": agent_name},
     ):
-        # Create thread config for checkpointing (+ runtime MLflow callbacks)
-        config_dict = {
-            "configurable": {
-                "thread_id": f"{user_id}:{session_id}",
-                "checkpoint_ns": agent_name,
-            },
-            "callbacks": [mlflow_cb],
-        }
+        config_dict = _thread_config(user_id, session_id, agent_name, [mlflow_cb], context)
 
         input_state = {"messages": [HumanMessage(content=query)]}
 
@@ -232,19 +345,15 @@ async def run_agent(
             messages = final_state.get("messages", [])
             if not messages:
                 log_metric("response_length", 0)
-                return "Agent did not produce a response."
-
-            last_message = messages[-1]
-            if isinstance(last_message, AIMessage):
-                response_text = ai_message_to_text(last_message)
-            else:
-                response_text = ai_message_to_text(last_message) if hasattr(last_message, "content") else str(last_message)
+                return AgentReply(NO_RESPONSE, answered=False)
 
-            cleaned_response = _clean_response(response_text)
+            cleaned_response = _final_text(messages)
             log_params({"message_count": len(messages)})
             log_metric("response_length", len(cleaned_response or ""))
             mlflow_cb.flush_summary_metrics()
-            return cleaned_response if cleaned_response else "Agent completed without a final response."
+            if not cleaned_response:
+                return AgentReply(NO_FINAL_RESPONSE, answered=False)
+            return AgentReply(cleaned_response)
 
         except Exception as e:
             logger.error(f"Agent {agent_name} execution failed: {e}", exc_info=True)
@@ -252,6 +361,171 @@ async def run_agent(
             raise HTTPException(status_code=500, detail=f"Agent execution failed: {str(e)}")
 
 
+async def stream_agent(
+    compiled_agent: Any,
+    user_id: str,
+    session_id: str,
+    query: str,
+    agent_name: str = "agent",
+    context: str = "",
+) -> AsyncIterator[dict]:
+    """
+    Streaming variant of `run_agent`, built on LangGraph's `astream_events`.
+
+    Yields plain event dicts (the router turns them into SSE frames):
+      {"event": "token", "text"}            — cleaned orchestrator/agent output
+      {"event": "agent_start", "agent"}     — a sub-agent (or tool) was called
+      {"event": "agent_token", "agent", "text"} — that sub-agent's partial output
+      {"event": "agent_end", "agent"}
+      {"event": "final", "response", "answered"} — same as `run_agent_reply` returns
+      {"event": "error", "detail"}
+
+    Tokens from intermediate orchestrator turns are streamed as they arrive;
+    clients should treat `final` as authoritative and replace the streamed text.
+    """
+    blocked_keyword = find_blocked_keyword(query)
+    if blocked_keyword:
+        await _track_blocked(agent_name, user_id, session_id, query, blocked_keyword)
+        yield {"event": "final", "response": _blocked_message(blocked_keyword), "answered": False}
+        return
+
+    await get_checkpointer()
+
+    mlflow_cb = MLflowCallbackHandler(agent_name=agent_name)
+
+    async with track_run(
+        run_name=f"{agent_name}-stream-{session_id[:8]}",
+        run_type="agent_chat",
+        params={
+            "agent_name": agent_name,
+            "user_id": user_id,
+            "session_id": session_id,
+            "query_length": len(query),
+            "model": config.agents.get_model_for_agent(agent_name),
+            "streaming": True,
+        },
+        tags={"agent": agent_name},
+    ):
+        config_dict = _thread_config(user_id, session_id, agent_name, [mlflow_cb], context)
+        input_state = {"messages": [HumanMessage(content=query)]}
+
+        # run_id -> tool name for tools called directly by this agent (for the
+        # orchestrator those are the sub-agents); nested activity is attributed
+        # to whichever of these appears in an event's parent_ids.
+        top_level_tools: dict[str, str] = {}
+        tool_cleaners: dict[str, _StreamCleaner] = {}
+        cleaner = _StreamCleaner()
+        final_messages: list = []
+
+        try:
+            async for ev in compiled_agent.astream_events(input_state, config=config_dict, version="v2"):
+                if COMPACTION_TAG in (ev.get("tags") or []):
+                    continue  # history summarizer output isn't part of the answer
+                kind = ev["event"]
+                parent_ids = ev.get("parent_ids") or []
+                owner = next((top_level_tools[p] for p in parent_ids if p in top_level_tools), None)
+                owner_run = next((p for p in parent_ids if p in top_level_tools), None)
+
+                if kind == "on_chat_model_stream":
+                    text = message_content_to_text(getattr(ev["data"].get("chunk"), "content", ""))
+                    if not text:
+                        continue
+                    if owner is None:
+                        out = cleaner.feed(text)
+                        if out:
+                            yield {"event": "token", "text": out}
+                    else:
+                        out = tool_cleaners[owner_run].feed(text)
+                        if out:
+                            yield {"event": "agent_token", "agent": owner, "text": out}
+                elif kind == "on_chat_model_end":
+                    # Each model turn ends on a paragraph boundary of its own.
+                    if owner is None:
+                        out = cleaner.flush()
+                        if out:
+                            yield {"event": "token", "text": out}
+                    else:
+                        out = tool_cleaners[owner_run].flush()
+                        if out:
+                            yield {"event": "agent_token", "agent": owner, "text": out}
+                elif kind == "on_tool_start" and owner is None:
+                    top_level_tools[ev["run_id"]] = ev["name"]
+                    tool_cleaners[ev["run_id"]] = _StreamCleaner()
+                    yield {"event": "agent_start", "agent": ev["name"]}
+                elif kind == "on_tool_end" and ev["run_id"] in top_level_tools:
+                    name = top_level_tools.pop(ev["run_id"])
+                    rest = tool_cleaners.pop(ev["run_id"]).flush()
+                    if rest:
+                        yield {"event": "agent_token", "agent": name, "text": rest}
+                    yield {"event": "agent_end", "agent": name}
+                elif kind == "on_chain_end" and not parent_ids:
+                    output = ev["data"].get("output")
+                    if isinstance(output, dict):
+                        final_messages = output.get("messages", []) or final_messages
+
+            rest = cleaner.flush()
+            if rest:
+                yield {"event": "token", "text": rest}
+
+            if not final_messages:
+                log_metric("response_length", 0)
+                yield {"event": "final", "response": NO_RESPONSE, "answered": False}
+                return
+
+            cleaned_response = _final_text(final_messages)
+            log_params({"message_count": len(final_messages)})
+            log_metric("response_length", len(cleaned_response or ""))
+            mlflow_cb.flush_summary_metrics()
+            yield {
+                "event": "final",
+                "response": cleaned_response or NO_FINAL_RESPONSE,
+                "answered": bool(cleaned_response),
+            }
+
+        except Exception as e:
+            logger.error(f"Agent {agent_name} streaming failed: {e}", exc_info=True)
+            mlflow_cb.flush_summary_metrics()
+            yield {"event": "error", "detail": f"Agent execution failed: {str(e)}"}
+
+
+async def thread_has_history(compiled_agent: Any, user_id: str, session_id: str, agent_name: str) -> bool:
+    """True if the checkpointed thread already holds messages (i.e. this is a follow-up turn)."""
+    if getattr(compiled_agent, "checkpointer", None) is None:
+        return False
+    try:
+        snapshot = await compiled_agent.aget_state(_state_config(user_id, session_id))
+    except Exception as e:  # noqa: BLE001 — assume history so callers stay conservative
+        logger.warning(f"Could not read {agent_name} thread state: {e}")
+        return True
+    return bool(snapshot.values.get("messages"))
+
+
+async def append_turn_to_thread(
+    compiled_agent: Any,
+    user_id: str,
+    session_id: str,
+    agent_name: str,
+    query: str,
+    response: str,
+) -> None:
+    """
+    Record a turn that was answered *without* running `compiled_agent` (e.g.
+    dispatched straight to a specialist by the intent pre-router) into its
+    checkpointed thread, so follow-up turns still see the exchange.
+    No-op for graphs compiled without a checkpointer.
+    """
+    if getattr(compiled_agent, "checkpointer", None) is None:
+        return
+    try:
+        await compiled_agent.aupdate_state(
+            _state_config(user_id, session_id),
+            {"messages": [HumanMessage(content=query), AIMessage(content=response)]},
+            as_node="agent",
+        )
+    except Exception as e:  # noqa: BLE001 — the answer was already produced
+        logger.warning(f"Could not record turn in {agent_name} thread: {e}")
+
+
 async def handle_agent_request(
     user_id: str,
     query: str,
@@ -0,0 +1,113 @@
+"""
+Process-wide registry of Gemini chat clients.
+
+Every `ChatGoogleGenerativeAI` owns its own `google.genai.Client` — and with it
+its own HTTP connection pool — so constructing one per request (as the
+dashboard's `_structured_completion` used to) paid client setup plus a fresh
+TLS handshake on every call. The registry memoizes clients by
+(model, temperature, max_retries, thinking_level) and structured-output
+runnables by that key plus the Pydantic schema, so agents and dashboard
+routes with the same settings share one client and its warm connections.
+
+Per-request callbacks (MLflow) must be passed at invoke time
+(`ainvoke(..., config={"callbacks": [...]})`), never bound onto a shared
+instance. `warm_llm_registry()` runs at app startup.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+
+from langchain_core.runnables import Runnable
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+from agents.langgraph_base import create_google_llm
+from core.config import config
+
+logger = logging.getLogger("llm_registry")
+
+_lock = threading.Lock()
+_clients: dict[tuple, ChatGoogleGenerativeAI] = {}
+_structured: dict[tuple, Runnable] = {}
+
+# Agents whose models are worth pre-building at startup (orchestrator, the
+# dashboard's agent_name values and the sub-agents share these settings).
+_WARM_AGENTS = (
+    "pitchmate_agent",
+    "market_validator_agent",
+    "investor_outreacher_agent",
+    "valuation_advisor_agent",
+    "pitch_writer_agent",
+    "due_diligence_agent",
+    "deck_creator_agent",
+)
+
+
+def _key(model: str, temperature: float, max_retries: int, thinking_level: str | None) -> tuple:
+    return (model, float(temperature), max_retries, thinking_level)
+
+
+def get_llm(
+    model: str,
+    temperature: float = 0.3,
+    max_retries: int = 2,
+    thinking_level: str | None = "low",
+) -> ChatGoogleGenerativeAI:
+    """Shared `create_google_llm(...)` instance for these settings (built on first use)."""
+    key = _key(model, temperature, max_retries, thinking_level)
+    llm = _clients.get(key)
+    if llm is None:
+        with _lock:
+            llm = _clients.get(key)
+            if llm is None:
+                llm = create_google_llm(
+                    model=model, temperature=temperature, max_retries=max_retries, thinking_level=thinking_level
+                )
+                _clients[key] = llm
+    return llm
+
+
+def get_structured_llm(
+    schema: type,
+    model: str,
+    temperature: float = 0.3,
+    max_retries: int = 2,
+    thinking_level: str | None = "low",
+) -> Runnable:
+    """Shared `get_llm(...).with_structured_output(schema)` runnable."""
+    key = (*_key(model, temperature, max_retries, thinking_level), schema)
+    runnable = _structured.get(key)
+    if runnable is None:
+        llm = get_llm(model, temperature, max_retries, thinking_level)
+        with _lock:
+            runnable = _structured.get(key)
+            if runnable is None:
+                runnable = llm.with_structured_output(schema)
+                _structured[key] = runnable
+    return runnable
+
+
+async def _open_connection(llm: ChatGoogleGenerativeAI) -> None:
+    """One cheap metadata request so the async connection pool holds a live TLS session."""
+    await llm.client.aio.models.get(model=llm.model)
+
+
+async def warm_llm_registry() -> None:
+    """
+    Build the clients the app uses most and, unless LLM_PREWARM_CONNECTIONS=false,
+    open one connection per distinct model so the first dashboard request skips
+    the handshake. Failures (offline dev, missing key) are logged, not raised.
+    """
+    llms = {id(llm): llm for llm in (get_llm(config.agents.get_model_for_agent(name)) for name in _WARM_AGENTS)}
+    logger.info(f"LLM registry warmed: {len(_clients)} client(s)")
+
+    if os.environ.get("LLM_PREWARM_CONNECTIONS", "true").strip().lower() in ("0", "false", "no", "off"):
+        return
+    results = await asyncio.gather(
+        *(asyncio.wait_for(_open_connection(llm), timeout=10) for llm in llms.values()),
+        return_exceptions=True,
+    )
+    for result in results:
+        if isinstance(result, BaseException):
+            logger.warning(f"LLM connection pre-warm skipped: {result!r}")
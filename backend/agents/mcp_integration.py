@@ -1,20 +1,46 @@
 """
 MCP (Model Context Protocol) integration for LangChain/LangGraph.
 
-Uses langchain-mcp-adapters so each tool call opens a short-lived MCP session
-(works reliably with stdio servers like @drawio/mcp and @figma/mcp).
+Two ways to get tools from a stdio MCP server (e.g. @drawio/mcp, @figma/mcp):
+
+- `get_mcp_tools` — langchain-mcp-adapters' `MultiServerMCPClient`, where each
+  tool call opens a short-lived MCP session (one `npx` process spawn per call).
+- `get_pooled_mcp_tools` — a long-lived `MCPSessionPool` of warm server
+  processes, started once during the FastAPI lifespan and shut down with
+  `shutdown_mcp_pools()`. Tool calls lease a warm session instead of paying a
+  Node cold start every time.
 """
 
+import asyncio
 import logging
 import os
 import sys
+from contextlib import asynccontextmanager
 from typing import Any
 
-from langchain_core.tools import BaseTool
+import anyio
+from langchain_core.tools import BaseTool, StructuredTool, ToolException
 from langchain_mcp_adapters.client import MultiServerMCPClient
+from langchain_mcp_adapters.tools import load_mcp_tools
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
 
 logger = logging.getLogger("mcp_integration")
 
+# Warm server processes kept per MCP server (also the max concurrent tool calls).
+_POOL_SIZE = int(os.environ.get("MCP_POOL_SIZE", "2"))
+# Seconds between pings of idle sessions; dead ones are restarted.
+_HEALTHCHECK_INTERVAL = float(os.environ.get("MCP_HEALTHCHECK_INTERVAL", "30"))
+# Upper bound on a single health-check ping / server start.
+_PING_TIMEOUT = 10.0
+_START_TIMEOUT = float(os.environ.get("MCP_START_TIMEOUT", "120"))
+# Longest a tool call waits for a free session (e.g. while a dead server keeps failing to restart).
+_LEASE_TIMEOUT = float(os.environ.get("MCP_LEASE_TIMEOUT", "60"))
+# Errors that mean the server process / stdio streams are broken (recycle the
+# session). Anything else — MCP tool errors, bad arguments, cancellation —
+# leaves a healthy session that goes back to the pool.
+_TRANSPORT_ERRORS = (OSError, EOFError, anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream)
+
 
 async def get_mcp_tools(
     command: str,
@@ -66,6 +92,298 @@ async def get_mcp_tools(
     return tools
 
 
+class MCPLeaseTimeout(ToolException):
+    """No pooled session became free within the lease timeout; returned to the model as tool output."""
+
+
+def _surfacing_lease_timeouts(handler: Any):
+    """Wrap a proxied tool's `handle_tool_error` so MCPLeaseTimeout always reaches the model as an error result."""
+    def handle(error: ToolException) -> Any:
+        if isinstance(error, MCPLeaseTimeout):
+            return str(error)
+        if callable(handler):
+            return handler(error)
+        if isinstance(handler, str):
+            return handler
+        if handler:
+            return str(error)
+        raise error
+    return handle
+
+
+class _PooledSession:
+    """
+    One warm MCP server process + initialized `ClientSession`.
+
+    The stdio transport and session are anyio contexts that must be entered
+    and exited from the same task, so each slot owns a dedicated task that
+    opens them, signals readiness, and holds them open until `stop()`.
+    """
+
+    def __init__(self, server_name: str, params: StdioServerParameters):
+        self.server_name = server_name
+        self._params = params
+        self.session: ClientSession | None = None
+        self.tools: dict[str, BaseTool] = {}
+        self._ready = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._error: BaseException | None = None
+        self._task: asyncio.Task | None = None
+
+    async def _run(self) -> None:
+        try:
+            async with stdio_client(self._params) as (read, write):
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    self.session = session
+                    self.tools = {t.name: t for t in await load_mcp_tools(session)}
+                    self._ready.set()
+                    await self._stop.wait()
+        except BaseException as e:  # noqa: BLE001 — surfaced to start()/logged
+            self._error = e
+            if not isinstance(e, asyncio.CancelledError):
+                logger.warning("MCP session for %s exited: %s", self.server_name, e)
+        finally:
+            self.session = None
+            self._ready.set()
+
+    async def start(self) -> "_PooledSession":
+        self._task = asyncio.create_task(self._run(), name=f"mcp-{self.server_name}")
+        await asyncio.wait_for(self._ready.wait(), timeout=_START_TIMEOUT)
+        if self.session is None:
+            raise RuntimeError(f"MCP server {self.server_name} failed to start: {self._error}")
+        return self
+
+    @property
+    def alive(self) -> bool:
+        return self.session is not None and self._task is not None and not self._task.done()
+
+    async def ping(self) -> bool:
+        if not self.alive:
+            return False
+        try:
+            await asyncio.wait_for(self.session.send_ping(), timeout=_PING_TIMEOUT)
+            return True
+        except Exception as e:  # noqa: BLE001
+            logger.warning("MCP health check failed for %s: %s", self.server_name, e)
+            return False
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(self._task, timeout=_PING_TIMEOUT)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                self._task.cancel()
+            except Exception:  # noqa: BLE001 — already logged by _run
+                pass
+
+
+class MCPSessionPool:
+    """
+    Small pool of warm stdio MCP server processes for one server.
+
+    - `size` sessions are started up front; tool calls lease one at a time,
+      so `size` also bounds concurrent calls (extra callers queue).
+    - A background task pings idle sessions every `healthcheck_interval`
+      seconds; a failed ping or a transport error during a call restarts
+      that session.
+    - A call that can't get a session within `lease_timeout` seconds (all
+      busy, or the server keeps failing to restart) fails with
+      MCPLeaseTimeout instead of waiting forever.
+    - `tools()` returns LangChain tools that route each call through a lease,
+      so compiled agents can bind them once and survive restarts.
+    """
+
+    def __init__(
+        self,
+        server_name: str,
+        command: str,
+        args: list[str],
+        env: dict[str, str] | None = None,
+        size: int = _POOL_SIZE,
+        healthcheck_interval: float = _HEALTHCHECK_INTERVAL,
+        lease_timeout: float = _LEASE_TIMEOUT,
+    ):
+        self.server_name = server_name
+        self._params = StdioServerParameters(command=command, args=args, env=env)
+        self._size = max(1, size)
+        self._healthcheck_interval = healthcheck_interval
+        self._lease_timeout = lease_timeout
+        self._idle: asyncio.Queue[_PooledSession] = asyncio.Queue()
+        self._slots: set[_PooledSession] = set()
+        self._health_task: asyncio.Task | None = None
+        self._tasks: set[asyncio.Task] = set()  # in-flight restarts (keep a reference until done)
+        self._closed = False
+
+    async def _new_slot(self) -> _PooledSession:
+        slot = await _PooledSession(self.server_name, self._params).start()
+        self._slots.add(slot)
+        return slot
+
+    async def start(self) -> "MCPSessionPool":
+        results = await asyncio.gather(*(self._new_slot() for _ in range(self._size)), return_exceptions=True)
+        started = [r for r in results if isinstance(r, _PooledSession)]
+        if not started:
+            raise RuntimeError(f"No MCP session could be started for {self.server_name}: {results[0]}")
+        for slot in started:
+            self._idle.put_nowait(slot)
+        # Keep the configured capacity even if some processes failed to boot.
+        for _ in range(self._size - len(started)):
+            self._spawn(self._replace(None))
+        self._health_task = asyncio.create_task(self._health_loop(), name=f"mcp-health-{self.server_name}")
+        logger.info("MCP pool %s started with %d/%d warm session(s)", self.server_name, len(started), self._size)
+        return self
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _replace(self, slot: _PooledSession | None) -> None:
+        """Stop `slot` (if any) and put a fresh session in its place."""
+        if slot is not None:
+            self._slots.discard(slot)
+            await slot.stop()
+        while not self._closed:
+            try:
+                self._idle.put_nowait(await self._new_slot())
+                logger.info("MCP pool %s: session (re)started", self.server_name)
+                return
+            except Exception as e:  # noqa: BLE001
+                logger.warning("MCP pool %s: restart failed, retrying: %s", self.server_name, e)
+                await asyncio.sleep(self._healthcheck_interval)
+
+    async def _health_loop(self) -> None:
+        while not self._closed:
+            await asyncio.sleep(self._healthcheck_interval)
+            # Only check sessions that are idle right now; busy ones are
+            # validated by the call they're serving.
+            for _ in range(self._idle.qsize()):
+                try:
+                    slot = self._idle.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if await slot.ping():
+                    self._idle.put_nowait(slot)
+                else:
+                    self._spawn(self._replace(slot))
+
+    @asynccontextmanager
+    async def lease(self):
+        """
+        Borrow a warm session for one tool call (waits up to the lease
+        timeout if all are busy, then raises MCPLeaseTimeout). The session
+        always goes back to the pool — also when the call is cancelled —
+        unless its process died or the call hit a transport error, in which
+        case it is restarted.
+        """
+        # asyncio.timeout rather than wait_for: wait_for can swallow the
+        # caller's cancellation when the queue hands over a slot at the same
+        # moment, leaking a lease to a task that was already cancelled.
+        try:
+            async with asyncio.timeout(self._lease_timeout):
+                while True:
+                    slot = await self._idle.get()
+                    if slot.alive:
+                        break
+                    self._spawn(self._replace(slot))
+        except TimeoutError:
+            raise MCPLeaseTimeout(
+                f"The {self.server_name} MCP server is unavailable: no session became free "
+                f"within {self._lease_timeout:g}s. Try again later."
+            ) from None
+        broken = False
+        try:
+            yield slot
+        except _TRANSPORT_ERRORS:
+            broken = True
+            raise
+        finally:
+            if broken or not slot.alive:
+                self._spawn(self._replace(slot))
+            else:
+                self._idle.put_nowait(slot)
+
+    def tools(self) -> list[BaseTool]:
+        """LangChain tools for this server, each call routed through `lease()`."""
+        def routed(tool_name: str):
+            async def call(**arguments: Any):
+                async with self.lease() as slot:
+                    return await slot.tools[tool_name].coroutine(**arguments)
+            return call
+
+        template = next(iter(self._slots))
+        proxies = []
+        for name, tool in template.tools.items():
+            proxies.append(StructuredTool(
+                name=tool.name,
+                description=tool.description,
+                args_schema=tool.args_schema,
+                coroutine=routed(name),
+                response_format=tool.response_format,
+                metadata=tool.metadata,
+                # MCP `isError` results raise a ToolException that this turns
+                # back into tool output for the model (as load_mcp_tools does);
+                # so do lease timeouts.
+                handle_tool_error=_surfacing_lease_timeouts(tool.handle_tool_error),
+            ))
+        return proxies
+
+    async def close(self) -> None:
+        self._closed = True
+        if self._health_task is not None:
+            self._health_task.cancel()
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*(slot.stop() for slot in list(self._slots)), return_exceptions=True)
+        self._slots.clear()
+        logger.info("MCP pool %s shut down", self.server_name)
+
+
+# server_name -> running pool (started by the MCP agents' lifespan init).
+_pools: dict[str, MCPSessionPool] = {}
+
+
+async def get_pooled_mcp_tools(
+    command: str,
+    args: list[str],
+    env: dict[str, str] | None = None,
+    tool_filter: list[str] | None = None,
+    server_name: str = "mcp",
+    pool_size: int = _POOL_SIZE,
+) -> list[BaseTool]:
+    """
+    Like `get_mcp_tools`, but backed by a long-lived `MCPSessionPool`
+    (started on first use, reused afterwards — call from the app lifespan).
+    """
+    pool = _pools.get(server_name)
+    if pool is None:
+        pool = await MCPSessionPool(server_name, command, args, env=env, size=pool_size).start()
+        _pools[server_name] = pool
+
+    tools = pool.tools()
+    if tool_filter:
+        allowed = set(tool_filter)
+        tools = [t for t in tools if t.name in allowed]
+
+    logger.info(
+        "Loaded %d pooled MCP tool(s) from %s %s: %s",
+        len(tools),
+        command,
+        " ".join(args),
+        [t.name for t in tools],
+    )
+    return tools
+
+
+async def shutdown_mcp_pools() -> None:
+    """Stop every pooled MCP server process (call on app shutdown)."""
+    pools = list(_pools.values())
+    _pools.clear()
+    await asyncio.gather(*(pool.close() for pool in pools), return_exceptions=True)
+
+
 def get_npx_command() -> str:
     """Return the platform-appropriate npx executable name."""
     return "npx.cmd" if sys.platform == "win32" else "npx"
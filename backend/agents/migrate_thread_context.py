@@ -0,0 +1,108 @@
+"""
+One-off migration: strip the startup profile / session notes that older
+builds prepended to every user message before it was checkpointed.
+
+Chat used to send `"<profile>\\n\\n---\\n## User Question\\n<query>"` as the
+HumanMessage, so every stored turn carried its own copy of the profile. The
+profile is now passed as ephemeral system context instead (see
+`langgraph_runner._thread_config`); this rewrites existing threads so each
+legacy HumanMessage holds only the user's question.
+
+By default the cleaned messages are written as a new checkpoint (older
+checkpoints still hold the long copies). `--prune-history` deletes each
+migrated thread's checkpoint history first and writes one compact checkpoint,
+which is what actually reclaims the space.
+
+Run from backend/ (needs DATABASE_URL):
+    python -m agents.migrate_thread_context [--dry-run] [--prune-history]
+"""
+
+import argparse
+import asyncio
+import logging
+from typing import Sequence
+
+from langchain_core.messages import BaseMessage, HumanMessage
+
+logger = logging.getLogger("migrate_thread_context")
+
+LEGACY_QUESTION_MARKER = "\n\n---\n## User Question\n"
+
+
+def strip_legacy_context(messages: Sequence[BaseMessage]) -> list[HumanMessage]:
+    """Replacement HumanMessages (same ids) for every legacy enriched user turn."""
+    fixed: list[HumanMessage] = []
+    for m in messages:
+        if isinstance(m, HumanMessage) and isinstance(m.content, str) and LEGACY_QUESTION_MARKER in m.content:
+            question = m.content.rsplit(LEGACY_QUESTION_MARKER, 1)[1]
+            fixed.append(HumanMessage(content=question, id=m.id))
+    return fixed
+
+
+async def migrate(dry_run: bool = False, prune_history: bool = False) -> dict:
+    from langgraph.checkpoint.memory import MemorySaver
+
+    from agents.agent import build_pitchmate_agent
+    from agents.langgraph_runner import get_checkpointer
+
+    checkpointer = await get_checkpointer()
+    if isinstance(checkpointer, MemorySaver):
+        logger.warning("No Postgres checkpointer (DATABASE_URL unset or unreachable) — nothing to migrate.")
+        return {"threads": 0, "migrated": 0, "messages": 0, "chars_saved": 0}
+
+    graph = build_pitchmate_agent(checkpointer=checkpointer)
+    thread_ids = {tup.config["configurable"]["thread_id"] async for tup in checkpointer.alist(None)}
+    stats = {"threads": len(thread_ids), "migrated": 0, "messages": 0, "chars_saved": 0}
+
+    for thread_id in sorted(thread_ids):
+        config = {"configurable": {"thread_id": thread_id}}
+        messages = (await graph.aget_state(config)).values.get("messages", [])
+        fixed = strip_legacy_context(messages)
+        if not fixed:
+            continue
+
+        by_id = {m.id: m for m in fixed}
+        saved = sum(len(m.content) - len(by_id[m.id].content) for m in messages if m.id in by_id)
+        stats["migrated"] += 1
+        stats["messages"] += len(fixed)
+        stats["chars_saved"] += saved
+        logger.info(f"{thread_id}: {len(fixed)} user turns, -{saved} chars per checkpoint")
+        if dry_run:
+            continue
+
+        if prune_history:
+            await checkpointer.adelete_thread(thread_id)
+            await graph.aupdate_state(config, {"messages": [by_id.get(m.id, m) for m in messages]}, as_node="agent")
+        else:
+            # add_messages replaces by id, so only the rewritten turns need sending.
+            await graph.aupdate_state(config, {"messages": fixed}, as_node="agent")
+
+    return stats
+
+
+async def _main(dry_run: bool, prune_history: bool) -> None:
+    from agents.langgraph_runner import cleanup_checkpointer
+
+    try:
+        stats = await migrate(dry_run=dry_run, prune_history=prune_history)
+    finally:
+        await cleanup_checkpointer()
+    verb = "Would migrate" if dry_run else "Migrated"
+    print(
+        f"{verb} {stats['migrated']}/{stats['threads']} threads "
+        f"({stats['messages']} user turns, {stats['chars_saved']} chars per latest checkpoint)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="Report what would change without writing.")
+    parser.add_argument("--prune-history", action="store_true",
+                        help="Delete each migrated thread's older checkpoints and keep one compact checkpoint.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(args.dry_run, args.prune_history))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Semantic response cache for Pitchmate chat.
+
+Founders on the same team keep asking near-identical questions ("who should I
+pitch to at seed for fintech?") against a startup profile that rarely changes,
+and each one costs a full multi-agent run. This cache sits in front of the
+agents (see agents/backend.py):
+
+  key    — (team_id, agent_name, sha256 of profile markdown + session notes)
+  match  — cosine similarity of the question's MiniLM embedding (the model the
+           knowledge base already loads) against cached questions for that
+           key embedded with the same embedding version, answered from cache
+           at >= RESPONSE_CACHE_MIN_SIMILARITY. After a reembed.py cut-over,
+           rows from the old model stop matching and age out with the TTL
+  expiry — TTL (RESPONSE_CACHE_TTL_SECONDS) plus per-team LRU eviction once a
+           team holds more than RESPONSE_CACHE_MAX_ENTRIES answers
+
+Entries live in Postgres (db.models.AgentResponseCache) so every worker shares
+them. Only turns that start a conversation are cached/served — a follow-up like
+"make that shorter" depends on thread history the key can't see.
+
+Enable with RESPONSE_CACHE_ENABLED=true. Hit-rate counters are per process
+(`cache_stats`); entry counts / lifetime hits come from the table.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.models import AgentResponseCache
+
+logger = logging.getLogger("response_cache")
+
+_MIN_SIMILARITY = float(os.environ.get("RESPONSE_CACHE_MIN_SIMILARITY", "0.92"))
+_TTL_SECONDS = int(os.environ.get("RESPONSE_CACHE_TTL_SECONDS", str(24 * 3600)))
+_MAX_ENTRIES_PER_TEAM = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", "500"))
+
+_counters = {"hits": 0, "misses": 0, "bypassed": 0, "stored": 0}
+
+
+def response_cache_enabled() -> bool:
+    return os.environ.get("RESPONSE_CACHE_ENABLED", "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def context_fingerprint(profile_md: str, session_context: str) -> str:
+    """Hash of everything injected ahead of the question — part of the cache key."""
+    return hashlib.sha256(f"{profile_md}\x00{session_context}".encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CacheProbe:
+    """Result of `lookup`. `embedding` (made by `embedding_version`) is reused by `store` on a miss."""
+
+    response: str | None
+    similarity: float
+    embedding: list[float]
+    embedding_version: int
+
+
+async def _embed_query(query: str) -> tuple[list[float], int]:
+    from agents.sub_agents.knowledge_base.embedding_versions import active_version
+    from agents.sub_agents.knowledge_base.pinecone_vector_store import aembed_query
+
+    version = active_version()
+    return await aembed_query(query.strip(), version), version.version
+
+
+def best_match(query_vec: list[float], candidates: list[list[float]]) -> tuple[int, float]:
+    """Index and cosine similarity of the closest candidate (vectors are normalized)."""
+    if not candidates:
+        return -1, 0.0
+    sims = np.asarray(candidates, dtype=np.float32) @ np.asarray(query_vec, dtype=np.float32)
+    idx = int(np.argmax(sims))
+    return idx, float(sims[idx])
+
+
+async def lookup(
+    db: AsyncSession,
+    team_id: str,
+    agent_name: str,
+    profile_hash: str,
+    query: str,
+    bypass: bool = False,
+) -> CacheProbe:
+    """
+    Find a live cached answer for a semantically equivalent question, bumping
+    its LRU stamp on hit. With `bypass` only the embedding is computed (so the
+    fresh answer can still be stored) and the table isn't read.
+    """
+    embedding, version = await _embed_query(query)
+    if bypass:
+        _counters["bypassed"] += 1
+        return CacheProbe(None, 0.0, embedding, version)
+    now = datetime.now(timezone.utc)
+    rows = list(await db.scalars(
+        select(AgentResponseCache).where(
+            AgentResponseCache.team_id == team_id,
+            AgentResponseCache.agent_name == agent_name,
+            AgentResponseCache.profile_hash == profile_hash,
+            AgentResponseCache.embedding_version == version,
+            AgentResponseCache.expires_at > now,
+        )
+    ))
+    idx, similarity = best_match(embedding, [row.embedding for row in rows])
+    if idx < 0 or similarity < _MIN_SIMILARITY:
+        _counters["misses"] += 1
+        return CacheProbe(None, similarity, embedding, version)
+
+    row = rows[idx]
+    row.hit_count += 1
+    row.last_hit_at = now
+    await db.commit()
+    _counters["hits"] += 1
+    logger.info(f"Response cache hit: team={team_id}, agent={agent_name}, similarity={similarity:.3f}")
+    return CacheProbe(row.response, similarity, embedding, version)
+
+
+async def store(
+    db: AsyncSession,
+    team_id: str,
+    agent_name: str,
+    profile_hash: str,
+    query: str,
+    embedding: list[float],
+    response: str,
+    embedding_version: int,
+) -> None:
+    """Insert a fresh answer, then drop the team's expired and least-recently-used entries."""
+    now = datetime.now(timezone.utc)
+    db.add(AgentResponseCache(
+        team_id=team_id,
+        agent_name=agent_name,
+        profile_hash=profile_hash,
+        query=query,
+        embedding=embedding,
+        embedding_version=embedding_version,
+        response=response,
+        created_at=now,
+        last_hit_at=now,
+        expires_at=now + timedelta(seconds=_TTL_SECONDS),
+    ))
+    await db.flush()
+
+    await db.execute(delete(AgentResponseCache).where(
+        AgentResponseCache.team_id == team_id,
+        AgentResponseCache.expires_at <= now,
+    ))
+    overflow = select(AgentResponseCache.id).where(
+        AgentResponseCache.team_id == team_id,
+    ).order_by(AgentResponseCache.last_hit_at.desc()).offset(_MAX_ENTRIES_PER_TEAM)
+    await db.execute(delete(AgentResponseCache).where(AgentResponseCache.id.in_(overflow)))
+    await db.commit()
+    _counters["stored"] += 1
+
+
+async def clear_team(db: AsyncSession, team_id: str) -> int:
+    result = await db.execute(delete(AgentResponseCache).where(AgentResponseCache.team_id == team_id))
+    await db.commit()
+    return result.rowcount or 0
+
+
+async def cache_stats(db: AsyncSession, team_id: str) -> dict:
+    """This process's hit rate plus the team's persisted entry count and lifetime hits."""
+    entries, lifetime_hits = (await db.execute(
+        select(func.count(AgentResponseCache.id), func.coalesce(func.sum(AgentResponseCache.hit_count), 0))
+        .where(AgentResponseCache.team_id == team_id)
+    )).one()
+    lookups = _counters["hits"] + _counters["misses"]
+    return {
+        "enabled": response_cache_enabled(),
+        **_counters,
+        "hit_rate": _counters["hits"] / lookups if lookups else 0.0,
+        "team_entries": int(entries),
+        "team_lifetime_hits": int(lifetime_hits),
+        "min_similarity": _MIN_SIMILARITY,
+        "ttl_seconds": _TTL_SECONDS,
+        "max_entries_per_team": _MAX_ENTRIES_PER_TEAM,
+    }
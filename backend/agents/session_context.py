@@ -1,21 +1,23 @@
 """
 In-memory store for startup context per chat session.
 Context is kept in the session only (not persisted to DB).
+Keyed by team as well as session, so one team can never read (or overwrite)
+another team's context by reusing its session id.
 """
 
 from typing import Optional
 
-# session_id -> context text (plain string)
-_SESSION_CONTEXT: dict[str, str] = {}
+# (team_id, session_id) -> context text (plain string)
+_SESSION_CONTEXT: dict[tuple[str, str], str] = {}
 
 
-def set_session_context(session_id: str, context: str) -> None:
-    """Store startup context for the given session."""
-    _SESSION_CONTEXT[session_id] = context
+def set_session_context(team_id: str, session_id: str, context: str) -> None:
+    """Store startup context for the given team's session."""
+    _SESSION_CONTEXT[(team_id, session_id)] = context
 
 
-def get_session_context(session_id: Optional[str]) -> str:
-    """Return startup context for the given session, or empty string."""
+def get_session_context(team_id: str, session_id: Optional[str]) -> str:
+    """Return startup context for the given team's session, or empty string."""
     if not session_id:
         return ""
-    return _SESSION_CONTEXT.get(session_id, "")
+    return _SESSION_CONTEXT.get((team_id, session_id), "")
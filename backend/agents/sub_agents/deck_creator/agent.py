@@ -2,7 +2,8 @@
 Deck Creator sub-agent — creates pitch deck / product report as PDF or DOCX.
 """
 
-from agents.langgraph_base import create_google_llm, wrap_tool_function, create_react_agent
+from agents.langgraph_base import wrap_tool_function, create_react_agent
+from agents.llm_registry import get_llm
 from agents.guardrails_langgraph import create_guardrail_callbacks
 from agents.sub_agents.deck_creator import prompt
 from agents.sub_agents.deck_creator.tools import create_deck_pdf, create_deck_docx
@@ -19,7 +20,7 @@ AGENT_DESCRIPTION = (
 )
 
 # Create LLM
-model = create_google_llm(
+model = get_llm(
     model=config.agents.get_model_for_agent(AGENT_NAME),
     temperature=0.3,
     max_retries=2,
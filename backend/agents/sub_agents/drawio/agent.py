@@ -1,15 +1,18 @@
 """
 Draw.io MCP sub-agent — creates diagrams and drawings via Draw.io MCP.
 
+Tools are bound to a warm, long-lived MCP session pool (see
+`agents.mcp_integration.MCPSessionPool`) instead of spawning `npx` per call.
 Must be initialized asynchronously (see `init_drawio_agent`) during app lifespan.
 Import-time `asyncio.run()` fails under uvicorn's running event loop.
 """
 
 import logging
 
-from agents.langgraph_base import create_google_llm, create_react_agent
+from agents.langgraph_base import create_react_agent
+from agents.llm_registry import get_llm
 from agents.guardrails_langgraph import create_guardrail_callbacks
-from agents.mcp_integration import get_mcp_tools, get_npx_command, mcp_env_with_path
+from agents.mcp_integration import get_npx_command, get_pooled_mcp_tools, mcp_env_with_path
 from agents.sub_agents.drawio import prompt
 from core.config import config
 
@@ -22,7 +25,7 @@ AGENT_DESCRIPTION = (
     "Supports Mermaid.js, CSV (org charts, flowcharts), and draw.io XML."
 )
 
-model = create_google_llm(
+model = get_llm(
     model=config.agents.get_model_for_agent(AGENT_NAME),
     temperature=0.1,
     max_retries=2,
@@ -33,8 +36,8 @@ drawio_agent = None
 
 
 async def _get_drawio_tools():
-    """Fetch Draw.io MCP tools (open_drawio_mermaid / csv / xml)."""
-    return await get_mcp_tools(
+    """Fetch Draw.io MCP tools (open_drawio_mermaid / csv / xml) from the pooled server."""
+    return await get_pooled_mcp_tools(
         command=get_npx_command(),
         args=["-y", "@drawio/mcp"],
         env=mcp_env_with_path(),
@@ -2,7 +2,8 @@
 Due Diligence sub-agent — anticipates investor questions and generates Q&A PDF for meeting prep.
 """
 
-from agents.langgraph_base import create_google_llm, wrap_tool_function, create_react_agent
+from agents.langgraph_base import wrap_tool_function, create_react_agent
+from agents.llm_registry import get_llm
 from agents.guardrails_langgraph import create_guardrail_callbacks
 from agents.sub_agents.due_diligence import prompt
 from agents.sub_agents.due_diligence.tools import create_due_diligence_qa_pdf
@@ -19,7 +20,7 @@ AGENT_DESCRIPTION = (
 )
 
 # Create LLM
-model = create_google_llm(
+model = get_llm(
     model=config.agents.get_model_for_agent(AGENT_NAME),
     temperature=0.3,
     max_retries=2,
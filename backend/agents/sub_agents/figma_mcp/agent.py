@@ -1,6 +1,8 @@
 """
 Figma MCP sub-agent — pitch deck visual design analysis via Figma MCP.
 
+Tools are bound to a warm, long-lived MCP session pool (see
+`agents.mcp_integration.MCPSessionPool`) instead of spawning `npx` per call.
 Must be initialized asynchronously (see `init_figma_agent`) during app lifespan.
 Import-time `asyncio.run()` fails under uvicorn's running event loop.
 """
@@ -8,9 +10,10 @@ Import-time `asyncio.run()` fails under uvicorn's running event loop.
 import logging
 import os
 
-from agents.langgraph_base import create_google_llm, create_react_agent
+from agents.langgraph_base import create_react_agent
+from agents.llm_registry import get_llm
 from agents.guardrails_langgraph import create_guardrail_callbacks
-from agents.mcp_integration import get_mcp_tools, get_npx_command, mcp_env_with_path
+from agents.mcp_integration import get_npx_command, get_pooled_mcp_tools, mcp_env_with_path
 from agents.sub_agents.figma_mcp import prompt
 from core.config import config
 
@@ -23,7 +26,7 @@ AGENT_DESCRIPTION = (
     "layout review, slide visual critique, or brand consistency checks."
 )
 
-model = create_google_llm(
+model = get_llm(
     model=config.agents.get_model_for_agent(AGENT_NAME),
     temperature=0.3,
     max_retries=2,
@@ -34,8 +37,8 @@ figma_mcp_agent = None
 
 
 async def _get_figma_tools():
-    """Fetch Figma MCP tools."""
-    return await get_mcp_tools(
+    """Fetch Figma MCP tools from the pooled server."""
+    return await get_pooled_mcp_tools(
         command=get_npx_command(),
         args=["-y", "@figma/mcp"],
         env=mcp_env_with_path({
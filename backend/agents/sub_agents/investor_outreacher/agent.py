@@ -2,7 +2,8 @@
 Investor Outreacher sub-agent — investor targeting and outreach email drafting.
 """
 
-from agents.langgraph_base import create_google_llm, wrap_tool_function, create_react_agent
+from agents.langgraph_base import wrap_tool_function, create_react_agent
+from agents.llm_registry import get_llm
 from agents.guardrails_langgraph import create_guardrail_callbacks
 from agents.sub_agents.investor_outreacher import prompt
 from agents.sub_agents.investor_outreacher.tools import draft_outreach_email, suggest_investor_types
@@ -17,7 +18,7 @@ AGENT_DESCRIPTION = (
 )
 
 # Create LLM
-model = create_google_llm(
+model = get_llm(
     model=config.agents.get_model_for_agent(AGENT_NAME),
     temperature=0.5,
     max_retries=2,
@@ -2,10 +2,15 @@
 Knowledge Base sub-agent — searches uploaded documents and reviews pitch decks.
 """
 
-from agents.langgraph_base import create_google_llm, wrap_tool_function, create_react_agent
+from agents.langgraph_base import wrap_tool_function, create_react_agent
+from agents.llm_registry import get_llm
 from agents.guardrails_langgraph import create_guardrail_callbacks
 from agents.sub_agents.knowledge_base import prompt
 from agents.sub_agents.knowledge_base.tools import (
+    aget_document,
+    alist_uploaded_documents,
+    asearch_knowledge_base,
+    get_document,
     list_uploaded_documents,
     search_knowledge_base,
 )
@@ -20,7 +25,7 @@ AGENT_DESCRIPTION = (
 )
 
 # Create LLM
-model = create_google_llm(
+model = get_llm(
     model=config.agents.get_model_for_agent(AGENT_NAME),
     temperature=0.3,
     max_retries=2,
@@ -28,8 +33,9 @@ model = create_google_llm(
 
 # Wrap tools
 tools = [
-    wrap_tool_function(search_knowledge_base),
-    wrap_tool_function(list_uploaded_documents),
+    wrap_tool_function(search_knowledge_base, coroutine=asearch_knowledge_base),
+    wrap_tool_function(list_uploaded_documents, coroutine=alist_uploaded_documents),
+    wrap_tool_function(get_document, coroutine=aget_document),
 ]
 
 # Create compiled agent
@@ -0,0 +1,89 @@
+"""
+One-off backfill of the document registry (registry.py) from the vector index.
+
+Documents uploaded before the registry existed have vectors but no
+kb_documents / kb_chunks rows. Everything that reads the registry misses
+them: document listings, get_document, the BM25 half of hybrid search, and
+incremental re-uploads. This registers every unregistered source in each
+team namespace, reading chunk text and order back from vector metadata.
+Sources already in the registry are left alone, so it is safe to re-run.
+
+Run after migrate_team_namespaces.py, from backend/ (needs DATABASE_URL and
+the vector store's own settings):
+    python -m agents.sub_agents.knowledge_base.backfill_registry [--dry-run] [--team TEAM_ID ...]
+"""
+
+import argparse
+import asyncio
+import logging
+
+logger = logging.getLogger("backfill_registry")
+
+
+def group_sources(vectors) -> dict[str, list[dict]]:
+    """Vectors (`{"id", "metadata"}`) as `{source: [{"id", "text", "metadata"}, ...]}` in document order."""
+    sources: dict[str, list[dict]] = {}
+    for vector in vectors:
+        meta = dict(vector.get("metadata") or {})
+        text = meta.get("text")
+        if not text:
+            continue
+        source = meta.get("source") or meta.get("file_name") or "Unknown"
+        sources.setdefault(source, []).append({"id": vector["id"], "text": text, "metadata": meta})
+    for chunks in sources.values():
+        chunks.sort(key=lambda c: c["metadata"].get("ordinal", c["metadata"].get("chunk_index", 0)))
+    return sources
+
+
+async def backfill_team(db, store, team_id: str, dry_run: bool = False) -> list[str]:
+    """Register the team's unregistered sources; returns their names."""
+    from agents.sub_agents.knowledge_base.pinecone_vector_store import _namespace
+    from agents.sub_agents.knowledge_base.registry import get_document, record_document
+
+    vectors = await asyncio.to_thread(lambda: list(store.iter_vectors(namespace=_namespace(team_id))))
+    registered = []
+    for source, chunks in group_sources(vectors).items():
+        if await get_document(db, team_id, source) is not None:
+            continue
+        logger.info(f"Team {team_id}: registering '{source}' ({len(chunks)} chunk(s))")
+        if not dry_run:
+            await record_document(db, team_id, team_id, source, chunks)
+        registered.append(source)
+    return registered
+
+
+def team_ids(store) -> list[str]:
+    """Teams that have a namespace in the index."""
+    from agents.sub_agents.knowledge_base.pinecone_vector_store import shared_namespace
+
+    base = shared_namespace()
+    prefix = f"{base}:team-" if base else "team-"  # see pinecone_vector_store._namespace
+    return sorted(name[len(prefix):] for name in store.namespace_sizes() if name and name.startswith(prefix))
+
+
+async def _main(dry_run: bool, teams: list[str] | None) -> None:
+    from agents.sub_agents.knowledge_base.pinecone_vector_store import get_vector_store
+    from db.base import close_db, get_sessionmaker
+
+    store = get_vector_store()
+    total = 0
+    try:
+        for team_id in teams or await asyncio.to_thread(team_ids, store):
+            async with get_sessionmaker()() as db:
+                total += len(await backfill_team(db, store, team_id, dry_run))
+    finally:
+        await close_db()
+    print(f"{'Would register' if dry_run else 'Registered'} {total} document(s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be registered without writing.")
+    parser.add_argument("--team", action="append", help="Only this team (repeatable; default: every team namespace).")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(args.dry_run, args.team))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Benchmark of the embedding backends: SentenceTransformer on PyTorch
+(KB_EMBED_BACKEND=torch) vs the int8 ONNX Runtime export (onnx; see
+onnx_embedder.py).
+
+For each backend it reports:
+  latency    — one query at a time through `encode` (the path a search
+               takes when no other queries are in flight): mean, p50 and
+               p95 ms;
+  throughput — chunks/second at each --batch-sizes value, over synthetic
+               ~450-word pages split by the production chunker;
+  memory     — resident set size (RSS) after loading the model, the model's
+               own share of it (RSS after load minus before), and peak RSS;
+  parity     — cosine between each backend's vector and PyTorch's for every
+               query and chunk, against the onnx_embedder tolerance
+               (mean >= PARITY_MEAN_COSINE, min >= PARITY_MIN_COSINE).
+
+Each backend runs in its own subprocess, so one backend's memory doesn't
+count against the other's. The ONNX export is built first (also in a
+subprocess) if KB_ONNX_DIR doesn't have it yet.
+
+Run with: python -m agents.sub_agents.knowledge_base.embedding_benchmark [--pages 20] [--batch-sizes 1 8 32 128]
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BACKENDS = ("torch", "onnx")
+
+
+def _rss_mb() -> float:
+    import psutil
+
+    return psutil.Process().memory_info().rss / 2**20
+
+
+def _worker(model_name: str, pages: int, batch_sizes: list[int], queries: int, out_dir: str) -> dict:
+    """Benchmark the backend selected by KB_EMBED_BACKEND in this process."""
+    from agents.sub_agents.knowledge_base import pinecone_vector_store as store
+    from agents.sub_agents.knowledge_base.ingest_benchmark import synthetic_chunks
+    from agents.sub_agents.knowledge_base.retrieval_eval import QUERIES
+
+    chunks = [c["text"] for c in synthetic_chunks(pages)]
+    texts = [q for q, _ in QUERIES]
+    query_texts = (texts * (queries // len(texts) + 1))[:queries]
+
+    rss_before = _rss_mb()
+    started = time.perf_counter()
+    model = store._get_model(model_name)
+    model.encode(texts[:2], normalize_embeddings=True)  # warm up outside the timings
+    load_s = time.perf_counter() - started
+    rss_loaded = _rss_mb()
+
+    latencies = []
+    for text in query_texts:
+        started = time.perf_counter()
+        model.encode(text, normalize_embeddings=True)
+        latencies.append(1000 * (time.perf_counter() - started))
+
+    throughput = {}
+    for batch_size in batch_sizes:
+        started = time.perf_counter()
+        model.encode(chunks, batch_size=batch_size, normalize_embeddings=True)
+        throughput[batch_size] = len(chunks) / (time.perf_counter() - started)
+
+    vectors = np.asarray(model.encode(texts + chunks, batch_size=32, normalize_embeddings=True), dtype=np.float32)
+    np.save(os.path.join(out_dir, f"{store.EMBED_BACKEND}.npy"), vectors)
+    return {
+        "backend": store.EMBED_BACKEND,
+        "chunks": len(chunks),
+        "load_s": load_s,
+        "latency_ms": {
+            "mean": float(np.mean(latencies)),
+            "p50": float(np.percentile(latencies, 50)),
+            "p95": float(np.percentile(latencies, 95)),
+        },
+        "chunks_per_s": throughput,
+        "rss_mb": rss_loaded,
+        "model_rss_mb": rss_loaded - rss_before,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,  # KiB on Linux
+        "torch_loaded": "torch" in sys.modules,
+    }
+
+
+def _run_module(module: str, args: list[str], backend: str) -> str:
+    env = {**os.environ, "KB_EMBED_BACKEND": backend}
+    result = subprocess.run(
+        [sys.executable, "-m", module, *args], env=env, capture_output=True, text=True, check=False
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{module} ({backend}) failed:\n{result.stderr[-2000:]}")
+    return result.stdout
+
+
+def run(model_name: str, pages: int, batch_sizes: list[int], queries: int) -> dict:
+    from agents.sub_agents.knowledge_base.onnx_embedder import PARITY_MEAN_COSINE, PARITY_MIN_COSINE
+
+    _run_module("agents.sub_agents.knowledge_base.onnx_embedder", [model_name], "onnx")
+    report = {"model": model_name, "backends": {}}
+    with tempfile.TemporaryDirectory() as out_dir:
+        for backend in BACKENDS:
+            stdout = _run_module(__spec__.name, [
+                "--worker", "--model", model_name, "--pages", str(pages), "--queries", str(queries),
+                "--batch-sizes", *map(str, batch_sizes), "--out", out_dir,
+            ], backend)
+            report["backends"][backend] = json.loads(stdout.strip().splitlines()[-1])
+
+        reference = np.load(os.path.join(out_dir, "torch.npy"))
+        for backend in BACKENDS:
+            cosine = np.sum(np.load(os.path.join(out_dir, f"{backend}.npy")) * reference, axis=1)
+            report["backends"][backend]["cosine"] = {
+                "mean": float(cosine.mean()),
+                "min": float(cosine.min()),
+                "within_tolerance": bool(cosine.mean() >= PARITY_MEAN_COSINE and cosine.min() >= PARITY_MIN_COSINE),
+            }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=None, help="Default: KB_EMBEDDING_MODEL.")
+    parser.add_argument("--pages", type=int, default=20, help="Synthetic document size for throughput (~450 words/page).")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--queries", type=int, default=200, help="Single-query encodes for latency.")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    from agents.sub_agents.knowledge_base.embedding_versions import DEFAULT_VERSION
+
+    model_name = args.model or DEFAULT_VERSION.model_name
+    if args.worker:
+        print(json.dumps(_worker(model_name, args.pages, args.batch_sizes, args.queries, args.out)))
+        return
+
+    report = run(model_name, args.pages, args.batch_sizes, args.queries)
+    chunks = report["backends"]["torch"]["chunks"]
+    print(f"Model: {model_name} — {args.queries} single queries, {chunks} chunks per throughput run")
+    for backend, r in report["backends"].items():
+        latency = r["latency_ms"]
+        throughput = "  ".join(f"b{size}={rate:.0f}/s" for size, rate in r["chunks_per_s"].items())
+        print(f"{backend:>5}: query {latency['mean']:.1f} ms (p50 {latency['p50']:.1f}, p95 {latency['p95']:.1f})  |  "
+              f"{throughput}")
+        print(f"       RSS {r['rss_mb']:.0f} MB (model {r['model_rss_mb']:.0f} MB, peak {r['peak_rss_mb']:.0f} MB), "
+              f"load {r['load_s']:.1f} s, torch loaded: {'yes' if r['torch_loaded'] else 'no'}  |  "
+              f"cosine vs torch: mean {r['cosine']['mean']:.4f}, min {r['cosine']['min']:.4f} "
+              f"({'within' if r['cosine']['within_tolerance'] else 'OUTSIDE'} tolerance)")
+    torch_r, onnx_r = report["backends"]["torch"], report["backends"]["onnx"]
+    print(f"onnx vs torch: {onnx_r['latency_ms']['mean'] / torch_r['latency_ms']['mean']:.2f}x the query latency, "
+          f"{onnx_r['model_rss_mb'] - torch_r['model_rss_mb']:+.0f} MB model RSS")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+Content-addressed embedding cache: in-memory LRU over a memory-mapped
+on-disk store of float32 vectors.
+
+Identical texts are embedded over and over — every chunk of a re-uploaded
+deck, and stock queries like "review my pitch deck". Entries are keyed by
+sha256(model name + whitespace-normalized text), so a hit skips the model
+entirely, and the disk tier survives restarts.
+
+On-disk layout (one directory per model, under KB_EMBED_CACHE_DIR):
+  meta.json    — model name, dimension and capacity the files were built for
+  keys.u8      — (capacity, 32) sha256 digests; all-zero = empty slot
+  vectors.f32  — (capacity, dim) vectors, row i belongs to keys[i]
+  cursor.u64   — total writes; the next slot is cursor % capacity (a ring,
+                 so the oldest entries are overwritten once it's full)
+
+Opening the cache for a different MODEL_NAME (or dimension) uses a fresh
+directory and deletes the other models' directories (except `keep_models`,
+the models of embedding versions still in use during a re-embed migration),
+so vectors from an old model can never be served. Only directories with
+this cache's meta.json are deleted; anything else sharing
+KB_EMBED_CACHE_DIR is left alone. A write clears the slot's key before replacing
+the vector and sets the new key last, and every read re-checks the key on
+disk, so readers never pair a key with another text's vector — including
+other worker processes sharing the directory (writers serialize on an
+flock where available). Writes are not fsynced; a power loss may drop
+recent entries, which only costs a re-embed.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Iterable
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines — single-process locking only
+    fcntl = None
+
+logger = logging.getLogger("embedding_cache")
+
+_EMPTY_KEY = bytes(32)
+
+
+def _normalize(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def _safe_dirname(model_name: str, dim: int) -> str:
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in model_name) + f"-{dim}"
+
+
+def _is_cache_dir(path: str) -> bool:
+    """Whether `path` holds an embedding cache (its meta.json names a model and dimension)."""
+    try:
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return isinstance(meta, dict) and {"model", "dim"} <= meta.keys()
+
+
+class EmbeddingCache:
+    """Thread-safe LRU + mmap cache of normalized embeddings for one model."""
+
+    def __init__(
+        self,
+        model_name: str,
+        dim: int,
+        directory: str | None,
+        memory_entries: int = 20_000,
+        disk_entries: int = 100_000,
+        keep_models: Iterable[tuple[str, int]] = (),
+    ):
+        self.model_name = model_name
+        self.dim = dim
+        self.memory_entries = memory_entries
+        self._lru: OrderedDict[bytes, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+
+        self._keys = self._vectors = self._cursor = None
+        self._slots: dict[bytes, int] = {}
+        self._lock_path: str | None = None
+        if directory and disk_entries > 0:
+            try:
+                self._open_disk(directory, disk_entries, {_safe_dirname(m, d) for m, d in keep_models})
+            except OSError as exc:
+                logger.warning(f"Embedding disk cache disabled ({directory}): {exc}")
+                self._keys = self._vectors = self._cursor = None
+
+    # ── disk tier ────────────────────────────────────────────────────────────
+
+    def _open_disk(self, directory: str, capacity: int, keep: set[str]) -> None:
+        os.makedirs(directory, exist_ok=True)
+        own = _safe_dirname(self.model_name, self.dim)
+        for name in os.listdir(directory):  # invalidate other models' vectors
+            path = os.path.join(directory, name)
+            if name != own and name not in keep and _is_cache_dir(path):
+                logger.info(f"Removing embedding cache for another model: {name}")
+                shutil.rmtree(path, ignore_errors=True)
+
+        root = os.path.join(directory, own)
+        meta = {"model": self.model_name, "dim": self.dim, "capacity": capacity}
+        meta_path = os.path.join(root, "meta.json")
+        try:
+            with open(meta_path) as f:
+                fresh = json.load(f) != meta
+        except (OSError, ValueError):
+            fresh = True
+        if fresh:
+            shutil.rmtree(root, ignore_errors=True)
+            os.makedirs(root)
+
+        mode = "w+" if fresh else "r+"
+        self._keys = np.memmap(os.path.join(root, "keys.u8"), dtype=np.uint8, mode=mode, shape=(capacity, 32))
+        self._vectors = np.memmap(os.path.join(root, "vectors.f32"), dtype=np.float32, mode=mode, shape=(capacity, self.dim))
+        self._cursor = np.memmap(os.path.join(root, "cursor.u64"), dtype=np.uint64, mode=mode, shape=(1,))
+        self._lock_path = os.path.join(root, "write.lock")
+        if fresh:
+            with open(meta_path, "w") as f:
+                json.dump(meta, f)
+        else:
+            for slot in np.flatnonzero(self._keys.any(axis=1)):
+                self._slots[self._keys[slot].tobytes()] = int(slot)
+        logger.info(f"Embedding disk cache: {root} ({len(self._slots)}/{capacity} entries)")
+
+    def _disk_get(self, key: bytes) -> np.ndarray | None:
+        slot = self._slots.get(key)
+        if slot is None:
+            return None
+        vector = np.array(self._vectors[slot])
+        if self._keys[slot].tobytes() != key:  # overwritten (maybe by another process)
+            self._slots.pop(key, None)
+            return None
+        return vector
+
+    def _disk_put(self, key: bytes, vector: np.ndarray) -> None:
+        lock_file = open(self._lock_path, "a") if fcntl is not None else None
+        try:
+            if lock_file is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            capacity = self._keys.shape[0]
+            slot = int(self._cursor[0] % capacity)
+            old = self._keys[slot].tobytes()
+            self._keys[slot] = 0
+            self._vectors[slot] = vector
+            self._keys[slot] = np.frombuffer(key, dtype=np.uint8)
+            self._cursor[0] += 1
+        finally:
+            if lock_file is not None:
+                lock_file.close()  # releases the flock
+        if old != _EMPTY_KEY:
+            self._slots.pop(old, None)
+        self._slots[key] = slot
+
+    # ── public API ───────────────────────────────────────────────────────────
+
+    def key(self, text: str) -> bytes:
+        return hashlib.sha256(f"{self.model_name}\0{_normalize(text)}".encode("utf-8")).digest()
+
+    def get_many(self, texts: list[str]) -> list[np.ndarray | None]:
+        out: list[np.ndarray | None] = []
+        with self._lock:
+            for text in texts:
+                key = self.key(text)
+                vector = self._lru.get(key)
+                if vector is not None:
+                    self._lru.move_to_end(key)
+                    self.hits_memory += 1
+                elif self._keys is not None and (vector := self._disk_get(key)) is not None:
+                    self._remember(key, vector)
+                    self.hits_disk += 1
+                else:
+                    self.misses += 1
+                out.append(vector)
+        return out
+
+    def put_many(self, texts: list[str], vectors: np.ndarray) -> None:
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                key = self.key(text)
+                vector = np.asarray(vector, dtype=np.float32)
+                self._remember(key, vector)
+                if self._keys is not None and key not in self._slots:
+                    self._disk_put(key, vector)
+
+    def get(self, text: str) -> np.ndarray | None:
+        return self.get_many([text])[0]
+
+    def put(self, text: str, vector) -> None:
+        self.put_many([text], np.asarray([vector], dtype=np.float32))
+
+    def _remember(self, key: bytes, vector: np.ndarray) -> None:
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.memory_entries:
+            self._lru.popitem(last=False)
+
+    def flush(self) -> None:
+        with self._lock:
+            for arr in (self._keys, self._vectors, self._cursor):
+                if arr is not None:
+                    arr.flush()
+
+    def stats(self) -> dict:
+        lookups = self.hits_memory + self.hits_disk + self.misses
+        return {
+            "model": self.model_name,
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "hit_ratio": (self.hits_memory + self.hits_disk) / lookups if lookups else 0.0,
+            "memory_entries": len(self._lru),
+            "disk_entries": len(self._slots) if self._keys is not None else None,
+        }
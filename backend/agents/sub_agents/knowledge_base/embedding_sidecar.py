@@ -0,0 +1,315 @@
+"""
+Shared embedding sidecar: one local process holds the embedding model and
+serves every API/worker process on the host over a Unix socket, so memory
+stays flat as workers are added and only the sidecar pays the cold load.
+
+  python -m agents.sub_agents.knowledge_base.embedding_sidecar [--socket PATH] [--model NAME ...]
+
+Start it before the workers, with the same environment
+(KB_EMBED_BACKEND, KB_EMBEDDING_MODEL, ...). Then set
+KB_EMBED_SIDECAR_SOCKET in the workers' environment. `_get_model` returns a
+`SidecarModel` there: a thin client with SentenceTransformer's `encode`.
+Every embedding path (queries, uploads, re-embeds) then goes through the
+sidecar unchanged, including the per-worker query batcher and the
+embedding cache.
+
+Texts from all connections are coalesced by a QueryEmbeddingBatcher per
+model (query_batcher.py): at most KB_EMBED_SIDECAR_MAX_BATCH rows per
+encode, waiting up to KB_EMBED_SIDECAR_MAX_WAIT_MS. The sidecar loads a
+model on its first request for it (--model preloads). Returned vectors are
+always L2-normalized, as every knowledge-base caller asks for.
+
+Protocol (big-endian framing, persistent connections, one request in flight
+per connection):
+  request  — u32 payload length, u8 op, payload
+               OP_EMBED: u16 model-name length, model name (UTF-8), u32 text
+                         count, then per text: u32 length, text (UTF-8)
+               OP_STATS: empty
+  response — u32 payload length, u8 status, payload
+               STATUS_OK for OP_EMBED: u32 rows, u32 dim, rows*dim
+                         little-endian float32
+               STATUS_OK for OP_STATS: JSON
+               STATUS_ERROR: message (UTF-8)
+
+  KB_EMBED_SIDECAR_SOCKET          — socket path; set in workers to use the sidecar
+  KB_EMBED_SIDECAR_TIMEOUT_SECONDS — client timeout per request (default 30)
+  KB_EMBED_SIDECAR_MAX_BATCH       — rows per encode (default 64)
+  KB_EMBED_SIDECAR_MAX_WAIT_MS     — batching window (default 2)
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import struct
+import threading
+from functools import lru_cache
+
+import numpy as np
+
+logger = logging.getLogger("embedding_sidecar")
+
+SIDECAR_SOCKET = os.environ.get("KB_EMBED_SIDECAR_SOCKET", "").strip()
+SIDECAR_TIMEOUT_SECONDS = float(os.environ.get("KB_EMBED_SIDECAR_TIMEOUT_SECONDS", "30"))
+SIDECAR_MAX_BATCH = int(os.environ.get("KB_EMBED_SIDECAR_MAX_BATCH", "64"))
+SIDECAR_MAX_WAIT_MS = float(os.environ.get("KB_EMBED_SIDECAR_MAX_WAIT_MS", "2"))
+DEFAULT_SOCKET = "/tmp/pitchmate-embed.sock"
+
+OP_EMBED = 1
+OP_STATS = 2
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+_HEADER = struct.Struct("!IB")
+_U16 = struct.Struct("!H")
+_U32 = struct.Struct("!I")
+_SHAPE = struct.Struct("!II")
+
+
+# ─── Protocol ────────────────────────────────────────────────────────────────
+
+def pack_embed_request(model_name: str, texts: list[str]) -> bytes:
+    name = model_name.encode()
+    parts = [_U16.pack(len(name)), name, _U32.pack(len(texts))]
+    for text in texts:
+        data = text.encode()
+        parts += [_U32.pack(len(data)), data]
+    return b"".join(parts)
+
+
+def unpack_embed_request(payload: bytes) -> tuple[str, list[str]]:
+    (name_length,) = _U16.unpack_from(payload, 0)
+    offset = _U16.size + name_length
+    model_name = payload[_U16.size:offset].decode()
+    (count,) = _U32.unpack_from(payload, offset)
+    offset += _U32.size
+    texts = []
+    for _ in range(count):
+        (length,) = _U32.unpack_from(payload, offset)
+        offset += _U32.size
+        texts.append(payload[offset:offset + length].decode())
+        offset += length
+    return model_name, texts
+
+
+def pack_vectors(vectors: np.ndarray) -> bytes:
+    vectors = np.asarray(vectors, dtype="<f4")
+    return _SHAPE.pack(*vectors.shape) + vectors.tobytes()
+
+
+def unpack_vectors(payload: bytes) -> np.ndarray:
+    rows, dim = _SHAPE.unpack_from(payload, 0)
+    return np.frombuffer(payload, dtype="<f4", count=rows * dim, offset=_SHAPE.size).reshape(rows, dim).astype(np.float32)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    buffer = bytearray()
+    while len(buffer) < size:
+        data = sock.recv(min(size - len(buffer), 1 << 20))
+        if not data:
+            raise ConnectionError("embedding sidecar closed the connection")
+        buffer += data
+    return bytes(buffer)
+
+
+# ─── Client (API / Celery workers) ───────────────────────────────────────────
+
+class SidecarClient:
+    """Blocking client over pooled persistent connections; safe to share between threads."""
+
+    def __init__(self, path: str, timeout: float = SIDECAR_TIMEOUT_SECONDS):
+        self.path = path
+        self.timeout = timeout
+        self._idle: list[socket.socket] = []
+        self._lock = threading.Lock()
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+        except OSError as exc:
+            sock.close()
+            raise ConnectionError(f"Embedding sidecar not reachable at {self.path}: {exc}") from exc
+        return sock
+
+    def _request(self, op: int, payload: bytes) -> bytes:
+        frame = _HEADER.pack(len(payload), op) + payload
+        while True:
+            with self._lock:
+                sock = self._idle.pop() if self._idle else None
+            pooled = sock is not None
+            sock = sock or self._connect()
+            try:
+                sock.sendall(frame)
+                length, status = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+                body = _recv_exact(sock, length)
+            except TimeoutError:
+                sock.close()
+                raise
+            except OSError:
+                sock.close()
+                if pooled:  # stale connection (e.g. the sidecar restarted) — retry on a fresh one
+                    continue
+                raise
+            with self._lock:
+                self._idle.append(sock)
+            if status != STATUS_OK:
+                raise RuntimeError(f"Embedding sidecar: {body.decode(errors='replace')}")
+            return body
+
+    def embed(self, model_name: str, texts: list[str]) -> np.ndarray:
+        return unpack_vectors(self._request(OP_EMBED, pack_embed_request(model_name, texts)))
+
+    def stats(self) -> dict:
+        return json.loads(self._request(OP_STATS, b""))
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for sock in idle:
+            sock.close()
+
+
+@lru_cache(maxsize=None)
+def get_client(path: str) -> SidecarClient:
+    return SidecarClient(path)
+
+
+class SidecarModel:
+    """Stands in for a SentenceTransformer in `_get_model`: `encode` runs in the sidecar."""
+
+    def __init__(self, model_name: str, path: str):
+        self.model_name = model_name
+        self._client = get_client(path)
+
+    def encode(self, sentences: str | list[str], batch_size: int = 32, **kwargs) -> np.ndarray:
+        """Embed one text (-> (dim,)) or many (-> (n, dim)); vectors are always normalized."""
+        single = isinstance(sentences, str)
+        vectors = self._client.embed(self.model_name, [sentences] if single else list(sentences))
+        return vectors[0] if single else vectors
+
+
+# ─── Server ──────────────────────────────────────────────────────────────────
+
+class EmbeddingSidecar:
+    """Serves OP_EMBED / OP_STATS, batching texts from every connection per model."""
+
+    def __init__(self, max_batch_size: int = SIDECAR_MAX_BATCH, max_wait_ms: float = SIDECAR_MAX_WAIT_MS):
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._batchers: dict = {}
+        self.connections = 0
+        self.requests = 0
+        self.errors = 0
+
+    def _batcher(self, model_name: str):
+        from agents.sub_agents.knowledge_base.query_batcher import QueryEmbeddingBatcher
+
+        batcher = self._batchers.get(model_name)
+        if batcher is None:
+            batcher = self._batchers[model_name] = QueryEmbeddingBatcher(
+                _local_encoder(model_name), self.max_batch_size, self.max_wait_ms
+            )
+        return batcher
+
+    async def embed(self, model_name: str, texts: list[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        batcher = self._batcher(model_name)
+        vectors = await asyncio.gather(*(batcher.embed(text) for text in texts))
+        return np.asarray(vectors, dtype=np.float32).reshape(len(texts), -1)
+
+    def stats(self) -> dict:
+        return {
+            "connections": self.connections,
+            "requests": self.requests,
+            "errors": self.errors,
+            "models": {name: batcher.stats() for name, batcher in self._batchers.items()},
+        }
+
+    async def _dispatch(self, op: int, payload: bytes) -> bytes:
+        if op == OP_EMBED:
+            return pack_vectors(await self.embed(*unpack_embed_request(payload)))
+        if op == OP_STATS:
+            return json.dumps(self.stats()).encode()
+        raise ValueError(f"unknown op {op}")
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    length, op = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+                    payload = await reader.readexactly(length)
+                except asyncio.IncompleteReadError:
+                    break
+                self.requests += 1
+                try:
+                    status, body = STATUS_OK, await self._dispatch(op, payload)
+                except Exception as exc:  # noqa: BLE001 — reported to the client
+                    self.errors += 1
+                    logger.warning(f"Embedding request failed: {exc}")
+                    status, body = STATUS_ERROR, str(exc).encode()
+                writer.write(_HEADER.pack(len(body), status) + body)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+
+def _local_encoder(model_name: str):
+    def encode(texts: list[str]) -> np.ndarray:
+        from agents.sub_agents.knowledge_base.pinecone_vector_store import _load_model
+
+        model = _load_model(model_name)
+        return np.asarray(model.encode(texts, batch_size=len(texts), normalize_embeddings=True), dtype=np.float32)
+
+    return encode
+
+
+async def serve(path: str, preload: list[str] = ()) -> None:
+    from agents.sub_agents.knowledge_base.pinecone_vector_store import _load_model
+
+    if os.path.exists(path):
+        try:
+            get_client(path).stats()
+        except ConnectionError:
+            os.unlink(path)  # left over from a sidecar that didn't shut down cleanly
+        else:
+            raise RuntimeError(f"An embedding sidecar is already listening on {path}.")
+    for model_name in preload:
+        await asyncio.to_thread(_load_model, model_name)
+    sidecar = EmbeddingSidecar()
+    server = await asyncio.start_unix_server(sidecar.handle, path=path)
+    os.chmod(path, 0o660)
+    logger.info(f"Embedding sidecar listening on {path} (models: {', '.join(preload) or 'loaded on demand'})")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+def main():
+    from agents.sub_agents.knowledge_base.embedding_versions import DEFAULT_VERSION
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--socket", default=SIDECAR_SOCKET or DEFAULT_SOCKET)
+    parser.add_argument("--model", action="append", help="Model to load at startup (repeatable; default KB_EMBEDDING_MODEL).")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    try:
+        asyncio.run(serve(args.socket, args.model or [DEFAULT_VERSION.model_name]))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""
+Versioned embeddings: which model the knowledge base is indexed with, and
+the bookkeeping for re-embedding it with another one (see reembed.py).
+
+Every `EmbeddingVersion` has its own index, because models differ in
+dimension and vectors from two models can't be compared:
+  - version 1 uses PINECONE_INDEX (or KB_LOCAL_INDEX_DIR);
+  - version N uses "<PINECONE_INDEX>-v<N>" (or "<KB_LOCAL_INDEX_DIR>-v<N>").
+Team namespaces are the same in every version.
+
+The kb_embedding_versions table holds exactly one "active" version, which
+serves every query. While a migration runs, it also holds one "building"
+version, and uploads and deletes are dual-written to it. Cut-over is a
+single transaction: the building version becomes active and the old one is
+"retired". A retired version gets no further writes, so its index goes
+stale from that moment; it is kept only for inspection or deletion. To go
+back to the old model, re-embed again with reembed.py.
+
+Each process caches the table for KB_EMBED_VERSION_REFRESH_SECONDS and
+re-reads it lazily from searches and uploads (`refresh_versions`). With no
+database, or before the first migration, version 1 is the only version: the
+KB_EMBEDDING_MODEL / KB_EMBEDDING_DIM model. Only change those on a fresh
+index; for an existing one, run reembed.py.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    from db.models import KBEmbeddingVersion
+
+logger = logging.getLogger("embedding_versions")
+
+REFRESH_SECONDS = float(os.environ.get("KB_EMBED_VERSION_REFRESH_SECONDS", "30"))
+
+
+@dataclass(frozen=True)
+class EmbeddingVersion:
+    version: int
+    model_name: str
+    dim: int
+
+
+DEFAULT_VERSION = EmbeddingVersion(
+    1,
+    os.environ.get("KB_EMBEDDING_MODEL", "all-MiniLM-L6-v2"),
+    int(os.environ.get("KB_EMBEDDING_DIM", "384")),
+)
+
+_active: EmbeddingVersion = DEFAULT_VERSION
+_building: EmbeddingVersion | None = None
+_refreshed_at = float("-inf")
+
+
+def active_version() -> EmbeddingVersion:
+    """The version queries are served from (as of this process's last refresh)."""
+    return _active
+
+
+def building_version() -> EmbeddingVersion | None:
+    return _building
+
+
+def write_versions() -> list[EmbeddingVersion]:
+    """Versions every write goes to: the active one first, then a migration's target."""
+    return [_active] if _building is None or _building == _active else [_active, _building]
+
+
+def _to_version(row: KBEmbeddingVersion) -> EmbeddingVersion:
+    return EmbeddingVersion(row.version, row.model_name, row.dim)
+
+
+async def refresh_versions(force: bool = False) -> None:
+    """Re-read the active/building versions if the cached view is older than REFRESH_SECONDS."""
+    global _active, _building, _refreshed_at
+    if not force and time.monotonic() - _refreshed_at < REFRESH_SECONDS:
+        return
+    _refreshed_at = time.monotonic()
+
+    from db.base import get_sessionmaker
+
+    try:
+        async with get_sessionmaker()() as db:
+            rows = await list_versions(db, statuses=("active", "building"))
+    except RuntimeError:  # DATABASE_URL not set — version 1 only
+        return
+    except Exception as exc:  # noqa: BLE001 — keep serving with the last known versions
+        logger.warning(f"Could not refresh embedding versions: {exc}")
+        return
+
+    active = next((_to_version(r) for r in rows if r.status == "active"), DEFAULT_VERSION)
+    building = next((_to_version(r) for r in rows if r.status == "building"), None)
+    if active != _active:
+        logger.info(f"Embedding version {active.version} ({active.model_name}, dim={active.dim}) is now active")
+    if building != _building and building is not None:
+        logger.info(f"Dual-writing to embedding version {building.version} ({building.model_name}) during migration")
+    _active, _building = active, building
+
+
+# ─── Persistence (kb_embedding_versions) ─────────────────────────────────────
+
+async def list_versions(db: AsyncSession, statuses: tuple[str, ...] | None = None) -> list[KBEmbeddingVersion]:
+    from sqlalchemy import select
+
+    from db.models import KBEmbeddingVersion
+
+    query = select(KBEmbeddingVersion).order_by(KBEmbeddingVersion.version)
+    if statuses:
+        query = query.where(KBEmbeddingVersion.status.in_(statuses))
+    return list(await db.scalars(query))
+
+
+async def get_version(db: AsyncSession, version: int) -> KBEmbeddingVersion | None:
+    from db.models import KBEmbeddingVersion
+
+    return await db.get(KBEmbeddingVersion, version, populate_existing=True)
+
+
+async def create_version(db: AsyncSession, model_name: str, dim: int) -> KBEmbeddingVersion:
+    """
+    Register a "building" version for `model_name`. The first call also
+    records version 1 (the env-configured model) as active. Raises
+    ValueError if a migration is already running or the model is the active one.
+    """
+    from db.models import KBEmbeddingVersion
+
+    rows = await list_versions(db)
+    if not rows:
+        rows = [KBEmbeddingVersion(
+            version=DEFAULT_VERSION.version, model_name=DEFAULT_VERSION.model_name,
+            dim=DEFAULT_VERSION.dim, status="active", activated_at=datetime.now(timezone.utc),
+        )]
+        db.add(rows[0])
+    building = [r for r in rows if r.status == "building"]
+    if building:
+        raise ValueError(f"Embedding version {building[0].version} is already being built.")
+    active = next((r for r in rows if r.status == "active"), None)
+    if active is not None and (active.model_name, active.dim) == (model_name, dim):
+        raise ValueError(f"{model_name} (dim={dim}) is already the active embedding model.")
+
+    row = KBEmbeddingVersion(version=max(r.version for r in rows) + 1, model_name=model_name, dim=dim)
+    db.add(row)
+    await db.commit()
+    await db.refresh(row)
+    return row
+
+
+async def claim_version(db: AsyncSession, version: int, stale_after: float) -> KBEmbeddingVersion | None:
+    """Atomically take a building version for this runner; None if another runner is still reporting progress."""
+    from sqlalchemy import or_, update
+
+    from db.models import KBEmbeddingVersion
+
+    now = datetime.now(timezone.utc)
+    claimed = await db.scalar(
+        update(KBEmbeddingVersion)
+        .where(
+            KBEmbeddingVersion.version == version,
+            KBEmbeddingVersion.status == "building",
+            or_(
+                KBEmbeddingVersion.claimed_at.is_(None),
+                KBEmbeddingVersion.updated_at < now - timedelta(seconds=stale_after),
+            ),
+        )
+        .values(claimed_at=now, updated_at=now, error=None)
+        .returning(KBEmbeddingVersion.version)
+    )
+    await db.commit()
+    if claimed is None:
+        return None
+    return await get_version(db, version)
+
+
+async def update_version(db: AsyncSession, version: int, **values: Any) -> None:
+    from sqlalchemy import update
+
+    from db.models import KBEmbeddingVersion
+
+    if "progress" in values:
+        values["progress"] = max(0, min(100, values["progress"]))
+    await db.execute(update(KBEmbeddingVersion).where(KBEmbeddingVersion.version == version).values(**values))
+    await db.commit()
+
+
+async def cut_over(db: AsyncSession, version: int) -> None:
+    """Make the building `version` active and retire the current one, in one transaction."""
+    from sqlalchemy import update
+
+    from db.models import KBEmbeddingVersion
+
+    await db.execute(
+        update(KBEmbeddingVersion).where(KBEmbeddingVersion.status == "active").values(status="retired")
+    )
+    result = await db.execute(
+        update(KBEmbeddingVersion)
+        .where(KBEmbeddingVersion.version == version, KBEmbeddingVersion.status == "building")
+        .values(status="active", progress=100, activated_at=datetime.now(timezone.utc), claimed_at=None)
+    )
+    if result.rowcount != 1:
+        await db.rollback()
+        raise ValueError(f"Embedding version {version} is not being built.")
+    await db.commit()
+
+
+async def fail_version(db: AsyncSession, version: int, error: str) -> None:
+    """Stop a migration: dual-writes end on each process's next refresh; the partial index is left in place."""
+    await update_version(db, version, status="failed", error=error, claimed_at=None)
+
+
+async def version_status() -> list[dict]:
+    """Every recorded version with its migration progress; just version 1 if none (or no database)."""
+    from db.base import get_sessionmaker
+
+    try:
+        async with get_sessionmaker()() as db:
+            rows = await list_versions(db)
+    except RuntimeError:  # DATABASE_URL not set
+        rows = []
+    if not rows:
+        return [{
+            "version": DEFAULT_VERSION.version, "model_name": DEFAULT_VERSION.model_name,
+            "dim": DEFAULT_VERSION.dim, "status": "active", "progress": 100, "total_chunks": None,
+            "migrated_chunks": None, "skipped_chunks": None, "completed_namespaces": 0, "error": None,
+        }]
+    return [
+        {
+            "version": r.version, "model_name": r.model_name, "dim": r.dim, "status": r.status,
+            "progress": r.progress, "total_chunks": r.total_chunks, "migrated_chunks": r.migrated_chunks,
+            "skipped_chunks": r.skipped_chunks, "completed_namespaces": len(r.completed_namespaces or []),
+            "error": r.error,
+        }
+        for r in rows
+    ]
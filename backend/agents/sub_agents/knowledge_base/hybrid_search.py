@@ -0,0 +1,261 @@
+"""
+Hybrid retrieval for the knowledge base: BM25 over the team's chunks, fused
+with vector search by reciprocal rank, plus an optional local cross-encoder
+rerank.
+
+MiniLM embeddings blur exact terms (a company name, "NRR", "$2.5M") that a
+lexical index matches directly. For each search:
+  1. the vector store returns its top KB_HYBRID_CANDIDATES chunks;
+  2. an in-process BM25 index over the same namespace returns its top
+     KB_HYBRID_CANDIDATES. Figures stay single tokens ("$2.5M" -> "2.5m",
+     "118%"), so they match exactly;
+  3. the two rankings are merged by reciprocal-rank fusion, where each chunk
+     scores sum(1 / (KB_RRF_K + rank));
+  4. with KB_RERANK_ENABLED, a local cross-encoder (KB_RERANK_MODEL)
+     re-scores the top KB_RERANK_CANDIDATES fused chunks against the query.
+
+A team's BM25 index is built on first use from the chunk text in the
+document registry: one indexed query on kb_chunks (registry.py). Deployments
+without a database, and searches outside a team, read the vector store's
+metadata instead, which is O(chunks) and a list + fetch on Pinecone. The
+index is rebuilt after this process writes to the namespace, and is
+otherwise at most KB_BM25_TTL_SECONDS old (to pick up uploads handled by
+another worker). Builds are single-flight per namespace; searches in other
+namespaces don't wait on them. KB_RETRIEVAL_MODE=vector turns hybrid retrieval off.
+Measure with `python -m agents.sub_agents.knowledge_base.retrieval_eval`.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from functools import lru_cache
+
+import numpy as np
+
+from agents.sub_agents.knowledge_base.local_vector_store import matches_filter
+
+logger = logging.getLogger("hybrid_search")
+
+RETRIEVAL_MODE = os.environ.get("KB_RETRIEVAL_MODE", "hybrid").strip().lower()
+HYBRID_CANDIDATES = int(os.environ.get("KB_HYBRID_CANDIDATES", "20"))
+RRF_K = int(os.environ.get("KB_RRF_K", "60"))
+BM25_TTL_SECONDS = float(os.environ.get("KB_BM25_TTL_SECONDS", "300"))
+RERANK_ENABLED = os.environ.get("KB_RERANK_ENABLED", "false").strip().lower() in ("1", "true", "yes")
+RERANK_MODEL = os.environ.get("KB_RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(os.environ.get("KB_RERANK_CANDIDATES", "12"))
+
+# Figures first (38k, 2.5m, 118%, 2,000), then words.
+_TOKEN_RE = re.compile(r"\d+(?:[.,]\d+)*(?:%|[kmb](?![a-z]))?|[a-z][a-z0-9]*")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how in is it its of on or our that the this to was we were "
+    "what when which who will with you your".split()
+)
+
+_indexes: dict[str, tuple[float, "BM25Index"]] = {}  # namespace -> (built at, index)
+_generations: dict[str, int] = {}  # bumped by `invalidate`; a build that raced a write isn't cached
+_build_locks: dict[str, threading.Lock] = {}
+_builds: dict[str, asyncio.Task] = {}
+_indexes_lock = threading.Lock()  # guards the dicts above, never held while building
+
+
+def tokenize(text: str) -> list[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower().replace("$", "")) if t not in _STOPWORDS]
+
+
+def use_hybrid() -> bool:
+    return RETRIEVAL_MODE == "hybrid"
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed list of chunk metadata dicts (each with "text")."""
+
+    def __init__(self, documents: list[dict], k1: float = 1.5, b: float = 0.75):
+        self.documents = documents
+        self.k1 = k1
+        postings: dict[str, list[tuple[int, int]]] = {}
+        lengths = np.zeros(len(documents), dtype=np.float32)
+        for i, meta in enumerate(documents):
+            tokens = tokenize(meta.get("text", ""))
+            lengths[i] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                postings.setdefault(term, []).append((i, tf))
+
+        n = len(documents)
+        avg_length = float(lengths.mean()) if n else 0.0
+        self._norm = k1 * (1 - b + b * lengths / max(avg_length, 1e-9))
+        self._postings = {
+            term: (
+                np.fromiter((doc for doc, _ in entries), dtype=np.int64, count=len(entries)),
+                np.fromiter((tf for _, tf in entries), dtype=np.float32, count=len(entries)),
+                math.log(1 + (n - len(entries) + 0.5) / (len(entries) + 0.5)),
+            )
+            for term, entries in postings.items()
+        }
+
+    def search(self, query: str, top_k: int, filter: dict | None = None) -> list[dict]:
+        """Top chunks for `query` as `{"text", "metadata", "score"}`, best first; chunks sharing no term are left out."""
+        scores = np.zeros(len(self.documents), dtype=np.float32)
+        for term in set(tokenize(query)):
+            if term not in self._postings:
+                continue
+            docs, tfs, idf = self._postings[term]
+            scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + self._norm[docs])
+
+        hits = [int(i) for i in np.argsort(-scores) if scores[i] > 0]
+        results = []
+        for i in hits:
+            if len(results) >= top_k:
+                break
+            meta = self.documents[i]
+            if filter and not matches_filter(meta, filter):
+                continue
+            metadata = {k: v for k, v in meta.items() if k != "text"}
+            results.append({"text": meta.get("text", ""), "metadata": metadata, "score": float(scores[i])})
+        return results
+
+
+def _fresh_index(key: str) -> "BM25Index | None":
+    with _indexes_lock:
+        cached = _indexes.get(key)
+    if cached is not None and time.monotonic() - cached[0] < BM25_TTL_SECONDS:
+        return cached[1]
+    return None
+
+
+def _build(key: str, documents: list[dict], started: float, generation: int) -> "BM25Index":
+    index = BM25Index([d for d in documents if d.get("text")])
+    with _indexes_lock:
+        if _generations.get(key, 0) == generation:
+            _indexes[key] = (started, index)
+    logger.info(f"Built BM25 index for namespace '{key}': {len(index.documents)} chunk(s) "
+                f"in {(time.monotonic() - started) * 1000:.0f} ms")
+    return index
+
+
+def _lexical_index(namespace: str | None, version=None) -> BM25Index:
+    """The namespace's BM25 index, built from vector-store metadata (no registry: sync callers, scripts)."""
+    from agents.sub_agents.knowledge_base.pinecone_vector_store import active_version, get_vector_store
+
+    key = namespace or ""
+    index = _fresh_index(key)
+    if index is not None:
+        return index
+    with _indexes_lock:
+        lock = _build_locks.setdefault(key, threading.Lock())
+    with lock:
+        index = _fresh_index(key)  # built by the thread we waited for
+        if index is not None:
+            return index
+        with _indexes_lock:
+            generation = _generations.get(key, 0)
+        started = time.monotonic()
+        metadata = get_vector_store(version or active_version()).iter_metadata(namespace=namespace)
+        return _build(key, list(metadata), started, generation)
+
+
+async def _build_from_registry(key: str, team_id: str, namespace: str | None, version) -> BM25Index:
+    from agents.sub_agents.knowledge_base.registry import team_chunks
+    from db.base import get_sessionmaker
+
+    with _indexes_lock:
+        generation = _generations.get(key, 0)
+    started = time.monotonic()
+    try:
+        async with get_sessionmaker()() as db:
+            documents = await team_chunks(db, team_id)
+    except RuntimeError:  # DATABASE_URL not set
+        return await asyncio.to_thread(_lexical_index, namespace, version)
+    except Exception as exc:  # noqa: BLE001 — search on vectors alone rather than fail
+        logger.warning(f"Could not read registry chunks for BM25 ({namespace}): {exc}")
+        return BM25Index([])
+    return await asyncio.to_thread(_build, key, documents, started, generation)
+
+
+async def alexical_index(team_id: str | None, namespace: str | None, version=None) -> BM25Index:
+    """The namespace's BM25 index, built from the team's registry chunks; concurrent searches share one build."""
+    key = namespace or ""
+    index = _fresh_index(key)
+    if index is not None:
+        return index
+    if not team_id:
+        return await asyncio.to_thread(_lexical_index, namespace, version)
+    task = _builds.get(key)
+    if task is None:
+        task = _builds[key] = asyncio.create_task(_build_from_registry(key, team_id, namespace, version))
+        task.add_done_callback(lambda _: _builds.pop(key, None))
+    return await asyncio.shield(task)
+
+
+def invalidate(namespace: str | None) -> None:
+    """Drop the namespace's BM25 index after a write; the next search rebuilds it."""
+    key = namespace or ""
+    with _indexes_lock:
+        _indexes.pop(key, None)
+        _generations[key] = _generations.get(key, 0) + 1
+
+
+def reciprocal_rank_fusion(rankings: list[list[dict]], k: int = RRF_K) -> list[dict]:
+    """
+    Merge ranked result lists (same chunk = same source + text). Scores are
+    scaled to 0-1, where 1 means ranked first by every list.
+    """
+    fused: dict[tuple, dict] = {}
+    totals: dict[tuple, float] = {}
+    for ranking in rankings:
+        for rank, result in enumerate(ranking, 1):
+            meta = result.get("metadata") or {}
+            key = (meta.get("source") or meta.get("file_name"), result.get("text", ""))
+            fused.setdefault(key, result)
+            totals[key] = totals.get(key, 0.0) + 1 / (k + rank)
+    best = len(rankings) / (k + 1)
+    order = sorted(totals, key=totals.get, reverse=True)
+    return [{**fused[key], "score": totals[key] / best} for key in order]
+
+
+@lru_cache(maxsize=1)
+def _get_reranker():
+    from sentence_transformers import CrossEncoder
+
+    logger.info(f"Loading rerank model {RERANK_MODEL}")
+    return CrossEncoder(RERANK_MODEL)
+
+
+def rerank(query: str, results: list[dict]) -> list[dict]:
+    """Re-order `results` by cross-encoder relevance; scores become probabilities (0-1)."""
+    if not results:
+        return results
+    try:
+        logits = _get_reranker().predict([(query, r.get("text", "")) for r in results])
+    except Exception as exc:  # noqa: BLE001 — reranking is an optional refinement
+        logger.warning(f"Rerank skipped: {exc}")
+        return results
+    scored = [{**r, "score": 1 / (1 + math.exp(-float(logit)))} for r, logit in zip(results, logits)]
+    return sorted(scored, key=lambda r: r["score"], reverse=True)
+
+
+def combine(
+    query: str,
+    vector_results: list[dict],
+    top_k: int,
+    filter: dict | None = None,
+    namespace: str | None = None,
+    rerank_results: bool | None = None,
+    version=None,
+    index: BM25Index | None = None,
+) -> list[dict]:
+    """
+    Fuse vector results with BM25 results for `query`, optionally rerank, and
+    keep the top_k. `index` is the namespace's BM25 index if the caller
+    already has it (see `alexical_index`).
+    """
+    index = index or _lexical_index(namespace, version)
+    lexical = index.search(query, HYBRID_CANDIDATES, filter)
+    fused = reciprocal_rank_fusion([vector_results, lexical])
+    if RERANK_ENABLED if rerank_results is None else rerank_results:
+        fused = rerank(query, fused[:max(RERANK_CANDIDATES, top_k)])
+    return fused[:top_k]
@@ -0,0 +1,122 @@
+"""
+Benchmark of the knowledge-base ingest path: chunks/second before and after
+batched embedding and concurrent upserts.
+
+  before — one `encode` call per chunk, then one upsert request carrying every
+           vector (the original `upsert_document_chunks`);
+  after  — `upsert_document_chunks` as it is now: vectorized batch encode (or
+           the multi-process pool when KB_EMBED_PROCESSES > 1), then
+           size-bounded upsert requests sent KB_UPSERT_CONCURRENCY at a time.
+
+Pinecone is replaced by an in-process fake index whose upsert sleeps
+`--upsert-ms` per request plus `--per-vector-ms` per vector, so the numbers
+compare the ingest code rather than your network, and nothing is written to
+a real index. The embedding model is the real one; the embedding cache is
+bypassed for the whole run, so every pass embeds every chunk (otherwise the
+first pass would warm it and the rest would time cache hits) and the real
+cache under KB_EMBED_CACHE_DIR is left untouched.
+
+Run with: python -m agents.sub_agents.knowledge_base.ingest_benchmark [--pages 60]
+"""
+
+import argparse
+import time
+import uuid
+from unittest.mock import patch
+
+from agents.sub_agents.knowledge_base import pinecone_vector_store as store
+
+_SENTENCES = [
+    "Our platform cuts onboarding time for mid-market finance teams from six weeks to four days.",
+    "The serviceable market is roughly 40,000 companies with 200 to 2,000 employees in North America.",
+    "We reached $38K MRR in March with 14% month-over-month growth and net revenue retention of 118%.",
+    "Customer acquisition cost fell to $1,150 after shifting spend from paid search to partner channels.",
+    "Competitors rely on manual reconciliation, while our engine matches 93% of transactions automatically.",
+    "The seed round of $2.5M extends runway to 22 months and funds two senior engineering hires.",
+    "Gross margin is 78% today and should exceed 82% once the data pipeline moves to reserved capacity.",
+]
+
+
+class _FakeIndex:
+    def __init__(self, upsert_ms: float, per_vector_ms: float):
+        self.upsert_ms = upsert_ms
+        self.per_vector_ms = per_vector_ms
+        self.requests = 0
+
+    def upsert(self, vectors, namespace=None):
+        self.requests += 1
+        time.sleep((self.upsert_ms + self.per_vector_ms * len(vectors)) / 1000)
+
+
+def synthetic_chunks(pages: int, words_per_page: int = 450) -> list[dict]:
+    from knowledge_base.extraction import chunk_blocks, iter_text_blocks
+
+    words_needed = pages * words_per_page
+    sentences, words = [], 0
+    i = 0
+    while words < words_needed:
+        sentence = f"{_SENTENCES[i % len(_SENTENCES)]} (section {i // len(_SENTENCES) + 1})"
+        sentences.append(sentence)
+        words += len(sentence.split())
+        i += 1
+    return list(chunk_blocks(iter_text_blocks(" ".join(sentences))))
+
+
+def _ingest_before(chunks: list[dict], source_name: str) -> int:
+    index = store._get_index()
+    vectors = []
+    for chunk in chunks:
+        text = chunk["text"]
+        meta = {"source": source_name, "text": text}
+        vectors.append({"id": str(uuid.uuid4()), "values": store._embed_document(text), "metadata": meta})
+    index.upsert(vectors=vectors, namespace=store._namespace())
+    return len(vectors)
+
+
+def run(pages: int, upsert_ms: float, per_vector_ms: float, repeats: int) -> dict:
+    with patch.object(store, "_version_cache", return_value=None):
+        return _run(pages, upsert_ms, per_vector_ms, repeats)
+
+
+def _run(pages: int, upsert_ms: float, per_vector_ms: float, repeats: int) -> dict:
+    chunks = synthetic_chunks(pages)
+    store._embed_documents([c["text"] for c in chunks[:8]])  # load the model outside the timings
+
+    results = {"chunks": len(chunks)}
+    for label, ingest in (("before", _ingest_before), ("after", store.upsert_document_chunks)):
+        best = float("inf")
+        requests = 0
+        for _ in range(repeats):
+            index = _FakeIndex(upsert_ms, per_vector_ms)
+            # The fake index behind a Pinecone store, whatever VECTOR_STORE_BACKEND says.
+            with patch.object(store, "_get_index", return_value=index), \
+                    patch.object(store, "get_vector_store", return_value=store.PineconeVectorStore()):
+                start = time.perf_counter()
+                ingest(chunks, "benchmark")
+                best = min(best, time.perf_counter() - start)
+            requests = index.requests
+        results[label] = {"seconds": best, "chunks_per_s": len(chunks) / best, "upsert_requests": requests}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=60, help="Synthetic document size (~450 words/page).")
+    parser.add_argument("--upsert-ms", type=float, default=120.0, help="Simulated latency per upsert request.")
+    parser.add_argument("--per-vector-ms", type=float, default=0.5, help="Simulated server time per vector.")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    report = run(args.pages, args.upsert_ms, args.per_vector_ms, args.repeats)
+    print(f"Document: {args.pages} pages -> {report['chunks']} chunks "
+          f"(batch={store.EMBED_BATCH_SIZE}, processes={store.EMBED_PROCESSES or 1}, "
+          f"upsert batch={store.UPSERT_BATCH_SIZE} x{store.UPSERT_CONCURRENCY})")
+    for label in ("before", "after"):
+        r = report[label]
+        print(f"{label:>6}: {r['seconds']:6.2f} s  {r['chunks_per_s']:7.1f} chunks/s  "
+              f"({r['upsert_requests']} upsert request(s))")
+    print(f"Speed-up: {report['before']['seconds'] / report['after']['seconds']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
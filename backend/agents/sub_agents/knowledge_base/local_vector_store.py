@@ -0,0 +1,381 @@
+"""
+In-process vector store: exact cosine search over a NumPy float32 matrix
+persisted to memory-mapped files — no network round-trip, works offline.
+
+Exact search (one matrix-vector product) over a single team's documents —
+tens of thousands of chunks — takes a few milliseconds, well under a
+Pinecone round-trip, so no approximate (HNSW) graph is built.
+
+Layout, one directory per namespace under KB_LOCAL_INDEX_DIR:
+  namespace     — the namespace's name (directory names are sanitized)
+  vectors.f32   — (capacity, dim) rows, grown by doubling; row i is record i
+  records.jsonl — append-only log: {"row", "id", "metadata"} per upsert,
+                  {"update": id, "metadata"} per metadata update and
+                  {"delete": id} per delete. It is the commit point: vectors
+                  are written and flushed first, then the log line, so a
+                  crash mid-write never leaves a record without its vector.
+
+  lock          — flock(2) target: writers (upsert, update, delete,
+                  compaction) hold it exclusively, readers take it shared
+                  while catching up
+
+Several processes can share a directory (uvicorn workers, Celery, the
+migration CLIs). Each keeps the records it has read in memory with the log
+offset it read up to. Before every operation it applies the lines other
+processes appended since. A writer does that under the exclusive lock, so
+it assigns rows after everyone else's. A compaction replaces both files;
+the others notice the new log inode and re-read from the start.
+
+Re-upserting an id appends a new row and retires the old one; the files are
+compacted on open once more than half the rows are dead. Metadata filters
+follow Pinecone's syntax ($eq, $ne, $in, $nin, $gt, $gte, $lt, $lte, $and,
+$or, and the bare {"field": value} shorthand for $eq).
+"""
+
+import fcntl
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+import numpy as np
+
+from agents.sub_agents.knowledge_base.vector_store import VectorStore
+
+logger = logging.getLogger("local_vector_store")
+
+_DEFAULT_NAMESPACE = "__default__"
+_INITIAL_CAPACITY = 1024
+
+_COMPARATORS = {
+    "$eq": lambda a, b: a == b,
+    "$ne": lambda a, b: a != b,
+    "$gt": lambda a, b: a is not None and a > b,
+    "$gte": lambda a, b: a is not None and a >= b,
+    "$lt": lambda a, b: a is not None and a < b,
+    "$lte": lambda a, b: a is not None and a <= b,
+    "$in": lambda a, b: a in b,
+    "$nin": lambda a, b: a not in b,
+}
+
+
+def matches_filter(metadata: dict, filter: dict | None) -> bool:
+    """Evaluate a Pinecone-style metadata filter against one record's metadata."""
+    if not filter:
+        return True
+    for key, condition in filter.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, sub) for sub in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for op, operand in condition.items():
+                if op not in _COMPARATORS:
+                    raise ValueError(f"Unsupported filter operator: {op}")
+                if not _COMPARATORS[op](value, operand):
+                    return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+class _Namespace:
+    """One namespace's matrix + record log."""
+
+    def __init__(self, root: str, dim: int, name: str | None = None):
+        self.root = root
+        self.dim = dim
+        os.makedirs(root, exist_ok=True)
+        name_path = os.path.join(root, "namespace")
+        if name is not None and not os.path.exists(name_path):
+            with open(name_path, "w", encoding="utf-8") as f:
+                f.write(name)
+        self._vectors_path = os.path.join(root, "vectors.f32")
+        self._records_path = os.path.join(root, "records.jsonl")
+        self._lock_fd = os.open(os.path.join(root, "lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        self.matrix: np.memmap | None = None
+        self._reset()
+        with self._flock(fcntl.LOCK_EX):
+            self._sync()
+            if len(self.ids) > _INITIAL_CAPACITY and len(self.row_of) < len(self.ids) / 2:
+                self._compact()
+
+    # ── persistence ──────────────────────────────────────────────────────────
+
+    @contextmanager
+    def _flock(self, operation: int):
+        fcntl.flock(self._lock_fd, operation)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _reset(self) -> None:
+        self.ids: list[str | None] = []  # row -> id (None = dead row)
+        self.metadata: list[dict | None] = []
+        self.row_of: dict[str, int] = {}
+        self._log_inode: int | None = None
+        self._log_offset = 0  # bytes of records.jsonl applied so far
+
+    def _apply(self, line: bytes) -> None:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return  # torn line from a crash
+        if "delete" in record:
+            self._retire(record["delete"])
+            return
+        if "update" in record:
+            self._merge(record["update"], record["metadata"])
+            return
+        row = record["row"]
+        while len(self.ids) <= row:
+            self.ids.append(None)
+            self.metadata.append(None)
+        self._retire(record["id"])
+        self.ids[row] = record["id"]
+        self.metadata[row] = record["metadata"]
+        self.row_of[record["id"]] = row
+
+    def _sync(self) -> None:
+        """Apply log lines appended since the last sync (all of them after another process compacted)."""
+        try:
+            f = open(self._records_path, "rb")
+        except FileNotFoundError:
+            f = None
+        if f is not None:
+            with f:
+                stat = os.fstat(f.fileno())
+                if stat.st_ino != self._log_inode:
+                    self._reset()
+                    self._log_inode = stat.st_ino
+                    if self.matrix is not None:
+                        del self.matrix  # the vectors file was replaced too
+                        self.matrix = None
+                if stat.st_size > self._log_offset:
+                    f.seek(self._log_offset)
+                    data = f.read()
+                    complete = data.rfind(b"\n") + 1  # a partial last line is picked up next time
+                    for line in data[:complete].splitlines():
+                        self._apply(line)
+                    self._log_offset += complete
+
+        if self.matrix is None or len(self.ids) > self.matrix.shape[0]:
+            capacity = max(_INITIAL_CAPACITY, len(self.ids))
+            if os.path.exists(self._vectors_path):
+                capacity = max(capacity, os.path.getsize(self._vectors_path) // (4 * self.dim))
+            self.matrix = None
+            self._open_matrix(capacity)
+
+    def refresh(self) -> None:
+        with self._flock(fcntl.LOCK_SH):
+            self._sync()
+
+    def _open_matrix(self, capacity: int) -> None:
+        mode = "r+" if os.path.exists(self._vectors_path) else "w+"
+        if mode == "r+" and os.path.getsize(self._vectors_path) < capacity * 4 * self.dim:
+            with open(self._vectors_path, "r+b") as f:
+                f.truncate(capacity * 4 * self.dim)
+        self.matrix = np.memmap(self._vectors_path, dtype=np.float32, mode=mode, shape=(capacity, self.dim))
+
+    def _retire(self, vector_id: str) -> None:
+        row = self.row_of.pop(vector_id, None)
+        if row is not None:
+            self.ids[row] = None
+            self.metadata[row] = None
+
+    def _merge(self, vector_id: str, metadata: dict) -> None:
+        row = self.row_of.get(vector_id)
+        if row is not None:
+            self.metadata[row] = {**self.metadata[row], **metadata}
+
+    def _compact(self) -> None:
+        live = [row for row, vid in enumerate(self.ids) if vid is not None]
+        logger.info(f"Compacting local vector index {self.root}: {len(self.ids)} rows -> {len(live)}")
+        vectors = np.array(self.matrix[live]) if live else np.zeros((0, self.dim), dtype=np.float32)
+        records = [{"row": new, "id": self.ids[old], "metadata": self.metadata[old]} for new, old in enumerate(live)]
+
+        tmp_vectors, tmp_records = self._vectors_path + ".tmp", self._records_path + ".tmp"
+        capacity = max(_INITIAL_CAPACITY, 2 * len(live))
+        out = np.memmap(tmp_vectors, dtype=np.float32, mode="w+", shape=(capacity, self.dim))
+        out[: len(live)] = vectors
+        out.flush()
+        del out
+        with open(tmp_records, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(r) + "\n" for r in records)
+        del self.matrix
+        os.replace(tmp_vectors, self._vectors_path)
+        os.replace(tmp_records, self._records_path)
+
+        self.ids = [r["id"] for r in records]
+        self.metadata = [r["metadata"] for r in records]
+        self.row_of = {r["id"]: r["row"] for r in records}
+        stat = os.stat(self._records_path)
+        self._log_inode, self._log_offset = stat.st_ino, stat.st_size
+        self._open_matrix(capacity)
+
+    # ── operations ───────────────────────────────────────────────────────────
+
+    def upsert(self, vectors: list[dict]) -> None:
+        with self._flock(fcntl.LOCK_EX):
+            self._sync()
+            start = len(self.ids)
+            needed = start + len(vectors)
+            if needed > self.matrix.shape[0]:
+                capacity = self.matrix.shape[0]
+                while capacity < needed:
+                    capacity *= 2
+                self.matrix.flush()
+                del self.matrix
+                self._open_matrix(capacity)
+
+            self.matrix[start:needed] = np.asarray([v["values"] for v in vectors], dtype=np.float32)
+            self.matrix.flush()
+            lines = []
+            for offset, v in enumerate(vectors):
+                row = start + offset
+                meta = dict(v.get("metadata") or {})
+                lines.append(json.dumps({"row": row, "id": v["id"], "metadata": meta}) + "\n")
+                self._retire(v["id"])
+                self.ids.append(v["id"])
+                self.metadata.append(meta)
+                self.row_of[v["id"]] = row
+            self._append(lines)
+
+    def delete(self, ids: list[str]) -> None:
+        with self._flock(fcntl.LOCK_EX):
+            self._sync()
+            ids = [vid for vid in ids if vid in self.row_of]
+            if not ids:
+                return
+            for vid in ids:
+                self._retire(vid)
+            self._append([json.dumps({"delete": vid}) + "\n" for vid in ids])
+
+    def update_metadata(self, updates: list[dict]) -> None:
+        with self._flock(fcntl.LOCK_EX):
+            self._sync()
+            updates = [u for u in updates if u["id"] in self.row_of]
+            if not updates:
+                return
+            for u in updates:
+                self._merge(u["id"], u["metadata"])
+            self._append([json.dumps({"update": u["id"], "metadata": u["metadata"]}) + "\n" for u in updates])
+
+    def _append(self, lines: list[str]) -> None:
+        """Append to the log (exclusive lock held); a line torn by a crash is terminated first."""
+        with open(self._records_path, "ab") as f:
+            if f.tell() > self._log_offset:
+                f.write(b"\n")
+            f.write("".join(lines).encode())
+            f.flush()
+            os.fsync(f.fileno())
+            stat = os.fstat(f.fileno())
+            self._log_inode, self._log_offset = stat.st_ino, stat.st_size
+
+    def query(self, vector: list[float], top_k: int, filter: dict | None) -> list[dict]:
+        rows = [
+            row for row, vid in enumerate(self.ids)
+            if vid is not None and matches_filter(self.metadata[row], filter)
+        ]
+        if not rows or top_k <= 0:
+            return []
+        rows_arr = np.asarray(rows)
+        scores = self.matrix[rows_arr] @ np.asarray(vector, dtype=np.float32)
+        k = min(top_k, len(rows))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [
+            {"id": self.ids[rows[i]], "score": float(scores[i]), "metadata": dict(self.metadata[rows[i]])}
+            for i in best
+        ]
+
+
+class LocalVectorStore(VectorStore):
+    """VectorStore over per-namespace `_Namespace` files in `directory`."""
+
+    name = "local"
+
+    def __init__(self, directory: str, dim: int):
+        self.directory = directory
+        self.dim = dim
+        self._namespaces: dict[str, _Namespace] = {}
+        self._lock = threading.RLock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _ns(self, namespace: str | None) -> _Namespace:
+        key = namespace or _DEFAULT_NAMESPACE
+        ns = self._namespaces.get(key)
+        if ns is None:
+            safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in key)
+            ns = self._namespaces[key] = _Namespace(os.path.join(self.directory, safe), self.dim, key)
+        else:
+            ns.refresh()
+        return ns
+
+    def upsert(self, vectors: list[dict[str, Any]], namespace: str | None = None) -> None:
+        if not vectors:
+            return
+        with self._lock:
+            self._ns(namespace).upsert(vectors)
+
+    def query(
+        self,
+        vector: list[float],
+        top_k: int,
+        filter: dict | None = None,
+        namespace: str | None = None,
+    ) -> list[dict[str, Any]]:
+        with self._lock:
+            return self._ns(namespace).query(vector, top_k, filter)
+
+    def delete(self, ids: list[str], namespace: str | None = None) -> None:
+        with self._lock:
+            self._ns(namespace).delete(ids)
+
+    def update_metadata(self, updates: list[dict[str, Any]], namespace: str | None = None) -> None:
+        if not updates:
+            return
+        with self._lock:
+            self._ns(namespace).update_metadata(updates)
+
+    def iter_metadata(self, namespace: str | None = None) -> Iterator[dict[str, Any]]:
+        with self._lock:
+            ns = self._ns(namespace)
+            snapshot = [dict(m) for m in ns.metadata if m is not None]
+        return iter(snapshot)
+
+    def iter_vectors(self, namespace: str | None = None) -> Iterator[dict[str, Any]]:
+        with self._lock:
+            ns = self._ns(namespace)
+            snapshot = [
+                {"id": vid, "values": ns.matrix[row].tolist(), "metadata": dict(ns.metadata[row])}
+                for row, vid in enumerate(ns.ids)
+                if vid is not None
+            ]
+        return iter(snapshot)
+
+    def iter_ids(self, namespace: str | None = None) -> Iterator[str]:
+        with self._lock:
+            snapshot = list(self._ns(namespace).row_of)
+        return iter(snapshot)
+
+    def namespace_sizes(self) -> dict[str | None, int]:
+        sizes = {}
+        with self._lock:
+            for entry in sorted(os.listdir(self.directory)):
+                path = os.path.join(self.directory, entry)
+                if not os.path.isdir(path):
+                    continue
+                try:
+                    with open(os.path.join(path, "namespace"), encoding="utf-8") as f:
+                        key = f.read()
+                except FileNotFoundError:  # created before names were recorded
+                    key = entry
+                sizes[None if key == _DEFAULT_NAMESPACE else key] = len(self._ns(key).row_of)
+        return sizes
@@ -0,0 +1,126 @@
+"""
+One-off migration: move knowledge-base vectors out of the shared namespace
+into per-team namespaces.
+
+Every team's chunks used to live in one namespace (PINECONE_NAMESPACE), and
+searches scored all of them. Chunks now live in "team-<team_id>" (see
+`pinecone_vector_store._namespace`), and searches, listings and document
+reads only look there. This copies each legacy vector into its owner's
+namespace and then deletes it from the shared one.
+
+IMPORTANT — chunks without a known owner. A vector's owner comes from the
+document registry (kb_chunks -> kb_documents.team_id). Vectors uploaded
+before the registry existed aren't in it, and their metadata holds no user
+or team (only source and text), so nothing in the data says whose they are:
+  - a deployment with a single team gets them assigned to that team
+    automatically;
+  - otherwise pass `--default-team TEAM_ID` to give them all to one team, or
+    they stay in the shared namespace and are reported as unassigned. No
+    team can see unassigned chunks any more; re-upload those documents, or
+    run again with --default-team.
+Run with --dry-run first: it reports how many vectors each team would get
+and how many are unassigned.
+
+Run from backend/ (needs DATABASE_URL and the vector store's own settings):
+    python -m agents.sub_agents.knowledge_base.migrate_team_namespaces [--dry-run] [--default-team TEAM_ID]
+"""
+
+import argparse
+import asyncio
+import logging
+
+logger = logging.getLogger("migrate_team_namespaces")
+
+MOVE_BATCH_SIZE = 100
+
+
+def move_vectors(store, shared_namespace: str | None, owners: dict[str, str],
+                 default_team_id: str | None = None, dry_run: bool = False) -> dict:
+    """Move each vector of `shared_namespace` to its owner's team namespace; returns counts."""
+    from agents.sub_agents.knowledge_base.pinecone_vector_store import _namespace
+
+    by_team: dict[str, list[dict]] = {}
+    unassigned = 0
+    # Materialize first: Pinecone's list pagination must not see our deletes.
+    for vector in list(store.iter_vectors(namespace=shared_namespace)):
+        team_id = owners.get(vector["id"]) or default_team_id
+        if team_id is None:
+            unassigned += 1
+            continue
+        by_team.setdefault(team_id, []).append(vector)
+
+    moved = 0
+    for team_id, vectors in by_team.items():
+        target = _namespace(team_id)
+        logger.info(f"Team {team_id}: {len(vectors)} vector(s) -> namespace '{target}'")
+        if dry_run:
+            moved += len(vectors)
+            continue
+        for start in range(0, len(vectors), MOVE_BATCH_SIZE):
+            batch = vectors[start:start + MOVE_BATCH_SIZE]
+            store.upsert(batch, namespace=target)  # copy first, so a crash never loses a chunk
+            store.delete([v["id"] for v in batch], namespace=shared_namespace)
+            moved += len(batch)
+    return {"teams": len(by_team), "moved": moved, "unassigned": unassigned}
+
+
+async def _load_owners() -> dict[str, str]:
+    from sqlalchemy import select
+
+    from db.base import get_sessionmaker
+    from db.models import KBChunk, KBDocument
+
+    async with get_sessionmaker()() as db:
+        rows = await db.execute(
+            select(KBChunk.id, KBDocument.team_id).join(KBDocument, KBDocument.id == KBChunk.document_id)
+        )
+        return {vector_id: team_id for vector_id, team_id in rows}
+
+
+async def _only_team() -> str | None:
+    """The team every user belongs to, if the deployment has exactly one."""
+    from sqlalchemy import select
+
+    from db.base import get_sessionmaker
+    from db.models import User
+
+    async with get_sessionmaker()() as db:
+        teams = list(await db.scalars(select(User.team_id).distinct().limit(2)))
+    return teams[0] if len(teams) == 1 else None
+
+
+async def _main(dry_run: bool, default_team_id: str | None) -> None:
+    from agents.sub_agents.knowledge_base.pinecone_vector_store import get_vector_store, shared_namespace
+    from db.base import close_db
+
+    try:
+        owners = await _load_owners()
+        if default_team_id is None:
+            default_team_id = await _only_team()
+            if default_team_id is not None:
+                logger.info(f"Single-team deployment: chunks missing from the registry go to team {default_team_id}")
+    finally:
+        await close_db()
+    stats = await asyncio.to_thread(
+        move_vectors, get_vector_store(), shared_namespace(), owners, default_team_id, dry_run
+    )
+    verb = "Would move" if dry_run else "Moved"
+    print(f"{verb} {stats['moved']} vector(s) into {stats['teams']} team namespace(s); "
+          f"{stats['unassigned']} without a known owner left in the shared namespace")
+    if stats["unassigned"]:
+        print(f"WARNING: {stats['unassigned']} vector(s) have no known owner and are no longer searchable by any "
+              "team. Re-run with --default-team TEAM_ID to assign them, or re-upload those documents.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="Report what would move without writing.")
+    parser.add_argument("--default-team", default=None,
+                        help="Team that owns chunks missing from the document registry.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(args.dry_run, args.default_team))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+ONNX Runtime embedding backend (KB_EMBED_BACKEND=onnx): the knowledge-base
+SentenceTransformer model exported to ONNX and int8-quantized, behind the
+same `encode` call as SentenceTransformer.
+
+A model is exported from its SentenceTransformer checkpoint into
+KB_ONNX_DIR/<model>/. The directory holds model.onnx (fp32), model-int8.onnx
+(dynamic int8 quantization), the tokenizer, and the pooling settings. Export
+needs torch and the `onnx` package, but only once. Afterwards a process
+loads only onnxruntime and the tokenizer, which is where the CPU and
+memory saving comes from. The tokenizer is the `tokenizers` library's, not
+transformers', because importing transformers imports torch. Export ahead of time, e.g. in the image build:
+
+  python -m agents.sub_agents.knowledge_base.onnx_embedder [model ...]
+
+Otherwise the first `_get_model` call exports it.
+
+Tolerance: int8 vectors match the PyTorch ones to a cosine of at least
+PARITY_MEAN_COSINE on average and PARITY_MIN_COSINE for any single text.
+Indexes built with either backend can therefore serve queries embedded by
+the other. KB_ONNX_QUANTIZE=false uses the fp32 export (cosine ~1.0).
+embedding_benchmark.py measures both backends.
+
+  KB_ONNX_DIR      — exported models (default ./.onnx_models)
+  KB_ONNX_QUANTIZE — use the int8 model (default true)
+  KB_ONNX_THREADS  — intra-op threads per session (default 0 = onnxruntime's choice)
+"""
+
+import inspect
+import json
+import logging
+import os
+import shutil
+import sys
+
+import numpy as np
+
+logger = logging.getLogger("onnx_embedder")
+
+ONNX_DIR = os.environ.get("KB_ONNX_DIR", "./.onnx_models")
+ONNX_QUANTIZE = os.environ.get("KB_ONNX_QUANTIZE", "true").strip().lower() not in ("0", "false", "no", "off")
+ONNX_THREADS = int(os.environ.get("KB_ONNX_THREADS", "0"))
+
+PARITY_MEAN_COSINE = 0.99
+PARITY_MIN_COSINE = 0.97
+
+_CONFIG_FILE = "embedder.json"
+
+
+def model_dir(model_name: str) -> str:
+    return os.path.join(ONNX_DIR, model_name.replace("/", "__"))
+
+
+def export_model(model_name: str, directory: str | None = None) -> str:
+    """
+    Export a SentenceTransformer model to ONNX (fp32 and int8), with its
+    tokenizer and pooling settings. The files are written to a temporary
+    directory that is then renamed into place, so concurrent exports can't
+    leave a half-written model. Returns the directory.
+    """
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Normalize, Pooling, Transformer
+
+    directory = directory or model_dir(model_name)
+    logger.info(f"Exporting {model_name} to ONNX in {directory}")
+    st_model = SentenceTransformer(model_name, device="cpu")
+    transformer = next(m for m in st_model if isinstance(m, Transformer))
+    pooling = next(m for m in st_model if isinstance(m, Pooling))
+    if pooling.pooling_mode_cls_token:
+        pooling_mode = "cls"
+    elif pooling.pooling_mode_max_tokens:
+        pooling_mode = "max"
+    elif pooling.pooling_mode_mean_tokens:
+        pooling_mode = "mean"
+    else:
+        raise ValueError(f"{model_name}: unsupported pooling for the ONNX backend ({pooling.get_pooling_mode_str()}).")
+    if not transformer.tokenizer.is_fast:
+        raise ValueError(f"{model_name}: the ONNX backend needs a fast (tokenizer.json) tokenizer.")
+
+    staging = f"{directory}.tmp-{os.getpid()}"
+    os.makedirs(staging, exist_ok=True)
+    try:
+        model = transformer.auto_model.eval()
+        sample = transformer.tokenizer(["export"], return_tensors="pt")
+        # The exporter names graph inputs in forward() order, not the tokenizer's.
+        names = [name for name in inspect.signature(model.forward).parameters if name in sample]
+        fp32_path = os.path.join(staging, "model.onnx")
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                (),
+                fp32_path,
+                kwargs={name: sample[name] for name in names},
+                input_names=names,
+                output_names=["token_embeddings"],
+                dynamic_axes={name: {0: "batch", 1: "sequence"} for name in [*names, "token_embeddings"]},
+                opset_version=14,
+                dynamo=False,
+            )
+        quantize_dynamic(fp32_path, os.path.join(staging, "model-int8.onnx"), weight_type=QuantType.QInt8)
+        transformer.tokenizer.save_pretrained(staging)
+        with open(os.path.join(staging, _CONFIG_FILE), "w") as f:
+            json.dump({
+                "model_name": model_name,
+                "dim": st_model.get_sentence_embedding_dimension(),
+                "max_seq_length": transformer.max_seq_length,
+                "pooling": pooling_mode,
+                "pad_token": transformer.tokenizer.pad_token,
+                "pad_token_id": transformer.tokenizer.pad_token_id,
+                "normalize": any(isinstance(m, Normalize) for m in st_model),
+            }, f)
+        try:
+            os.rename(staging, directory)
+        except OSError:  # another process finished first
+            if not os.path.exists(os.path.join(directory, _CONFIG_FILE)):
+                raise
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return directory
+
+
+def _pool(token_embeddings: np.ndarray, attention_mask: np.ndarray, mode: str) -> np.ndarray:
+    """Sentence vectors from (batch, sequence, dim) token embeddings, ignoring padding."""
+    if mode == "cls":
+        return token_embeddings[:, 0]
+    mask = attention_mask[..., None].astype(np.float32)
+    if mode == "max":
+        return np.where(mask > 0, token_embeddings, -1e9).max(axis=1)
+    return (token_embeddings * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+
+
+class OnnxEmbedder:
+    """An exported model (see export_model) with SentenceTransformer's `encode` signature."""
+
+    def __init__(self, directory: str, quantized: bool = True, threads: int = 0):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(directory, _CONFIG_FILE)) as f:
+            config = json.load(f)
+        self.model_name = config["model_name"]
+        self.dim = config["dim"]
+        self.max_seq_length = config["max_seq_length"]
+        self.pooling = config["pooling"]
+        self.normalize = config["normalize"]
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        path = os.path.join(directory, "model-int8.onnx" if quantized else "model.onnx")
+        self._session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self._input_names = [i.name for i in self._session.get_inputs()]
+        self.tokenizer = Tokenizer.from_file(os.path.join(directory, "tokenizer.json"))
+        self.tokenizer.enable_truncation(self.max_seq_length)
+        self.tokenizer.enable_padding(pad_id=config["pad_token_id"], pad_token=config["pad_token"])
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def encode(
+        self,
+        sentences: str | list[str],
+        batch_size: int = 32,
+        normalize_embeddings: bool = False,
+        convert_to_numpy: bool = True,
+        **kwargs,
+    ) -> np.ndarray:
+        """Embed one text (-> (dim,)) or many (-> (n, dim)) as float32; other SentenceTransformer kwargs are ignored."""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        # Longest first, like SentenceTransformer, so each batch pads little.
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        for start in range(0, len(texts), max(batch_size, 1)):
+            rows = order[start:start + batch_size]
+            encodings = self.tokenizer.encode_batch([texts[i] for i in rows])
+            encoded = {
+                "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+                "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+                "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+            }
+            token_embeddings = self._session.run(None, {name: encoded[name] for name in self._input_names})[0]
+            vectors[rows] = _pool(token_embeddings, encoded["attention_mask"], self.pooling)
+        if normalize_embeddings or self.normalize:
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors[0] if single else vectors
+
+
+def load_embedder(model_name: str) -> OnnxEmbedder:
+    """The ONNX embedder for `model_name`, exporting it first if KB_ONNX_DIR doesn't have it yet."""
+    directory = model_dir(model_name)
+    if not os.path.exists(os.path.join(directory, _CONFIG_FILE)):
+        logger.warning(f"No ONNX export of {model_name} in {ONNX_DIR}; exporting now (loads torch once)")
+        export_model(model_name, directory)
+    return OnnxEmbedder(directory, quantized=ONNX_QUANTIZE, threads=ONNX_THREADS)
+
+
+if __name__ == "__main__":
+    from agents.sub_agents.knowledge_base.embedding_versions import DEFAULT_VERSION
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    for name in sys.argv[1:] or [DEFAULT_VERSION.model_name]:
+        print(export_model(name))
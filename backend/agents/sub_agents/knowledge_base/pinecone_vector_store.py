@@ -1,44 +1,214 @@
 """
-Pinecone vector store helper — embed text locally using SentenceTransformers
-and perform similarity search via Pinecone.
-
-NOTE: all-MiniLM-L6-v2 produces 384-dim vectors. Create your Pinecone index
-with dimension=384 and metric="cosine" (or let this module auto-create a
-serverless index on first use — see _get_index() below).
-
-Required env vars:
+Knowledge-base vector store helper — embed text locally using SentenceTransformers
+and perform similarity search via the configured VectorStore (Pinecone by
+default, or the in-process index in local_vector_store.py; see vector_store.py).
+
+NOTE: all-MiniLM-L6-v2 (the default KB_EMBEDDING_MODEL) produces 384-dim
+vectors. Create your Pinecone index with dimension=384 and metric="cosine"
+(or let this module auto-create a serverless index on first use — see
+_get_index() below). Switching an existing index to another model is a
+re-embed migration: see embedding_versions.py and reembed.py.
+
+Backend selection:
+  VECTOR_STORE_BACKEND — "pinecone" (default) or "local"
+  KB_LOCAL_INDEX_DIR   — local index files (default ./.vector_index)
+
+Embedding model (version 1; see embedding_versions.py):
+  KB_EMBEDDING_MODEL   — SentenceTransformer model (default all-MiniLM-L6-v2)
+  KB_EMBEDDING_DIM     — its output dimension (default 384)
+  KB_EMBED_BACKEND     — "torch" (default: SentenceTransformer on PyTorch) or
+                         "onnx" (int8 ONNX Runtime export; see onnx_embedder.py)
+  KB_EMBED_SIDECAR_SOCKET — embed through the shared sidecar on this Unix socket
+                         instead of loading the model in this process (see
+                         embedding_sidecar.py)
+
+Required env vars (Pinecone backend):
   PINECONE_API_KEY   — from https://app.pinecone.io
   PINECONE_INDEX     — index name (default: "pitchmate")
 
 Optional env vars (only used if the index needs to be auto-created):
   PINECONE_CLOUD     — default "aws"
   PINECONE_REGION    — default "us-east-1"
-  PINECONE_NAMESPACE — default "" (Pinecone's default namespace)
+  PINECONE_NAMESPACE — default "" — prefix for the per-team namespaces
+                       ("<prefix>:team-<team_id>"); the namespace itself is
+                       only used by callers without a team
+
+Ingest tuning (all optional):
+  KB_EMBED_BATCH_SIZE      — chunks per SentenceTransformer.encode batch (default 64)
+  KB_EMBED_PROCESSES       — >1 starts a multi-process encode pool for large
+                             documents (default 0 = off; each process loads the model;
+                             torch backend only)
+  KB_EMBED_POOL_MIN_CHUNKS — documents with at least this many chunks use the pool (default 256)
+  KB_UPSERT_BATCH_SIZE     — max vectors per Pinecone upsert request (default 100)
+  KB_UPSERT_CONCURRENCY    — upsert requests in flight at once (default 4)
+
+Retrieval (see hybrid_search.py; all optional):
+  KB_RETRIEVAL_MODE    — "hybrid" (default: vector + BM25, rank-fused) or "vector"
+  KB_HYBRID_CANDIDATES — chunks taken from each ranking before fusion (default 20)
+  KB_RERANK_ENABLED    — rerank fused results with a local cross-encoder (default false)
+  KB_RERANK_MODEL      — default cross-encoder/ms-marco-MiniLM-L-6-v2
+
+Embedding cache (see embedding_cache.py; all optional):
+  KB_EMBED_CACHE_ENABLED        — default true
+  KB_EMBED_CACHE_DIR            — on-disk tier location (default ./.embedding_cache; empty = memory only)
+  KB_EMBED_CACHE_MEMORY_ENTRIES — in-memory LRU size (default 20000)
+  KB_EMBED_CACHE_DISK_ENTRIES   — on-disk capacity (default 100000)
 """
 
+import asyncio
+import hashlib
+import json
 import logging
 import os
-import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
+from typing import Awaitable, Callable
+
+import numpy as np
+
+from agents.sub_agents.knowledge_base.embedding_versions import (
+    DEFAULT_VERSION,
+    EmbeddingVersion,
+    active_version,
+    refresh_versions,
+    write_versions,
+)
+from agents.sub_agents.knowledge_base.vector_store import VectorStore
 
 logger = logging.getLogger("pinecone_vector_store")
 
-MODEL_NAME = "all-MiniLM-L6-v2"
-EMBEDDING_DIM = 384
+# Version 1's model; the active one may differ after a migration (embedding_versions.py).
+MODEL_NAME = DEFAULT_VERSION.model_name
+EMBEDDING_DIM = DEFAULT_VERSION.dim
+
+EMBED_BACKEND = os.environ.get("KB_EMBED_BACKEND", "torch").strip().lower()
+EMBED_SIDECAR_SOCKET = os.environ.get("KB_EMBED_SIDECAR_SOCKET", "").strip()
+EMBED_BATCH_SIZE = int(os.environ.get("KB_EMBED_BATCH_SIZE", "64"))
+EMBED_PROCESSES = int(os.environ.get("KB_EMBED_PROCESSES", "0"))
+EMBED_POOL_MIN_CHUNKS = int(os.environ.get("KB_EMBED_POOL_MIN_CHUNKS", "256"))
+UPSERT_BATCH_SIZE = int(os.environ.get("KB_UPSERT_BATCH_SIZE", "100"))
+UPSERT_CONCURRENCY = int(os.environ.get("KB_UPSERT_CONCURRENCY", "4"))
+# Pinecone rejects upsert requests over 2 MB; stay well under it.
+UPSERT_MAX_BYTES = 1_500_000
+DELETE_BATCH_SIZE = 1000  # Pinecone's per-request limit
+
+VECTOR_STORE_BACKEND = os.environ.get("VECTOR_STORE_BACKEND", "pinecone").strip().lower()
+LOCAL_INDEX_DIR = os.environ.get("KB_LOCAL_INDEX_DIR", "./.vector_index")
+PINECONE_INDEX = os.environ.get("PINECONE_INDEX", "pitchmate")
+
+EMBED_CACHE_DIR = os.environ.get("KB_EMBED_CACHE_DIR", "./.embedding_cache")
+EMBED_CACHE_MEMORY_ENTRIES = int(os.environ.get("KB_EMBED_CACHE_MEMORY_ENTRIES", "20000"))
+EMBED_CACHE_DISK_ENTRIES = int(os.environ.get("KB_EMBED_CACHE_DISK_ENTRIES", "100000"))
+
+_encode_pools: dict[str, dict] = {}  # model name -> sentence-transformers pool
+_encode_pool_lock = threading.Lock()
+_embedding_caches: dict[tuple[str, int], object] = {}
+_embedding_caches_lock = threading.Lock()
+
+
+@lru_cache(maxsize=4)
+def _get_model(model_name: str = MODEL_NAME):
+    """
+    The embedding model for this process. With KB_EMBED_SIDECAR_SOCKET it is
+    a client of the shared embedding sidecar, so workers don't each load a
+    copy. Otherwise it is the model itself (_load_model).
+    """
+    if EMBED_SIDECAR_SOCKET:
+        from agents.sub_agents.knowledge_base.embedding_sidecar import SidecarModel
+        return SidecarModel(model_name, EMBED_SIDECAR_SOCKET)
+    return _load_model(model_name)
 
 
-@lru_cache(maxsize=1)
-def _get_model():
-    """Load SentenceTransformer model once and cache it."""
+@lru_cache(maxsize=4)
+def _load_model(model_name: str = MODEL_NAME):
+    """
+    Load an embedding model once and cache it (two at a time during a
+    migration): SentenceTransformer, or its ONNX Runtime export with
+    KB_EMBED_BACKEND=onnx. Both have the same `encode`.
+    """
+    if EMBED_BACKEND == "onnx":
+        from agents.sub_agents.knowledge_base.onnx_embedder import load_embedder
+        logger.info(f"Loading ONNX embedding model: {model_name}")
+        return load_embedder(model_name)
     from sentence_transformers import SentenceTransformer
-    logger.info(f"Loading embedding model: {MODEL_NAME}")
-    return SentenceTransformer(MODEL_NAME)
+    logger.info(f"Loading embedding model: {model_name}")
+    return SentenceTransformer(model_name)
+
+
+def _get_embedding_cache(model_name: str = MODEL_NAME, dim: int = EMBEDDING_DIM):
+    """The process-wide EmbeddingCache for a model, or None when disabled."""
+    if os.environ.get("KB_EMBED_CACHE_ENABLED", "true").strip().lower() in ("0", "false", "no", "off"):
+        return None
+    from agents.sub_agents.knowledge_base.embedding_cache import EmbeddingCache
+
+    with _embedding_caches_lock:
+        cache = _embedding_caches.get((model_name, dim))
+        if cache is None:
+            cache = _embedding_caches[(model_name, dim)] = EmbeddingCache(
+                model_name,
+                dim,
+                EMBED_CACHE_DIR or None,
+                memory_entries=EMBED_CACHE_MEMORY_ENTRIES,
+                disk_entries=EMBED_CACHE_DISK_ENTRIES,
+                keep_models=[(v.model_name, v.dim) for v in write_versions()],
+            )
+        return cache
+
+
+def _version_cache(version: EmbeddingVersion):
+    return _get_embedding_cache(version.model_name, version.dim)
+
+
+def embedding_cache_stats() -> dict | None:
+    cache = _version_cache(active_version())
+    return cache.stats() if cache is not None else None
+
+
+def embedding_sidecar_stats() -> dict | None:
+    """The shared embedding sidecar's connection, request and batching stats; None when not configured."""
+    if not EMBED_SIDECAR_SOCKET:
+        return None
+    from agents.sub_agents.knowledge_base.embedding_sidecar import get_client
+
+    try:
+        return get_client(EMBED_SIDECAR_SOCKET).stats()
+    except (ConnectionError, RuntimeError) as exc:
+        return {"error": str(exc)}
+
+
+def flush_embedding_cache() -> None:
+    """Write the on-disk cache tiers back to disk (call on app shutdown)."""
+    with _embedding_caches_lock:
+        caches = [cache for cache in _embedding_caches.values() if cache is not None]
+    for cache in caches:
+        cache.flush()
+
 
+def _embed(text: str, version: EmbeddingVersion | None = None) -> list[float]:
+    """Embed text for similarity query (with the active version's model by default)."""
+    version = version or active_version()
+    cache = _version_cache(version)
+    if cache is not None and (hit := cache.get(text)) is not None:
+        return hit.tolist()
+    vector = _get_model(version.model_name).encode(text, normalize_embeddings=True)
+    if cache is not None:
+        cache.put(text, vector)
+    return vector.tolist()
 
-def _embed(text: str) -> list[float]:
-    """Embed text for similarity query."""
-    model = _get_model()
-    return model.encode(text, normalize_embeddings=True).tolist()
+
+async def aembed_query(text: str, version: EmbeddingVersion | None = None) -> list[float]:
+    """Embed a search query through the cache, then the shared micro-batcher (see query_batcher.py)."""
+    from agents.sub_agents.knowledge_base.query_batcher import get_query_batcher
+
+    version = version or active_version()
+    cache = _version_cache(version)
+    if cache is not None and (hit := cache.get(text)) is not None:
+        return hit.tolist()
+    vector = await get_query_batcher(version.model_name).embed(text)
+    if cache is not None:
+        cache.put(text, vector)
+    return vector
 
 
 def _embed_document(text: str) -> list[float]:
@@ -46,13 +216,115 @@ def _embed_document(text: str) -> list[float]:
     return _embed(text)
 
 
-def _namespace() -> str:
+def _embed_documents(texts: list[str], version: EmbeddingVersion | None = None) -> np.ndarray:
+    """
+    Embed many document chunks at once. Cached chunks (e.g. a re-uploaded
+    deck) come from the embedding cache; the rest go through one vectorized
+    `encode`. Returns a (len(texts), version.dim) float32 array of
+    normalized vectors.
+    """
+    version = version or active_version()
+    cache = _version_cache(version)
+    if cache is None:
+        return _encode_documents(texts, version)
+    vectors = np.zeros((len(texts), version.dim), dtype=np.float32)
+    missing: list[int] = []
+    for i, hit in enumerate(cache.get_many(texts)):
+        if hit is None:
+            missing.append(i)
+        else:
+            vectors[i] = hit
+    if missing:
+        encoded = _encode_documents([texts[i] for i in missing], version)
+        vectors[missing] = encoded
+        cache.put_many([texts[i] for i in missing], encoded)
+    return vectors
+
+
+def _encode_documents(texts: list[str], version: EmbeddingVersion | None = None) -> np.ndarray:
+    """
+    One vectorized `encode` over EMBED_BATCH_SIZE-sized batches instead of one
+    call per chunk. Very large documents go to the multi-process pool when
+    KB_EMBED_PROCESSES > 1.
+    """
+    version = version or active_version()
+    if not texts:
+        return np.zeros((0, version.dim), dtype=np.float32)
+    model = _get_model(version.model_name)
+    use_pool = EMBED_PROCESSES > 1 and EMBED_BACKEND == "torch" and not EMBED_SIDECAR_SOCKET
+    if use_pool and len(texts) >= EMBED_POOL_MIN_CHUNKS:
+        with _encode_pool_lock:  # the pool's queues serve one caller at a time
+            pool = _get_encode_pool(version.model_name)
+            vectors = model.encode_multi_process(texts, pool, batch_size=EMBED_BATCH_SIZE)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    return np.asarray(
+        model.encode(texts, batch_size=EMBED_BATCH_SIZE, normalize_embeddings=True, convert_to_numpy=True),
+        dtype=np.float32,
+    )
+
+
+def _get_encode_pool(model_name: str) -> dict:
+    pool = _encode_pools.get(model_name)
+    if pool is None:
+        logger.info(f"Starting {EMBED_PROCESSES}-process embedding pool for {model_name}")
+        pool = _encode_pools[model_name] = _get_model(model_name).start_multi_process_pool(
+            target_devices=["cpu"] * EMBED_PROCESSES
+        )
+    return pool
+
+
+def shutdown_embedding_pool() -> None:
+    """Stop the multi-process encode pools if any were started (call on app shutdown)."""
+    with _encode_pool_lock:
+        if _encode_pools:
+            from sentence_transformers import SentenceTransformer
+            for pool in _encode_pools.values():
+                SentenceTransformer.stop_multi_process_pool(pool)
+            _encode_pools.clear()
+
+
+def _namespace(team_id: str | None = None) -> str | None:
+    """
+    The team's own namespace (the current request's team when not given), so
+    a search only ever scores that team's chunks. Without any team — scripts,
+    legacy writers — the shared namespace from PINECONE_NAMESPACE; reads go
+    through `_read_namespace`, which never falls back to it.
+    """
+    from core.request_context import current_team_id
+
+    base = shared_namespace()
+    team_id = team_id or current_team_id()
+    if not team_id:
+        return base
+    return f"{base}:team-{team_id}" if base else f"team-{team_id}"
+
+
+def _read_namespace(team_id: str | None = None) -> str | None:
+    """
+    The namespace a search, listing or document read may use: the team's own
+    (the current request's team when not given). None without a team — the
+    caller returns nothing. Reads fail closed rather than fall back to the
+    shared namespace, which still holds every team's chunks until
+    migrate_team_namespaces.py has run.
+    """
+    from core.request_context import current_team_id
+
+    team_id = team_id or current_team_id()
+    if not team_id:
+        logger.warning("Knowledge-base read without a team in scope — returning no results")
+        return None
+    return _namespace(team_id)
+
+
+def shared_namespace() -> str | None:
+    """The pre-partitioning namespace every team used to share (see migrate_team_namespaces.py)."""
     return os.environ.get("PINECONE_NAMESPACE", "") or None
 
 
-@lru_cache(maxsize=1)
-def _get_index():
-    """Return (and lazily initialise) the Pinecone index singleton."""
+@lru_cache(maxsize=4)
+def _get_index(index_name: str = PINECONE_INDEX, dim: int = EMBEDDING_DIM):
+    """Return (and lazily initialise) a Pinecone index — one per embedding version."""
     try:
         from pinecone import Pinecone, ServerlessSpec
     except ImportError:
@@ -61,16 +333,15 @@ def _get_index():
     api_key = os.environ.get("PINECONE_API_KEY", "")
     if not api_key:
         raise RuntimeError("PINECONE_API_KEY environment variable must be set.")
-    index_name = os.environ.get("PINECONE_INDEX", "pitchmate")
 
     pc = Pinecone(api_key=api_key)
 
     existing = {idx["name"] for idx in pc.list_indexes()}
     if index_name not in existing:
-        logger.info(f"Creating Pinecone index '{index_name}' (dim={EMBEDDING_DIM}, cosine)")
+        logger.info(f"Creating Pinecone index '{index_name}' (dim={dim}, cosine)")
         pc.create_index(
             name=index_name,
-            dimension=EMBEDDING_DIM,
+            dimension=dim,
             metric="cosine",
             spec=ServerlessSpec(
                 cloud=os.environ.get("PINECONE_CLOUD", "aws"),
@@ -81,74 +352,439 @@ def _get_index():
     return pc.Index(index_name)
 
 
-def init_pinecone():
-    """Eagerly initialise the Pinecone index singleton (call on app startup)."""
-    _get_index()
+class PineconeVectorStore(VectorStore):
+    """VectorStore over a hosted Pinecone index (see _get_index)."""
+
+    name = "pinecone"
+
+    def __init__(self, index_name: str = PINECONE_INDEX, dim: int = EMBEDDING_DIM):
+        self.index_name = index_name
+        self.dim = dim
+
+    def _index(self):
+        return _get_index(self.index_name, self.dim)
+
+    def upsert(self, vectors: list[dict], namespace: str | None = None) -> None:
+        """Size-bounded upsert requests, UPSERT_CONCURRENCY at a time."""
+        index = self._index()
+        batches = _upsert_batches(vectors)
+        if not batches:
+            return
+        if len(batches) == 1:
+            index.upsert(vectors=batches[0], namespace=namespace)
+            return
+        with ThreadPoolExecutor(max_workers=min(UPSERT_CONCURRENCY, len(batches))) as pool:
+            # list() re-raises the first failed request.
+            list(pool.map(lambda batch: index.upsert(vectors=batch, namespace=namespace), batches))
+
+    def query(self, vector: list[float], top_k: int, filter: dict | None = None, namespace: str | None = None) -> list[dict]:
+        response = self._index().query(
+            vector=vector,
+            top_k=top_k,
+            include_metadata=True,
+            filter=filter or None,
+            namespace=namespace,
+        )
+        return [
+            {"id": match.id, "score": match.score, "metadata": dict(match.metadata or {})}
+            for match in response.matches
+        ]
+
+    def update_metadata(self, updates: list[dict], namespace: str | None = None) -> None:
+        """One update request per vector (Pinecone has no batch update), UPSERT_CONCURRENCY at a time."""
+        if not updates:
+            return
+        index = self._index()
+        with ThreadPoolExecutor(max_workers=min(UPSERT_CONCURRENCY, len(updates))) as pool:
+            list(pool.map(
+                lambda u: index.update(id=u["id"], set_metadata=u["metadata"], namespace=namespace), updates
+            ))
+
+    def iter_metadata(self, namespace: str | None = None):
+        index = self._index()
+        for id_batch in index.list(namespace=namespace):
+            if not id_batch:
+                continue
+            fetched = index.fetch(ids=list(id_batch), namespace=namespace)
+            for vec in fetched.vectors.values():
+                yield dict(vec.metadata or {})
+
+    def iter_vectors(self, namespace: str | None = None):
+        index = self._index()
+        for id_batch in index.list(namespace=namespace):
+            if not id_batch:
+                continue
+            fetched = index.fetch(ids=list(id_batch), namespace=namespace)
+            for vid, vec in fetched.vectors.items():
+                yield {"id": vid, "values": list(vec.values), "metadata": dict(vec.metadata or {})}
+
+    def iter_ids(self, namespace: str | None = None):
+        for id_batch in self._index().list(namespace=namespace):
+            yield from id_batch
+
+    def namespace_sizes(self) -> dict[str | None, int]:
+        stats = self._index().describe_index_stats()
+        return {name or None: summary.vector_count for name, summary in stats.namespaces.items()}
+
+    def delete(self, ids: list[str], namespace: str | None = None) -> None:
+        index = self._index()
+        for start in range(0, len(ids), DELETE_BATCH_SIZE):
+            index.delete(ids=ids[start:start + DELETE_BATCH_SIZE], namespace=namespace)
+
+
+@lru_cache(maxsize=4)
+def _vector_store_for(version: EmbeddingVersion) -> VectorStore:
+    suffix = "" if version.version == DEFAULT_VERSION.version else f"-v{version.version}"
+    if VECTOR_STORE_BACKEND == "pinecone":
+        return PineconeVectorStore(PINECONE_INDEX + suffix, version.dim)
+    if VECTOR_STORE_BACKEND == "local":
+        from agents.sub_agents.knowledge_base.local_vector_store import LocalVectorStore
+
+        directory = LOCAL_INDEX_DIR.rstrip("/\\") + suffix
+        logger.info(f"Using local vector index at {directory}")
+        return LocalVectorStore(directory, version.dim)
+    raise RuntimeError(f"Unknown VECTOR_STORE_BACKEND '{VECTOR_STORE_BACKEND}' (expected 'pinecone' or 'local').")
+
+
+def get_vector_store(version: EmbeddingVersion | None = None) -> VectorStore:
+    """
+    The VectorStore selected by VECTOR_STORE_BACKEND (see vector_store.py)
+    for an embedding version — the active one by default.
+    """
+    return _vector_store_for(version or active_version())
+
 
+def init_vector_store():
+    """Eagerly initialise the vector store (Pinecone index or local files) on app startup."""
+    store = get_vector_store()
+    if isinstance(store, PineconeVectorStore):
+        store._index()
 
-def query_vectors(query_text: str, top_k: int = 6, filter: dict | None = None) -> list[dict]:
+
+def query_vectors(
+    query_text: str, top_k: int = 6, filter: dict | None = None, team_id: str | None = None
+) -> list[dict]:
     """
-    Embed *query_text* and retrieve the top_k most similar documents from Pinecone.
-    Returns a list of dicts with keys: text, metadata, score.
+    Embed *query_text* and retrieve the top_k most similar documents from the
+    team's namespace (see _read_namespace; nothing without a team). Returns a list of dicts with keys:
+    text, metadata, score.
     """
-    embedding = _embed(query_text)
-    index = _get_index()
-
-    response = index.query(
-        vector=embedding,
-        top_k=top_k,
-        include_metadata=True,
-        filter=filter or None,
-        namespace=_namespace(),
+    namespace = _read_namespace(team_id)
+    if namespace is None:
+        return []
+    version = active_version()
+    embedding = _embed(query_text, version)
+    return _search(query_text, embedding, top_k, filter, namespace, version)
+
+
+def _search(
+    query_text: str,
+    embedding: list[float],
+    top_k: int,
+    filter: dict | None,
+    namespace: str | None,
+    version: EmbeddingVersion,
+    lexical_index=None,
+) -> list[dict]:
+    """
+    Vector search, fused with BM25 (and optionally reranked) unless
+    KB_RETRIEVAL_MODE=vector. `lexical_index` is the namespace's BM25 index
+    when the caller has already loaded it (see `aquery_vectors`).
+    """
+    from agents.sub_agents.knowledge_base import hybrid_search
+
+    store = get_vector_store(version)
+    if not hybrid_search.use_hybrid():
+        matches = store.query(embedding, top_k, filter=filter or None, namespace=namespace)
+        return _matches_to_results(matches)
+    candidates = max(top_k, hybrid_search.HYBRID_CANDIDATES)
+    matches = store.query(embedding, candidates, filter=filter or None, namespace=namespace)
+    return hybrid_search.combine(
+        query_text, _matches_to_results(matches), top_k, filter or None, namespace, version=version,
+        index=lexical_index,
     )
 
+
+def _matches_to_results(matches: list[dict]) -> list[dict]:
     results = []
-    for match in response.matches:
-        meta = dict(match.metadata or {})
+    for match in matches:
+        meta = dict(match["metadata"])
         text = meta.pop("text", "")
-        results.append({"text": text, "metadata": meta, "score": match.score})
+        results.append({"text": text, "metadata": meta, "score": match["score"]})
     return results
 
 
-def list_all_sources() -> list[dict]:
-    """Return distinct document sources with chunk counts."""
-    index = _get_index()
-    namespace = _namespace()
-
+async def aquery_vectors(
+    query_text: str, top_k: int = 6, filter: dict | None = None, team_id: str | None = None
+) -> list[dict]:
+    """
+    Async `query_vectors`: batched query embedding, the team's BM25 index
+    from the document registry, then search and fusion on a worker thread.
+    """
+    from agents.sub_agents.knowledge_base import hybrid_search
+    from core.request_context import current_team_id
+
+    team_id = team_id or current_team_id()
+    namespace = _read_namespace(team_id)
+    if namespace is None:
+        return []
+    await refresh_versions()
+    version = active_version()
+    embedding = await aembed_query(query_text, version)
+    lexical_index = None
+    if hybrid_search.use_hybrid():
+        lexical_index = await hybrid_search.alexical_index(team_id, namespace, version)
+    return await asyncio.to_thread(_search, query_text, embedding, top_k, filter, namespace, version, lexical_index)
+
+
+def list_all_sources(team_id: str | None = None) -> list[dict]:
+    """
+    Return distinct document sources with chunk counts by scanning every
+    vector's metadata — O(total chunks). Prefer `list_team_sources`; this
+    remains for deployments without the registry (no DATABASE_URL).
+    """
+    namespace = _read_namespace(team_id)
+    if namespace is None:
+        return []
     counts: dict[str, int] = {}
-    for id_batch in index.list(namespace=namespace):
-        if not id_batch:
-            continue
-        fetched = index.fetch(ids=list(id_batch), namespace=namespace)
-        for vec in fetched.vectors.values():
-            meta = vec.metadata or {}
-            source = meta.get("source") or meta.get("file_name") or "Unknown"
-            counts[source] = counts.get(source, 0) + 1
+    for meta in get_vector_store().iter_metadata(namespace=namespace):
+        source = meta.get("source") or meta.get("file_name") or "Unknown"
+        counts[source] = counts.get(source, 0) + 1
 
     return [{"file_name": name, "count": count} for name, count in sorted(counts.items())]
 
 
-def upsert_document_chunks(chunks: list[dict], source_name: str) -> int:
+def _upsert_batches(vectors: list[dict]) -> list[list[dict]]:
+    """Split vectors into requests of at most UPSERT_BATCH_SIZE vectors and ~UPSERT_MAX_BYTES."""
+    batches: list[list[dict]] = []
+    current: list[dict] = []
+    current_bytes = 0
+    for vec in vectors:
+        # ~10 bytes per serialized float plus the metadata (chunk text dominates).
+        size = len(vec["values"]) * 10 + len(json.dumps(vec["metadata"]))
+        if current and (len(current) >= UPSERT_BATCH_SIZE or current_bytes + size > UPSERT_MAX_BYTES):
+            batches.append(current)
+            current, current_bytes = [], 0
+        current.append(vec)
+        current_bytes += size
+    if current:
+        batches.append(current)
+    return batches
+
+
+def upsert_document_chunks(chunks: list[dict], source_name: str, team_id: str | None = None) -> int:
     """
-    Embed and upsert text chunks into Pinecone.
+    Embed and upsert text chunks into the team's namespace of the vector store.
+
+    Chunks are embedded in vectorized batches, then written in one
+    `VectorStore.upsert` (Pinecone splits it into size-bounded requests,
+    UPSERT_CONCURRENCY at a time). Chunk IDs are deterministic (see
+    `chunk_id`), so repeating an upload overwrites instead of duplicating.
+    Blocking — async callers should use `aupsert_document_chunks`, which also
+    skips chunks that are already stored.
 
     Raises:
-        RuntimeError: if embedding or the Pinecone index is unavailable.
+        RuntimeError: if embedding or the vector store is unavailable.
     Returns:
         Number of chunks successfully upserted.
     """
-    index = _get_index()
-    vectors = []
+    items = _prepare_chunks(chunks, source_name, team_id)
+    _store_chunks(items, team_id)
+    return len(items)
+
+
+def chunk_id(team_id: str | None, source_name: str, text: str) -> str:
+    """Vector ID for a chunk: sha256 of (team, source, chunk text hash) — same chunk, same ID."""
+    from agents.sub_agents.knowledge_base.registry import text_hash
+
+    return hashlib.sha256(f"{team_id or ''}\0{source_name}\0{text_hash(text)}".encode("utf-8")).hexdigest()
+
+
+def _prepare_chunks(chunks: list[dict], source_name: str, team_id: str | None) -> list[dict]:
+    """Non-empty chunks as `[{"id", "text", "metadata"}, ...]` in document order, repeated passages once."""
+    items: dict[str, dict] = {}
     for chunk in chunks:
         text = chunk.get("text") or chunk.get("content", "")
         if not text.strip():
             continue
-        meta = {**(chunk.get("metadata") or {}), "source": source_name, "text": text}
-        embedding = _embed_document(text)  # raises on failure
-        vectors.append({"id": str(uuid.uuid4()), "values": embedding, "metadata": meta})
+        vid = chunk_id(team_id, source_name, text)
+        if vid not in items:
+            meta = {**(chunk.get("metadata") or {}), "source": source_name, "text": text, "ordinal": len(items)}
+            items[vid] = {"id": vid, "text": text, "metadata": meta}
+    return list(items.values())
+
 
-    if not vectors:
+def _store_chunks(items: list[dict], team_id: str | None) -> None:
+    """
+    Embed `items` (from _prepare_chunks) and upsert them into the team's
+    namespace — of every write version, so a re-embed migration's target
+    index sees new uploads too (the active index is always written first).
+    """
+    if not items:
+        return
+    for version in write_versions():
+        embeddings = _embed_documents([item["text"] for item in items], version)  # raises on failure
+        vectors = [
+            {"id": item["id"], "values": embedding.tolist(), "metadata": item["metadata"]}
+            for item, embedding in zip(items, embeddings)
+        ]
+        get_vector_store(version).upsert(vectors, namespace=_namespace(team_id))
+    _invalidate_lexical_index(team_id)
+
+
+def _update_chunk_metadata(items: list[dict], team_id: str | None) -> None:
+    """Rewrite stored chunks' metadata (from _prepare_chunks) in every write version, keeping their vectors."""
+    if not items:
+        return
+    updates = [{"id": item["id"], "metadata": item["metadata"]} for item in items]
+    for version in write_versions():
+        get_vector_store(version).update_metadata(updates, namespace=_namespace(team_id))
+
+
+def _delete_chunks(ids: list[str], team_id: str | None) -> None:
+    """Delete chunk vectors from the team's namespace of every write version (active first)."""
+    for version in write_versions():
+        get_vector_store(version).delete(ids, namespace=_namespace(team_id))
+    _invalidate_lexical_index(team_id)
+
+
+def _invalidate_lexical_index(team_id: str | None) -> None:
+    from agents.sub_agents.knowledge_base.hybrid_search import invalidate
+
+    invalidate(_namespace(team_id))
+
+
+async def aupsert_document_chunks(
+    chunks: list[dict],
+    source_name: str,
+    team_id: str | None = None,
+    user_id: str | None = None,
+    batch_size: int | None = None,
+    start_batch: int = 0,
+    on_batch: Callable[[int, int], Awaitable[None]] | None = None,
+) -> int:
+    """
+    `upsert_document_chunks` on a worker thread, so ingest never blocks the
+    event loop. With `team_id`, the upload is incremental against the
+    document registry (registry.py): an unchanged re-upload does no work,
+    otherwise only chunks not already stored are embedded and upserted,
+    stored chunks whose position changed (slides reordered, pages inserted)
+    get their metadata rewritten, the registry is updated, and chunks the new
+    version dropped are deleted.
+
+    With `batch_size`, new chunks are embedded + upserted `batch_size` at a
+    time and `on_batch(done, total)` is awaited after each batch; passing the
+    last reported `done` back as `start_batch` resumes an interrupted upload
+    (chunk IDs are deterministic, so the batches come out the same).
+    """
+    await refresh_versions()  # pick up a migration in progress, so its index gets this upload too
+    items = _prepare_chunks(chunks, source_name, team_id)
+    if team_id is None:
+        new_items, existing = items, set()
+    elif not items:
         return 0
+    else:
+        from agents.sub_agents.knowledge_base.registry import chunk_positions, document_hash, get_document
+        from db.base import get_sessionmaker
+
+        async with get_sessionmaker()() as db:
+            document = await get_document(db, team_id, source_name)
+            existing = await chunk_positions(db, document.id) if document is not None else {}
+        new_items = [item for item in items if item["id"] not in existing]
+        moved = [
+            item for item in items
+            if item["id"] in existing
+            and existing[item["id"]] != (item["metadata"]["ordinal"], item["metadata"].get("page"))
+        ]
+        if document is not None and not moved and document.content_hash == document_hash([i["text"] for i in items]):
+            logger.info(f"'{source_name}' is unchanged — skipping re-index")
+            return len(items)
+        # Unchanged chunks keep their vectors, but their page / section / position may have moved.
+        await asyncio.to_thread(_update_chunk_metadata, moved, team_id)
+
+    size = batch_size or max(1, len(new_items))
+    batches = [new_items[i:i + size] for i in range(0, len(new_items), size)]
+    for number in range(start_batch, len(batches)):
+        await asyncio.to_thread(_store_chunks, batches[number], team_id)
+        if on_batch is not None:
+            await on_batch(number + 1, len(batches))
+    if team_id is None:
+        return len(items)
+
+    from agents.sub_agents.knowledge_base.registry import record_document
+    from db.base import get_sessionmaker
+
+    async with get_sessionmaker()() as db:
+        removed = await record_document(db, team_id, user_id or team_id, source_name, items)
+    _invalidate_lexical_index(team_id)  # again: a search during the upload may have rebuilt it without them
+    if removed:
+        await asyncio.to_thread(_delete_chunks, removed, team_id)
+    logger.info(
+        f"Indexed '{source_name}': {len(new_items)} new, {len(items) - len(new_items)} unchanged "
+        f"({len(moved)} moved), {len(removed)} removed chunk(s)"
+    )
+    return len(items)
+
+
+async def list_team_sources(team_id: str) -> list[dict]:
+    """
+    The team's documents from the registry: one indexed query, no index scan.
+    If the registry has none, the team's namespace is scanned instead
+    (`list_all_sources`), so documents uploaded before the registry existed
+    stay visible until backfill_registry.py has registered them.
+    """
+    from agents.sub_agents.knowledge_base.registry import list_documents
+    from db.base import get_sessionmaker
 
-    index.upsert(vectors=vectors, namespace=_namespace())
-    return len(vectors)
+    async with get_sessionmaker()() as db:
+        documents = await list_documents(db, team_id)
+    return documents or await asyncio.to_thread(list_all_sources, team_id)
+
+
+def document_chunks_from_index(
+    source_name: str, team_id: str | None = None, first_page: int | None = None, last_page: int | None = None
+) -> list[dict]:
+    """
+    `source_name`'s chunks in document order, read back from vector metadata
+    — O(total chunks). The fallback for `aget_document_chunks` when the
+    registry can't answer (no DATABASE_URL, or chunks indexed before it
+    stored their text).
+    """
+    namespace = _read_namespace(team_id)
+    if namespace is None:
+        return []
+    chunks = []
+    for meta in get_vector_store().iter_metadata(namespace=namespace):
+        if (meta.get("source") or meta.get("file_name")) != source_name:
+            continue
+        page = meta.get("page")
+        if (first_page is not None or last_page is not None) and page is None:
+            continue
+        if (first_page is not None and page < first_page) or (last_page is not None and page > last_page):
+            continue
+        ordinal = meta.get("ordinal", meta.get("chunk_index", 0))
+        chunks.append({"text": meta.get("text", ""), "page": page, "ordinal": ordinal})
+    chunks.sort(key=lambda c: c["ordinal"])
+    return chunks
+
+
+async def aget_document_chunks(
+    source_name: str, team_id: str | None = None, first_page: int | None = None, last_page: int | None = None
+) -> list[dict]:
+    """
+    A whole document (or pages first_page..last_page) as ordered
+    `{"text", "page", "ordinal"}` chunks: one indexed registry query for the
+    team, falling back to `document_chunks_from_index`.
+    """
+    if team_id:
+        from agents.sub_agents.knowledge_base.registry import document_chunks
+        from db.base import get_sessionmaker
+
+        try:
+            async with get_sessionmaker()() as db:
+                chunks = await document_chunks(db, team_id, source_name, first_page, last_page)
+        except RuntimeError:  # DATABASE_URL not set
+            chunks = None
+        if chunks is not None:
+            return chunks
+    return await asyncio.to_thread(document_chunks_from_index, source_name, team_id, first_page, last_page)
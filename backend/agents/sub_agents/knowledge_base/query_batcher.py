@@ -0,0 +1,155 @@
+"""
+Micro-batching for query embeddings.
+
+Every knowledge-base search (and response-cache lookup) embeds one short
+query. Under concurrent chat load those are hundreds of single-row forward
+passes competing for the same CPU, each paying the full per-call overhead.
+`QueryEmbeddingBatcher` collects queries arriving within KB_QUERY_BATCH_MAX_WAIT_MS
+(default 5 ms), runs one batched `encode` on a worker thread (at most
+KB_QUERY_BATCH_MAX_SIZE rows, default 32), and resolves each caller's future
+with its own vector. While one batch is encoding, new arrivals queue up and
+go out as the next batch as soon as it finishes, so batches grow with load
+instead of queuing single-row calls.
+
+Batch-size and queue-latency metrics: `query_batcher_stats()` /
+GET /knowledge-base/embedding-stats.
+"""
+
+import asyncio
+import os
+import time
+import weakref
+from collections import deque
+from typing import Callable
+
+import numpy as np
+
+MAX_BATCH_SIZE = int(os.environ.get("KB_QUERY_BATCH_MAX_SIZE", "32"))
+MAX_WAIT_MS = float(os.environ.get("KB_QUERY_BATCH_MAX_WAIT_MS", "5"))
+
+
+class QueryEmbeddingBatcher:
+    """Coalesces concurrent `embed(text)` calls on one event loop into batched encodes."""
+
+    def __init__(
+        self,
+        encode: Callable[[list[str]], np.ndarray],
+        max_batch_size: int = MAX_BATCH_SIZE,
+        max_wait_ms: float = MAX_WAIT_MS,
+    ):
+        self._encode = encode
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._pending: list[tuple[str, asyncio.Future, float]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._encoding = False
+        # Metrics
+        self.batches = 0
+        self.queries = 0
+        self._batch_sizes: deque = deque(maxlen=1000)
+        self._queue_ms: deque = deque(maxlen=1000)
+        self._encode_ms: deque = deque(maxlen=1000)
+
+    async def embed(self, text: str) -> list[float]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future, time.monotonic()))
+        if not self._encoding:
+            if len(self._pending) >= self.max_batch_size:
+                self._flush()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._encoding or not self._pending:
+            return
+        batch = self._pending[: self.max_batch_size]
+        del self._pending[: self.max_batch_size]
+        self._encoding = True
+        asyncio.get_running_loop().create_task(self._run(batch))
+
+    async def _run(self, batch: list[tuple[str, asyncio.Future, float]]) -> None:
+        started = time.monotonic()
+        unique = list(dict.fromkeys(text for text, _, _ in batch))  # identical queries encode once
+        try:
+            vectors = await asyncio.to_thread(self._encode, unique)
+        except Exception as exc:  # noqa: BLE001 — every waiter gets the failure
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(exc)
+        else:
+            by_text = {text: vectors[i].tolist() for i, text in enumerate(unique)}
+            for text, future, _ in batch:
+                if not future.done():
+                    future.set_result(by_text[text])
+        finally:
+            self.batches += 1
+            self.queries += len(batch)
+            self._batch_sizes.append(len(batch))
+            self._queue_ms.extend(1000 * (started - enqueued) for _, _, enqueued in batch)
+            self._encode_ms.append(1000 * (time.monotonic() - started))
+            self._encoding = False
+            # Whatever arrived during the encode has already waited long enough.
+            self._flush()
+
+    def stats(self) -> dict:
+        def summary(values: deque) -> dict[str, float]:
+            if not values:
+                return {"avg": 0.0, "p95": 0.0, "max": 0.0}
+            ordered = sorted(values)
+            return {
+                "avg": sum(ordered) / len(ordered),
+                "p95": ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))],
+                "max": ordered[-1],
+            }
+
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "queries": self.queries,
+            "pending": len(self._pending),
+            "batch_size": summary(self._batch_sizes),
+            "queue_ms": summary(self._queue_ms),
+            "encode_ms": summary(self._encode_ms),
+        }
+
+
+# One batcher per event loop and embedding model — futures and timers are
+# loop-bound (the API and a Celery worker each run one loop; tests create a
+# fresh loop per test), and a re-embed migration briefly has two models.
+_batchers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, QueryEmbeddingBatcher]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _query_encoder(model_name: str) -> Callable[[list[str]], np.ndarray]:
+    def encode(texts: list[str]) -> np.ndarray:
+        from agents.sub_agents.knowledge_base.pinecone_vector_store import _get_model
+
+        model = _get_model(model_name)
+        return np.asarray(model.encode(texts, batch_size=len(texts), normalize_embeddings=True), dtype=np.float32)
+
+    return encode
+
+
+def get_query_batcher(model_name: str | None = None) -> QueryEmbeddingBatcher:
+    """This loop's batcher for `model_name` (default: the active embedding version's model)."""
+    if model_name is None:
+        from agents.sub_agents.knowledge_base.embedding_versions import active_version
+
+        model_name = active_version().model_name
+    batchers = _batchers.setdefault(asyncio.get_running_loop(), {})
+    batcher = batchers.get(model_name)
+    if batcher is None:
+        batcher = batchers[model_name] = QueryEmbeddingBatcher(_query_encoder(model_name))
+    return batcher
+
+
+def query_batcher_stats() -> dict:
+    merged = [b.stats() for batchers in _batchers.values() for b in batchers.values()]
+    return merged[0] if len(merged) == 1 else {"loops": merged}
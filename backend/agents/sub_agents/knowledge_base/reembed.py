@@ -0,0 +1,270 @@
+"""
+Re-embed the knowledge base with a new embedding model, without downtime.
+
+  python -m agents.sub_agents.knowledge_base.reembed start --model BAAI/bge-small-en-v1.5 --dim 384
+  python -m agents.sub_agents.knowledge_base.reembed resume     # after an interruption or error
+  python -m agents.sub_agents.knowledge_base.reembed status
+  python -m agents.sub_agents.knowledge_base.reembed abort
+
+`start` registers a "building" embedding version (see embedding_versions.py)
+and runs the migration in this process:
+  1. settle — wait one KB_EMBED_VERSION_REFRESH_SECONDS interval, so every
+     API and worker process is dual-writing uploads to the new index before
+     the copy starts;
+  2. copy — namespace by namespace, read the stored chunks from the active
+     index, re-embed their text with the new model KB_REEMBED_BATCH_SIZE at
+     a time, and upsert them into the new index, at most
+     KB_REEMBED_MAX_CHUNKS_PER_SECOND (0 = unthrottled);
+  3. reconcile — per namespace, delete from the new index any chunk the old
+     index no longer has (a re-upload removed it mid-copy), and re-embed any
+     chunk it is missing. The namespace is then recorded as done, so
+     `resume` skips it;
+  4. cut over — one transaction makes the new version active. Every process
+     moves its queries to it within one refresh interval.
+
+Searches keep hitting the active index until the cut-over. Progress is
+recorded on the kb_embedding_versions row: chunks re-embedded, namespaces
+done and a percentage. `status` and GET /knowledge-base/embedding-stats show
+it. Run this with the API's environment (DATABASE_URL, VECTOR_STORE_BACKEND,
+Pinecone or local index settings).
+
+With VECTOR_STORE_BACKEND=local, this process and the API/worker processes
+all write the "<KB_LOCAL_INDEX_DIR>-v<N>" directory: the dual-writes and the
+copy. local_vector_store.py serializes those writes with a file lock, and
+every process picks up the rows the others appended before it reads. The
+API therefore serves the copied chunks after the cut-over without a
+restart. KB_LOCAL_INDEX_DIR must be on a filesystem that every process
+mounts and that supports flock(2); a local disk does.
+"""
+
+import argparse
+import asyncio
+import itertools
+import logging
+import os
+import time
+from datetime import datetime, timezone
+
+from agents.sub_agents.knowledge_base import embedding_versions as versions
+from agents.sub_agents.knowledge_base import pinecone_vector_store as store
+from agents.sub_agents.knowledge_base.vector_store import VectorStore
+
+logger = logging.getLogger("reembed")
+
+REEMBED_BATCH_SIZE = int(os.environ.get("KB_REEMBED_BATCH_SIZE", "256"))
+REEMBED_MAX_CHUNKS_PER_SECOND = float(os.environ.get("KB_REEMBED_MAX_CHUNKS_PER_SECOND", "0"))
+# A runner that hasn't reported progress for this long is presumed dead; `resume` may take over.
+REEMBED_STALE_SECONDS = float(os.environ.get("KB_REEMBED_STALE_SECONDS", "300"))
+
+# Share of the progress bar for the copy; reconcile and cut-over take the rest.
+_COPY_PROGRESS = 95
+
+
+class _Throttle:
+    """Sleeps so that no more than `per_second` chunks are processed per second (0 = no limit)."""
+
+    def __init__(self, per_second: float):
+        self.per_second = per_second
+        self._started = time.monotonic()
+        self._count = 0
+
+    async def wait(self, chunks: int) -> None:
+        if self.per_second <= 0:
+            return
+        self._count += chunks
+        delay = self._started + self._count / self.per_second - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def _next_batch(iterator, size: int) -> list[dict]:
+    return list(itertools.islice(iterator, size))
+
+
+def reembed_vectors(vectors: list[dict], target: versions.EmbeddingVersion, namespace: str | None) -> tuple[int, int]:
+    """
+    Re-embed stored vectors' chunk text with the target model and upsert them
+    into its index. Returns (stored, skipped); vectors without text in their
+    metadata can't be re-embedded and are skipped.
+    """
+    with_text = [v for v in vectors if (v.get("metadata") or {}).get("text")]
+    if with_text:
+        embeddings = store._embed_documents([v["metadata"]["text"] for v in with_text], target)
+        store.get_vector_store(target).upsert(
+            [
+                {"id": v["id"], "values": embedding.tolist(), "metadata": v["metadata"]}
+                for v, embedding in zip(with_text, embeddings)
+            ],
+            namespace=namespace,
+        )
+    return len(with_text), len(vectors) - len(with_text)
+
+
+def reconcile_namespace(
+    source: VectorStore, target: versions.EmbeddingVersion, namespace: str | None, batch_size: int
+) -> tuple[int, int]:
+    """
+    Make the target namespace hold exactly the source's chunks. Returns
+    (deleted, restored).
+
+    Target IDs are read before source IDs. Dual-writes reach the source
+    first, so a chunk that is mid-write can't look like an extra one and be
+    deleted.
+    """
+    target_store = store.get_vector_store(target)
+    target_ids = set(target_store.iter_ids(namespace))
+    source_ids = set(source.iter_ids(namespace))
+
+    extra = list(target_ids - source_ids)
+    if extra:
+        target_store.delete(extra, namespace=namespace)
+    missing = source_ids - target_ids
+    restored = 0
+    if missing:
+        pending = (v for v in source.iter_vectors(namespace) if v["id"] in missing)
+        while batch := _next_batch(pending, batch_size):
+            restored += reembed_vectors(batch, target, namespace)[0]
+    return len(extra), restored
+
+
+async def run_migration(
+    version: int,
+    batch_size: int = REEMBED_BATCH_SIZE,
+    max_chunks_per_second: float = REEMBED_MAX_CHUNKS_PER_SECOND,
+) -> None:
+    """Claim the building `version` and run (or resume) its migration through to the cut-over."""
+    from db.base import get_sessionmaker
+
+    sessionmaker = get_sessionmaker()
+    async with sessionmaker() as db:
+        row = await versions.claim_version(db, version, stale_after=REEMBED_STALE_SECONDS)
+    if row is None:
+        raise RuntimeError(f"Embedding version {version} is not being built, or another runner is working on it.")
+
+    async def report(**values) -> None:
+        async with sessionmaker() as progress_db:
+            await versions.update_version(progress_db, version, **values)
+
+    try:
+        await versions.refresh_versions(force=True)
+        target = versions.EmbeddingVersion(row.version, row.model_name, row.dim)
+        source = store.get_vector_store(versions.active_version())
+        logger.info(f"Re-embedding into version {version} ({row.model_name}, dim={row.dim})")
+
+        settle = versions.REFRESH_SECONDS + 5 - (datetime.now(timezone.utc) - row.created_at).total_seconds()
+        if settle > 0:
+            logger.info(f"Waiting {settle:.0f}s for every process to start dual-writing")
+            await asyncio.sleep(settle)
+
+        sizes = await asyncio.to_thread(source.namespace_sizes)
+        done = list(row.completed_namespaces or [])
+        total = sum(sizes.values())
+        migrated = sum(sizes.get(ns, 0) for ns in done)  # a partly copied namespace starts over
+        skipped = row.skipped_chunks
+        await report(total_chunks=total, migrated_chunks=migrated)
+        throttle = _Throttle(max_chunks_per_second)
+
+        for namespace in sorted((ns for ns in sizes if ns not in done), key=lambda ns: ns or ""):
+            vectors = await asyncio.to_thread(source.iter_vectors, namespace)
+            namespace_skipped = 0
+            while batch := await asyncio.to_thread(_next_batch, vectors, batch_size):
+                stored, skipped_now = await asyncio.to_thread(reembed_vectors, batch, target, namespace)
+                migrated += stored + skipped_now
+                namespace_skipped += skipped_now
+                await report(
+                    migrated_chunks=migrated,
+                    progress=_COPY_PROGRESS * migrated // max(total, 1),
+                )
+                await throttle.wait(len(batch))
+
+            deleted, restored = await asyncio.to_thread(reconcile_namespace, source, target, namespace, batch_size)
+            done.append(namespace)
+            skipped += namespace_skipped
+            await report(completed_namespaces=list(done), skipped_chunks=skipped)
+            logger.info(
+                f"Namespace '{namespace or ''}' re-embedded "
+                f"({len(done)}/{len(sizes)}; reconciled: {deleted} deleted, {restored} restored)"
+            )
+
+        async with sessionmaker() as db:
+            await versions.cut_over(db, version)
+        await versions.refresh_versions(force=True)
+        logger.info(f"Cut over to embedding version {version} ({row.model_name}): {migrated} chunk(s), {skipped} skipped")
+    except BaseException as exc:
+        # Still "building" (dual-writes continue); `resume` picks up from the last finished namespace.
+        error = str(exc) or type(exc).__name__
+        logger.error(f"Re-embed of version {version} stopped: {error}", exc_info=isinstance(exc, Exception))
+        await report(claimed_at=None, error=error)
+        raise
+
+
+async def _start(args) -> None:
+    from db.base import get_sessionmaker, init_db
+
+    await init_db()
+    async with get_sessionmaker()() as db:
+        row = await versions.create_version(db, args.model, args.dim)
+    print(f"Created embedding version {row.version} ({row.model_name}, dim={row.dim})")
+    await run_migration(row.version, args.batch_size, args.max_chunks_per_second)
+
+
+async def _building_version() -> int:
+    from db.base import get_sessionmaker
+
+    async with get_sessionmaker()() as db:
+        rows = await versions.list_versions(db, statuses=("building",))
+    if not rows:
+        raise SystemExit("No embedding migration is in progress.")
+    return rows[0].version
+
+
+async def _resume(args) -> None:
+    await run_migration(await _building_version(), args.batch_size, args.max_chunks_per_second)
+
+
+async def _abort(args) -> None:
+    from db.base import get_sessionmaker
+
+    version = await _building_version()
+    async with get_sessionmaker()() as db:
+        await versions.fail_version(db, version, "aborted")
+    print(f"Aborted embedding version {version}; queries stay on the active version.")
+
+
+async def _status(args) -> None:
+    for row in await versions.version_status():
+        line = f"v{row['version']} {row['model_name']} (dim={row['dim']}): {row['status']}"
+        if row["status"] in ("building", "failed"):
+            line += (
+                f" — {row['progress']}%, {row['migrated_chunks']}/{row['total_chunks']} chunk(s), "
+                f"{row['completed_namespaces']} namespace(s) done"
+            )
+        if row["error"]:
+            line += f" — {row['error']}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    start = commands.add_parser("start", help="Register a new embedding model and migrate to it.")
+    start.add_argument("--model", required=True, help="SentenceTransformer model name.")
+    start.add_argument("--dim", type=int, required=True, help="The model's output dimension.")
+    resume = commands.add_parser("resume", help="Continue the migration in progress.")
+    for command in (start, resume):
+        command.add_argument("--batch-size", type=int, default=REEMBED_BATCH_SIZE)
+        command.add_argument("--max-chunks-per-second", type=float, default=REEMBED_MAX_CHUNKS_PER_SECOND)
+    commands.add_parser("status", help="Show embedding versions and migration progress.")
+    commands.add_parser("abort", help="Stop the migration in progress; the active version is unchanged.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    handlers = {"start": _start, "resume": _resume, "status": _status, "abort": _abort}
+    try:
+        asyncio.run(handlers[args.command](args))
+    except ValueError as exc:
+        raise SystemExit(str(exc))
+
+
+if __name__ == "__main__":
+    main()
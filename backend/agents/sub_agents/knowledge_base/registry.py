@@ -0,0 +1,158 @@
+"""
+Postgres-side registry of knowledge-base documents (kb_documents / kb_chunks).
+
+`aupsert_document_chunks(..., team_id=...)` records each upload here after
+its vectors are written, so listing a team's documents is one indexed query
+rather than paging through every vector in the index and fetching its
+metadata. Each chunk row holds its vector ID, which is what a delete or a
+replace-by-source needs.
+"""
+
+from __future__ import annotations
+
+import hashlib
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.models import KBChunk, KBDocument
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def document_hash(chunk_texts: list[str]) -> str:
+    digest = hashlib.sha256()
+    for text in chunk_texts:
+        digest.update(text_hash(text).encode("ascii"))
+    return digest.hexdigest()
+
+
+async def get_document(db: AsyncSession, team_id: str, source: str) -> KBDocument | None:
+    return await db.scalar(
+        select(KBDocument).where(KBDocument.team_id == team_id, KBDocument.source == source)
+    )
+
+
+async def chunk_ids(db: AsyncSession, document_id: str) -> list[str]:
+    rows = await db.scalars(
+        select(KBChunk.id).where(KBChunk.document_id == document_id).order_by(KBChunk.ordinal)
+    )
+    return list(rows)
+
+
+
+async def chunk_positions(db: AsyncSession, document_id: str) -> dict[str, tuple[int, int | None]]:
+    """The document's chunks as `{vector ID: (ordinal, page)}`."""
+    rows = await db.execute(
+        select(KBChunk.id, KBChunk.ordinal, KBChunk.page).where(KBChunk.document_id == document_id)
+    )
+    return {vid: (ordinal, page) for vid, ordinal, page in rows}
+
+async def record_document(
+    db: AsyncSession, team_id: str, user_id: str, source: str, vectors: list[dict]
+) -> list[str]:
+    """
+    Register (or replace) `source` for the team with its stored chunks
+    (`[{"id", "text", "metadata"?}, ...]` in document order). Returns the vector IDs of
+    the previous version that the new one no longer uses — the caller
+    deletes them from the vector store.
+    """
+    fields = {
+        "uploaded_by_user_id": user_id,
+        "content_hash": document_hash([v["text"] for v in vectors]),
+        "chunk_count": len(vectors),
+    }
+    document = await get_document(db, team_id, source)
+    replaced: list[str] = []
+    if document is None:
+        document = KBDocument(team_id=team_id, source=source, **fields)
+        db.add(document)
+        await db.flush()  # assigns document.id for the chunks below
+    else:
+        current = {v["id"] for v in vectors}
+        replaced = [vid for vid in await chunk_ids(db, document.id) if vid not in current]
+        await db.execute(delete(KBChunk).where(KBChunk.document_id == document.id))
+        for name, value in fields.items():
+            setattr(document, name, value)
+
+    db.add_all(
+        KBChunk(
+            id=v["id"],
+            document_id=document.id,
+            ordinal=i,
+            content_hash=text_hash(v["text"]),
+            page=(v.get("metadata") or {}).get("page"),
+            text=v["text"],
+        )
+        for i, v in enumerate(vectors)
+    )
+    await db.commit()
+    return replaced
+
+
+async def list_documents(db: AsyncSession, team_id: str) -> list[dict]:
+    """The team's documents as `list_all_sources()`-style dicts, plus hash and upload time."""
+    rows = await db.scalars(
+        select(KBDocument).where(KBDocument.team_id == team_id).order_by(KBDocument.source)
+    )
+    return [
+        {
+            "file_name": doc.source,
+            "count": doc.chunk_count,
+            "content_hash": doc.content_hash,
+            "uploaded_at": doc.updated_at.isoformat() if doc.updated_at else None,
+        }
+        for doc in rows
+    ]
+
+
+async def document_chunks(
+    db: AsyncSession, team_id: str, source: str, first_page: int | None = None, last_page: int | None = None
+) -> list[dict] | None:
+    """
+    The stored chunks of `source`, in document order, as `{"text", "page",
+    "ordinal"}` — optionally only pages first_page..last_page. None if the
+    document isn't registered (or predates stored chunk text).
+    """
+    document = await get_document(db, team_id, source)
+    if document is None:
+        return None
+    query = select(KBChunk).where(KBChunk.document_id == document.id).order_by(KBChunk.ordinal)
+    if first_page is not None:
+        query = query.where(KBChunk.page >= first_page)
+    if last_page is not None:
+        query = query.where(KBChunk.page <= last_page)
+    chunks = list(await db.scalars(query))
+    if any(chunk.text is None for chunk in chunks):
+        return None
+    return [{"text": chunk.text, "page": chunk.page, "ordinal": chunk.ordinal} for chunk in chunks]
+
+
+async def team_chunks(db: AsyncSession, team_id: str) -> list[dict]:
+    """
+    Every stored chunk of the team's documents as `{"text", "source",
+    "page", "ordinal"}` — the corpus of the team's BM25 index
+    (hybrid_search.py). Chunks registered before their text was stored are
+    left out.
+    """
+    rows = await db.execute(
+        select(KBDocument.source, KBChunk.text, KBChunk.page, KBChunk.ordinal)
+        .join(KBDocument, KBChunk.document_id == KBDocument.id)
+        .where(KBDocument.team_id == team_id, KBChunk.text.is_not(None))
+        .order_by(KBDocument.source, KBChunk.ordinal)
+    )
+    return [{"text": text, "source": source, "page": page, "ordinal": ordinal} for source, text, page, ordinal in rows]
+
+
+async def delete_document(db: AsyncSession, team_id: str, source: str) -> list[str]:
+    """Remove `source` from the registry; returns its vector IDs for the caller to delete."""
+    document = await get_document(db, team_id, source)
+    if document is None:
+        return []
+    ids = await chunk_ids(db, document.id)
+    await db.execute(delete(KBChunk).where(KBChunk.document_id == document.id))
+    await db.delete(document)
+    await db.commit()
+    return ids
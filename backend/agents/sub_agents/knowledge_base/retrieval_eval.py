@@ -0,0 +1,166 @@
+"""
+Retrieval evaluation on a fixture corpus: recall@k and the prompt tokens a
+search sends to the LLM, for vector-only, hybrid (vector + BM25 fused by
+reciprocal rank) and, with --rerank, hybrid + cross-encoder retrieval.
+
+The corpus is a set of short decks and memos from several companies that
+deliberately look alike: every deck has an MRR, a retention figure, a round
+size and a team slide. Each query is answerable from exactly one passage,
+and most hinge on an exact name or figure. Those are the queries where
+embedding similarity alone picks a neighbour.
+
+"Tokens" is the approximate word-piece count (extraction.count_tokens) of
+the passages a search returns at top_k, formatted the way
+search_knowledge_base formats them. The reduction compares each method at the
+smallest top_k that matches vector-only recall@6 (the tool default) with
+vector-only at top_k=6. search_knowledge_base keeps top_k=6 until this has
+been run with the production embedding model; lower it to the matching_k
+reported here.
+
+Chunks are indexed into a throwaway local vector store; the embedding model
+(and, with --rerank, the cross-encoder) are the real ones.
+
+Run with: python -m agents.sub_agents.knowledge_base.retrieval_eval [--rerank]
+"""
+
+import argparse
+import tempfile
+from unittest.mock import patch
+
+from agents.sub_agents.knowledge_base import hybrid_search
+from agents.sub_agents.knowledge_base import pinecone_vector_store as store
+
+BASELINE_TOP_K = 6
+EVAL_TEAM = "retrieval-eval"  # searches are team-scoped, so the fixture corpus lives in a team namespace
+
+# (source, passage key, text)
+CORPUS = [
+    ("Lumora deck", "lumora-problem", "Problem: dental clinics lose about 20% of recall appointments because reminders are manual."),
+    ("Lumora deck", "lumora-traction", "Traction: Lumora reached $38K MRR in March, growing 14% month over month across 112 clinics."),
+    ("Lumora deck", "lumora-retention", "Net revenue retention is 118% and logo churn is under 2% per month."),
+    ("Lumora deck", "lumora-ask", "The ask: a $2.5M seed round to extend runway to 22 months and hire two senior engineers."),
+    ("Lumora deck", "lumora-team", "Team: Priya Raman (CEO) ran growth at Dentrix; Tomas Berg (CTO) built billing at Stripe."),
+    ("Lumora deck", "lumora-competition", "Competitors Weave and Solutionreach sell broad patient messaging; Lumora automates recall only."),
+    ("Fernway deck", "fernway-problem", "Problem: mid-market finance teams spend six weeks onboarding a new ERP reconciliation workflow."),
+    ("Fernway deck", "fernway-traction", "Traction: Fernway has $61K MRR, up 9% month over month, with 27 paying customers."),
+    ("Fernway deck", "fernway-retention", "Net revenue retention sits at 104%; expansion comes from additional entities per customer."),
+    ("Fernway deck", "fernway-ask", "We are raising a $4M seed extension to reach $150K MRR and break-even by Q3 2027."),
+    ("Fernway deck", "fernway-team", "Team: Dana Okafor (CEO), former controller at Brex; Luis Ortega (CTO), ex-Plaid data platform."),
+    ("Fernway deck", "fernway-unit", "Customer acquisition cost is $1,150 with a payback period of 7 months on annual contracts."),
+    ("Quillstack deck", "quill-problem", "Problem: legal teams redline the same vendor contracts every quarter with no reusable playbook."),
+    ("Quillstack deck", "quill-traction", "Traction: Quillstack closed 9 enterprise pilots and converted 6 to paid, at $24K ARR each."),
+    ("Quillstack deck", "quill-margin", "Gross margin is 78% today and should exceed 82% once inference moves to reserved capacity."),
+    ("Quillstack deck", "quill-ask", "Quillstack is raising a $6M Series A led by a legal-tech specialist fund."),
+    ("Quillstack deck", "quill-team", "Team: Mei Tanaka (CEO) was general counsel at Asana; Omar Haddad (CTO) led NLP at Ironclad."),
+    ("Investor memo", "memo-nrr", "Seed investors in vertical SaaS expect net revenue retention above 110% before a Series A."),
+    ("Investor memo", "memo-burn", "A burn multiple under 1.5x is considered efficient; above 3x raises questions in diligence."),
+    ("Investor memo", "memo-runway", "Founders should raise enough to reach 18 to 24 months of runway after the round closes."),
+    ("Investor memo", "memo-tam", "Top-down TAM claims are discounted; investors prefer bottom-up sizing from customer counts."),
+    ("Market report", "market-dental", "There are roughly 135,000 dental practices in the United States, 60% of them independent."),
+    ("Market report", "market-finance", "About 40,000 North American companies have 200 to 2,000 employees and a dedicated finance team."),
+    ("Market report", "market-legal", "Enterprise legal operations spend grew 11% in 2025, led by contract lifecycle tooling."),
+]
+
+# (query, relevant passage key)
+QUERIES = [
+    ("What is Lumora's MRR?", "lumora-traction"),
+    ("Fernway monthly recurring revenue", "fernway-traction"),
+    ("Which company has 118% net revenue retention?", "lumora-retention"),
+    ("Fernway NRR", "fernway-retention"),
+    ("How much is Quillstack raising?", "quill-ask"),
+    ("$2.5M seed round use of funds", "lumora-ask"),
+    ("Who is Fernway's CTO?", "fernway-team"),
+    ("Mei Tanaka background", "quill-team"),
+    ("Who competes with Lumora?", "lumora-competition"),
+    ("What is the CAC and payback period?", "fernway-unit"),
+    ("Quillstack gross margin", "quill-margin"),
+    ("What NRR do seed investors expect before a Series A?", "memo-nrr"),
+    ("How many dental practices are in the US?", "market-dental"),
+    ("What burn multiple counts as efficient?", "memo-burn"),
+    ("Quillstack pilots converted to paid", "quill-traction"),
+    ("How many clinics use Lumora?", "lumora-traction"),
+]
+
+_KEY_BY_TEXT = {text: key for _, key, text in CORPUS}
+
+
+def _build_store(directory: str):
+    from agents.sub_agents.knowledge_base.local_vector_store import LocalVectorStore
+
+    local = LocalVectorStore(directory, store.EMBEDDING_DIM)
+    embeddings = store._embed_documents([text for _, _, text in CORPUS])
+    local.upsert([
+        {"id": key, "values": embedding.tolist(), "metadata": {"source": source, "text": text}}
+        for (source, key, text), embedding in zip(CORPUS, embeddings)
+    ], namespace=store._namespace(EVAL_TEAM))
+    return local
+
+
+def _rankings(mode: str, rerank: bool, max_k: int) -> dict[str, list[dict]]:
+    results = {}
+    with patch.object(hybrid_search, "RETRIEVAL_MODE", "vector" if mode == "vector" else "hybrid"), \
+            patch.object(hybrid_search, "RERANK_ENABLED", rerank):
+        for query, _ in QUERIES:
+            results[query] = store.query_vectors(query, top_k=max_k, team_id=EVAL_TEAM)
+    return results
+
+
+def _prompt_tokens(query: str, passages: list[dict]) -> int:
+    from agents.sub_agents.knowledge_base.tools import _format_results
+    from knowledge_base.extraction import count_tokens
+
+    return count_tokens(_format_results(query, passages))
+
+
+def evaluate(methods: list[tuple[str, str, bool]], ks: list[int]) -> dict:
+    max_k = max(ks + [BASELINE_TOP_K])
+    report = {}
+    with tempfile.TemporaryDirectory() as directory:
+        local = _build_store(directory)
+        hybrid_search.invalidate(store._namespace(EVAL_TEAM))
+        with patch.object(store, "get_vector_store", return_value=local):
+            for label, mode, rerank in methods:
+                ranked = _rankings(mode, rerank, max_k)
+                keys = {q: [_KEY_BY_TEXT.get(r["text"]) for r in results] for q, results in ranked.items()}
+                report[label] = {
+                    "recall": {
+                        k: sum(key in keys[q][:k] for q, key in QUERIES) / len(QUERIES) for k in range(1, max_k + 1)
+                    },
+                    "tokens": {
+                        k: sum(_prompt_tokens(q, ranked[q][:k]) for q, _ in QUERIES) / len(QUERIES)
+                        for k in range(1, max_k + 1)
+                    },
+                }
+
+    target = report["vector"]["recall"][BASELINE_TOP_K]
+    baseline_tokens = report["vector"]["tokens"][BASELINE_TOP_K]
+    for r in report.values():
+        k = next((k for k in range(1, max_k + 1) if r["recall"][k] >= target), max_k)
+        r["matching_k"] = k
+        r["matching_tokens"] = r["tokens"][k]
+        r["token_reduction"] = 1 - r["matching_tokens"] / baseline_tokens
+    return {"target_recall": target, "baseline_tokens": baseline_tokens, "methods": report}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rerank", action="store_true", help="Also evaluate hybrid + cross-encoder rerank.")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5])
+    args = parser.parse_args()
+
+    methods = [("vector", "vector", False), ("hybrid", "hybrid", False)]
+    if args.rerank:
+        methods.append(("hybrid+rerank", "hybrid", True))
+    result = evaluate(methods, args.k)
+
+    print(f"Corpus: {len(CORPUS)} passages, {len(QUERIES)} queries")
+    print(f"Baseline: vector top_k={BASELINE_TOP_K} — recall {result['target_recall']:.2f}, "
+          f"~{result['baseline_tokens']:.0f} prompt tokens per search")
+    for label, r in result["methods"].items():
+        recalls = "  ".join(f"R@{k}={r['recall'][k]:.2f}" for k in args.k)
+        print(f"{label:>14}: {recalls}  | top_k={r['matching_k']} reaches baseline recall: "
+              f"~{r['matching_tokens']:.0f} tokens ({-r['token_reduction']:+.0%} vs baseline)")
+
+
+if __name__ == "__main__":
+    main()
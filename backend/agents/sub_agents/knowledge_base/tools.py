@@ -1,11 +1,19 @@
 """
-Knowledge Base tools — search and list documents via Pinecone.
+Knowledge Base tools — search, list and read documents via Pinecone.
 """
 
+import asyncio
 import logging
+import os
+import re
 
 logger = logging.getLogger("knowledge_base_agent")
 
+# Longest document text get_document returns in one call (characters).
+DOCUMENT_MAX_CHARS = int(os.environ.get("KB_DOCUMENT_MAX_CHARS", "40000"))
+
+_PAGES_RE = re.compile(r"^\s*(\d+)\s*(?:-\s*(\d+)\s*)?$")
+
 
 def _query_vectors(query_text: str, top_k: int) -> list[dict]:
     from agents.sub_agents.knowledge_base.pinecone_vector_store import query_vectors
@@ -17,37 +25,38 @@ def _list_sources() -> list[dict]:
     return list_all_sources()
 
 
-def search_knowledge_base(query: str, top_k: int = 6) -> str:
-    """
-    Search the Pinecone knowledge base for passages relevant to the query.
-    Use this to answer questions about uploaded pitch-related documents, frameworks, or research.
+async def _alist_sources() -> list[dict]:
+    """The current team's documents from the registry; falls back to an index scan without a team or database."""
+    from core.request_context import current_team_id
 
-    Args:
-        query: The search query derived from the user's question.
-        top_k: Number of results to return (default 6, max 10).
-    """
-    if not query or not str(query).strip():
-        return "No search query provided. Please specify what you are looking for."
-    try:
-        from core.mlflow_tracking import log_metric, log_params, mlflow_is_active
+    team_id = current_team_id()
+    if team_id:
+        from agents.sub_agents.knowledge_base.pinecone_vector_store import list_team_sources
+        try:
+            return await list_team_sources(team_id)
+        except RuntimeError:  # DATABASE_URL not set
+            pass
+    return await asyncio.to_thread(_list_sources)
+
+
+async def _aquery_vectors(query_text: str, top_k: int) -> list[dict]:
+    from agents.sub_agents.knowledge_base.pinecone_vector_store import aquery_vectors
+    return await aquery_vectors(query_text, top_k=top_k)
+
+
+def _log_search_metrics(query: str, top_k: int, documents: list[dict]) -> None:
+    from core.mlflow_tracking import log_metric, log_params, mlflow_is_active
+
+    if mlflow_is_active():
+        log_params({"kb_query_length": len(str(query)), "kb_top_k": top_k})
+        log_metric("kb_results_count", len(documents))
+        if documents:
+            scores = [d.get("score") for d in documents if d.get("score") is not None]
+            if scores:
+                log_metric("kb_top_score", max(scores))
 
-        documents = _query_vectors(str(query).strip(), top_k=min(top_k, 10))
-        if mlflow_is_active():
-            log_params({"kb_query_length": len(str(query)), "kb_top_k": min(top_k, 10)})
-            log_metric("kb_results_count", len(documents))
-            if documents:
-                scores = [d.get("score") for d in documents if d.get("score") is not None]
-                if scores:
-                    log_metric("kb_top_score", max(scores))
-    except RuntimeError as e:
-        return (
-            "Knowledge base (Pinecone) is not available. "
-            "Please ensure PINECONE_API_KEY and PINECONE_INDEX are set."
-        )
-    except Exception as e:
-        logger.exception("Knowledge base search failed")
-        return f"Search failed: {str(e)}."
 
+def _format_results(query: str, documents: list[dict]) -> str:
     if not documents:
         return (
             f'No relevant passages found for: "{query}". '
@@ -66,6 +75,49 @@ def search_knowledge_base(query: str, top_k: int = 6) -> str:
     return "\n\n---\n\n".join(parts)
 
 
+_UNAVAILABLE = (
+    "Knowledge base (Pinecone) is not available. "
+    "Please ensure PINECONE_API_KEY and PINECONE_INDEX are set."
+)
+
+
+def search_knowledge_base(query: str, top_k: int = 6) -> str:
+    """
+    Search the knowledge base for passages relevant to the query (semantic + exact-term match).
+    Use this to answer questions about uploaded pitch-related documents, frameworks, or research.
+
+    Args:
+        query: The search query derived from the user's question.
+        top_k: Number of results to return (default 6, max 10).
+    """
+    if not query or not str(query).strip():
+        return "No search query provided. Please specify what you are looking for."
+    try:
+        documents = _query_vectors(str(query).strip(), top_k=min(top_k, 10))
+        _log_search_metrics(query, min(top_k, 10), documents)
+    except RuntimeError:
+        return _UNAVAILABLE
+    except Exception as e:
+        logger.exception("Knowledge base search failed")
+        return f"Search failed: {str(e)}."
+    return _format_results(query, documents)
+
+
+async def asearch_knowledge_base(query: str, top_k: int = 6) -> str:
+    """Async `search_knowledge_base` — the query embedding goes through the shared micro-batcher."""
+    if not query or not str(query).strip():
+        return "No search query provided. Please specify what you are looking for."
+    try:
+        documents = await _aquery_vectors(str(query).strip(), top_k=min(top_k, 10))
+        _log_search_metrics(query, min(top_k, 10), documents)
+    except RuntimeError:
+        return _UNAVAILABLE
+    except Exception as e:
+        logger.exception("Knowledge base search failed")
+        return f"Search failed: {str(e)}."
+    return _format_results(query, documents)
+
+
 def list_uploaded_documents() -> str:
     """
     List all documents currently stored in the Pinecone knowledge base.
@@ -78,7 +130,22 @@ def list_uploaded_documents() -> str:
     except Exception as e:
         logger.exception("List sources failed")
         return f"Could not list documents: {str(e)}."
+    return _format_sources(sources)
+
+
+async def alist_uploaded_documents() -> str:
+    """Async `list_uploaded_documents` — reads the team's document registry instead of scanning the index."""
+    try:
+        sources = await _alist_sources()
+    except RuntimeError:
+        return "Knowledge base is not available. No documents are loaded."
+    except Exception as e:
+        logger.exception("List sources failed")
+        return f"Could not list documents: {str(e)}."
+    return _format_sources(sources)
+
 
+def _format_sources(sources: list[dict]) -> str:
     if not sources:
         return "No documents have been uploaded to the knowledge base yet."
 
@@ -88,3 +155,121 @@ def list_uploaded_documents() -> str:
         count = s.get("count", 0)
         lines.append(f"- {name} ({count} chunks)")
     return "Uploaded documents:\n" + "\n".join(lines)
+
+
+def parse_pages(pages: str) -> tuple[int | None, int | None]:
+    """'' -> whole document, '5' -> page 5, '3-7' -> pages 3 to 7. Raises ValueError otherwise."""
+    if not pages or not str(pages).strip():
+        return None, None
+    match = _PAGES_RE.match(str(pages))
+    if not match:
+        raise ValueError(f"Invalid page range: {pages!r}. Use e.g. '5' or '3-7'.")
+    first = int(match.group(1))
+    last = int(match.group(2)) if match.group(2) else first
+    if first < 1 or last < first:
+        raise ValueError(f"Invalid page range: {pages!r}.")
+    return first, last
+
+
+def _without_overlap(previous: str, text: str) -> str:
+    """Drop the leading sentences `text` repeats from the end of `previous` (chunks overlap by ~30 tokens)."""
+    for cut in range(min(len(text), len(previous)), 0, -1):
+        at_sentence_end = text[cut - 1] in ".!?" and (cut == len(text) or text[cut] == " ")
+        if at_sentence_end and previous.endswith(text[:cut]):
+            return text[cut:].lstrip()
+    return text
+
+
+def _format_document(source: str, chunks: list[dict]) -> str:
+    parts: list[str] = []
+    size = 0
+    page = previous = None
+    for chunk in chunks:
+        text = _without_overlap(previous, chunk["text"]) if previous and chunk["page"] == page else chunk["text"]
+        previous = chunk["text"]
+        if not text.strip():
+            continue
+        if chunk["page"] is not None and chunk["page"] != page:
+            text = f"\n## Page {chunk['page']}\n{text}"
+        page = chunk["page"]
+        if size + len(text) > DOCUMENT_MAX_CHARS:
+            parts.append(
+                f"\n[Truncated at {DOCUMENT_MAX_CHARS} characters — call get_document again with a page range "
+                f"starting at page {page} for the rest.]" if page is not None else
+                f"\n[Truncated at {DOCUMENT_MAX_CHARS} characters.]"
+            )
+            break
+        parts.append(text)
+        size += len(text)
+    return f"Document: {source}\n" + "\n".join(parts)
+
+
+def _document_result(source: str, pages: str, chunks: list[dict]) -> str:
+    if not chunks:
+        where = f" (pages {pages})" if pages and str(pages).strip() else ""
+        return (
+            f'No content found for document "{source}"{where}. '
+            "Call list_uploaded_documents to see the exact document names."
+        )
+    return _format_document(source, chunks)
+
+
+def _source_names(source: str) -> list[str]:
+    """The name as given, then without a .pdf/.docx extension (uploads are stored under the bare name)."""
+    source = str(source or "").strip()
+    stem, ext = os.path.splitext(source)
+    return [source, stem] if ext.lower() in (".pdf", ".docx") and stem else [source]
+
+
+def get_document(source: str, pages: str = "") -> str:
+    """
+    Read a whole uploaded document — or a page range — in its original order, in one call.
+    Use this to review a pitch deck instead of running many searches.
+
+    Args:
+        source: The document name, as shown by list_uploaded_documents.
+        pages: Optional page range, e.g. "5" or "3-7". Empty reads the whole document.
+    """
+    from agents.sub_agents.knowledge_base.pinecone_vector_store import document_chunks_from_index
+
+    if not source or not str(source).strip():
+        return "No document name provided. Call list_uploaded_documents to see what is available."
+    try:
+        first, last = parse_pages(pages)
+        chunks = []
+        for name in _source_names(source):
+            chunks = document_chunks_from_index(name, first_page=first, last_page=last)
+            if chunks:
+                break
+    except ValueError as e:
+        return str(e)
+    except RuntimeError:
+        return _UNAVAILABLE
+    except Exception as e:
+        logger.exception("Get document failed")
+        return f"Could not read document: {str(e)}."
+    return _document_result(name, pages, chunks)
+
+
+async def aget_document(source: str, pages: str = "") -> str:
+    """Async `get_document` — one ordered query against the team's document registry."""
+    from agents.sub_agents.knowledge_base.pinecone_vector_store import aget_document_chunks
+    from core.request_context import current_team_id
+
+    if not source or not str(source).strip():
+        return "No document name provided. Call list_uploaded_documents to see what is available."
+    try:
+        first, last = parse_pages(pages)
+        chunks = []
+        for name in _source_names(source):
+            chunks = await aget_document_chunks(name, current_team_id(), first_page=first, last_page=last)
+            if chunks:
+                break
+    except ValueError as e:
+        return str(e)
+    except RuntimeError:
+        return _UNAVAILABLE
+    except Exception as e:
+        logger.exception("Get document failed")
+        return f"Could not read document: {str(e)}."
+    return _document_result(name, pages, chunks)
@@ -0,0 +1,64 @@
+"""
+Vector store interface for the knowledge base.
+
+`pinecone_vector_store` embeds text and routes every read and write through
+`get_vector_store()`, which returns one of:
+  - PineconeVectorStore (pinecone_vector_store.py) — the hosted index, default;
+  - LocalVectorStore (local_vector_store.py) — an in-process index persisted
+    to memory-mapped files, for small single-team deployments, offline dev
+    and tests.
+
+Selected by VECTOR_STORE_BACKEND ("pinecone" | "local"); each embedding
+version has its own store (see embedding_versions.py).
+"""
+
+from abc import ABC, abstractmethod
+from typing import Any, Iterator
+
+
+class VectorStore(ABC):
+    """
+    Where chunk vectors live. Vectors are L2-normalized, so scores are cosine
+    similarities. `namespace` None means the backend's default namespace.
+    """
+
+    name: str = "base"
+
+    @abstractmethod
+    def upsert(self, vectors: list[dict[str, Any]], namespace: str | None = None) -> None:
+        """Insert or replace `[{"id", "values", "metadata"}, ...]`."""
+
+    @abstractmethod
+    def query(
+        self,
+        vector: list[float],
+        top_k: int,
+        filter: dict | None = None,
+        namespace: str | None = None,
+    ) -> list[dict[str, Any]]:
+        """Best matches first: `[{"id", "score", "metadata"}, ...]`. `filter` uses Pinecone's syntax."""
+
+    @abstractmethod
+    def delete(self, ids: list[str], namespace: str | None = None) -> None:
+        """Remove vectors by ID; unknown IDs are ignored."""
+
+    @abstractmethod
+    def update_metadata(self, updates: list[dict[str, Any]], namespace: str | None = None) -> None:
+        """Merge `[{"id", "metadata"}, ...]` into the stored metadata, keeping the vectors; unknown IDs are ignored."""
+
+    @abstractmethod
+    def iter_metadata(self, namespace: str | None = None) -> Iterator[dict[str, Any]]:
+        """Metadata of every stored vector (for listing sources)."""
+
+    @abstractmethod
+    def iter_vectors(self, namespace: str | None = None) -> Iterator[dict[str, Any]]:
+        """Every stored vector as `{"id", "values", "metadata"}` (for migrations)."""
+
+    @abstractmethod
+    def namespace_sizes(self) -> dict[str | None, int]:
+        """Vector count per namespace (None = the default namespace)."""
+
+    def iter_ids(self, namespace: str | None = None) -> Iterator[str]:
+        """IDs of every stored vector (backends override this with something cheaper)."""
+        for vector in self.iter_vectors(namespace):
+            yield vector["id"]
@@ -3,7 +3,8 @@ Market Agent — validates TAM/SAM/SOM and competition; suggests GTM strategy an
 Combines market validation and market strategy in one agent to avoid conflicting tools.
 """
 
-from agents.langgraph_base import create_google_llm, wrap_tool_function, create_react_agent
+from agents.langgraph_base import wrap_tool_function, create_react_agent
+from agents.llm_registry import get_llm
 from agents.guardrails_langgraph import create_guardrail_callbacks
 from agents.sub_agents.market_validator import prompt
 from agents.sub_agents.market_validator.tools import (
@@ -23,7 +24,7 @@ AGENT_DESCRIPTION = (
 )
 
 # Create LLM
-model = create_google_llm(
+model = get_llm(
     model=config.agents.get_model_for_agent(AGENT_NAME),
     temperature=0.2,
     max_retries=2,
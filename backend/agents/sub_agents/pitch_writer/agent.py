@@ -3,7 +3,8 @@ Pitch Writer sub-agent — short elevator pitch and one-page executive summary (
 Core creative engine: takes enriched context and produces pitch content + PDF.
 """
 
-from agents.langgraph_base import create_google_llm, wrap_tool_function, create_react_agent
+from agents.langgraph_base import wrap_tool_function, create_react_agent
+from agents.llm_registry import get_llm
 from agents.guardrails_langgraph import create_guardrail_callbacks
 from agents.sub_agents.pitch_writer import prompt
 from agents.sub_agents.pitch_writer.tools import (
@@ -22,7 +23,7 @@ AGENT_DESCRIPTION = (
 )
 
 # Create LLM
-model = create_google_llm(
+model = get_llm(
     model=config.agents.get_model_for_agent(AGENT_NAME),
     temperature=0.5,
     max_retries=2,
@@ -2,7 +2,8 @@
 Valuation Advisor agent — estimates pre-money valuation ranges and negotiation guidance.
 """
 
-from agents.langgraph_base import create_google_llm, wrap_tool_function, create_react_agent
+from agents.langgraph_base import wrap_tool_function, create_react_agent
+from agents.llm_registry import get_llm
 from agents.guardrails_langgraph import create_guardrail_callbacks
 from agents.sub_agents.valuation_advisor import prompt
 from agents.sub_agents.valuation_advisor.tools import estimate_valuation
@@ -18,7 +19,7 @@ AGENT_DESCRIPTION = (
 )
 
 # Create LLM
-model = create_google_llm(
+model = get_llm(
     model=config.agents.get_model_for_agent(AGENT_NAME),
     temperature=0.2,
     max_retries=2,
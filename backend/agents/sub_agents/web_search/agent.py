@@ -9,7 +9,8 @@ module was previously named `brave_search_mcp`, which was doubly misleading
 (neither Brave Search nor MCP); renamed to `web_search` for clarity.
 """
 
-from agents.langgraph_base import create_google_llm, wrap_tool_function, create_react_agent
+from agents.langgraph_base import wrap_tool_function, create_react_agent
+from agents.llm_registry import get_llm
 from agents.guardrails_langgraph import create_guardrail_callbacks
 from agents.sub_agents.web_search import prompt
 from agents.sub_agents.web_search.tools import web_search, web_search_news
@@ -26,7 +27,7 @@ AGENT_DESCRIPTION = (
 )
 
 # Create LLM
-model = create_google_llm(
+model = get_llm(
     model=config.agents.get_model_for_agent(AGENT_NAME),
     temperature=0.2,
     max_retries=2,
@@ -5,8 +5,13 @@ Run with: python -m pytest backend/agents/test_migration.py
 
 import pytest
 import asyncio
+import time
+from typing import ClassVar
 from unittest.mock import AsyncMock, Mock, patch
+from langchain_core.language_models import BaseChatModel
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
 from langchain_core.messages import HumanMessage, AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
 
 
 class TestLangGraphBase:
@@ -35,6 +40,21 @@ class TestLangGraphBase:
         assert "sample tool" in wrapped_tool.description.lower()
 
 
+class TestLLMRegistry:
+    """Test the shared client registry."""
+
+    def test_clients_and_structured_runnables_are_memoized(self):
+        from pydantic import BaseModel
+        from agents.llm_registry import get_llm, get_structured_llm
+
+        class _Schema(BaseModel):
+            answer: str
+
+        assert get_llm("gemini-3.5-flash", 0.3) is get_llm("gemini-3.5-flash", 0.3)
+        assert get_llm("gemini-3.5-flash", 0.3) is not get_llm("gemini-3.5-flash", 0.5)
+        assert get_structured_llm(_Schema, "gemini-3.5-flash") is get_structured_llm(_Schema, "gemini-3.5-flash")
+
+
 class TestSubAgents:
     """Test that sub-agents are properly initialized."""
     
@@ -126,6 +146,1112 @@ class TestRunner:
         assert mock_agent.ainvoke.called
 
 
+class _FakeToolModel(GenericFakeChatModel):
+    """Scripted chat model that accepts bind_tools (GenericFakeChatModel doesn't)."""
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+
+class TestStreaming:
+    """Test the SSE streaming path (langgraph_runner.stream_agent)."""
+
+    def test_stream_cleaner_matches_clean_response(self):
+        """Incremental cleaning yields the same paragraphs as _clean_response."""
+        from agents.langgraph_runner import _StreamCleaner, _clean_response
+
+        text = "/*REASONING*/ pick a tool\n\nHere is your answer.\n\nSecond para /FINAL_ANSWER/ done."
+        cleaner = _StreamCleaner()
+        out = "".join(cleaner.feed(text[i:i + 4]) for i in range(0, len(text), 4)) + cleaner.flush()
+        assert out == _clean_response(text)
+
+    @pytest.mark.asyncio
+    async def test_stream_agent_emits_tokens_then_final(self):
+        """Orchestrator tokens stream before the final cleaned response."""
+        from agents.langgraph_base import create_react_agent
+        from agents.langgraph_runner import stream_agent
+
+        model = _FakeToolModel(messages=iter([AIMessage(content="Hello founder, here is the plan.")]))
+        agent = create_react_agent(model=model, tools=[], system_prompt="test", agent_name="test_agent")
+
+        events = [e async for e in stream_agent(agent, "u", "session-1", "hi", agent_name="test_agent")]
+        kinds = [e["event"] for e in events]
+        assert "token" in kinds
+        assert kinds[-1] == "final"
+        assert events[-1]["response"] == "Hello founder, here is the plan."
+        assert "".join(e["text"] for e in events if e["event"] == "token") == events[-1]["response"]
+        assert events[-1]["answered"] is True
+
+    @pytest.mark.asyncio
+    async def test_blocked_and_empty_turns_are_not_flagged_as_answers(self, monkeypatch):
+        from agents import langgraph_runner
+        from agents.langgraph_base import create_react_agent
+        from agents.langgraph_runner import run_agent_reply, stream_agent
+
+        model = _FakeToolModel(messages=iter([AIMessage(content="")]))
+        agent = create_react_agent(model=model, tools=[], system_prompt="test", agent_name="test_agent")
+        reply = await run_agent_reply(agent, "u", "session-2", "hi", agent_name="test_agent")
+        assert (reply.response, reply.answered) == (langgraph_runner.NO_FINAL_RESPONSE, False)
+
+        monkeypatch.setattr(langgraph_runner, "find_blocked_keyword", lambda query: "forbidden")
+        monkeypatch.setattr(langgraph_runner, "_track_blocked", AsyncMock())
+        assert not (await run_agent_reply(agent, "u", "session-3", "forbidden", agent_name="test_agent")).answered
+        events = [e async for e in stream_agent(agent, "u", "session-3", "forbidden", agent_name="test_agent")]
+        assert events[-1]["event"] == "final" and events[-1]["answered"] is False
+
+
+class _SlowModel(BaseChatModel):
+    """Chat model with a fixed, awaitable latency — stands in for a Gemini round-trip."""
+
+    latency: float = 0.3
+    in_flight: ClassVar[int] = 0  # _agenerate calls currently awaiting
+    max_in_flight: ClassVar[int] = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "slow-fake"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="done"))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        cls = type(self)
+        cls.in_flight += 1
+        cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            cls.in_flight -= 1
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="done"))])
+
+
+@pytest.mark.asyncio
+class TestAsyncAgentNode:
+    """The react agent's model node must await the LLM rather than block the loop."""
+
+    async def test_concurrent_chats_overlap(self):
+        """Simultaneous chats have their model calls in flight at the same time, not one after another."""
+        from agents.langgraph_base import create_react_agent
+        from agents.langgraph_runner import run_agent
+
+        model = _SlowModel(latency=0.3)
+        _SlowModel.in_flight = _SlowModel.max_in_flight = 0
+        agent = create_react_agent(model=model, tools=[], system_prompt="test", agent_name="test_agent")
+        n = 8
+
+        responses = await asyncio.gather(*(
+            run_agent(agent, user_id="u", session_id=f"s{i}", query="hi", agent_name="test_agent")
+            for i in range(n)
+        ))
+
+        assert responses == ["done"] * n
+        assert _SlowModel.max_in_flight > 1, "model calls ran one at a time"
+
+
+class _FakeMCPSlot:
+    """Stands in for a warm MCP server session in MCPSessionPool tests."""
+
+    def __init__(self, tools=None):
+        self.alive = True
+        self.stopped = False
+        self.tools = tools or {}
+
+    async def stop(self):
+        self.stopped = True
+        self.alive = False
+
+
+@pytest.mark.asyncio
+class TestMCPSessionPool:
+    """Test lease/return/recycle of pooled MCP sessions."""
+
+    def _pool(self, *slots):
+        from agents.mcp_integration import MCPSessionPool
+
+        pool = MCPSessionPool("test", "npx", [], size=len(slots), healthcheck_interval=0.01)
+        fresh = []
+
+        async def new_slot():
+            slot = _FakeMCPSlot()
+            fresh.append(slot)
+            pool._slots.add(slot)
+            return slot
+
+        pool._new_slot = new_slot
+        for slot in slots:
+            pool._slots.add(slot)
+            pool._idle.put_nowait(slot)
+        return pool, fresh
+
+    async def test_tool_errors_and_cancellation_return_the_session(self):
+        from langchain_core.tools import ToolException
+
+        slot = _FakeMCPSlot()
+        pool, fresh = self._pool(slot)
+        with pytest.raises(ToolException):
+            async with pool.lease():
+                raise ToolException("isError result")
+
+        async def hang():
+            async with pool.lease():
+                await asyncio.sleep(10)
+
+        for _ in range(3):  # more cancellations than the pool has sessions
+            task = asyncio.create_task(hang())
+            await asyncio.sleep(0)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+        async with pool.lease() as leased:
+            assert leased is slot
+        assert fresh == [] and not slot.stopped
+
+    async def test_transport_errors_and_dead_sessions_are_replaced(self):
+        dead, healthy = _FakeMCPSlot(), _FakeMCPSlot()
+        dead.alive = False
+        pool, fresh = self._pool(dead, healthy)
+
+        with pytest.raises(BrokenPipeError):
+            async with pool.lease() as leased:
+                assert leased is healthy  # the dead session was skipped
+                raise BrokenPipeError("server exited")
+        await asyncio.sleep(0.05)
+        assert dead.stopped and healthy.stopped and len(fresh) == 2
+        assert pool._idle.qsize() == 2 and not pool._tasks
+
+    async def test_proxy_tools_return_mcp_errors_to_the_model(self):
+        from langchain_core.tools import StructuredTool, ToolException
+
+        async def draw(shape: str) -> str:
+            raise ToolException(f"unknown shape {shape}")
+
+        template = StructuredTool.from_function(
+            coroutine=draw, name="draw", description="Draw a shape.", handle_tool_error=lambda e: f"Error: {e}"
+        )
+        pool, _ = self._pool(_FakeMCPSlot({"draw": template}))
+        (proxy,) = pool.tools()
+        assert await proxy.ainvoke({"shape": "hexagon"}) == "Error: unknown shape hexagon"
+
+    async def test_lease_times_out_when_no_session_comes_back(self):
+        from langchain_core.tools import StructuredTool
+        from agents.mcp_integration import MCPLeaseTimeout
+
+        async def draw(shape: str) -> str:
+            return shape
+
+        template = StructuredTool.from_function(coroutine=draw, name="draw", description="Draw a shape.")
+        pool, _ = self._pool(_FakeMCPSlot({"draw": template}))
+        pool._lease_timeout = 0.05
+        pool._idle.get_nowait()  # the only session is gone (its server never restarts)
+
+        with pytest.raises(MCPLeaseTimeout):
+            async with pool.lease():
+                pass
+        (proxy,) = pool.tools()
+        assert "unavailable" in await proxy.ainvoke({"shape": "hexagon"})
+
+
+def _keyword_encode(texts):
+    """Stands in for MiniLM in `intent_router._encode`: one axis per keyword, plus a constant one."""
+    import numpy as np
+
+    vectors = np.array([[t.lower().count("market"), t.lower().count("investor"), 0.1] for t in texts], dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class TestIntentRouter:
+    """Test the nearest-centroid pre-router and when the runner consults it."""
+
+    _EXAMPLES = {"market_agent": ["market size", "my market"], "investor_agent": ["investor email", "an investor"]}
+
+    def test_routes_confident_queries_and_abstains_otherwise(self, monkeypatch):
+        from agents import intent_router
+
+        monkeypatch.setattr(intent_router, "_encode", _keyword_encode)
+        router = intent_router.IntentRouter(self._EXAMPLES, min_score=0.5, min_margin=0.07)
+
+        assert router.route("Validate my market").agent_name == "market_agent"
+        assert router.route("Email an investor").agent_name == "investor_agent"
+        assert router.route("Hi").agent_name is None  # below min_score
+        assert router.route("Tell investors about my market").agent_name is None  # below min_margin
+        assert router.route("Validate my market", allowed={"investor_agent"}).agent_name is None
+
+    @pytest.mark.asyncio
+    async def test_follow_up_turns_skip_the_pre_router(self, monkeypatch):
+        from langgraph.checkpoint.memory import MemorySaver
+        from agents import agent_runner, intent_router
+        from agents.langgraph_base import create_react_agent
+        from agents.langgraph_runner import append_turn_to_thread
+
+        monkeypatch.setenv("INTENT_ROUTER_ENABLED", "true")
+        monkeypatch.setattr(intent_router, "_encode", _keyword_encode)
+        monkeypatch.setattr(intent_router, "get_intent_router", lambda: intent_router.IntentRouter(self._EXAMPLES))
+        monkeypatch.setattr("agents.agent.SUB_AGENT_SPECS", [
+            {"name": name, "get_agent": lambda name=name: name} for name in self._EXAMPLES
+        ])
+        orchestrator = create_react_agent(
+            model=_FakeToolModel(messages=iter([])), tools=[], system_prompt="t", checkpointer=MemorySaver()
+        )
+
+        assert await agent_runner._preroute("Validate my market", orchestrator, "u", "s") == ("market_agent", "market_agent")
+        await append_turn_to_thread(orchestrator, "u", "s", "pitchmate_agent", "Validate my market", "Looks big.")
+        assert await agent_runner._preroute("Email an investor", orchestrator, "u", "s") is None
+
+
+class TestResponseCache:
+    """Test the semantic response cache."""
+
+    def test_best_match_picks_most_similar(self):
+        from agents.response_cache import best_match
+
+        assert best_match([1.0, 0.0], []) == (-1, 0.0)
+        idx, sim = best_match([1.0, 0.0], [[0.0, 1.0], [0.8, 0.6]])
+        assert idx == 1
+        assert sim == pytest.approx(0.8)
+
+    def test_context_fingerprint_changes_with_profile(self):
+        from agents.response_cache import context_fingerprint
+
+        assert context_fingerprint("# Acme", "") == context_fingerprint("# Acme", "")
+        assert context_fingerprint("# Acme", "") != context_fingerprint("# Acme v2", "")
+        assert context_fingerprint("# Acme", "") != context_fingerprint("# Acme", "notes")
+
+    @pytest.mark.asyncio
+    async def test_entries_only_match_their_embedding_version(self, sqlite_db, monkeypatch):
+        from agents import response_cache
+        from agents.sub_agents.knowledge_base import embedding_versions
+        from agents.sub_agents.knowledge_base.embedding_versions import EmbeddingVersion
+
+        async def _embed_query(query):
+            version = embedding_versions.active_version()
+            return [1.0] + [0.0] * (version.dim - 1), version.version
+
+        monkeypatch.setattr(response_cache, "_embed_query", _embed_query)
+        monkeypatch.setattr(embedding_versions, "_active", EmbeddingVersion(1, "small", 2))
+        miss = await response_cache.lookup(sqlite_db, "t1", "agent", "p", "Who invests at seed?")
+        assert miss.response is None
+        await response_cache.store(
+            sqlite_db, "t1", "agent", "p", "Who invests at seed?", miss.embedding, "Fintech angels.", miss.embedding_version
+        )
+        hit = await response_cache.lookup(sqlite_db, "t1", "agent", "p", "Who invests at seed?")
+        assert hit.response == "Fintech angels."
+
+        # After a cut-over to a wider model the old rows are skipped, not compared (a shape error).
+        monkeypatch.setattr(embedding_versions, "_active", EmbeddingVersion(2, "large", 3))
+        probe = await response_cache.lookup(sqlite_db, "t1", "agent", "p", "Who invests at seed?")
+        assert probe.response is None and probe.embedding_version == 2
+
+    @pytest.mark.asyncio
+    async def test_thread_history_detection(self):
+        from langgraph.checkpoint.memory import MemorySaver
+        from agents.langgraph_base import create_react_agent
+        from agents.langgraph_runner import append_turn_to_thread, thread_has_history
+
+        agent = create_react_agent(
+            model=_FakeToolModel(messages=iter([])), tools=[], system_prompt="t", checkpointer=MemorySaver()
+        )
+        assert not await thread_has_history(agent, "u", "s", "test_agent")
+        await append_turn_to_thread(agent, "u", "s", "test_agent", "q", "cached answer")
+        assert await thread_has_history(agent, "u", "s", "test_agent")
+
+
+class TestEphemeralContext:
+    """Profile/session context reaches the prompt but not the checkpoint."""
+
+    @pytest.mark.asyncio
+    async def test_context_is_not_persisted(self):
+        from langgraph.checkpoint.memory import MemorySaver
+        from agents.langgraph_base import create_react_agent
+        from agents.langgraph_runner import _state_config, run_agent
+
+        seen = []
+
+        class _Recording(_FakeToolModel):
+            def _generate(self, messages, *args, **kwargs):
+                seen.append(messages)
+                return super()._generate(messages, *args, **kwargs)
+
+        model = _Recording(messages=iter([AIMessage(content="ok")]))
+        agent = create_react_agent(model=model, tools=[], system_prompt="sys {{braces}}", checkpointer=MemorySaver())
+        await run_agent(agent, "u", "s", "question", "test_agent", context="# Acme {profile}")
+
+        assert seen[0][0].content == "sys {braces}\n\n# Acme {profile}"
+        stored = (await agent.aget_state(_state_config("u", "s"))).values["messages"]
+        assert [m.content for m in stored] == ["question", "ok"]
+        checkpoints = [c async for c in agent.checkpointer.alist(None)]
+        assert checkpoints and not any("Acme" in repr(c.metadata) for c in checkpoints)
+        assert all("context" not in c.metadata for c in checkpoints)
+
+    def test_migration_strips_legacy_prefix(self):
+        from agents.migrate_thread_context import strip_legacy_context
+
+        messages = [
+            HumanMessage(content="# Acme\n\n---\n## User Question\nWho invests?", id="h1"),
+            AIMessage(content="Seed funds.", id="a1"),
+            HumanMessage(content="plain follow-up", id="h2"),
+        ]
+        fixed = strip_legacy_context(messages)
+        assert [(m.id, m.content) for m in fixed] == [("h1", "Who invests?")]
+
+
+class TestHistoryCompaction:
+    """Test rolling summarization of long threads."""
+
+    def test_split_never_orphans_tool_pairs(self):
+        from langchain_core.messages import ToolMessage
+        from agents.history_compaction import split_for_compaction
+
+        messages = [
+            HumanMessage(content="q1", id="1"),
+            AIMessage(content="", id="2", tool_calls=[{"name": "t", "args": {}, "id": "c1"}]),
+            ToolMessage(content="r1", tool_call_id="c1", id="3"),
+            AIMessage(content="a1", id="4"),
+            HumanMessage(content="q2", id="5"),
+            AIMessage(content="", id="6", tool_calls=[{"name": "t", "args": {}, "id": "c2"}]),
+            ToolMessage(content="r2", tool_call_id="c2", id="7"),
+            AIMessage(content="a2", id="8"),
+        ]
+        older, kept = split_for_compaction(messages, keep_last_turns=1)
+        assert [m.id for m in older] == ["1", "2", "3", "4"]
+        assert [m.id for m in kept] == ["5", "6", "7", "8"]
+        assert split_for_compaction(messages, keep_last_turns=2) == ([], messages)
+
+    def test_turn_in_progress_does_not_count_toward_kept_turns(self):
+        from agents.history_compaction import split_for_compaction
+
+        messages = [
+            HumanMessage(content="q1", id="1"),
+            AIMessage(content="a1", id="2"),
+            HumanMessage(content="q2", id="3"),
+            AIMessage(content="a2", id="4"),
+            HumanMessage(content="q3", id="5"),
+        ]
+        older, kept = split_for_compaction(messages, keep_last_turns=1)
+        assert [m.id for m in older] == ["1", "2"]
+        assert [m.id for m in kept] == ["3", "4", "5"]
+        assert split_for_compaction(messages, keep_last_turns=0) == (older, kept)
+
+    @pytest.mark.asyncio
+    async def test_long_thread_is_summarized(self):
+        from langgraph.checkpoint.memory import MemorySaver
+        from agents.history_compaction import SUMMARY_MESSAGE_ID, CompactionPolicy
+        from agents.langgraph_base import create_react_agent
+        from agents.langgraph_runner import _state_config, append_turn_to_thread, run_agent
+
+        model = _FakeToolModel(messages=iter([AIMessage(content="- founder builds Acme"), AIMessage(content="answer")]))
+        agent = create_react_agent(
+            model=model,
+            tools=[],
+            system_prompt="t",
+            checkpointer=MemorySaver(),
+            compaction=CompactionPolicy(max_messages=6, keep_last_turns=1),
+        )
+        for i in range(3):
+            await append_turn_to_thread(agent, "u", "s", "test_agent", f"q{i}", f"a{i}")
+
+        assert await run_agent(agent, "u", "s", "latest", "test_agent") == "answer"
+
+        messages = (await agent.aget_state(_state_config("u", "s"))).values["messages"]
+        assert messages[0].id == SUMMARY_MESSAGE_ID
+        assert "founder builds Acme" in messages[0].content
+        assert [m.content for m in messages[1:]] == ["q2", "a2", "latest", "answer"]
+
+
+class TestAdmission:
+    """Test the Gemini admission controller's scheduling and backoff parsing."""
+
+    async def _grant_order(self, gate, requests):
+        order = []
+
+        async def one(team, lane):
+            await gate.acquire(team, lane)
+            order.append((team, lane))
+
+        tasks = []
+        for team, lane in requests:
+            tasks.append(asyncio.create_task(one(team, lane)))
+            await asyncio.sleep(0)  # enqueue in submission order
+        await asyncio.gather(*tasks)
+        return order
+
+    @pytest.mark.asyncio
+    async def test_teams_share_capacity_fairly(self):
+        from agents.admission import ModelGate
+
+        gate = ModelGate("test-model", rpm=6000, burst_seconds=0.01)  # 100/s, no burst
+        flood = [("team-a", "background")] * 6 + [("team-b", "background")] * 2
+        order = [team for team, _ in await self._grant_order(gate, flood)]
+
+        # team-b arrived last but interleaves with team-a instead of waiting out the flood.
+        assert order[:5].count("team-b") == 2
+
+    @pytest.mark.asyncio
+    async def test_interactive_lane_goes_first(self):
+        from agents.admission import ModelGate
+
+        gate = ModelGate("test-model", rpm=6000, burst_seconds=0.01)
+        requests = [("t", "background")] * 5 + [("t", "interactive")] * 2
+        order = [lane for _, lane in await self._grant_order(gate, requests)]
+
+        assert order[:4].count("interactive") == 2
+        assert gate.stats()["queue_depth"] == {"interactive": 0, "background": 0}
+
+    def test_retry_after_from_gemini_error(self):
+        from google.genai.errors import ClientError
+        from agents.admission import _backoff_for, retry_after_seconds
+
+        error = ClientError(429, {"error": {"code": 429, "status": "RESOURCE_EXHAUSTED", "details": [
+            {"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": "17s"},
+        ]}})
+        try:
+            try:
+                raise error
+            except ClientError as exc:
+                raise RuntimeError("Error calling model") from exc
+        except RuntimeError as wrapped:
+            assert retry_after_seconds(wrapped) == 17.0
+            delay, pause_gate = _backoff_for(wrapped, attempt=0)
+            assert pause_gate and 17.0 <= delay <= 17.0 * 1.25
+        assert _backoff_for(ValueError("bad schema"), attempt=0) is None
+
+
+class TestBackgroundJobs:
+    """Test job submission validation and artifact discovery."""
+
+    def test_dashboard_submission_is_validated(self):
+        from jobs.tasks import validate_submission
+
+        params = validate_submission("dashboard", "market", {"tam": "$5B", "sam": "$1B", "som": "$50M", "description": "CRM"})
+        assert params["tam"] == "$5B"
+        with pytest.raises(ValueError):
+            validate_submission("dashboard", "market", {"tam": "$5B"})
+        with pytest.raises(ValueError):
+            validate_submission("dashboard", "not_a_module", {})
+
+    def test_artifacts_only_link_existing_files(self, tmp_path, monkeypatch):
+        from jobs.tasks import artifacts_in
+
+        monkeypatch.setenv("ARTIFACTS_ROOT_DIR", str(tmp_path))
+        (tmp_path / "deck_Acme_20260101.pdf").write_bytes(b"%PDF")
+        text = "Deck PDF created. Download: deck_Acme_20260101.pdf (see also missing.pdf)"
+        assert artifacts_in(text) == [
+            {"filename": "deck_Acme_20260101.pdf", "download_url": "/agents/artifacts/download/deck_Acme_20260101.pdf"}
+        ]
+
+
+class TestKnowledgeBaseIngest:
+    """Test batched embedding and size-bounded upserts in the KB ingest path."""
+
+    def test_chunks_are_embedded_in_one_batch_and_upserted_in_bounded_requests(self, monkeypatch):
+        import numpy as np
+        from agents.sub_agents.knowledge_base import pinecone_vector_store as store
+
+        encode_calls, upserts = [], []
+
+        class _Model:
+            def encode(self, texts, **kwargs):
+                encode_calls.append(len(texts))
+                return np.ones((len(texts), store.EMBEDDING_DIM), dtype=np.float32)
+
+        class _Index:
+            def upsert(self, vectors, namespace=None):
+                upserts.append(len(vectors))
+
+        monkeypatch.setattr(store, "_get_model", lambda *_: _Model())
+        monkeypatch.setattr(store, "_get_index", lambda *_: _Index())
+        monkeypatch.setattr(store, "_get_embedding_cache", lambda *_: None)
+        monkeypatch.setattr(store, "UPSERT_BATCH_SIZE", 40)
+
+        chunks = [{"text": f"chunk {i}"} for i in range(100)] + [{"text": "  "}]
+        assert store.upsert_document_chunks(chunks, "deck") == 100
+        assert encode_calls == [100]
+        assert sorted(upserts) == [20, 40, 40]
+
+    def test_reupload_overwrites_instead_of_duplicating(self, tmp_path, monkeypatch):
+        import numpy as np
+        from agents.sub_agents.knowledge_base import pinecone_vector_store as store
+        from agents.sub_agents.knowledge_base.local_vector_store import LocalVectorStore
+
+        class _Model:
+            def encode(self, texts, **kwargs):
+                return np.ones((len(texts), store.EMBEDDING_DIM), dtype=np.float32)
+
+        local = LocalVectorStore(str(tmp_path), store.EMBEDDING_DIM)
+        monkeypatch.setattr(store, "_get_model", lambda *_: _Model())
+        monkeypatch.setattr(store, "_get_embedding_cache", lambda *_: None)
+        monkeypatch.setattr(store, "get_vector_store", lambda *_: local)
+
+        chunks = [{"text": "Problem: dentists lose 20% of bookings."}, {"text": "Ask: $2M seed."}]
+        assert store.upsert_document_chunks(chunks + chunks[:1], "deck", team_id="t1") == 2
+        store.upsert_document_chunks(chunks, "deck", team_id="t1")
+        assert store.list_all_sources(team_id="t1") == [{"file_name": "deck", "count": 2}]
+        assert store.chunk_id("t1", "deck", "Ask: $2M seed.") != store.chunk_id("t2", "deck", "Ask: $2M seed.")
+
+    @pytest.mark.asyncio
+    async def test_batched_upsert_resumes_after_last_completed_batch(self, monkeypatch):
+        from agents.sub_agents.knowledge_base import pinecone_vector_store as store
+
+        stored, progress = [], []
+        monkeypatch.setattr(store, "_store_chunks", lambda items, team_id: stored.append([i["text"] for i in items]))
+
+        async def on_batch(done, total):
+            progress.append((done, total))
+
+        chunks = [{"text": f"slide {i}"} for i in range(10)]
+        assert await store.aupsert_document_chunks(chunks, "deck", batch_size=4, start_batch=1, on_batch=on_batch) == 10
+        assert stored == [["slide 4", "slide 5", "slide 6", "slide 7"], ["slide 8", "slide 9"]]
+        assert progress == [(2, 3), (3, 3)]
+
+
+class _SyncSession:
+    """AsyncSession's API over a sync SQLite Session, so registry.py runs here without Postgres."""
+
+    def __init__(self, session):
+        self._session = session
+
+    async def scalar(self, statement):
+        return self._session.scalar(statement)
+
+    async def scalars(self, statement):
+        return self._session.scalars(statement)
+
+    async def execute(self, statement):
+        return self._session.execute(statement)
+
+    def add(self, instance):
+        self._session.add(instance)
+
+    def add_all(self, instances):
+        self._session.add_all(instances)
+
+    async def flush(self):
+        self._session.flush()
+
+    async def commit(self):
+        self._session.commit()
+
+    async def delete(self, instance):
+        self._session.delete(instance)
+
+
+@pytest.fixture
+def sqlite_db():
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+    from db.models import AgentResponseCache, Base, KBChunk, KBDocument
+
+    engine = create_engine("sqlite://")
+    tables = [KBDocument.__table__, KBChunk.__table__, AgentResponseCache.__table__]
+    Base.metadata.create_all(engine, tables=tables)
+    with Session(engine) as session:
+        yield _SyncSession(session)
+
+
+class TestDocumentRegistry:
+    """Test the kb_documents / kb_chunks registry and its backfill from the index."""
+
+    @pytest.mark.asyncio
+    async def test_record_list_replace_and_delete(self, sqlite_db):
+        from agents.sub_agents.knowledge_base import registry
+
+        deck = [{"id": "v1", "text": "Problem", "metadata": {"page": 1}}, {"id": "v2", "text": "Ask", "metadata": {"page": 2}}]
+        assert await registry.record_document(sqlite_db, "t1", "u1", "deck", deck) == []
+        await registry.record_document(sqlite_db, "t2", "u2", "memo", [{"id": "m1", "text": "MRR"}])
+        [listed] = await registry.list_documents(sqlite_db, "t1")
+        assert listed["file_name"] == "deck" and listed["count"] == 2
+        assert listed["content_hash"] == registry.document_hash(["Problem", "Ask"])
+
+        replaced = await registry.record_document(sqlite_db, "t1", "u1", "deck", [deck[0], {"id": "v3", "text": "Ask: $2M"}])
+        assert replaced == ["v2"]
+        assert [c["text"] for c in await registry.document_chunks(sqlite_db, "t1", "deck")] == ["Problem", "Ask: $2M"]
+        assert [c["text"] for c in await registry.team_chunks(sqlite_db, "t1")] == ["Problem", "Ask: $2M"]
+
+        assert await registry.delete_document(sqlite_db, "t1", "deck") == ["v1", "v3"]
+        assert await registry.list_documents(sqlite_db, "t1") == []
+        assert await registry.delete_document(sqlite_db, "t1", "deck") == []
+        assert [d["file_name"] for d in await registry.list_documents(sqlite_db, "t2")] == ["memo"]
+
+    @pytest.mark.asyncio
+    async def test_backfill_registers_legacy_sources_once(self, sqlite_db, tmp_path):
+        from agents.sub_agents.knowledge_base import registry
+        from agents.sub_agents.knowledge_base.backfill_registry import backfill_team, team_ids
+        from agents.sub_agents.knowledge_base.local_vector_store import LocalVectorStore
+        from agents.sub_agents.knowledge_base.pinecone_vector_store import _namespace
+
+        store = LocalVectorStore(str(tmp_path), 2)
+        store.upsert([
+            {"id": "b", "values": [1.0, 0.0], "metadata": {"source": "deck", "text": "Ask", "chunk_index": 1, "page": 2}},
+            {"id": "a", "values": [1.0, 0.0], "metadata": {"source": "deck", "text": "Problem", "chunk_index": 0}},
+        ], namespace=_namespace("t1"))
+        assert team_ids(store) == ["t1"]
+
+        assert await backfill_team(sqlite_db, store, "t1") == ["deck"]
+        assert await backfill_team(sqlite_db, store, "t1") == []
+        chunks = await registry.document_chunks(sqlite_db, "t1", "deck")
+        assert [(c["text"], c["page"]) for c in chunks] == [("Problem", None), ("Ask", 2)]
+
+    @pytest.mark.asyncio
+    async def test_reupload_rewrites_metadata_of_moved_chunks(self, sqlite_db, tmp_path, monkeypatch):
+        import numpy as np
+        from agents.sub_agents.knowledge_base import pinecone_vector_store as store
+        from agents.sub_agents.knowledge_base.local_vector_store import LocalVectorStore
+
+        class _Model:
+            def encode(self, texts, **kwargs):
+                return np.ones((len(texts), store.EMBEDDING_DIM), dtype=np.float32)
+
+        class _Session:
+            async def __aenter__(self):
+                return sqlite_db
+
+            async def __aexit__(self, *exc):
+                return False
+
+        local = LocalVectorStore(str(tmp_path), store.EMBEDDING_DIM)
+        monkeypatch.setattr(store, "_get_model", lambda *_: _Model())
+        monkeypatch.setattr(store, "_get_embedding_cache", lambda *_: None)
+        monkeypatch.setattr(store, "get_vector_store", lambda *_: local)
+        monkeypatch.setattr("db.base.get_sessionmaker", lambda: _Session)
+
+        problem = {"text": "Problem: dentists lose 20% of bookings.", "metadata": {"page": 1}}
+        ask = {"text": "Ask: $2M seed.", "metadata": {"page": 2}}
+        await store.aupsert_document_chunks([problem, ask], "deck", team_id="t1")
+        traction = {"text": "Traction: 40 clinics.", "metadata": {"page": 2}}
+        moved_ask = {"text": ask["text"], "metadata": {"page": 3}}
+        await store.aupsert_document_chunks([problem, traction, moved_ask], "deck", team_id="t1")
+
+        reopened = LocalVectorStore(str(tmp_path), store.EMBEDDING_DIM)  # replays the update from the log
+        by_text = {m["text"]: m for m in reopened.iter_metadata(store._namespace("t1"))}
+        assert (by_text[ask["text"]]["page"], by_text[ask["text"]]["ordinal"]) == (3, 2)
+        assert (by_text[problem["text"]]["page"], by_text[problem["text"]]["ordinal"]) == (1, 0)
+
+
+class TestEmbeddingCache:
+    """Test the LRU + memory-mapped embedding cache."""
+
+    def test_hits_survive_restart_and_model_change_invalidates(self, tmp_path):
+        import numpy as np
+        from agents.sub_agents.knowledge_base.embedding_cache import EmbeddingCache
+
+        cache = EmbeddingCache("model-a", 4, str(tmp_path), memory_entries=1, disk_entries=8)
+        cache.put_many(["review my  pitch deck", "burn rate"], np.eye(4, dtype=np.float32)[:2])
+        assert cache.get("review my pitch deck").tolist() == [1.0, 0.0, 0.0, 0.0]  # whitespace-normalized, from disk
+        cache.flush()
+
+        reopened = EmbeddingCache("model-a", 4, str(tmp_path), memory_entries=1, disk_entries=8)
+        assert reopened.get("burn rate").tolist() == [0.0, 1.0, 0.0, 0.0]
+        assert reopened.get("unseen") is None
+        assert reopened.stats()["hits_disk"] == 1 and reopened.stats()["misses"] == 1
+
+        (tmp_path / "uploads").mkdir()  # not a cache directory: a shared KB_EMBED_CACHE_DIR must keep it
+        (tmp_path / "uploads" / "deck.pdf").write_bytes(b"%PDF")
+        other_model = EmbeddingCache("model-b", 4, str(tmp_path), disk_entries=8)
+        assert other_model.get("burn rate") is None
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["model-b-4", "uploads"]
+
+
+class TestQueryBatcher:
+    """Test coalescing of concurrent query embeddings."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_queries_share_one_encode(self):
+        import numpy as np
+        from agents.sub_agents.knowledge_base.query_batcher import QueryEmbeddingBatcher
+
+        calls = []
+
+        def encode(texts):
+            calls.append(list(texts))
+            return np.asarray([[float(len(t)), 1.0] for t in texts], dtype=np.float32)
+
+        batcher = QueryEmbeddingBatcher(encode, max_batch_size=8, max_wait_ms=20)
+        queries = ["a", "bb", "ccc", "bb"]
+        vectors = await asyncio.gather(*(batcher.embed(q) for q in queries))
+
+        assert vectors == [[1.0, 1.0], [2.0, 1.0], [3.0, 1.0], [2.0, 1.0]]
+        assert calls == [["a", "bb", "ccc"]]
+        stats = batcher.stats()
+        assert stats["batches"] == 1 and stats["batch_size"]["max"] == 4
+
+
+class TestEmbeddingSidecar:
+    """Test the shared embedding sidecar's protocol and cross-client batching."""
+
+    @pytest.mark.asyncio
+    async def test_clients_share_batched_encodes(self, tmp_path, monkeypatch):
+        import numpy as np
+        from agents.sub_agents.knowledge_base import pinecone_vector_store as store
+        from agents.sub_agents.knowledge_base.embedding_sidecar import EmbeddingSidecar, SidecarClient, SidecarModel
+
+        calls = []
+
+        class _Model:
+            def encode(self, texts, **kwargs):
+                calls.append(len(texts))
+                return np.asarray([[float(len(t)), 1.0] for t in texts], dtype=np.float32)
+
+        monkeypatch.setattr(store, "_load_model", lambda *_: _Model())
+        path = str(tmp_path / "embed.sock")
+        sidecar = EmbeddingSidecar(max_batch_size=16, max_wait_ms=20)
+        server = await asyncio.start_unix_server(sidecar.handle, path=path)
+        async with server:
+            model = SidecarModel("model-a", path)
+            single, batch = await asyncio.gather(
+                asyncio.to_thread(model.encode, "naïve"),
+                asyncio.to_thread(SidecarClient(path).embed, "model-a", ["a", "bb", "a"]),
+            )
+            stats = await asyncio.to_thread(model._client.stats)
+
+        assert single.tolist() == [5.0, 1.0]
+        assert batch.tolist() == [[1.0, 1.0], [2.0, 1.0], [1.0, 1.0]]
+        assert calls == [3]  # both clients' texts in one encode, duplicates once
+        assert stats["requests"] == 3 and stats["models"]["model-a"]["batches"] == 1
+
+
+class TestOnnxEmbedder:
+    """Test the ONNX backend's pooling of token embeddings."""
+
+    def test_pooling_ignores_padding(self):
+        import numpy as np
+        from agents.sub_agents.knowledge_base.onnx_embedder import _pool
+
+        tokens = np.array([[[1.0, 3.0], [3.0, 1.0], [9.0, 9.0]], [[2.0, 0.0], [4.0, 4.0], [6.0, 2.0]]], dtype=np.float32)
+        mask = np.array([[1, 1, 0], [1, 1, 1]])
+        assert _pool(tokens, mask, "mean").tolist() == [[2.0, 2.0], [4.0, 2.0]]
+        assert _pool(tokens, mask, "max").tolist() == [[3.0, 3.0], [6.0, 4.0]]
+        assert _pool(tokens, mask, "cls").tolist() == [[1.0, 3.0], [2.0, 0.0]]
+
+
+class TestLocalVectorStore:
+    """Test the in-process vector index backend."""
+
+    def test_filtered_query_persistence_and_sources(self, tmp_path):
+        from agents.sub_agents.knowledge_base.local_vector_store import LocalVectorStore
+
+        store = LocalVectorStore(str(tmp_path), 3)
+        store.upsert([
+            {"id": "a", "values": [1.0, 0.0, 0.0], "metadata": {"source": "deck", "page": 1}},
+            {"id": "b", "values": [0.8, 0.6, 0.0], "metadata": {"source": "deck", "page": 2}},
+            {"id": "c", "values": [0.0, 1.0, 0.0], "metadata": {"source": "memo", "page": 1}},
+        ])
+        assert [m["id"] for m in store.query([1.0, 0.0, 0.0], top_k=2)] == ["a", "b"]
+        assert [m["id"] for m in store.query([1.0, 0.0, 0.0], top_k=5, filter={"source": "memo"})] == ["c"]
+        assert [m["id"] for m in store.query([1.0, 0.0, 0.0], top_k=5, filter={"page": {"$gte": 2}})] == ["b"]
+
+        store.upsert([{"id": "a", "values": [0.0, 0.0, 1.0], "metadata": {"source": "memo"}}])
+        reopened = LocalVectorStore(str(tmp_path), 3)
+        top = reopened.query([0.0, 0.0, 1.0], top_k=1)[0]
+        assert top["id"] == "a" and top["metadata"] == {"source": "memo"}
+        assert sorted(m["source"] for m in reopened.iter_metadata()) == ["deck", "memo", "memo"]
+
+    def test_writers_sharing_a_directory_see_each_others_rows(self, tmp_path):
+        from agents.sub_agents.knowledge_base.local_vector_store import LocalVectorStore
+
+        api, worker = LocalVectorStore(str(tmp_path), 2), LocalVectorStore(str(tmp_path), 2)
+        api.query([1.0, 0.0], top_k=1)  # both open the namespace before either writes
+        worker.query([1.0, 0.0], top_k=1)
+        api.upsert([{"id": "a", "values": [1.0, 0.0], "metadata": {"source": "deck"}}])
+        worker.upsert([{"id": "b", "values": [0.0, 1.0], "metadata": {"source": "memo"}}])
+        worker.delete(["a"])
+
+        for store in (api, worker, LocalVectorStore(str(tmp_path), 2)):
+            assert [m["id"] for m in store.query([0.0, 1.0], top_k=5)] == ["b"]
+            assert [v["values"] for v in store.iter_vectors()] == [[0.0, 1.0]]
+
+
+class TestTeamPartitioning:
+    """Test per-team KB namespaces, the legacy-vector migration and team-scoped session context."""
+
+    def test_legacy_vectors_move_to_their_team_namespace(self, tmp_path):
+        from agents.sub_agents.knowledge_base.local_vector_store import LocalVectorStore
+        from agents.sub_agents.knowledge_base.migrate_team_namespaces import move_vectors
+        from agents.sub_agents.knowledge_base.pinecone_vector_store import _namespace
+
+        store = LocalVectorStore(str(tmp_path), 2)
+        store.upsert([
+            {"id": "a", "values": [1.0, 0.0], "metadata": {"source": "deck"}},
+            {"id": "b", "values": [0.0, 1.0], "metadata": {"source": "memo"}},
+            {"id": "c", "values": [1.0, 0.0], "metadata": {"source": "old"}},
+        ])
+        stats = move_vectors(store, None, {"a": "t1", "b": "t2"})
+        assert stats == {"teams": 2, "moved": 2, "unassigned": 1}
+        assert _namespace("t1") == "team-t1"
+        assert [m["id"] for m in store.query([1.0, 0.0], top_k=5, namespace="team-t1")] == ["a"]
+        assert [m["id"] for m in store.query([1.0, 0.0], top_k=5)] == ["c"]
+
+    def test_reads_without_a_team_fail_closed(self, tmp_path, monkeypatch):
+        from agents.sub_agents.knowledge_base import pinecone_vector_store as pvs
+        from agents.sub_agents.knowledge_base.local_vector_store import LocalVectorStore
+
+        store = LocalVectorStore(str(tmp_path), 2)
+        store.upsert([{"id": "legacy", "values": [1.0, 0.0], "metadata": {"source": "deck", "text": "Ask: $2M."}}])
+        monkeypatch.setattr(pvs, "get_vector_store", lambda *_: store)
+        monkeypatch.setattr(pvs, "_embed", lambda *_: [1.0, 0.0])
+
+        assert pvs.query_vectors("ask") == []
+        assert pvs.list_all_sources() == []
+        assert pvs.document_chunks_from_index("deck") == []
+        assert [r["text"] for r in pvs.query_vectors("ask", team_id="t1")] == []  # not the shared namespace either
+
+    def test_session_context_is_scoped_to_team(self):
+        from agents.session_context import get_session_context, set_session_context
+
+        set_session_context("team-a", "s1", "Acme: CRM for dentists")
+        assert get_session_context("team-a", "s1") == "Acme: CRM for dentists"
+        assert get_session_context("team-b", "s1") == ""
+
+
+class TestEmbeddingVersions:
+    """Test dual-writes during a re-embed migration and the copy + reconcile into the new index."""
+
+    def test_uploads_are_dual_written_and_reembed_reconciles(self, tmp_path, monkeypatch):
+        import numpy as np
+        from agents.sub_agents.knowledge_base import embedding_versions as versions
+        from agents.sub_agents.knowledge_base import pinecone_vector_store as store
+        from agents.sub_agents.knowledge_base.local_vector_store import LocalVectorStore
+        from agents.sub_agents.knowledge_base.reembed import reconcile_namespace, reembed_vectors
+
+        old, new = versions.DEFAULT_VERSION, versions.EmbeddingVersion(2, "model-b", 3)
+        stores = {1: LocalVectorStore(str(tmp_path / "v1"), old.dim), 2: LocalVectorStore(str(tmp_path / "v2"), 3)}
+        dims = {old.model_name: old.dim, "model-b": 3}
+        api_view = LocalVectorStore(str(tmp_path / "v2"), 3)  # an API process's handle on the new index
+        assert api_view.query([1.0, 0.0, 0.0], top_k=5, namespace=store._namespace("t1")) == []
+
+        class _Model:
+            def __init__(self, name):
+                self.dim = dims[name]
+
+            def encode(self, texts, **kwargs):
+                return np.ones((len(texts), self.dim), dtype=np.float32)
+
+        monkeypatch.setattr(store, "_get_model", lambda name=old.model_name: _Model(name))
+        monkeypatch.setattr(store, "_get_embedding_cache", lambda *_: None)
+        monkeypatch.setattr(store, "get_vector_store", lambda version=None: stores[(version or old).version])
+
+        store.upsert_document_chunks([{"text": "Ask: $2M seed."}], "deck", team_id="t1")
+        monkeypatch.setattr(versions, "_building", new)
+        store.upsert_document_chunks([{"text": "MRR is $38K."}], "memo", team_id="t1")
+        namespace = store._namespace("t1")
+        assert stores[1].namespace_sizes() == {namespace: 2}
+        assert stores[2].namespace_sizes() == {namespace: 1}  # only the upload made during the migration
+
+        stale = {"id": "gone", "values": [1.0, 0.0], "metadata": {"text": "Deleted mid-copy."}}
+        assert reembed_vectors([stale, {"id": "x", "values": [1.0, 0.0], "metadata": {}}], new, namespace) == (1, 1)
+        assert reconcile_namespace(stores[1], new, namespace, batch_size=1) == (1, 1)
+        assert sorted(stores[2].iter_ids(namespace)) == sorted(stores[1].iter_ids(namespace))
+        assert sorted(api_view.iter_ids(namespace)) == sorted(stores[1].iter_ids(namespace))
+
+
+class _FakeSession:
+    """Stands in for an AsyncSession from `get_sessionmaker()()` when the registry functions are stubbed."""
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class TestHybridSearch:
+    """Test BM25 + vector reciprocal-rank fusion."""
+
+    def test_exact_figures_are_fused_into_vector_results(self, tmp_path, monkeypatch):
+        from agents.sub_agents.knowledge_base import hybrid_search
+        from agents.sub_agents.knowledge_base import pinecone_vector_store as pvs
+        from agents.sub_agents.knowledge_base.local_vector_store import LocalVectorStore
+
+        store = LocalVectorStore(str(tmp_path), 2)
+        texts = {
+            "a": "Lumora reached $38K MRR, growing 14% month over month.",
+            "b": "Fernway has $61K MRR with 27 paying customers.",
+            "c": "Net revenue retention is 118%.",
+        }
+        store.upsert([{"id": k, "values": [1.0, 0.0], "metadata": {"source": "deck", "text": t}}
+                      for k, t in texts.items()])
+        monkeypatch.setattr(pvs, "get_vector_store", lambda *_: store)
+        hybrid_search.invalidate(None)
+
+        assert hybrid_search.tokenize("Raised $2.5M at 118% NRR") == ["raised", "2.5m", "118%", "nrr"]
+        lexical = hybrid_search._lexical_index(None).search("Fernway $61K MRR", top_k=5)
+        assert [r["text"] for r in lexical][:1] == [texts["b"]]
+
+        vector = [{"text": texts[k], "metadata": {"source": "deck"}, "score": 0.5} for k in ("c", "b", "a")]
+        fused = hybrid_search.combine("Fernway $61K MRR", vector, top_k=2, rerank_results=False)
+        assert [r["text"] for r in fused] == [texts["b"], texts["a"]]
+        assert all(0 < r["score"] <= 1 for r in fused)
+
+    @pytest.mark.asyncio
+    async def test_team_index_is_built_once_from_the_registry(self, monkeypatch):
+        from agents.sub_agents.knowledge_base import hybrid_search, registry
+        from agents.sub_agents.knowledge_base import pinecone_vector_store as pvs
+
+        reads = []
+
+        async def team_chunks(db, team_id):
+            reads.append(team_id)
+            await asyncio.sleep(0.01)
+            return [{"text": "Fernway has $61K MRR.", "source": "deck", "page": 2, "ordinal": 0}]
+
+        monkeypatch.setattr(registry, "team_chunks", team_chunks)
+        monkeypatch.setattr("db.base.get_sessionmaker", lambda: _FakeSession)
+        monkeypatch.setattr(pvs, "get_vector_store", lambda *_: pytest.fail("BM25 must not scan the vector store"))
+        hybrid_search.invalidate("team-t1")
+
+        first, second = await asyncio.gather(
+            hybrid_search.alexical_index("t1", "team-t1"), hybrid_search.alexical_index("t1", "team-t1")
+        )
+        assert first is second and reads == ["t1"]
+        [hit] = first.search("Fernway MRR", top_k=5)
+        assert hit["metadata"] == {"source": "deck", "page": 2, "ordinal": 0}
+        assert await hybrid_search.alexical_index("t1", "team-t1") is first and reads == ["t1"]
+
+
+class TestDocumentRetrieval:
+    """Test ordered full-document reads for the get_document tool."""
+
+    def test_document_reads_back_in_order_by_page(self, tmp_path, monkeypatch):
+        from agents.sub_agents.knowledge_base import pinecone_vector_store as pvs
+        from agents.sub_agents.knowledge_base.local_vector_store import LocalVectorStore
+        from agents.sub_agents.knowledge_base.tools import _format_document, parse_pages
+
+        store = LocalVectorStore(str(tmp_path), 2)
+        items = pvs._prepare_chunks([
+            {"text": "Problem: dentists lose 20% of bookings.", "metadata": {"page": 1}},
+            {"text": "Solution: automated recall. Pilot with 12 clinics.", "metadata": {"page": 2}},
+            {"text": "Pilot with 12 clinics. Ask: $2M seed.", "metadata": {"page": 2}},
+            {"text": "Team: ex-Stripe founders.", "metadata": {"page": 3}},
+        ], "deck", "t1")
+        team = pvs._namespace("t1")
+        store.upsert([{"id": i["id"], "values": [1.0, 0.0], "metadata": i["metadata"]} for i in reversed(items)], team)
+        store.upsert([{"id": "x", "values": [1.0, 0.0], "metadata": {"source": "memo", "text": "Other", "page": 2}}], team)
+        monkeypatch.setattr(pvs, "get_vector_store", lambda *_: store)
+
+        assert parse_pages("2-3") == (2, 3) and parse_pages("") == (None, None)
+        with pytest.raises(ValueError):
+            parse_pages("3-1")
+        assert pvs.document_chunks_from_index("deck") == []  # no team in scope: fail closed
+        chunks = pvs.document_chunks_from_index("deck", "t1", first_page=2, last_page=3)
+        assert [c["page"] for c in chunks] == [2, 2, 3]
+        assert _format_document("deck", chunks) == (
+            "Document: deck\n\n## Page 2\nSolution: automated recall. Pilot with 12 clinics.\n"
+            "Ask: $2M seed.\n\n## Page 3\nTeam: ex-Stripe founders."
+        )
+
+
+class TestDocumentChunking:
+    """Test structure-aware chunking of extracted documents."""
+
+    def test_chunks_respect_headings_pages_and_token_budget(self):
+        from knowledge_base.extraction import TextBlock, chunk_blocks, count_tokens, pdf_page_blocks
+
+        page = {"blocks": [
+            {"lines": [{"spans": [{"text": "Traction", "size": 24.0}]}]},
+            {"lines": [{"spans": [{"text": "We grew 14% month over month.", "size": 11.0}]},
+                       {"spans": [{"text": "Net retention is 118%.", "size": 11.0}]}]},
+        ]}
+        blocks = pdf_page_blocks(page, 3) + [
+            TextBlock("Ask", page=4, is_heading=True),
+            TextBlock(" ".join(f"Use of funds item {i}." for i in range(60)), page=4),
+        ]
+        assert [b.is_heading for b in blocks[:2]] == [True, False]
+
+        chunks = list(chunk_blocks(blocks, max_tokens=50, overlap_tokens=10))
+        assert chunks[0] == {
+            "text": "Traction We grew 14% month over month. Net retention is 118%.",
+            "metadata": {"chunk_index": 0, "page": 3, "section": "Traction"},
+        }
+        assert all(c["metadata"]["page"] == 4 and c["metadata"]["section"] == "Ask" for c in chunks[1:])
+        assert all(count_tokens(c["text"]) <= 50 for c in chunks)
+        assert [c["metadata"]["chunk_index"] for c in chunks] == list(range(len(chunks)))
+
+    def test_overlap_never_repeats_a_chunk_or_overflows_the_next(self):
+        from knowledge_base.extraction import MAX_CHUNK_TOKENS, TextBlock, chunk_blocks, count_tokens
+
+        long_sentence = " ".join(f"w{i % 10}" for i in range(195))
+        blocks = [TextBlock("Short intro sentence here. Another one.", page=1), TextBlock(long_sentence, page=1)]
+        chunks = [c["text"] for c in chunk_blocks(blocks)]
+        assert chunks == ["Short intro sentence here. Another one.", f"Another one. {long_sentence}"]
+        assert all(count_tokens(c) <= MAX_CHUNK_TOKENS for c in chunks)
+
+        longer = " ".join(f"w{i % 10}" for i in range(199))  # no room left for any overlap
+        chunks = [c["text"] for c in chunk_blocks([blocks[0], TextBlock(longer, page=1)])]
+        assert chunks[1] == longer and all(count_tokens(c) <= MAX_CHUNK_TOKENS for c in chunks)
+
+    @pytest.mark.asyncio
+    async def test_extraction_is_cached_by_content_hash(self, monkeypatch):
+        from knowledge_base import extraction_service
+
+        calls = []
+
+        async def _extract(content, filename):
+            calls.append(filename)
+            return [extraction_service.TextBlock("Seed round: $2M", page=1)]
+
+        monkeypatch.setattr(extraction_service, "_extract", _extract)
+        first, second = await asyncio.gather(
+            extraction_service.aextract_blocks(b"%PDF-deck", "deck.pdf"),
+            extraction_service.aextract_blocks(b"%PDF-deck", "Deck.PDF"),
+        )
+        assert first is second and calls == ["deck.pdf"]
+        assert await extraction_service.aextract_text(b"%PDF-deck", "copy.pdf") == "Seed round: $2M"
+        assert calls == ["deck.pdf"]
+
+    @pytest.mark.asyncio
+    async def test_cancelled_request_does_not_cancel_shared_extraction(self, monkeypatch):
+        from knowledge_base import extraction_service
+
+        release = asyncio.Event()
+
+        async def _extract(content, filename):
+            await release.wait()
+            return [extraction_service.TextBlock(content.decode() * 1000, page=1)]
+
+        monkeypatch.setattr(extraction_service, "_extract", _extract)
+        monkeypatch.setattr(extraction_service, "EXTRACT_CACHE_MAX_BYTES", 2500)
+        disconnected = asyncio.create_task(extraction_service.aextract_blocks(b"a", "a.pdf"))
+        waiting = asyncio.create_task(extraction_service.aextract_blocks(b"a", "a.pdf"))
+        await asyncio.sleep(0)
+        disconnected.cancel()
+        release.set()
+        assert (await waiting)[0].text == "a" * 1000
+
+        await extraction_service.aextract_blocks(b"b", "b.pdf")
+        await extraction_service.aextract_blocks(b"c", "c.pdf")  # over the byte budget: evicts a
+        cached = [extraction_service.cache_key(c, f"{c.decode()}.pdf") in extraction_service._cache for c in (b"a", b"b", b"c")]
+        assert cached == [False, True, True]
+        assert extraction_service._cache_bytes <= 2500
+
+    @pytest.mark.asyncio
+    async def test_spooled_upload_is_parsed_from_its_path(self, tmp_path, monkeypatch):
+        import fitz
+        import hashlib
+        from knowledge_base import extraction_service
+
+        doc = fitz.open()
+        doc.new_page().insert_text((72, 72), "Seed round: $2M")
+        path = str(tmp_path / "upload.pdf")
+        doc.save(path)
+        doc.close()
+        with open(path, "rb") as f:
+            content = f.read()
+
+        sources = []
+        extract = extraction_service._extract
+
+        async def _extract(source, filename):
+            sources.append(source)
+            return await extract(source, filename)
+
+        monkeypatch.setattr(extraction_service, "_extract", _extract)
+        blocks = await extraction_service.aextract_file_blocks(path, "deck.pdf", hashlib.sha256(content).hexdigest())
+        assert [b.text for b in blocks] == ["Seed round: $2M"] and sources == [path]
+        assert await extraction_service.aextract_blocks(content, "deck.pdf") is blocks  # same cache entry
+
+
 class TestGuardrails:
     """Test guardrail callbacks."""
     
@@ -14,18 +14,24 @@ from fastapi.middleware.cors import CORSMiddleware
 async def lifespan(app: FastAPI):
     """Application lifespan — startup and shutdown hooks."""
     # Startup
-    from agents.sub_agents.knowledge_base.pinecone_vector_store import init_pinecone
-    init_pinecone()  # initialise Pinecone index singleton on startup (knowledge base)
+    from agents.sub_agents.knowledge_base.pinecone_vector_store import init_vector_store
+    init_vector_store()  # initialise the knowledge-base vector store (Pinecone index or local files) on startup
 
     # Ensure the self-hosted auth database (users table) exists.
     from db.base import init_db
     await init_db()
 
+    # Serve queries from the active embedding version (see knowledge_base/embedding_versions.py).
+    from agents.sub_agents.knowledge_base.embedding_versions import refresh_versions
+    await refresh_versions(force=True)
+
     # Optional MLflow tracking for agents, dashboard LLM calls, and KB ops.
     from core.mlflow_tracking import init_mlflow
     init_mlflow()
 
     # MCP-backed agents need async init (cannot use asyncio.run under uvicorn).
+    # Each one starts a pool of warm MCP server processes that its tools lease
+    # per call (see agents.mcp_integration.MCPSessionPool).
     from agents.sub_agents.drawio.agent import init_drawio_agent
     from agents.sub_agents.figma_mcp.agent import init_figma_agent
     await init_drawio_agent()
@@ -41,9 +47,45 @@ async def lifespan(app: FastAPI):
     checkpointer = await get_checkpointer()
     cache_agent("pitchmate_agent", build_pitchmate_agent(checkpointer=checkpointer))
 
+    # Optional local intent pre-router — embed its labelled examples up front
+    # so the first routed chat doesn't pay for it.
+    from agents.intent_router import get_intent_router, intent_router_enabled
+    if intent_router_enabled():
+        get_intent_router()
+
+    # Shared Gemini clients (agents/llm_registry.py) — build them and open
+    # their connections now so the first dashboard call skips the TLS handshake.
+    from agents.llm_registry import warm_llm_registry
+    await warm_llm_registry()
+
+    # Background jobs (jobs/) — without a Celery broker they run in this
+    # process; pick up any a previous process left queued or interrupted.
+    from jobs.executor import resume_local_jobs
+    await resume_local_jobs()
+
+    # KB file uploads interrupted mid-ingestion resume from their last batch.
+    from knowledge_base.ingestion import resume_ingestions
+    await resume_ingestions()
+
     yield
 
     # Shutdown
+    from jobs.executor import shutdown_local_jobs
+    await shutdown_local_jobs()
+
+    from knowledge_base.ingestion import shutdown_ingestions
+    await shutdown_ingestions()
+
+    from agents.mcp_integration import shutdown_mcp_pools
+    await shutdown_mcp_pools()
+
+    from agents.sub_agents.knowledge_base.pinecone_vector_store import flush_embedding_cache, shutdown_embedding_pool
+    shutdown_embedding_pool()
+    flush_embedding_cache()
+
+    from knowledge_base.extraction_service import shutdown_extraction_pool
+    shutdown_extraction_pool()
+
     from agents.langgraph_runner import cleanup_checkpointer
     await cleanup_checkpointer()
 
@@ -84,6 +126,7 @@ from team.router import router as team_router                   # noqa: E402
 from roadmap.router import router as roadmap_router             # noqa: E402
 from runway.router import router as runway_router               # noqa: E402
 from simulator.router import router as simulator_router         # noqa: E402
+from jobs.router import router as jobs_router                   # noqa: E402
 
 app.include_router(auth_router)
 app.include_router(agents_router)
@@ -97,6 +140,7 @@ app.include_router(team_router)
 app.include_router(roadmap_router)
 app.include_router(runway_router)
 app.include_router(simulator_router)
+app.include_router(jobs_router)
 
 
 @app.get("/health", tags=["Health"])
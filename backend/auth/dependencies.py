@@ -11,6 +11,7 @@ from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from core.request_context import set_request_context
 from core.security import decode_access_token
 from db.base import get_db_session
 from db.models import User
@@ -53,3 +54,16 @@ async def get_current_user(
         "team_id": user.team_id,
         "metadata": {"full_name": user.full_name} if user.full_name else {},
     }
+
+
+def llm_lane(lane: str):
+    """
+    Router-level dependency factory: tag the request's outbound Gemini calls
+    with the caller's team and a priority lane (see core/request_context.py).
+    Usage:  APIRouter(..., dependencies=[Depends(llm_lane(INTERACTIVE))])
+    """
+
+    async def _tag_request(current_user: Annotated[dict, Depends(get_current_user)]) -> None:
+        set_request_context(current_user["team_id"], lane)
+
+    return _tag_request
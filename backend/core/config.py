@@ -25,6 +25,15 @@ class AgentsConfig:
         env_key = f"{agent_name.upper()}_MODEL"
         return os.environ.get(env_key, self._default_model)
 
+    def get_history_setting(self, agent_name: str, setting: str, default: int) -> int:
+        """
+        Return one chat-history compaction setting (see agents/history_compaction.py)
+        for *agent_name*, e.g. setting="MAX_TOKENS".
+        Priority: {AGENT_NAME_UPPER}_HISTORY_{SETTING} → HISTORY_{SETTING} → default
+        """
+        value = os.environ.get(f"{agent_name.upper()}_HISTORY_{setting}") or os.environ.get(f"HISTORY_{setting}")
+        return int(value) if value else default
+
 
 @dataclass
 class Config:
@@ -0,0 +1,36 @@
+"""
+Per-request context for outbound LLM calls.
+
+The Gemini admission controller (agents/admission.py) needs to know which team
+a model call is for and how urgent it is, but those calls happen deep inside
+LangGraph nodes, tools and dashboard helpers that never see the request. The
+values ride in contextvars instead: routers set them once via the
+`auth.dependencies.llm_lane(...)` dependency, and asyncio tasks / LangGraph
+nodes / `asyncio.to_thread` all inherit them.
+"""
+
+from contextvars import ContextVar
+
+# Priority lanes — interactive chat is served ahead of dashboard/background work.
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+LANES = (INTERACTIVE, BACKGROUND)
+
+_team_id: ContextVar[str | None] = ContextVar("llm_team_id", default=None)
+_lane: ContextVar[str] = ContextVar("llm_lane", default=BACKGROUND)
+
+
+def set_request_context(team_id: str | None, lane: str = INTERACTIVE) -> None:
+    """Tag every LLM call made from the current task (and its children)."""
+    if lane not in LANES:
+        raise ValueError(f"Unknown lane: {lane}")
+    _team_id.set(team_id)
+    _lane.set(lane)
+
+
+def current_team_id() -> str | None:
+    return _team_id.get()
+
+
+def current_lane() -> str:
+    return _lane.get()
@@ -25,9 +25,10 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from auth.dependencies import get_current_user
-from agents.langgraph_base import create_google_llm
+from auth.dependencies import get_current_user, llm_lane
+from agents.llm_registry import get_structured_llm
 from core.config import config
+from core.request_context import BACKGROUND
 from core.mlflow_tracking import MLflowCallbackHandler, log_metric, log_params, track_run
 from db.base import get_db_session
 from dashboard.store import ANALYSIS_MODULES, delete_analysis, get_analyses, save_analysis
@@ -57,7 +58,7 @@ from dashboard.schemas import (
 )
 
 logger = logging.getLogger("dashboard_router")
-router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
+router = APIRouter(prefix="/dashboard", tags=["Dashboard"], dependencies=[Depends(llm_lane(BACKGROUND))])
 
 SchemaT = TypeVar("SchemaT", bound=BaseModel)
 
@@ -92,19 +93,16 @@ async def _structured_completion(
         },
         tags={"endpoint": endpoint, "agent": agent_name},
     ):
-        llm = create_google_llm(
-            model=model_name,
-            temperature=0.3,
-            max_retries=2,
-        ).with_config(callbacks=[mlflow_cb])
-        structured_llm = llm.with_structured_output(schema)
+        # Shared client + structured runnable (agents/llm_registry.py); the
+        # per-request MLflow callback goes in at invoke time instead.
+        structured_llm = get_structured_llm(schema, model=model_name, temperature=0.3, max_retries=2)
 
         last_error: Exception | None = None
         attempts_used = 0
         for attempt in range(3):
             attempts_used = attempt + 1
             try:
-                result = await structured_llm.ainvoke(instructions)
+                result = await structured_llm.ainvoke(instructions, config={"callbacks": [mlflow_cb]})
             except Exception as exc:  # noqa: BLE001 - retry regardless of exact cause
                 last_error = exc
                 continue
@@ -72,6 +72,8 @@ async def init_db() -> None:
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
         await _migrate_team_columns(conn)
+        await _migrate_kb_chunk_columns(conn)
+        await _migrate_response_cache_columns(conn)
     logger.info("Database tables ensured (users, startup_profiles, ...)")
 
 
@@ -109,6 +111,32 @@ async def _migrate_team_columns(conn) -> None:
         await conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_team_id ON {table} (team_id)"))
 
 
+async def _migrate_kb_chunk_columns(conn) -> None:
+    """
+    kb_chunks.page / kb_chunks.text (added for ordered full-document reads)
+    on databases created before them. Older chunks keep NULL text until
+    their document is re-uploaded. Idempotent, like `_migrate_team_columns`.
+    """
+    from sqlalchemy import text
+
+    await conn.execute(text("ALTER TABLE kb_chunks ADD COLUMN IF NOT EXISTS page INTEGER"))
+    await conn.execute(text("ALTER TABLE kb_chunks ADD COLUMN IF NOT EXISTS text TEXT"))
+    await conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_kb_chunks_document_ordinal ON kb_chunks (document_id, ordinal)"
+    ))
+
+
+async def _migrate_response_cache_columns(conn) -> None:
+    """
+    agent_response_cache.embedding_version on databases created before it.
+    Older rows keep NULL, never match a lookup, and age out with the TTL.
+    Idempotent, like `_migrate_team_columns`.
+    """
+    from sqlalchemy import text
+
+    await conn.execute(text("ALTER TABLE agent_response_cache ADD COLUMN IF NOT EXISTS embedding_version INTEGER"))
+
+
 async def close_db() -> None:
     """Dispose of the engine's connection pool. Called on app shutdown."""
     global _engine, _sessionmaker
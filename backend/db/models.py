@@ -4,7 +4,7 @@ import uuid
 from datetime import datetime, timezone
 from typing import Any
 
-from sqlalchemy import Boolean, DateTime, Float, Integer, JSON, String, Text, UniqueConstraint
+from sqlalchemy import Boolean, DateTime, Float, Index, Integer, JSON, String, Text, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column
 
 from db.base import Base
@@ -312,3 +312,206 @@ class AnalysisResult(Base):
         default=lambda: datetime.now(timezone.utc),
         onupdate=lambda: datetime.now(timezone.utc),
     )
+
+
+class AgentResponseCache(Base):
+    """
+    One cached chat answer for the semantic response cache (see
+    agents/response_cache.py). Looked up by (team_id, agent_name,
+    profile_hash) and then by cosine similarity of `embedding` against the
+    new question, so near-identical questions asked against an unchanged
+    startup profile skip the multi-agent run. Kept in Postgres so every
+    worker shares it; `last_hit_at` drives per-team LRU eviction.
+    """
+
+    __tablename__ = "agent_response_cache"
+    __table_args__ = (
+        Index("ix_agent_response_cache_lookup", "team_id", "agent_name", "profile_hash"),
+    )
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    team_id: Mapped[str] = mapped_column(String(36), nullable=False)
+    agent_name: Mapped[str] = mapped_column(String(64), nullable=False)
+    # sha256 of the injected profile markdown + session notes — any profile
+    # edit changes the hash, so stale answers simply stop matching.
+    profile_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+
+    query: Mapped[str] = mapped_column(Text, nullable=False)
+    embedding: Mapped[list] = mapped_column(JSON, nullable=False)  # normalized MiniLM vector
+    # EmbeddingVersion.version that produced `embedding`; only rows of the
+    # querying version are compared (NULL: stored before this column existed).
+    embedding_version: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    response: Mapped[str] = mapped_column(Text, nullable=False)
+
+    hit_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+    last_hit_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True, nullable=False)
+
+
+class BackgroundJob(Base):
+    """
+    One long-running agent or dashboard task submitted via POST /jobs (see
+    jobs/). Runs on a Celery worker when JOBS_BROKER_URL is set, otherwise on
+    the API process's in-process executor; either way status, progress, the
+    result and any generated artifact links live here so clients can poll
+    GET /jobs/{id} instead of holding an HTTP request open for a minute.
+    """
+
+    __tablename__ = "background_jobs"
+    __table_args__ = (
+        Index("ix_background_jobs_team_created", "team_id", "created_at"),
+    )
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id: Mapped[str] = mapped_column(String(36), nullable=False)
+    team_id: Mapped[str] = mapped_column(String(36), nullable=False)
+
+    kind: Mapped[str] = mapped_column(String(16), nullable=False)  # "agent" | "dashboard"
+    task: Mapped[str] = mapped_column(String(64), nullable=False)  # agent name or dashboard module
+    params: Mapped[dict[str, Any]] = mapped_column(JSON, default=dict, nullable=False)
+
+    status: Mapped[str] = mapped_column(String(16), default="queued", index=True, nullable=False)
+    progress: Mapped[int] = mapped_column(Integer, default=0, nullable=False)  # 0-100
+    progress_message: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    result: Mapped[dict[str, Any] | None] = mapped_column(JSON, nullable=True)
+    artifacts: Mapped[list] = mapped_column(JSON, default=list, nullable=False)  # [{filename, download_url}]
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+    started_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+
+class KBDocument(Base):
+    """
+    One uploaded knowledge-base document (see agents/sub_agents/knowledge_base/
+    registry.py). Written alongside the vector upsert so listing documents is
+    one indexed query instead of a scan of every vector in the index. One row
+    per (team, source) — re-uploading a source replaces it. `content_hash` is
+    the sha256 of the document's chunk texts, so an unchanged re-upload can be
+    recognised.
+    """
+
+    __tablename__ = "kb_documents"
+    __table_args__ = (UniqueConstraint("team_id", "source", name="uq_kb_documents_team_source"),)
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    team_id: Mapped[str] = mapped_column(String(36), index=True, nullable=False)
+    uploaded_by_user_id: Mapped[str] = mapped_column(String(36), nullable=False)
+
+    source: Mapped[str] = mapped_column(String(255), nullable=False)
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    chunk_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+    )
+
+
+class KBChunk(Base):
+    """
+    One stored chunk of a `KBDocument`: `id` is the chunk's vector ID in the
+    vector store, so a document's vectors can be deleted or replaced without
+    querying the index. The text and page are kept here too, so a whole
+    document (or a page range) can be read back in order with one indexed
+    query — see the KB agent's `get_document` tool.
+    """
+
+    __tablename__ = "kb_chunks"
+    __table_args__ = (Index("ix_kb_chunks_document_ordinal", "document_id", "ordinal"),)
+
+    id: Mapped[str] = mapped_column(String(64), primary_key=True)  # vector ID
+    document_id: Mapped[str] = mapped_column(String(36), index=True, nullable=False)
+    ordinal: Mapped[int] = mapped_column(Integer, nullable=False)  # position within the document
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=False)  # sha256 of the chunk text
+    page: Mapped[int | None] = mapped_column(Integer, nullable=True)  # 1-based; None for formats without pages
+    text: Mapped[str | None] = mapped_column(Text, nullable=True)  # None for chunks registered before it was stored
+
+
+class KBIngestion(Base):
+    """
+    One file upload working its way into the knowledge base (see
+    knowledge_base/ingestion.py): spooled to disk, then extracted, chunked,
+    and embedded + upserted in batches. `completed_batches` is the resume
+    point — an ingestion interrupted by a crash or redeploy picks up from the
+    next batch on startup instead of starting over. Polled via
+    GET /knowledge-base/ingestions/{id}.
+    """
+
+    __tablename__ = "kb_ingestions"
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    team_id: Mapped[str] = mapped_column(String(36), index=True, nullable=False)
+    user_id: Mapped[str] = mapped_column(String(36), nullable=False)
+
+    source: Mapped[str] = mapped_column(String(255), nullable=False)
+    filename: Mapped[str] = mapped_column(String(255), nullable=False)
+    size_bytes: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=False)  # sha256 of the uploaded bytes
+
+    status: Mapped[str] = mapped_column(String(16), default="queued", index=True, nullable=False)  # queued|running|succeeded|failed
+    # spooled | extracting | chunking | indexing | finalizing | done
+    stage: Mapped[str] = mapped_column(String(16), default="spooled", nullable=False)
+    progress: Mapped[int] = mapped_column(Integer, default=0, nullable=False)  # 0-100
+    total_chunks: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    total_batches: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    completed_batches: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    chunks_stored: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+    )
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+
+class KBEmbeddingVersion(Base):
+    """
+    One embedding model the knowledge base is (or was, or is being) indexed
+    with, and that version's re-embed progress. One row is "active" and
+    serves queries. While reembed.py runs, its target is "building" and
+    receives dual writes. See agents/sub_agents/knowledge_base/embedding_versions.py.
+    """
+
+    __tablename__ = "kb_embedding_versions"
+
+    version: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    model_name: Mapped[str] = mapped_column(String(255), nullable=False)
+    dim: Mapped[int] = mapped_column(Integer, nullable=False)
+    status: Mapped[str] = mapped_column(String(16), default="building", index=True, nullable=False)  # building|active|retired|failed
+
+    # Re-embed progress (building versions)
+    total_chunks: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    migrated_chunks: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    skipped_chunks: Mapped[int] = mapped_column(Integer, default=0, nullable=False)  # stored without text
+    progress: Mapped[int] = mapped_column(Integer, default=0, nullable=False)  # 0-100
+    completed_namespaces: Mapped[list] = mapped_column(JSON, default=list, nullable=False)
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    claimed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)  # runner start
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+    )
+    activated_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
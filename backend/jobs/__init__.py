@@ -0,0 +1 @@
+"""Background jobs package — long agent runs and dashboard generation, polled via /jobs."""
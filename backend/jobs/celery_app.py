@@ -0,0 +1,59 @@
+"""
+Celery worker entry point for background jobs (used when JOBS_BROKER_URL is set).
+
+Run from backend/, with the same .env / DATABASE_URL / ARTIFACTS_ROOT_DIR as
+the API (generated files must land where /agents/artifacts/download reads):
+    celery -A jobs.celery_app worker --loglevel=info --concurrency=2
+
+Each worker process keeps one event loop for its lifetime — the DB engine,
+checkpointer pool and Gemini clients are loop-bound singletons, so tasks run
+on that loop rather than a fresh `asyncio.run` each.
+"""
+
+import asyncio
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from celery import Celery  # noqa: E402
+from celery.signals import worker_process_init, worker_process_shutdown  # noqa: E402
+
+from jobs.executor import JOBS_BROKER_URL, execute_job, init_worker_runtime, shutdown_worker_runtime  # noqa: E402
+
+celery_app = Celery("pitchmate", broker=JOBS_BROKER_URL or None)
+celery_app.conf.update(
+    # Ack after the run, so a worker that dies mid-job has it redelivered;
+    # the job's DB claim keeps a redelivery from running it twice.
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    worker_prefetch_multiplier=1,
+    task_ignore_result=True,  # results live in background_jobs
+    broker_connection_retry_on_startup=True,
+)
+
+_loop: asyncio.AbstractEventLoop | None = None
+
+
+def _worker_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    if _loop is None:
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+        _loop.run_until_complete(init_worker_runtime())
+    return _loop
+
+
+@worker_process_init.connect
+def _init_worker_process(**_kwargs) -> None:
+    _worker_loop()
+
+
+@worker_process_shutdown.connect
+def _shutdown_worker_process(**_kwargs) -> None:
+    if _loop is not None:
+        _loop.run_until_complete(shutdown_worker_runtime())
+
+
+@celery_app.task(name="jobs.run_job")
+def run_job(job_id: str) -> None:
+    _worker_loop().run_until_complete(execute_job(job_id))
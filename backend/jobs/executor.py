@@ -0,0 +1,152 @@
+"""
+Where submitted jobs run.
+
+With JOBS_BROKER_URL set (e.g. redis://redis:6379/0), `submit_job` enqueues
+onto Celery and a separate worker pool runs them (jobs/celery_app.py). Without
+it, the API process runs them itself on a bounded in-process executor
+(JOBS_LOCAL_CONCURRENCY at a time), so the job API works with no Redis at all.
+Either way `execute_job` does the work and every state change lands in the
+background_jobs table — a job outlives the request (and the client) that
+submitted it. In-process jobs interrupted by a shutdown are re-queued and
+resumed on the next startup.
+"""
+
+import asyncio
+import logging
+import os
+
+from fastapi import HTTPException
+
+from core.request_context import BACKGROUND, set_request_context
+from db.base import get_sessionmaker
+from jobs import store
+
+logger = logging.getLogger("jobs")
+
+JOBS_BROKER_URL = os.environ.get("JOBS_BROKER_URL", "").strip()
+_LOCAL_CONCURRENCY = int(os.environ.get("JOBS_LOCAL_CONCURRENCY", "2"))
+# Upper bound on one run; a "running" job older than this is treated as abandoned.
+JOB_TIMEOUT_SECONDS = float(os.environ.get("JOBS_TIMEOUT_SECONDS", "900"))
+
+_local_slots: asyncio.Semaphore | None = None
+_local_tasks: set[asyncio.Task] = set()
+
+
+def celery_enabled() -> bool:
+    return bool(JOBS_BROKER_URL)
+
+
+def _error_text(exc: BaseException) -> str:
+    if isinstance(exc, HTTPException):
+        return str(exc.detail)
+    if isinstance(exc, asyncio.TimeoutError):
+        return f"Timed out after {JOB_TIMEOUT_SECONDS:.0f}s"
+    return str(exc) or type(exc).__name__
+
+
+async def execute_job(job_id: str) -> None:
+    """Claim, run and record one job. Safe to call more than once — only one caller wins the claim."""
+    from jobs.tasks import run_task
+
+    sessionmaker = get_sessionmaker()
+    async with sessionmaker() as db:
+        job = await store.claim_job(db, job_id, stale_after=JOB_TIMEOUT_SECONDS)
+    if job is None:
+        logger.info(f"Job {job_id} already claimed or finished — skipping")
+        return
+
+    # Gemini calls from this run queue as the owner's team, behind interactive chat.
+    set_request_context(job.team_id, BACKGROUND)
+
+    async def report(progress: int | None, message: str | None) -> None:
+        async with sessionmaker() as progress_db:
+            await store.update_progress(progress_db, job_id, progress, message)
+
+    logger.info(f"Job {job_id} started: {job.kind}/{job.task}")
+    try:
+        result, artifacts = await asyncio.wait_for(run_task(job, report), timeout=JOB_TIMEOUT_SECONDS)
+    except Exception as exc:  # noqa: BLE001 — every failure is recorded on the job
+        logger.error(f"Job {job_id} failed: {exc}", exc_info=True)
+        async with sessionmaker() as db:
+            await store.fail_job(db, job_id, _error_text(exc))
+        return
+
+    async with sessionmaker() as db:
+        await store.complete_job(db, job_id, result, artifacts)
+    logger.info(f"Job {job_id} succeeded ({len(artifacts)} artifact(s))")
+
+
+async def _run_locally(job_id: str) -> None:
+    global _local_slots
+    if _local_slots is None:
+        _local_slots = asyncio.Semaphore(_LOCAL_CONCURRENCY)
+    try:
+        async with _local_slots:
+            await execute_job(job_id)
+    except asyncio.CancelledError:
+        async with get_sessionmaker()() as db:
+            await store.requeue_job(db, job_id)
+        raise
+
+
+async def submit_job(job_id: str) -> None:
+    """Hand a freshly created job to the Celery pool, or to the in-process executor."""
+    if celery_enabled():
+        from jobs.celery_app import run_job
+
+        await asyncio.to_thread(run_job.delay, job_id)
+        return
+    task = asyncio.get_running_loop().create_task(_run_locally(job_id))
+    _local_tasks.add(task)
+    task.add_done_callback(_local_tasks.discard)
+
+
+async def resume_local_jobs() -> None:
+    """Startup hook: re-submit jobs a previous API process left queued or abandoned (in-process mode only)."""
+    if celery_enabled():
+        return  # the broker still holds them
+    async with get_sessionmaker()() as db:
+        job_ids = await store.list_resumable_job_ids(db, stale_after=JOB_TIMEOUT_SECONDS)
+    for job_id in job_ids:
+        await submit_job(job_id)
+    if job_ids:
+        logger.info(f"Resumed {len(job_ids)} background job(s)")
+
+
+async def shutdown_local_jobs() -> None:
+    """Shutdown hook: stop in-process jobs; each one re-queues itself for the next startup."""
+    for task in list(_local_tasks):
+        task.cancel()
+    if _local_tasks:
+        await asyncio.gather(*_local_tasks, return_exceptions=True)
+
+
+async def init_worker_runtime() -> None:
+    """The parts of app.py's lifespan a Celery worker process needs to run agents."""
+    from agents.sub_agents.knowledge_base.pinecone_vector_store import init_vector_store
+    init_vector_store()
+
+    from core.mlflow_tracking import init_mlflow
+    init_mlflow()
+
+    from agents.sub_agents.drawio.agent import init_drawio_agent
+    from agents.sub_agents.figma_mcp.agent import init_figma_agent
+    await init_drawio_agent()
+    await init_figma_agent()
+
+    from agents.agent import build_pitchmate_agent
+    from agents.langgraph_runner import cache_agent, get_checkpointer
+
+    checkpointer = await get_checkpointer()
+    cache_agent("pitchmate_agent", build_pitchmate_agent(checkpointer=checkpointer))
+
+
+async def shutdown_worker_runtime() -> None:
+    from agents.mcp_integration import shutdown_mcp_pools
+    await shutdown_mcp_pools()
+
+    from agents.langgraph_runner import cleanup_checkpointer
+    await cleanup_checkpointer()
+
+    from db.base import close_db
+    await close_db()
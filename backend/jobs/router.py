@@ -0,0 +1,89 @@
+"""
+Background jobs router — run long agent turns and dashboard generation outside
+the HTTP request, then poll for status, progress and results.
+
+Endpoints:
+  POST /jobs        — submit an agent or dashboard task (202 + the queued job)
+  GET  /jobs        — the team's most recent jobs
+  GET  /jobs/{id}   — status, progress, result and artifact download links
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from auth.dependencies import get_current_user, llm_lane
+from core.request_context import BACKGROUND
+from db.base import get_db_session
+from db.models import BackgroundJob
+from jobs import store
+from jobs.executor import submit_job
+from jobs.schemas import JobArtifact, JobResponse, JobSubmitRequest
+from jobs.tasks import validate_submission
+
+logger = logging.getLogger("jobs_router")
+router = APIRouter(prefix="/jobs", tags=["Jobs"], dependencies=[Depends(llm_lane(BACKGROUND))])
+
+
+def _job_to_response(job: BackgroundJob) -> JobResponse:
+    return JobResponse(
+        id=job.id,
+        kind=job.kind,
+        task=job.task,
+        status=job.status,
+        progress=job.progress,
+        progress_message=job.progress_message,
+        result=job.result,
+        artifacts=[JobArtifact(**a) for a in job.artifacts or []],
+        error=job.error,
+        created_at=job.created_at.isoformat() if job.created_at else None,
+        started_at=job.started_at.isoformat() if job.started_at else None,
+        finished_at=job.finished_at.isoformat() if job.finished_at else None,
+    )
+
+
+@router.post("", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def submit(
+    body: JobSubmitRequest,
+    current_user: Annotated[dict, Depends(get_current_user)],
+    db: Annotated[AsyncSession, Depends(get_db_session)],
+):
+    try:
+        params = validate_submission(body.kind, body.task, body.params)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(exc))
+
+    job = await store.create_job(db, current_user["id"], current_user["team_id"], body.kind, body.task, params)
+    try:
+        await submit_job(job.id)
+    except Exception as exc:  # noqa: BLE001 — e.g. broker unreachable; don't leave a job queued forever
+        logger.error(f"Could not enqueue job {job.id}: {exc}", exc_info=True)
+        await store.fail_job(db, job.id, f"Could not enqueue job: {exc}")
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Job queue unavailable")
+
+    logger.info(f"Job {job.id} queued: {body.kind}/{body.task} for user {current_user['id']}")
+    return _job_to_response(job)
+
+
+@router.get("", response_model=list[JobResponse])
+async def list_recent(
+    current_user: Annotated[dict, Depends(get_current_user)],
+    db: Annotated[AsyncSession, Depends(get_db_session)],
+):
+    return [_job_to_response(j) for j in await store.list_jobs(db, current_user["team_id"])]
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_status(
+    job_id: str,
+    current_user: Annotated[dict, Depends(get_current_user)],
+    db: Annotated[AsyncSession, Depends(get_db_session)],
+):
+    job = await store.get_job(db, current_user["team_id"], job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return _job_to_response(job)
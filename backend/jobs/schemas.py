@@ -0,0 +1,42 @@
+"""Pydantic schemas for the background job API."""
+
+from __future__ import annotations
+
+from typing import Any, Literal, Optional
+
+from pydantic import BaseModel, Field
+
+JOB_STATUSES: list[str] = ["queued", "running", "succeeded", "failed"]
+
+
+class JobSubmitRequest(BaseModel):
+    kind: Literal["agent", "dashboard"]
+    task: str = Field(
+        ...,
+        description='Agent name (see GET /agents/available) for "agent" jobs, or a dashboard module '
+        '(market, competition, gtm, investors, valuation, deck, deck_export, finance, traction, debrief).',
+    )
+    params: dict[str, Any] = Field(
+        default_factory=dict,
+        description='"agent": {"query", "session_id"?}. "dashboard": the module\'s POST /dashboard/... body.',
+    )
+
+
+class JobArtifact(BaseModel):
+    filename: str
+    download_url: str
+
+
+class JobResponse(BaseModel):
+    id: str
+    kind: str
+    task: str
+    status: str
+    progress: int = 0
+    progress_message: Optional[str] = None
+    result: Optional[dict[str, Any]] = None
+    artifacts: list[JobArtifact] = Field(default_factory=list)
+    error: Optional[str] = None
+    created_at: Optional[str] = None
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
@@ -0,0 +1,106 @@
+"""
+Persistence helpers for background jobs.
+
+Jobs are read back scoped by team_id (like the pipeline), so cofounders can
+poll each other's runs. `claim_job` is the only way a job starts running: it
+is a single conditional UPDATE, so a job delivered twice (Celery redelivery,
+two API workers resuming the same queue) still runs once.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.models import BackgroundJob
+
+
+async def create_job(
+    db: AsyncSession, user_id: str, team_id: str, kind: str, task: str, params: dict[str, Any]
+) -> BackgroundJob:
+    job = BackgroundJob(user_id=user_id, team_id=team_id, kind=kind, task=task, params=params)
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    return job
+
+
+async def get_job(db: AsyncSession, team_id: str, job_id: str) -> BackgroundJob | None:
+    return await db.scalar(
+        select(BackgroundJob).where(BackgroundJob.team_id == team_id, BackgroundJob.id == job_id)
+    )
+
+
+async def list_jobs(db: AsyncSession, team_id: str, limit: int = 20) -> list[BackgroundJob]:
+    rows = await db.scalars(
+        select(BackgroundJob)
+        .where(BackgroundJob.team_id == team_id)
+        .order_by(BackgroundJob.created_at.desc())
+        .limit(limit)
+    )
+    return list(rows)
+
+
+def _stale_running(stale_after: float):
+    """A "running" job whose runner died (crash, redeploy) — started longer ago than any run may take."""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=stale_after)
+    return (BackgroundJob.status == "running") & (BackgroundJob.started_at < cutoff)
+
+
+async def claim_job(db: AsyncSession, job_id: str, stale_after: float) -> BackgroundJob | None:
+    """Atomically move a queued (or abandoned) job to running; None if someone else has it."""
+    claimed = await db.scalar(
+        update(BackgroundJob)
+        .where(BackgroundJob.id == job_id, or_(BackgroundJob.status == "queued", _stale_running(stale_after)))
+        .values(status="running", started_at=datetime.now(timezone.utc), progress=5, error=None)
+        .returning(BackgroundJob.id)
+    )
+    await db.commit()
+    if claimed is None:
+        return None
+    return await db.get(BackgroundJob, job_id, populate_existing=True)
+
+
+async def list_resumable_job_ids(db: AsyncSession, stale_after: float) -> list[str]:
+    rows = await db.scalars(
+        select(BackgroundJob.id)
+        .where(or_(BackgroundJob.status == "queued", _stale_running(stale_after)))
+        .order_by(BackgroundJob.created_at)
+    )
+    return list(rows)
+
+
+async def _set(db: AsyncSession, job_id: str, **values: Any) -> None:
+    await db.execute(update(BackgroundJob).where(BackgroundJob.id == job_id).values(**values))
+    await db.commit()
+
+
+async def update_progress(db: AsyncSession, job_id: str, progress: int | None, message: str | None) -> None:
+    values: dict[str, Any] = {"progress_message": (message or "")[:255] or None}
+    if progress is not None:
+        values["progress"] = max(0, min(100, progress))
+    await _set(db, job_id, **values)
+
+
+async def complete_job(db: AsyncSession, job_id: str, result: dict[str, Any], artifacts: list[dict]) -> None:
+    await _set(
+        db, job_id, status="succeeded", progress=100, progress_message=None,
+        result=result, artifacts=artifacts, finished_at=datetime.now(timezone.utc),
+    )
+
+
+async def fail_job(db: AsyncSession, job_id: str, error: str) -> None:
+    await _set(db, job_id, status="failed", error=error, finished_at=datetime.now(timezone.utc))
+
+
+async def requeue_job(db: AsyncSession, job_id: str) -> None:
+    """Hand an interrupted job back to the queue (the API process is shutting down mid-run)."""
+    await db.execute(
+        update(BackgroundJob)
+        .where(BackgroundJob.id == job_id, BackgroundJob.status == "running")
+        .values(status="queued", progress=0, progress_message="Interrupted — will resume", started_at=None)
+    )
+    await db.commit()
@@ -0,0 +1,143 @@
+"""
+What a background job can run, and how.
+
+Two kinds of job, both reusing the code paths the synchronous endpoints use:
+  - "agent": one chat turn against the orchestrator or a named specialist
+    (e.g. a full deck or due-diligence pack), streamed so each sub-agent hop
+    shows up as progress;
+  - "dashboard": one POST /dashboard/<module> call, run with the job owner
+    as the current user (so the result is saved like any dashboard run).
+
+Handlers return (result, artifacts); artifacts are download links for files
+the run wrote to the artifacts directory.
+"""
+
+from __future__ import annotations
+
+import inspect
+import os
+import re
+import uuid
+from typing import Any, Awaitable, Callable
+
+from pydantic import BaseModel
+
+from core.config import config
+from db.base import get_sessionmaker
+from db.models import BackgroundJob
+
+ProgressReporter = Callable[[int | None, str | None], Awaitable[None]]
+
+_ARTIFACT_NAME_RE = re.compile(r"[\w\-.]+\.(?:pdf|docx|txt)")
+
+
+def _dashboard_tasks() -> dict[str, tuple[Callable, type[BaseModel]]]:
+    """module → (dashboard endpoint, its request schema)."""
+    from dashboard import router as dashboard
+    from dashboard import schemas
+
+    return {
+        "market": (dashboard.analyze_market, schemas.MarketSizeRequest),
+        "competition": (dashboard.analyze_competition, schemas.CompetitionRequest),
+        "gtm": (dashboard.build_gtm_plan, schemas.GTMRequest),
+        "investors": (dashboard.suggest_investors, schemas.InvestorRequest),
+        "valuation": (dashboard.estimate_valuation_range, schemas.ValuationRequest),
+        "deck": (dashboard.draft_deck_sections, schemas.DeckRequest),
+        "deck_export": (dashboard.export_deck, schemas.DeckExportRequest),
+        "finance": (dashboard.coach_financials, schemas.FinanceRequest),
+        "traction": (dashboard.frame_traction_story, schemas.TractionRequest),
+        "debrief": (dashboard.debrief_meeting, schemas.MeetingDebriefRequest),
+    }
+
+
+def validate_submission(kind: str, task: str, params: dict[str, Any]) -> dict[str, Any]:
+    """Reject bad jobs at submit time (ValueError) instead of failing them on the worker."""
+    if kind == "dashboard":
+        tasks = _dashboard_tasks()
+        if task not in tasks:
+            raise ValueError(f"Unknown dashboard task: {task}. Expected one of: {', '.join(tasks)}")
+        return tasks[task][1].model_validate(params).model_dump()
+
+    from agents.agent import list_available_agents
+
+    names = [a["name"] for a in list_available_agents()]
+    if task not in names:
+        raise ValueError(f"Unknown or unavailable agent: {task}")
+    query = str(params.get("query") or "").strip()
+    if not query:
+        raise ValueError('Agent jobs need a non-empty "query" param')
+    return {"query": query, "session_id": params.get("session_id") or None}
+
+
+def artifacts_in(text: str) -> list[dict[str, str]]:
+    """Download links for every artifact file named in an agent's answer that actually exists."""
+    from agents.backend import _safe_artifact_filename
+
+    found: list[str] = []
+    for name in _ARTIFACT_NAME_RE.findall(text or ""):
+        if name in found or not _safe_artifact_filename(name):
+            continue
+        if os.path.isfile(os.path.join(config.artifacts_root_dir, name)):
+            found.append(name)
+    return [{"filename": name, "download_url": f"/agents/artifacts/download/{name}"} for name in found]
+
+
+async def _run_agent_job(job: BackgroundJob, report: ProgressReporter) -> tuple[dict, list]:
+    from agents.backend import PitchmateRequest, _chat_context_for, _target_agent
+
+    req = PitchmateRequest(query=job.params["query"], session_id=job.params.get("session_id"), agent_name=job.task)
+    owner = {"id": job.user_id, "team_id": job.team_id}
+    async with get_sessionmaker()() as db:
+        chat_context, _ = await _chat_context_for(req, owner, db)
+    agent_name, compiled_agent = _target_agent(req)
+    session_id = req.session_id or str(uuid.uuid4())
+
+    if agent_name == "pitchmate_agent":
+        from agents.agent_runner import stream_pitchmate_request
+
+        events = stream_pitchmate_request(job.user_id, req.query, session_id, context=chat_context)
+    else:
+        from agents.langgraph_runner import stream_agent
+
+        events = stream_agent(
+            compiled_agent, job.user_id, session_id, req.query, agent_name, context=chat_context
+        )
+
+    await report(10, f"Running {agent_name}")
+    finished_steps = 0
+    response = ""
+    async for item in events:
+        if item["event"] == "agent_start":
+            await report(None, f"Running {item['agent']}")
+        elif item["event"] == "agent_end":
+            # The number of hops isn't known up front; approach 90% asymptotically.
+            finished_steps += 1
+            await report(90 - 80 // (finished_steps + 1), f"Finished {item['agent']}")
+        elif item["event"] == "final":
+            response = item["response"]
+        elif item["event"] == "error":
+            raise RuntimeError(item["detail"])
+
+    return {"response": response, "session_id": session_id}, artifacts_in(response)
+
+
+async def _run_dashboard_job(job: BackgroundJob, report: ProgressReporter) -> tuple[dict, list]:
+    endpoint, schema = _dashboard_tasks()[job.task]
+    req = schema.model_validate(job.params)
+    owner = {"id": job.user_id, "team_id": job.team_id}
+
+    await report(10, f"Running {job.task}")
+    async with get_sessionmaker()() as db:
+        kwargs = {"db": db} if "db" in inspect.signature(endpoint).parameters else {}
+        result = (await endpoint(req, owner, **kwargs)).model_dump()
+
+    artifacts = []
+    if result.get("download_url"):
+        artifacts.append({"filename": result["filename"], "download_url": result["download_url"]})
+    return result, artifacts
+
+
+async def run_task(job: BackgroundJob, report: ProgressReporter) -> tuple[dict, list]:
+    if job.kind == "dashboard":
+        return await _run_dashboard_job(job, report)
+    return await _run_agent_job(job, report)
@@ -0,0 +1,237 @@
+"""
+Streaming document extraction and structure-aware chunking for the knowledge base.
+
+Extraction yields `TextBlock`s one at a time — PDF pages are read one page
+at a time from PyMuPDF, DOCX paragraphs are read one at a time from
+python-docx — and `chunk_blocks` consumes them lazily, so the document never
+exists as one big string. The input is either the file's bytes or, for
+uploads spooled to disk, its path; from a path, peak memory is a page's
+worth of blocks plus whatever the parser keeps mapped.
+
+Chunks never span a page break or a heading: a heading (PDF text set larger
+than the page's body text, DOCX "Heading"/"Title" styles, Markdown "#" lines)
+starts a new section, and every chunk carries `page` and `section`
+metadata. Chunk size is counted in approximate word-piece tokens, because
+all-MiniLM-L6-v2 truncates input at 256 tokens and anything past that is
+silently dropped from the embedding.
+"""
+
+import io
+import re
+from dataclasses import dataclass
+from typing import Iterable, Iterator
+
+MAX_CHUNK_TOKENS = 200  # headroom under MiniLM's 256 word-piece limit
+OVERLAP_TOKENS = 30
+
+# Font size, relative to the page's body text, at which a short PDF block counts as a heading.
+_PDF_HEADING_SCALE = 1.2
+_HEADING_MAX_CHARS = 120
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+_MARKDOWN_HEADING_RE = re.compile(r"^#{1,6}\s+(.*)$")
+
+
+@dataclass
+class TextBlock:
+    """One paragraph (or heading) of extracted text."""
+
+    text: str
+    page: int | None = None  # 1-based; None for formats without pages
+    is_heading: bool = False
+
+
+def count_tokens(text: str) -> int:
+    """Approximate word-piece count: words and punctuation, long words counted as several pieces."""
+    return sum(1 + len(token) // 8 for token in _TOKEN_RE.findall(text))
+
+
+# ─── Extraction ──────────────────────────────────────────────────────────────
+
+def iter_file_blocks(content: bytes | str, filename: str) -> Iterator[TextBlock]:
+    """Blocks of a PDF or DOCX file (its bytes or its path), in reading order."""
+    if filename.endswith(".pdf"):
+        return _iter_pdf_blocks(content)
+    if filename.endswith(".docx"):
+        return _iter_docx_blocks(content)
+    raise ValueError("Unsupported file type")
+
+
+def iter_text_blocks(text: str) -> Iterator[TextBlock]:
+    """Blocks of plain text / Markdown: blank-line-separated paragraphs, "#" lines as headings."""
+    paragraph: list[str] = []
+    for line in io.StringIO(text):
+        line = line.strip()
+        heading = _MARKDOWN_HEADING_RE.match(line)
+        if not line or heading:
+            if paragraph:
+                yield TextBlock(" ".join(paragraph))
+                paragraph = []
+            if heading and heading.group(1).strip():
+                yield TextBlock(heading.group(1).strip(), is_heading=True)
+            continue
+        paragraph.append(line)
+    if paragraph:
+        yield TextBlock(" ".join(paragraph))
+
+
+def _open_pdf(content: bytes | str):
+    try:
+        import fitz  # PyMuPDF
+    except ImportError:
+        raise RuntimeError("PDF support requires PyMuPDF: pip install PyMuPDF")
+    if isinstance(content, str):
+        return fitz.open(content, filetype="pdf")  # pages are read from disk on demand
+    return fitz.open(stream=content, filetype="pdf")
+
+
+def _iter_pdf_blocks(content: bytes | str, start: int = 0, stop: int | None = None) -> Iterator[TextBlock]:
+    doc = _open_pdf(content)
+    try:
+        for page_index in range(start, len(doc) if stop is None else min(stop, len(doc))):
+            yield from pdf_page_blocks(doc[page_index].get_text("dict"), page_index + 1)
+    finally:
+        doc.close()
+
+
+def pdf_page_count(content: bytes | str) -> int:
+    doc = _open_pdf(content)
+    try:
+        return len(doc)
+    finally:
+        doc.close()
+
+
+def extract_pdf_pages(content: bytes | str, start: int, stop: int) -> list[TextBlock]:
+    """Blocks of pages [start, stop) — the unit of work extraction_service.py sends to worker processes."""
+    return list(_iter_pdf_blocks(content, start, stop))
+
+
+def pdf_page_blocks(page_dict: dict, page_number: int) -> list[TextBlock]:
+    """TextBlocks of one page from PyMuPDF's `get_text("dict")` output."""
+    blocks: list[tuple[str, float]] = []
+    for block in page_dict.get("blocks", []):
+        spans = [span for line in block.get("lines", []) for span in line.get("spans", [])]
+        text = " ".join(
+            "".join(span.get("text", "") for span in line.get("spans", [])).strip()
+            for line in block.get("lines", [])
+        ).strip()
+        if text:
+            blocks.append((re.sub(r"\s+", " ", text), max(span.get("size", 0.0) for span in spans)))
+    if not blocks:
+        return []
+
+    # Body size = the font size covering the most characters on the page.
+    chars_by_size: dict[float, int] = {}
+    for text, size in blocks:
+        chars_by_size[round(size, 1)] = chars_by_size.get(round(size, 1), 0) + len(text)
+    body_size = max(chars_by_size, key=chars_by_size.get)
+    return [
+        TextBlock(
+            text,
+            page=page_number,
+            is_heading=size >= body_size * _PDF_HEADING_SCALE and len(text) <= _HEADING_MAX_CHARS,
+        )
+        for text, size in blocks
+    ]
+
+
+def _iter_docx_blocks(content: bytes | str) -> Iterator[TextBlock]:
+    try:
+        from docx import Document
+    except ImportError:
+        raise RuntimeError("DOCX support requires python-docx: pip install python-docx")
+    doc = Document(content if isinstance(content, str) else io.BytesIO(content))
+    for paragraph in doc.paragraphs:
+        text = paragraph.text.strip()
+        if not text:
+            continue
+        style = (paragraph.style.name if paragraph.style is not None else "") or ""
+        yield TextBlock(text, is_heading=style.startswith(("Heading", "Title")))
+
+
+# ─── Chunking ────────────────────────────────────────────────────────────────
+
+def chunk_blocks(
+    blocks: Iterable[TextBlock],
+    max_tokens: int = MAX_CHUNK_TOKENS,
+    overlap_tokens: int = OVERLAP_TOKENS,
+) -> Iterator[dict]:
+    """
+    Pack blocks into chunks of at most ~max_tokens, yielding
+    `{"text", "metadata": {"page"?, "section"?, "chunk_index"}}`. A chunk
+    ends at every heading and page break; consecutive chunks within one
+    section share ~overlap_tokens of trailing sentences, as long as the next
+    chunk still fits max_tokens and never repeating a whole chunk.
+    """
+    section: str | None = None
+    page: int | None = None
+    pieces: list[str] = []  # sentences of the chunk being built
+    tokens = 0
+    index = 0
+
+    def emit() -> Iterator[dict]:
+        nonlocal index
+        text = " ".join(pieces).strip()
+        if not text:
+            return
+        metadata = {"chunk_index": index}
+        if page is not None:
+            metadata["page"] = page
+        if section:
+            metadata["section"] = section
+        index += 1
+        yield {"text": text, "metadata": metadata}
+
+    for block in blocks:
+        if block.page != page or block.is_heading:
+            yield from emit()
+            pieces, tokens = [], 0
+            page = block.page
+            if block.is_heading:
+                section = block.text
+        for sentence in _sentences(block.text, max_tokens):
+            size = count_tokens(sentence)
+            if pieces and tokens + size > max_tokens:
+                yield from emit()
+                pieces = _overlap(pieces, min(overlap_tokens, max_tokens - size))
+                tokens = sum(count_tokens(p) for p in pieces)
+            pieces.append(sentence)
+            tokens += size
+    yield from emit()
+
+
+def _sentences(text: str, max_tokens: int) -> Iterator[str]:
+    """Split a block into sentences, and any sentence over max_tokens into word runs."""
+    for sentence in _SENTENCE_END_RE.split(text):
+        if count_tokens(sentence) <= max_tokens:
+            yield sentence
+            continue
+        words: list[str] = []
+        size = 0
+        for word in sentence.split():
+            word_size = count_tokens(word)
+            if words and size + word_size > max_tokens:
+                yield " ".join(words)
+                words, size = [], 0
+            words.append(word)
+            size += word_size
+        if words:
+            yield " ".join(words)
+
+
+def _overlap(pieces: list[str], overlap_tokens: int) -> list[str]:
+    """
+    Trailing sentences of the previous chunk, up to overlap_tokens, to carry
+    into the next. Never all of them: a short chunk would otherwise be
+    repeated whole inside the next one.
+    """
+    carried: list[str] = []
+    size = 0
+    for piece in reversed(pieces[1:]):
+        size += count_tokens(piece)
+        if size > overlap_tokens:
+            break
+        carried.insert(0, piece)
+    return carried
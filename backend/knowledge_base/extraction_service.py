@@ -0,0 +1,144 @@
+"""
+Document extraction service: PDF/DOCX parsing off the event loop, parallel
+across processes, with results cached by content hash.
+
+/agents/context/upload-file extracts through `aextract_blocks` (bytes in
+memory); knowledge-base ingestions through `aextract_file_blocks`, which
+parses the spooled upload from its path so it is never read back into
+memory. For both:
+  - results are cached by sha256 of the uploaded bytes (in-memory LRU of at
+    most KB_EXTRACT_CACHE_ENTRIES results and KB_EXTRACT_CACHE_MAX_MB of
+    text), so a repeat upload — or the same deck sent to both endpoints —
+    returns immediately;
+  - concurrent requests for the same bytes share one extraction task. A
+    request that is cancelled (client disconnect) stops waiting without
+    cancelling the task, so the others still get its result;
+  - PDFs with at least KB_EXTRACT_POOL_MIN_PAGES pages are split into runs
+    of KB_EXTRACT_PAGES_PER_TASK pages and parsed on a pool of
+    KB_EXTRACT_PROCESSES worker processes (parsing is CPU-bound and holds
+    the GIL, so threads don't parallelize it);
+  - everything else is parsed on a worker thread.
+"""
+
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from knowledge_base.extraction import TextBlock, extract_pdf_pages, iter_file_blocks, pdf_page_count
+
+logger = logging.getLogger("extraction_service")
+
+EXTRACT_PROCESSES = int(os.environ.get("KB_EXTRACT_PROCESSES", "2"))
+EXTRACT_PAGES_PER_TASK = int(os.environ.get("KB_EXTRACT_PAGES_PER_TASK", "8"))
+EXTRACT_POOL_MIN_PAGES = int(os.environ.get("KB_EXTRACT_POOL_MIN_PAGES", "16"))
+EXTRACT_CACHE_ENTRIES = int(os.environ.get("KB_EXTRACT_CACHE_ENTRIES", "64"))
+EXTRACT_CACHE_MAX_BYTES = int(float(os.environ.get("KB_EXTRACT_CACHE_MAX_MB", "128")) * 2**20)
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+_cache: "OrderedDict[str, tuple[list[TextBlock], int]]" = OrderedDict()  # key -> (blocks, approx. bytes)
+_cache_bytes = 0
+_inflight: dict[str, asyncio.Task] = {}
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            logger.info(f"Starting {EXTRACT_PROCESSES}-process extraction pool")
+            # spawn, not fork: the API process runs threads (uvicorn, model loading).
+            _pool = ProcessPoolExecutor(EXTRACT_PROCESSES, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shutdown_extraction_pool() -> None:
+    """Stop the extraction worker processes if they were started (call on app shutdown)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+def cache_key(content: bytes, filename: str) -> str:
+    return _key(hashlib.sha256(content).hexdigest(), filename)
+
+
+def _key(content_hash: str, filename: str) -> str:
+    return f"{content_hash}{os.path.splitext(filename)[1].lower()}"
+
+
+def _blocks_size(blocks: list[TextBlock]) -> int:
+    """Rough memory footprint of cached blocks: their text plus per-object overhead."""
+    return sum(len(block.text) + 100 for block in blocks)
+
+
+def _cache_put(key: str, blocks: list[TextBlock]) -> None:
+    global _cache_bytes
+    size = _blocks_size(blocks)
+    if size > EXTRACT_CACHE_MAX_BYTES:
+        return  # larger than the whole cache; keeping it would evict everything else
+    _cache[key] = (blocks, size)
+    _cache_bytes += size
+    while len(_cache) > EXTRACT_CACHE_ENTRIES or _cache_bytes > EXTRACT_CACHE_MAX_BYTES:
+        _, (_, evicted) = _cache.popitem(last=False)
+        _cache_bytes -= evicted
+
+
+async def _extract_and_cache(key: str, content: bytes | str, filename: str) -> list[TextBlock]:
+    blocks = await _extract(content, filename)
+    _cache_put(key, blocks)
+    return blocks
+
+
+def _extraction_done(key: str, task: asyncio.Task) -> None:
+    _inflight.pop(key, None)
+    if not task.cancelled():
+        task.exception()  # retrieved here, so waiter-less failures aren't logged as unhandled
+
+
+async def aextract_blocks(content: bytes, filename: str) -> list[TextBlock]:
+    """All blocks of a PDF or DOCX upload, in reading order (see extraction.py)."""
+    return await _aextract(cache_key(content, filename), content, filename)
+
+
+async def aextract_file_blocks(path: str, filename: str, content_hash: str) -> list[TextBlock]:
+    """`aextract_blocks` for an upload on disk; `content_hash` is the sha256 hex digest of its bytes."""
+    return await _aextract(_key(content_hash, filename), path, filename)
+
+
+async def _aextract(key: str, content: bytes | str, filename: str) -> list[TextBlock]:
+    if key in _cache:
+        _cache.move_to_end(key)
+        return _cache[key][0]
+    task = _inflight.get(key)
+    if task is None:
+        task = _inflight[key] = asyncio.create_task(_extract_and_cache(key, content, filename))
+        task.add_done_callback(lambda done: _extraction_done(key, done))
+    # Shielded: cancelling this request must not cancel the extraction other requests await.
+    return await asyncio.shield(task)
+
+
+async def aextract_text(content: bytes, filename: str) -> str:
+    """The whole upload as plain text (startup context)."""
+    return "\n\n".join(block.text for block in await aextract_blocks(content, filename)).strip()
+
+
+async def _extract(content: bytes | str, filename: str) -> list[TextBlock]:
+    """Parse bytes or a file path; pool workers get the path, not a copy of the bytes, when there is one."""
+    if filename.endswith(".pdf") and EXTRACT_PROCESSES > 1:
+        pages = await asyncio.to_thread(pdf_page_count, content)
+        if pages >= EXTRACT_POOL_MIN_PAGES:
+            loop = asyncio.get_running_loop()
+            pool = _get_pool()
+            runs = await asyncio.gather(*(
+                loop.run_in_executor(pool, extract_pdf_pages, content, start, start + EXTRACT_PAGES_PER_TASK)
+                for start in range(0, pages, EXTRACT_PAGES_PER_TASK)
+            ))
+            return [block for run in runs for block in run]
+    return await asyncio.to_thread(lambda: list(iter_file_blocks(content, filename)))
@@ -0,0 +1,214 @@
+"""
+Staged, resumable ingestion of uploaded files into the knowledge base.
+
+An upload is streamed to disk in KB_INGEST_SPOOL_CHUNK_BYTES pieces (hashing
+as it goes) instead of being read into memory, recorded as a kb_ingestions
+row, and then run through:
+
+  extracting -> chunking -> indexing (embed + upsert, KB_INGEST_BATCH_SIZE
+  chunks per batch) -> finalizing (document registry, removed chunks) -> done
+
+Progress lands on the row after every stage and batch, for
+GET /knowledge-base/ingestions/{id}. The chunk list is saved next to the
+spooled file once chunking finishes, and `completed_batches` records the
+last batch that reached the vector store, so an ingestion interrupted by a
+crash or redeploy resumes from the next batch on startup
+(`resume_ingestions`) rather than starting over. Ingestions run on the API
+process, KB_INGEST_CONCURRENCY at a time — the spooled file lives on its disk.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import uuid
+
+from fastapi import UploadFile
+
+from db.base import get_sessionmaker
+from db.models import KBIngestion
+from knowledge_base import ingestion_store as store
+
+logger = logging.getLogger("kb_ingestion")
+
+SPOOL_DIR = os.environ.get("KB_INGEST_SPOOL_DIR", "./.kb_uploads")
+SPOOL_CHUNK_BYTES = int(os.environ.get("KB_INGEST_SPOOL_CHUNK_BYTES", str(1 << 20)))
+INGEST_BATCH_SIZE = int(os.environ.get("KB_INGEST_BATCH_SIZE", "64"))
+INGEST_CONCURRENCY = int(os.environ.get("KB_INGEST_CONCURRENCY", "2"))
+# A "running" ingestion with no progress for this long is treated as abandoned.
+INGEST_STALE_SECONDS = float(os.environ.get("KB_INGEST_STALE_SECONDS", "600"))
+
+# Progress (0-100) at the start of each stage; indexing fills the span up to finalizing.
+_PROGRESS = {"extracting": 5, "chunking": 20, "indexing": 25, "finalizing": 95}
+
+_slots: asyncio.Semaphore | None = None
+_tasks: dict[str, asyncio.Task] = {}
+
+
+class IngestionError(Exception):
+    """An upload that can't be ingested (no extractable text, unreadable file)."""
+
+
+def _upload_path(ingestion_id: str, filename: str) -> str:
+    return os.path.join(SPOOL_DIR, f"{ingestion_id}{os.path.splitext(filename)[1].lower()}")
+
+
+def _chunks_path(ingestion_id: str) -> str:
+    return os.path.join(SPOOL_DIR, f"{ingestion_id}.chunks.jsonl")
+
+
+async def spool_upload(file: UploadFile, team_id: str, user_id: str, source: str) -> KBIngestion:
+    """Stream `file` to the spool directory and record a queued ingestion for it."""
+    ingestion_id = str(uuid.uuid4())
+    filename = (file.filename or "upload").strip()
+    path = _upload_path(ingestion_id, filename)
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+
+    digest, size = hashlib.sha256(), 0
+    with open(path, "wb") as out:
+        while piece := await file.read(SPOOL_CHUNK_BYTES):
+            digest.update(piece)
+            size += len(piece)
+            await asyncio.to_thread(out.write, piece)
+    if size == 0:
+        os.remove(path)
+        raise IngestionError("File is empty.")
+
+    async with get_sessionmaker()() as db:
+        return await store.create_ingestion(db, KBIngestion(
+            id=ingestion_id, team_id=team_id, user_id=user_id, source=source,
+            filename=filename, size_bytes=size, content_hash=digest.hexdigest(),
+        ))
+
+
+def _save_chunks(ingestion_id: str, chunks: list[dict]) -> None:
+    tmp = _chunks_path(ingestion_id) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.writelines(json.dumps(chunk) + "\n" for chunk in chunks)
+    os.replace(tmp, _chunks_path(ingestion_id))  # only a complete list is ever resumed from
+
+
+def _load_chunks(ingestion_id: str) -> list[dict] | None:
+    try:
+        with open(_chunks_path(ingestion_id), encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+    except FileNotFoundError:
+        return None
+
+
+def _remove_spool(ingestion: KBIngestion) -> None:
+    for path in (_upload_path(ingestion.id, ingestion.filename), _chunks_path(ingestion.id)):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+async def _report(ingestion_id: str, **values) -> None:
+    async with get_sessionmaker()() as db:
+        await store.update_ingestion(db, ingestion_id, **values)
+
+
+async def _chunk_upload(ingestion: KBIngestion) -> list[dict]:
+    from knowledge_base.extraction import chunk_blocks
+    from knowledge_base.extraction_service import aextract_file_blocks
+
+    await _report(ingestion.id, stage="extracting", progress=_PROGRESS["extracting"])
+    path = _upload_path(ingestion.id, ingestion.filename)
+    try:
+        # Parsed from the spooled file, so the upload is never held in memory as a whole.
+        blocks = await aextract_file_blocks(path, ingestion.filename.lower(), ingestion.content_hash)
+    except Exception as exc:  # noqa: BLE001 — any parser failure means an unreadable file
+        raise IngestionError(f"Could not extract text from file: {exc}") from exc
+
+    await _report(ingestion.id, stage="chunking", progress=_PROGRESS["chunking"])
+    chunks = await asyncio.to_thread(lambda: list(chunk_blocks(blocks)))
+    if not chunks:
+        raise IngestionError("No text could be extracted from the file.")
+    await asyncio.to_thread(_save_chunks, ingestion.id, chunks)
+    return chunks
+
+
+async def run_ingestion(ingestion_id: str) -> None:
+    """Claim and run (or resume) one ingestion. Only one caller wins the claim."""
+    from agents.sub_agents.knowledge_base.pinecone_vector_store import aupsert_document_chunks
+
+    async with get_sessionmaker()() as db:
+        ingestion = await store.claim_ingestion(db, ingestion_id, stale_after=INGEST_STALE_SECONDS)
+    if ingestion is None:
+        logger.info(f"Ingestion {ingestion_id} already claimed or finished — skipping")
+        return
+
+    try:
+        chunks = await asyncio.to_thread(_load_chunks, ingestion_id)
+        if chunks is None:
+            chunks = await _chunk_upload(ingestion)
+        elif ingestion.completed_batches:
+            logger.info(f"Resuming ingestion {ingestion_id} after batch {ingestion.completed_batches}")
+
+        await _report(ingestion_id, stage="indexing", total_chunks=len(chunks),
+                      progress=max(ingestion.progress, _PROGRESS["indexing"]))
+
+        async def on_batch(done: int, total: int) -> None:
+            span = _PROGRESS["finalizing"] - _PROGRESS["indexing"]
+            await _report(ingestion_id, completed_batches=done, total_batches=total,
+                          progress=_PROGRESS["indexing"] + span * done // total,
+                          stage="finalizing" if done == total else "indexing")
+
+        stored = await aupsert_document_chunks(
+            chunks, ingestion.source, team_id=ingestion.team_id, user_id=ingestion.user_id,
+            batch_size=INGEST_BATCH_SIZE, start_batch=ingestion.completed_batches, on_batch=on_batch,
+        )
+    except Exception as exc:  # noqa: BLE001 — every failure is recorded on the ingestion
+        logger.error(f"Ingestion {ingestion_id} failed: {exc}", exc_info=not isinstance(exc, IngestionError))
+        async with get_sessionmaker()() as db:
+            await store.fail_ingestion(db, ingestion_id, str(exc) or type(exc).__name__)
+        await asyncio.to_thread(_remove_spool, ingestion)
+        return
+
+    async with get_sessionmaker()() as db:
+        await store.finish_ingestion(db, ingestion_id, stored)
+    await asyncio.to_thread(_remove_spool, ingestion)
+    logger.info(f"Ingestion {ingestion_id} ('{ingestion.source}') done: {stored} chunk(s)")
+
+
+async def _run_locally(ingestion_id: str) -> None:
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(INGEST_CONCURRENCY)
+    try:
+        async with _slots:
+            await run_ingestion(ingestion_id)
+    except asyncio.CancelledError:
+        async with get_sessionmaker()() as db:
+            await store.requeue_ingestion(db, ingestion_id)
+        raise
+
+
+def submit_ingestion(ingestion_id: str) -> asyncio.Task:
+    """Start (or join) the ingestion on this process; the task outlives the request that submitted it."""
+    task = _tasks.get(ingestion_id)
+    if task is None:
+        task = _tasks[ingestion_id] = asyncio.get_running_loop().create_task(_run_locally(ingestion_id))
+        task.add_done_callback(lambda _: _tasks.pop(ingestion_id, None))
+    return task
+
+
+async def resume_ingestions() -> None:
+    """Startup hook: resume ingestions a previous API process left queued or abandoned."""
+    async with get_sessionmaker()() as db:
+        ingestion_ids = await store.list_resumable_ingestion_ids(db, stale_after=INGEST_STALE_SECONDS)
+    for ingestion_id in ingestion_ids:
+        submit_ingestion(ingestion_id)
+    if ingestion_ids:
+        logger.info(f"Resumed {len(ingestion_ids)} KB ingestion(s)")
+
+
+async def shutdown_ingestions() -> None:
+    """Shutdown hook: stop in-flight ingestions; each re-queues itself to resume on the next startup."""
+    tasks = list(_tasks.values())
+    for task in tasks:
+        task.cancel()
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,87 @@
+"""
+Persistence helpers for KB ingestions (kb_ingestions).
+
+Same shape as jobs/store.py: reads are team-scoped, and `claim_ingestion`
+is a single conditional UPDATE, so an ingestion resumed by two API workers
+at once still runs once.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.models import KBIngestion
+
+
+async def create_ingestion(db: AsyncSession, ingestion: KBIngestion) -> KBIngestion:
+    db.add(ingestion)
+    await db.commit()
+    await db.refresh(ingestion)
+    return ingestion
+
+
+async def get_ingestion(db: AsyncSession, team_id: str, ingestion_id: str) -> KBIngestion | None:
+    return await db.scalar(
+        select(KBIngestion).where(KBIngestion.team_id == team_id, KBIngestion.id == ingestion_id)
+    )
+
+
+def _stale_running(stale_after: float):
+    """A "running" ingestion that stopped reporting progress — its process died."""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=stale_after)
+    return (KBIngestion.status == "running") & (KBIngestion.updated_at < cutoff)
+
+
+async def claim_ingestion(db: AsyncSession, ingestion_id: str, stale_after: float) -> KBIngestion | None:
+    """Atomically move a queued (or abandoned) ingestion to running; None if someone else has it."""
+    claimed = await db.scalar(
+        update(KBIngestion)
+        .where(KBIngestion.id == ingestion_id, or_(KBIngestion.status == "queued", _stale_running(stale_after)))
+        .values(status="running", error=None, updated_at=datetime.now(timezone.utc))
+        .returning(KBIngestion.id)
+    )
+    await db.commit()
+    if claimed is None:
+        return None
+    return await db.get(KBIngestion, ingestion_id, populate_existing=True)
+
+
+async def list_resumable_ingestion_ids(db: AsyncSession, stale_after: float) -> list[str]:
+    rows = await db.scalars(
+        select(KBIngestion.id)
+        .where(or_(KBIngestion.status == "queued", _stale_running(stale_after)))
+        .order_by(KBIngestion.created_at)
+    )
+    return list(rows)
+
+
+async def update_ingestion(db: AsyncSession, ingestion_id: str, **values: Any) -> None:
+    if "progress" in values:
+        values["progress"] = max(0, min(100, values["progress"]))
+    await db.execute(update(KBIngestion).where(KBIngestion.id == ingestion_id).values(**values))
+    await db.commit()
+
+
+async def finish_ingestion(db: AsyncSession, ingestion_id: str, chunks_stored: int) -> None:
+    await update_ingestion(
+        db, ingestion_id, status="succeeded", stage="done", progress=100,
+        chunks_stored=chunks_stored, finished_at=datetime.now(timezone.utc),
+    )
+
+
+async def fail_ingestion(db: AsyncSession, ingestion_id: str, error: str) -> None:
+    await update_ingestion(db, ingestion_id, status="failed", error=error, finished_at=datetime.now(timezone.utc))
+
+
+async def requeue_ingestion(db: AsyncSession, ingestion_id: str) -> None:
+    """Hand an interrupted ingestion back to the queue; it resumes from `completed_batches`."""
+    await db.execute(
+        update(KBIngestion)
+        .where(KBIngestion.id == ingestion_id, KBIngestion.status == "running")
+        .values(status="queued")
+    )
+    await db.commit()
@@ -3,18 +3,26 @@ Knowledge Base router — upload text/documents and list stored sources.
 Endpoints:
   POST /knowledge-base/upload      — embed + store text chunks in Pinecone
   POST /knowledge-base/upload-file — upload PDF or DOCX file, extract text, then store
-  GET  /knowledge-base/documents   — list all uploaded document sources
+                                     (?background=true returns 202 + an ingestion id)
+  GET  /knowledge-base/ingestions/{id} — progress of a file upload
+  GET  /knowledge-base/documents   — list the team's uploaded documents (document registry)
+  GET  /knowledge-base/embedding-stats — query micro-batcher and embedding cache metrics
 """
 
-import io
+import asyncio
 import logging
-from typing import Annotated
+from typing import Annotated, Optional
 
-from fastapi import APIRouter, File, HTTPException, UploadFile, status, Depends
+from fastapi import APIRouter, File, HTTPException, Response, UploadFile, status, Depends
 from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from auth.dependencies import get_current_user
 from core.mlflow_tracking import log_metric, log_params, track_run
+from db.base import get_db_session, get_sessionmaker
+from knowledge_base.extraction import chunk_blocks, iter_text_blocks
+from knowledge_base.ingestion import IngestionError, spool_upload, submit_ingestion
+from knowledge_base.ingestion_store import get_ingestion
 
 logger = logging.getLogger("knowledge_base_router")
 router = APIRouter(prefix="/knowledge-base", tags=["Knowledge Base"])
@@ -29,6 +37,23 @@ class UploadResponse(BaseModel):
     status: str
     chunks_stored: int
     source_name: str
+    ingestion_id: Optional[str] = None  # file uploads: poll GET /knowledge-base/ingestions/{id}
+
+
+class IngestionResponse(BaseModel):
+    id: str
+    source_name: str
+    filename: str
+    status: str                        # queued | running | succeeded | failed
+    stage: str                         # spooled | extracting | chunking | indexing | finalizing | done
+    progress: int = 0                  # 0-100
+    total_chunks: Optional[int] = None
+    completed_batches: int = 0
+    total_batches: Optional[int] = None
+    chunks_stored: Optional[int] = None
+    error: Optional[str] = None
+    created_at: Optional[str] = None
+    finished_at: Optional[str] = None
 
 
 class DocumentsResponse(BaseModel):
@@ -49,7 +74,7 @@ async def upload_document(
         raise HTTPException(status_code=400, detail="text body is empty.")
 
     try:
-        chunks = _chunk_text(req.text)
+        chunks = await asyncio.to_thread(lambda: list(chunk_blocks(iter_text_blocks(req.text))))
 
         async with track_run(
             run_name=f"kb-upload-{req.source_name}",
@@ -62,10 +87,12 @@ async def upload_document(
             },
             tags={"operation": "upload"},
         ):
-            from agents.sub_agents.knowledge_base.pinecone_vector_store import upsert_document_chunks
-            stored = upsert_document_chunks(
-                [{"text": c} for c in chunks],
+            from agents.sub_agents.knowledge_base.pinecone_vector_store import aupsert_document_chunks
+            stored = await aupsert_document_chunks(
+                chunks,
                 source_name=req.source_name,
+                team_id=current_user["team_id"],
+                user_id=current_user["id"],
             )
             log_metric("chunks_stored", stored)
             return UploadResponse(
@@ -85,9 +112,16 @@ async def upload_document(
 async def upload_file(
     file: Annotated[UploadFile, File()],
     current_user: Annotated[dict, Depends(get_current_user)],
+    response: Response,
+    background: bool = False,
 ):
     """
     Upload a PDF or DOCX file: extract text, chunk, embed, and store in the knowledge base.
+
+    The file is streamed to disk and ingested in resumable stages (see
+    knowledge_base/ingestion.py). By default the request waits for the result;
+    with `?background=true` it returns 202 as soon as the file is spooled, and
+    the client polls GET /knowledge-base/ingestions/{ingestion_id}.
     """
     fn = (file.filename or "").strip().lower()
     if not fn.endswith(".pdf") and not fn.endswith(".docx"):
@@ -95,64 +129,87 @@ async def upload_file(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Only PDF and DOCX files are allowed.",
         )
-    content = await file.read()
-    if not content:
-        raise HTTPException(status_code=400, detail="File is empty.")
 
+    source_name = (file.filename or "uploaded_doc").rsplit(".", 1)[0].strip() or "uploaded_doc"
     try:
-        text = _extract_text_from_file(content, fn)
-    except Exception as exc:
-        logger.warning(f"Extract text failed: {exc}")
+        ingestion = await spool_upload(file, current_user["team_id"], current_user["id"], source_name)
+    except IngestionError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    task = submit_ingestion(ingestion.id)
+
+    if background:
+        response.status_code = status.HTTP_202_ACCEPTED
+        return UploadResponse(status="queued", chunks_stored=0, source_name=source_name, ingestion_id=ingestion.id)
+
+    async with track_run(
+        run_name=f"kb-upload-file-{source_name}",
+        run_type="knowledge_base",
+        params={
+            "operation": "upload_file",
+            "source_name": source_name,
+            "filename": file.filename or "",
+            "file_bytes": ingestion.size_bytes,
+            "user_id": current_user["id"],
+        },
+        tags={"operation": "upload_file"},
+    ):
+        # Shielded: a client that disconnects doesn't stop the ingestion.
+        await asyncio.shield(task)
+        async with get_sessionmaker()() as db:
+            ingestion = await get_ingestion(db, current_user["team_id"], ingestion.id)
+        if ingestion.status == "succeeded":
+            log_metric("chunks_stored", ingestion.chunks_stored or 0)
+
+    if ingestion.status != "succeeded":
+        logger.error(f"Upload file error ({ingestion.id}): {ingestion.error}")
+        unreadable = ingestion.stage in ("extracting", "chunking")
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Could not extract text from file: {exc}",
-        ) from exc
+            status_code=status.HTTP_400_BAD_REQUEST if unreadable else status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=ingestion.error if unreadable else f"Upload failed: {ingestion.error}",
+        )
+    return UploadResponse(
+        status="success",
+        chunks_stored=ingestion.chunks_stored or 0,
+        source_name=source_name,
+        ingestion_id=ingestion.id,
+    )
 
-    if not (text or "").strip():
-        raise HTTPException(status_code=400, detail="No text could be extracted from the file.")
 
-    source_name = (file.filename or "uploaded_doc").rsplit(".", 1)[0].strip() or "uploaded_doc"
-    try:
-        chunks = _chunk_text(text.strip())
-        async with track_run(
-            run_name=f"kb-upload-file-{source_name}",
-            run_type="knowledge_base",
-            params={
-                "operation": "upload_file",
-                "source_name": source_name,
-                "filename": file.filename or "",
-                "text_length": len(text),
-                "user_id": current_user["id"],
-            },
-            tags={"operation": "upload_file"},
-        ):
-            from agents.sub_agents.knowledge_base.pinecone_vector_store import upsert_document_chunks
-            stored = upsert_document_chunks(
-                [{"text": c} for c in chunks],
-                source_name=source_name,
-            )
-            log_metric("chunks_stored", stored)
-            return UploadResponse(
-                status="success",
-                chunks_stored=stored,
-                source_name=source_name,
-            )
-    except Exception as exc:
-        logger.error(f"Upload file error: {exc}", exc_info=True)
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Upload failed: {str(exc)}",
-        ) from exc
+@router.get("/ingestions/{ingestion_id}", response_model=IngestionResponse)
+async def get_ingestion_status(
+    ingestion_id: str,
+    current_user: Annotated[dict, Depends(get_current_user)],
+    db: Annotated[AsyncSession, Depends(get_db_session)],
+):
+    """Progress of a file upload: stage, batches embedded + upserted so far, and the outcome."""
+    ingestion = await get_ingestion(db, current_user["team_id"], ingestion_id)
+    if ingestion is None:
+        raise HTTPException(status_code=404, detail="Ingestion not found.")
+    return IngestionResponse(
+        id=ingestion.id,
+        source_name=ingestion.source,
+        filename=ingestion.filename,
+        status=ingestion.status,
+        stage=ingestion.stage,
+        progress=ingestion.progress,
+        total_chunks=ingestion.total_chunks,
+        completed_batches=ingestion.completed_batches,
+        total_batches=ingestion.total_batches,
+        chunks_stored=ingestion.chunks_stored,
+        error=ingestion.error,
+        created_at=ingestion.created_at.isoformat() if ingestion.created_at else None,
+        finished_at=ingestion.finished_at.isoformat() if ingestion.finished_at else None,
+    )
 
 
 @router.get("/documents", response_model=DocumentsResponse)
 async def list_documents(
     current_user: Annotated[dict, Depends(get_current_user)],
 ):
-    """List all document sources stored in the knowledge base."""
+    """List the team's knowledge-base documents (registry, or an index scan before the backfill)."""
     try:
-        from agents.sub_agents.knowledge_base.pinecone_vector_store import list_all_sources
-        sources = list_all_sources()
+        from agents.sub_agents.knowledge_base.pinecone_vector_store import list_team_sources
+        sources = await list_team_sources(current_user["team_id"])
         return DocumentsResponse(documents=sources)
     except Exception as exc:
         logger.error(f"List documents error: {exc}", exc_info=True)
@@ -162,49 +219,22 @@ async def list_documents(
         )
 
 
-# ─── Helpers ─────────────────────────────────────────────────────────────────
-
-def _extract_text_from_file(content: bytes, filename: str) -> str:
-    """Extract plain text from PDF or DOCX file content."""
-    if filename.endswith(".pdf"):
-        try:
-            import fitz  # PyMuPDF
-        except ImportError:
-            raise RuntimeError("PDF support requires PyMuPDF: pip install PyMuPDF")
-        doc = fitz.open(stream=content, filetype="pdf")
-        parts = []
-        for page in doc:
-            parts.append(page.get_text())
-        doc.close()
-        return "\n\n".join(parts).strip()
-    if filename.endswith(".docx"):
-        try:
-            from docx import Document
-        except ImportError:
-            raise RuntimeError("DOCX support requires python-docx: pip install python-docx")
-        doc = Document(io.BytesIO(content))
-        return "\n\n".join(p.text for p in doc.paragraphs if p.text).strip()
-    raise ValueError("Unsupported file type")
-
-
-def _chunk_text(text: str, chunk_size: int = 800, overlap: int = 100) -> list[str]:
+@router.get("/embedding-stats")
+async def embedding_stats(
+    current_user: Annotated[dict, Depends(get_current_user)],
+):
     """
-    Split text into overlapping chunks of ~chunk_size characters.
-    Simple sliding-window splitter — no external library needed.
+    Embedding stats (this worker): query micro-batcher batch sizes / queue and
+    encode latency in ms, and embedding cache hit ratio. Also the embedding
+    versions, with re-embed progress while a migration runs (reembed.py),
+    and the shared embedding sidecar's stats when one is configured.
     """
-    text = text.strip()
-    if len(text) <= chunk_size:
-        return [text]
-
-    chunks = []
-    start = 0
-    while start < len(text):
-        end = start + chunk_size
-        # Try to break on a sentence boundary
-        if end < len(text):
-            boundary = text.rfind(". ", start, end)
-            if boundary != -1 and boundary > start + chunk_size // 2:
-                end = boundary + 1  # include the period
-        chunks.append(text[start:end].strip())
-        start = end - overlap
-    return [c for c in chunks if c]
+    from agents.sub_agents.knowledge_base.embedding_versions import version_status
+    from agents.sub_agents.knowledge_base.pinecone_vector_store import embedding_cache_stats, embedding_sidecar_stats
+    from agents.sub_agents.knowledge_base.query_batcher import query_batcher_stats
+    return {
+        "query_batcher": query_batcher_stats(),
+        "cache": embedding_cache_stats(),
+        "embedding_versions": await version_status(),
+        "sidecar": await asyncio.to_thread(embedding_sidecar_stats),
+    }
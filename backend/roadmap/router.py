@@ -21,7 +21,8 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from auth.dependencies import get_current_user
+from auth.dependencies import get_current_user, llm_lane
+from core.request_context import BACKGROUND
 from db.base import get_db_session
 from db.models import RoadmapItem
 from roadmap import store
@@ -41,7 +42,7 @@ from roadmap.schemas import (
 )
 
 logger = logging.getLogger("roadmap_router")
-router = APIRouter(prefix="/roadmap", tags=["Roadmap"])
+router = APIRouter(prefix="/roadmap", tags=["Roadmap"], dependencies=[Depends(llm_lane(BACKGROUND))])
 
 
 def _to_response(item: RoadmapItem) -> RoadmapItemResponse:
@@ -18,8 +18,9 @@ from typing import Annotated
 from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from auth.dependencies import get_current_user
+from auth.dependencies import get_current_user, llm_lane
 from core.config import config
+from core.request_context import INTERACTIVE
 from db.base import get_db_session
 from simulator import store
 from simulator.personas import MAX_TURNS, PERSONAS, PERSONAS_BY_ID
@@ -40,7 +41,7 @@ from simulator.schemas import (
 from simulator.tts import TTSNotConfigured, synthesize_speech
 
 logger = logging.getLogger("simulator_router")
-router = APIRouter(prefix="/simulator", tags=["Simulator"])
+router = APIRouter(prefix="/simulator", tags=["Simulator"], dependencies=[Depends(llm_lane(INTERACTIVE))])
 
 
 def _resolve_persona(scenario_id: str, custom_persona: str | None):
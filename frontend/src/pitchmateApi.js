@@ -85,6 +85,48 @@ export async function apiPitchmate(query, sessionId = null, agentName = null) {
     return data; // { status, response, session_id }
 }
 
+/**
+ * Streaming variant of apiPitchmate (POST /agents/pitchmate/stream, server-sent events).
+ * `onEvent(event, data)` fires per frame: session, token, agent_start, agent_token,
+ * agent_end, final, error. `final.response` is authoritative — replace any streamed text with it.
+ * @returns {{ response: string, session_id: string }} the `final` frame's payload
+ */
+export async function apiPitchmateStream(query, sessionId = null, agentName = null, onEvent = () => {}) {
+    const headers = await authHeaders();
+    const res = await fetch(`${BACKEND}/agents/pitchmate/stream`, {
+        method: "POST",
+        headers,
+        body: JSON.stringify({ query, session_id: sessionId, agent_name: agentName || null }),
+    });
+    if (!res.ok || !res.body) {
+        const data = await res.json().catch(() => ({}));
+        throw new Error(data?.detail || `Agent request failed (${res.status})`);
+    }
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    let final = null;
+    for (;;) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let sep;
+        while ((sep = buffer.indexOf("\n\n")) !== -1) {
+            const frame = buffer.slice(0, sep);
+            buffer = buffer.slice(sep + 2);
+            const event = frame.match(/^event: (.*)$/m)?.[1];
+            const raw = frame.match(/^data: (.*)$/m)?.[1];
+            if (!event || raw == null) continue;
+            const data = JSON.parse(raw);
+            onEvent(event, data);
+            if (event === "error") throw new Error(data?.detail || "Agent request failed");
+            if (event === "final") final = data;
+        }
+    }
+    if (!final) throw new Error("Stream ended without a final response");
+    return final; // { response, session_id }
+}
+
 /** Root agent + every specialist sub-agent currently available, for the chat's agent picker. */
 export async function apiGetAvailableAgents() {
     const headers = await authHeaders();